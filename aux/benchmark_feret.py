@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+from __future__ import print_function, division
+
+# import modules
+import sys
+import os
+import time
+import inspect
+import argparse
+import numpy as np
+from scipy import ndimage as ndi
+from skimage.measure import regionprops
+
+# This makes python look for modules in directory above this one
+mm3_dir = os.path.realpath(os.path.abspath(
+                                 os.path.join(os.path.split(inspect.getfile(
+                                 inspect.currentframe()))[0], '..')))
+if mm3_dir not in sys.path:
+    sys.path.insert(0, mm3_dir)
+
+import mm3_helpers as mm3
+
+def feretdiameter_reference(region):
+    '''
+    The per region feretdiameter from before feret_diameters, kept for comparison.
+    feretdiameter calculates the length and width of the binary region shape. The cell orientation
+    from the ellipsoid is used to find the major and minor axis of the cell.
+    See https://en.wikipedia.org/wiki/Feret_diameter.
+    '''
+
+    # y: along vertical axis of the image; x: along horizontal axis of the image;
+    # calculate the relative centroid in the bounding box (non-rotated)
+    # print(region.centroid)
+    y0, x0 = region.centroid
+    y0 = y0 - np.int16(region.bbox[0]) + 1
+    x0 = x0 - np.int16(region.bbox[1]) + 1
+    cosorient = np.cos(region.orientation)
+    sinorient = np.sin(region.orientation)
+    # print(cosorient, sinorient)
+    amp_param = 1.2 #amplifying number to make sure the axis is longer than actual cell length
+
+    # coordinates relative to bounding box
+    # r_coords = region.coords - [np.int16(region.bbox[0]), np.int16(region.bbox[1])]
+
+    # limit to perimeter coords. pixels are relative to bounding box
+    region_binimg = np.pad(region.image, 1, 'constant') # pad region binary image by 1 to avoid boundary non-zero pixels
+    distance_image = ndi.distance_transform_edt(region_binimg)
+    r_coords = np.where(distance_image == 1)
+    r_coords = list(zip(r_coords[0], r_coords[1]))
+
+    # coordinates are already sorted by y. partion into top and bottom to search faster later
+    # if orientation > 0, L1 is closer to top of image (lower Y coord)
+    if region.orientation > 0:
+        L1_coords = r_coords[:int(np.round(len(r_coords)/4))]
+        L2_coords = r_coords[int(np.round(len(r_coords)/4)):]
+    else:
+        L1_coords = r_coords[int(np.round(len(r_coords)/4)):]
+        L2_coords = r_coords[:int(np.round(len(r_coords)/4))]
+
+    #####################
+    # calculte cell length
+    L1_pt = np.zeros((2,1))
+    L2_pt = np.zeros((2,1))
+
+    # define the two end points of the the long axis line
+    # one pole.
+    L1_pt[1] = x0 + cosorient * 0.5 * region.major_axis_length*amp_param
+    L1_pt[0] = y0 - sinorient * 0.5 * region.major_axis_length*amp_param
+
+    # the other pole.
+    L2_pt[1] = x0 - cosorient * 0.5 * region.major_axis_length*amp_param
+    L2_pt[0] = y0 + sinorient * 0.5 * region.major_axis_length*amp_param
+
+    # calculate the minimal distance between the points at both ends of 3 lines
+    # aka calcule the closest coordiante in the region to each of the above points.
+    # pt_L1 = r_coords[np.argmin([np.sqrt(np.power(Pt[0]-L1_pt[0],2) + np.power(Pt[1]-L1_pt[1],2)) for Pt in r_coords])]
+    # pt_L2 = r_coords[np.argmin([np.sqrt(np.power(Pt[0]-L2_pt[0],2) + np.power(Pt[1]-L2_pt[1],2)) for Pt in r_coords])]
+
+    try:
+        pt_L1 = L1_coords[np.argmin([np.sqrt(np.power(Pt[0]-L1_pt[0],2) + np.power(Pt[1]-L1_pt[1],2)) for Pt in L1_coords])]
+        pt_L2 = L2_coords[np.argmin([np.sqrt(np.power(Pt[0]-L2_pt[0],2) + np.power(Pt[1]-L2_pt[1],2)) for Pt in L2_coords])]
+        length = np.sqrt(np.power(pt_L1[0]-pt_L2[0],2) + np.power(pt_L1[1]-pt_L2[1],2))
+    except:
+        length = None
+
+    #####################
+    # calculate cell width
+    # draw 2 parallel lines along the short axis line spaced by 0.8*quarter of length = 0.4, to avoid  in midcell
+
+    # limit to points in each half
+    W_coords = []
+    if region.orientation > 0:
+        W_coords.append(r_coords[:int(np.round(len(r_coords)/2))]) # note the /2 here instead of /4
+        W_coords.append(r_coords[int(np.round(len(r_coords)/2)):])
+    else:
+        W_coords.append(r_coords[int(np.round(len(r_coords)/2)):])
+        W_coords.append(r_coords[:int(np.round(len(r_coords)/2))])
+
+    # starting points
+    x1 = x0 + cosorient * 0.5 * length*0.4
+    y1 = y0 - sinorient * 0.5 * length*0.4
+    x2 = x0 - cosorient * 0.5 * length*0.4
+    y2 = y0 + sinorient * 0.5 * length*0.4
+    W1_pts = np.zeros((2,2))
+    W2_pts = np.zeros((2,2))
+
+    # now find the ends of the lines
+    # one side
+    W1_pts[0,1] = x1 - sinorient * 0.5 * region.minor_axis_length*amp_param
+    W1_pts[0,0] = y1 - cosorient * 0.5 * region.minor_axis_length*amp_param
+    W1_pts[1,1] = x2 - sinorient * 0.5 * region.minor_axis_length*amp_param
+    W1_pts[1,0] = y2 - cosorient * 0.5 * region.minor_axis_length*amp_param
+
+    # the other side
+    W2_pts[0,1] = x1 + sinorient * 0.5 * region.minor_axis_length*amp_param
+    W2_pts[0,0] = y1 + cosorient * 0.5 * region.minor_axis_length*amp_param
+    W2_pts[1,1] = x2 + sinorient * 0.5 * region.minor_axis_length*amp_param
+    W2_pts[1,0] = y2 + cosorient * 0.5 * region.minor_axis_length*amp_param
+
+    # calculate the minimal distance between the points at both ends of 3 lines
+    pt_W1 = np.zeros((2,2))
+    pt_W2 = np.zeros((2,2))
+    d_W = np.zeros((2,1))
+    i = 0
+    for W1_pt, W2_pt in zip(W1_pts, W2_pts):
+
+        # # find the points closest to the guide points
+        # pt_W1[i,0], pt_W1[i,1] = r_coords[np.argmin([np.sqrt(np.power(Pt[0]-W1_pt[0],2) + np.power(Pt[1]-W1_pt[1],2)) for Pt in r_coords])]
+        # pt_W2[i,0], pt_W2[i,1] = r_coords[np.argmin([np.sqrt(np.power(Pt[0]-W2_pt[0],2) + np.power(Pt[1]-W2_pt[1],2)) for Pt in r_coords])]
+
+        # find the points closest to the guide points
+        pt_W1[i,0], pt_W1[i,1] = W_coords[i][np.argmin([np.sqrt(np.power(Pt[0]-W1_pt[0],2) + np.power(Pt[1]-W1_pt[1],2)) for Pt in W_coords[i]])]
+        pt_W2[i,0], pt_W2[i,1] = W_coords[i][np.argmin([np.sqrt(np.power(Pt[0]-W2_pt[0],2) + np.power(Pt[1]-W2_pt[1],2)) for Pt in W_coords[i]])]
+
+        # calculate the actual width
+        d_W[i] = np.sqrt(np.power(pt_W1[i,0]-pt_W2[i,0],2) + np.power(pt_W1[i,1]-pt_W2[i,1],2))
+        i += 1
+
+    # take the average of the two at quarter positions
+    width = np.mean([d_W[0],d_W[1]])
+
+    return length, width
+
+
+def make_test_stack(n_frames, n_cells, seed=0):
+    '''Labeled stack of rod shaped cells with random sizes and tilts, packed
+    along a channel like in a mother machine.'''
+
+    rng = np.random.RandomState(seed)
+    height, width = 40 * n_cells + 20, 32
+    yy, xx = np.mgrid[:height, :width]
+    label_stack = np.zeros((n_frames, height, width), dtype='uint16')
+    for frame in range(n_frames):
+        y = 10
+        for label in range(1, n_cells + 1):
+            length = rng.uniform(15, 35)
+            radius = rng.uniform(4, 7)
+            angle = rng.uniform(-0.3, 0.3)
+            cy, cx = y + length / 2, width / 2 + rng.uniform(-2, 2)
+            # distance to the axis segment of the rod
+            u = (yy - cy) * np.cos(angle) + (xx - cx) * np.sin(angle)
+            v = -(yy - cy) * np.sin(angle) + (xx - cx) * np.cos(angle)
+            u = np.clip(np.abs(u) - length / 2, 0, None)
+            label_stack[frame][(u**2 + v**2 <= radius**2) & (label_stack[frame] == 0)] = label
+            y += length + 2 * radius + 2
+
+    return label_stack
+
+# when using this script as a function and not as a library the following will execute
+if __name__ == "__main__":
+    '''Times feret_diameters against the per region feretdiameter it replaced and
+    checks that both give the same lengths and widths. Uses a synthetic stack,
+    or the segmented stack of a channel when given a parameter file.'''
+
+    parser = argparse.ArgumentParser(prog='python benchmark_feret.py',
+                                     description='Benchmark Feret diameter calculation.')
+    parser.add_argument('-f', '--paramfile', type=str,
+                        required=False, help='Yaml file of an experiment to take a segmented stack from.')
+    parser.add_argument('-o', '--fov', type=int,
+                        required=False, help='FOV of the stack. Defaults to the first analyzed one.')
+    parser.add_argument('-p', '--peak', type=int,
+                        required=False, help='Peak of the stack. Defaults to the first analyzed one.')
+    parser.add_argument('-t', '--frames', type=int, default=200,
+                        required=False, help='Number of frames of the synthetic stack.')
+    namespace = parser.parse_args()
+
+    if namespace.paramfile:
+        p = mm3.init_mm3_helpers(namespace.paramfile)
+        specs = mm3.load_specs()
+        fov_id = namespace.fov or sorted(specs.keys())[0]
+        peak_id = namespace.peak or sorted([peak for peak, spec in specs[fov_id].items() if spec == 1])[0]
+        label_stack = mm3.load_stack(fov_id, peak_id, color=p['seg_img'])
+    else:
+        label_stack = make_test_stack(namespace.frames, 5)
+
+    # table without the Feret diameters, which are what is timed
+    t0 = time.time()
+    region_table = mm3.make_region_table(label_stack)
+    table_time = time.time() - t0
+    n_regions = len(region_table['label'])
+    print('{} regions in {} frames. Region table made in {:.2f} s.'.format(n_regions, len(label_stack), table_time))
+
+    t0 = time.time()
+    regions = [region for label_image in label_stack for region in regionprops(label_image)]
+    reference = [feretdiameter_reference(region) for region in regions]
+    reference_time = time.time() - t0
+
+    t0 = time.time()
+    lengths, widths = mm3.feret_diameters(label_stack, region_table)
+    batch_time = time.time() - t0
+
+    print('%-24s %12s' % ('', 'us / region'))
+    print('%-24s %12.1f' % ('feretdiameter (before)', 1e6 * reference_time / n_regions))
+    print('%-24s %12.1f' % ('feret_diameters', 1e6 * batch_time / n_regions))
+    print('Speedup {:.0f}x.'.format(reference_time / batch_time))
+
+    reference_lengths = np.array([np.nan if length is None else length for length, _ in reference])
+    reference_widths = np.array([width for _, width in reference])
+    same = (np.array_equal(lengths, reference_lengths, equal_nan=True) and
+            np.array_equal(widths, reference_widths, equal_nan=True))
+    print('Identical lengths and widths: {}'.format(same))
+    if not same:
+        sys.exit(1)
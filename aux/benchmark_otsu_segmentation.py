@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+from __future__ import print_function, division
+import six
+
+# import modules
+import sys
+import os
+import time
+import inspect
+import argparse
+import numpy as np
+
+# user modules
+# realpath() will make your script run, even if you symlink it
+cmd_folder = os.path.realpath(os.path.abspath(
+                              os.path.split(inspect.getfile(inspect.currentframe()))[0]))
+if cmd_folder not in sys.path:
+    sys.path.insert(0, cmd_folder)
+
+# This makes python look for modules in directory above this one
+mm3_dir = os.path.realpath(os.path.abspath(
+                                 os.path.join(os.path.split(inspect.getfile(
+                                 inspect.currentframe()))[0], '..')))
+if mm3_dir not in sys.path:
+    sys.path.insert(0, mm3_dir)
+
+import mm3_helpers as mm3
+
+def segment_stack_timed(sub_stack, method):
+    '''Segments every frame with the given Otsu method and returns the labeled
+    stack and the time per frame in seconds.'''
+
+    mm3.params['segment']['otsu']['method'] = method
+
+    labeled_stack = []
+    frame_times = []
+    for image in sub_stack:
+        t0 = time.time()
+        labeled_stack.append(mm3.segment_image(image))
+        frame_times.append(time.time() - t0)
+
+    return np.stack(labeled_stack, axis=0), np.array(frame_times)
+
+def match_labels(labels_ref, labels_test, iou_threshold=0.5):
+    '''Compares two labeled images.
+
+    Returns
+    -------
+    fg_iou : float
+        Intersection over union of the foreground (all cells).
+    n_matched, n_ref, n_test : int
+        Objects matched one to one at IoU > iou_threshold, and the number of
+        objects in each image.
+    '''
+
+    fg_ref = labels_ref > 0
+    fg_test = labels_test > 0
+    union = np.sum(fg_ref | fg_test)
+    fg_iou = np.sum(fg_ref & fg_test) / union if union else 1.0
+
+    n_ref = int(labels_ref.max())
+    n_test = int(labels_test.max())
+    if n_ref == 0 or n_test == 0:
+        return fg_iou, 0, n_ref, n_test
+
+    # overlap table between every pair of objects (row 0 and column 0 are background)
+    overlap = np.zeros((n_ref + 1, n_test + 1), dtype=np.int64)
+    np.add.at(overlap, (labels_ref.ravel(), labels_test.ravel()), 1)
+    area_ref = overlap.sum(axis=1)[1:, np.newaxis]
+    area_test = overlap.sum(axis=0)[np.newaxis, 1:]
+    intersection = overlap[1:, 1:]
+    iou = intersection / (area_ref + area_test - intersection)
+
+    # IoU > 0.5 guarantees a match is unique
+    n_matched = int(np.sum(iou > iou_threshold))
+
+    return fg_iou, n_matched, n_ref, n_test
+
+# when using this script as a function and not as a library the following will execute
+if __name__ == "__main__":
+    '''Compare the random walker and watershed backends of mm3.segment_image
+    for speed and agreement on subtracted images from an experiment.'''
+
+    parser = argparse.ArgumentParser(prog='python benchmark_otsu_segmentation.py',
+                                     description='Benchmark Otsu segmentation methods.')
+    parser.add_argument('-f', '--paramfile',  type=str,
+                        required=True, help='Yaml file containing parameters.')
+    parser.add_argument('-o', '--fov',  type=str,
+                        required=False, help='List of fields of view to analyze. Input "1", "1,2,3", or "1-10", etc.')
+    parser.add_argument('-p', '--peaks', type=int, default=5,
+                        required=False, help='Number of analyzed peaks per FOV to use.')
+    parser.add_argument('-t', '--frames', type=int, default=50,
+                        required=False, help='Number of frames per peak to use.')
+    namespace = parser.parse_args()
+
+    # Load the project parameters file
+    mm3.information('Loading experiment parameters.')
+    p = mm3.init_mm3_helpers(namespace.paramfile) # initialized the helper library
+
+    if namespace.fov:
+        if '-' in namespace.fov:
+            user_spec_fovs = range(int(namespace.fov.split("-")[0]),
+                                   int(namespace.fov.split("-")[1])+1)
+        else:
+            user_spec_fovs = [int(val) for val in namespace.fov.split(",")]
+    else:
+        user_spec_fovs = []
+
+    specs = mm3.load_specs()
+    fov_id_list = sorted([fov_id for fov_id in specs.keys()])
+    if user_spec_fovs:
+        fov_id_list[:] = [fov for fov in fov_id_list if fov in user_spec_fovs]
+
+    methods = ['random_walker', 'watershed']
+    times = {method : [] for method in methods}
+    fg_ious = []
+    n_matched, n_ref, n_test = 0, 0, 0
+
+    for fov_id in fov_id_list:
+        ana_peak_ids = sorted([peak_id for peak_id, spec in six.iteritems(specs[fov_id]) if spec == 1])
+        for peak_id in ana_peak_ids[:namespace.peaks]:
+            mm3.information('Benchmarking FOV %d, peak %d.' % (fov_id, peak_id))
+            sub_stack = mm3.load_stack(fov_id, peak_id, color='sub_{}'.format(p['phase_plane']))
+            sub_stack = sub_stack[:namespace.frames]
+
+            labeled = {}
+            for method in methods:
+                labeled[method], frame_times = segment_stack_timed(sub_stack, method)
+                times[method].extend(frame_times)
+
+            for labels_ref, labels_test in zip(labeled['random_walker'], labeled['watershed']):
+                fg_iou, matched, ref, test = match_labels(labels_ref, labels_test)
+                fg_ious.append(fg_iou)
+                n_matched += matched
+                n_ref += ref
+                n_test += test
+
+    if not fg_ious:
+        mm3.warning('No analyzed peaks found.')
+        sys.exit(1)
+
+    # report
+    print()
+    print('Frames compared: %d' % len(fg_ious))
+    for method in methods:
+        print('%-14s %8.2f ms/frame (median %.2f ms)' % (method,
+              1000 * np.mean(times[method]), 1000 * np.median(times[method])))
+    print('Speedup (mean): %.1fx' % (np.mean(times['random_walker']) / np.mean(times['watershed'])))
+    print('Foreground IoU: mean %.4f, min %.4f' % (np.mean(fg_ious), np.min(fg_ious)))
+    precision = n_matched / n_test if n_test else 1.0
+    recall = n_matched / n_ref if n_ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) else 0.0
+    print('Matched objects (IoU > 0.5): %d of %d random_walker, %d watershed' % (n_matched, n_ref, n_test))
+    print('Object precision %.4f, recall %.4f, F1 %.4f' % (precision, recall, f1))
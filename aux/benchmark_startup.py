@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+from __future__ import print_function, division
+
+# import modules
+import sys
+import os
+import time
+import inspect
+import argparse
+import subprocess
+import numpy as np
+
+# This makes python look for modules in directory above this one
+mm3_dir = os.path.realpath(os.path.abspath(
+                                 os.path.join(os.path.split(inspect.getfile(
+                                 inspect.currentframe()))[0], '..')))
+
+# pipeline scripts to time. All of them exit after their imports when given -h
+scripts = ['mm3_Compile.py',
+           'mm3_ChannelPicker.py',
+           'mm3_Subtract.py',
+           'mm3_Segment-Otsu.py',
+           'mm3_Segment-Unet.py',
+           'mm3_Track-Standard.py',
+           'mm3_Track.py',
+           'mm3_DetectFoci.py',
+           'mm3_TrackFoci.py']
+
+# packages that are expensive to import
+heavy_modules = ['tensorflow', 'sklearn', 'pandas', 'networkx', 'matplotlib']
+
+def parse_importtime(stderr):
+    '''Reads the output of python -X importtime.
+
+    Returns
+    -------
+    import_time : float
+        Sum of the self time of all imports, in seconds.
+    modules : list of str
+        Names of all imported modules.
+    '''
+
+    import_time = 0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        import_time += int(self_us)
+        modules.append(name.strip())
+
+    return import_time / 1e6, modules
+
+def time_startup(command, cwd):
+    '''Runs a command with python -X importtime and measures it.
+
+    Returns
+    -------
+    wall_time : float
+        Seconds until the process exited.
+    import_time : float
+        Seconds spent importing.
+    max_rss : float
+        Peak resident memory in MB.
+    modules : list of str
+        Names of all imported modules.
+    '''
+
+    t0 = time.time()
+    proc = subprocess.Popen([sys.executable, '-X', 'importtime'] + command, cwd=cwd,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    stderr = proc.stderr.read()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    wall_time = time.time() - t0
+    proc.returncode = status # reaped by wait4 to get its resource usage
+
+    import_time, modules = parse_importtime(stderr)
+    max_rss = rusage.ru_maxrss / 1024 # kB on Linux
+
+    return wall_time, import_time, max_rss, modules
+
+def benchmark_dir(directory, script_list, repeats):
+    '''Times importing mm3_helpers and starting each script in a checkout of mm3.
+
+    Returns a dictionary keyed by script with the median wall time, import time
+    and peak memory, and which heavy packages were imported.
+    '''
+
+    results = {}
+    commands = [('import mm3_helpers', ['-c', 'import mm3_helpers'])]
+    commands += [(script, [script, '-h']) for script in script_list
+                 if os.path.exists(os.path.join(directory, script))]
+
+    for name, command in commands:
+        runs = [time_startup(command, directory) for _ in range(repeats)]
+        loaded = set(module.split('.')[0] for module in runs[0][3])
+        results[name] = {'wall' : np.median([run[0] for run in runs]),
+                         'import' : np.median([run[1] for run in runs]),
+                         'rss' : np.median([run[2] for run in runs]),
+                         'heavy' : [module for module in heavy_modules if module in loaded]}
+
+    return results
+
+def print_results(results, label):
+    print()
+    print(label)
+    print('%-24s %9s %9s %9s  %s' % ('', 'wall [s]', 'import [s]', 'RSS [MB]', 'heavy imports'))
+    for name, result in results.items():
+        print('%-24s %9.2f %9.2f %9.0f  %s' % (name, result['wall'], result['import'],
+              result['rss'], ', '.join(result['heavy'])))
+
+# when using this script as a function and not as a library the following will execute
+if __name__ == "__main__":
+    '''Measures the startup time and memory of the mm3 scripts with
+    python -X importtime. Give --compare with an older checkout, for example
+    one made with git worktree, to see the difference.'''
+
+    parser = argparse.ArgumentParser(prog='python benchmark_startup.py',
+                                     description='Benchmark startup of the mm3 scripts.')
+    parser.add_argument('-d', '--directory', type=str, default=mm3_dir,
+                        required=False, help='mm3 directory to benchmark. Defaults to this checkout.')
+    parser.add_argument('-c', '--compare', type=str,
+                        required=False, help='Other mm3 directory to compare against.')
+    parser.add_argument('-s', '--scripts', type=str, nargs='*', default=scripts,
+                        required=False, help='Scripts to time.')
+    parser.add_argument('-r', '--repeats', type=int, default=3,
+                        required=False, help='Runs per script. The median is reported.')
+    namespace = parser.parse_args()
+
+    results = benchmark_dir(namespace.directory, namespace.scripts, namespace.repeats)
+    print_results(results, namespace.directory)
+
+    if not namespace.compare:
+        sys.exit(0)
+
+    results_ref = benchmark_dir(namespace.compare, namespace.scripts, namespace.repeats)
+    print_results(results_ref, namespace.compare)
+
+    print()
+    print('%-24s %9s %9s' % ('', 'speedup', 'RSS saved [MB]'))
+    for name in results:
+        if name in results_ref:
+            print('%-24s %8.1fx %9.0f' % (name,
+                  results_ref[name]['wall'] / results[name]['wall'],
+                  results_ref[name]['rss'] - results[name]['rss']))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+from __future__ import print_function, division
+import six
+
+# import modules
+import sys
+import os
+import inspect
+import argparse
+import numpy as np
+
+# user modules
+# realpath() will make your script run, even if you symlink it
+cmd_folder = os.path.realpath(os.path.abspath(
+                              os.path.split(inspect.getfile(inspect.currentframe()))[0]))
+if cmd_folder not in sys.path:
+    sys.path.insert(0, cmd_folder)
+
+# This makes python look for modules in directory above this one
+mm3_dir = os.path.realpath(os.path.abspath(
+                                 os.path.join(os.path.split(inspect.getfile(
+                                 inspect.currentframe()))[0], '..')))
+if mm3_dir not in sys.path:
+    sys.path.insert(0, mm3_dir)
+
+import mm3_inference as inference
+
+def get_experiment_samples(mm3, p, kind, n_samples):
+    '''Loads preprocessed frames from the analyzed channels of an experiment,
+    for the cell and foci segmentation models.'''
+
+    specs = mm3.load_specs()
+    unet_shape = (p['segment']['trained_model_image_height'],
+                  p['segment']['trained_model_image_width'])
+
+    samples = []
+    for fov_id in sorted(specs.keys()):
+        for _, peak_id, pad_dict, _ in mm3_ml.get_unet_peak_jobs(fov_id, specs, unet_shape):
+            if kind == 'cells':
+                img_stack = mm3.load_stack(fov_id, peak_id, color=p['phase_plane'])
+                img_stack = mm3_ml.preprocess_cells_unet(img_stack, pad_dict, unet_shape)
+            else:
+                img_stack = mm3.load_stack(fov_id, peak_id, color=p['foci']['foci_plane'])
+                img_stack = np.pad(img_stack,
+                                   ((0,0),
+                                   (pad_dict['top_pad'],pad_dict['bottom_pad']),
+                                   (pad_dict['left_pad'],pad_dict['right_pad'])),
+                                   mode='constant')
+                img_stack = np.expand_dims(img_stack, -1).astype('float32')
+
+            # a few frames spread over the experiment from each channel
+            step = max(1, img_stack.shape[0] // 5)
+            samples.append(img_stack[::step][:5])
+            if sum([len(sample) for sample in samples]) >= n_samples:
+                return np.concatenate(samples, axis=0)[:n_samples]
+
+    return np.concatenate(samples, axis=0)[:n_samples]
+
+# when using this script as a function and not as a library the following will execute
+if __name__ == "__main__":
+    '''Converts an mm3 Keras model to a TensorFlow Lite model for CPU inference and
+    checks that the converted model agrees with the original.'''
+
+    parser = argparse.ArgumentParser(prog='python mm3_ConvertModel.py',
+                                     description='Export a model for CPU inference.')
+    parser.add_argument('-m', '--modelfile', type=str,
+                        required=True, help='Path to the .hdf5 model.')
+    parser.add_argument('-o', '--output', type=str,
+                        required=False, help='Path for the .tflite model. Defaults to the model path with .tflite.')
+    parser.add_argument('-k', '--kind', type=str, default='cells',
+                        choices=['cells', 'foci', 'traps', 'channel_picker', 'tracking'],
+                        help='Which type of model this is. Sets the accuracy check.')
+    parser.add_argument('-q', '--quantize', type=str, default='none',
+                        choices=['none', 'float16', 'int8'],
+                        help='Post-training quantization. int8 is full integer, with int8 inputs and outputs. Both need TensorFlow 2.3 or later.')
+    parser.add_argument('-f', '--paramfile', type=str,
+                        required=False, help='Yaml file of an experiment to take sample images from (cells and foci models).')
+    parser.add_argument('-s', '--samples', type=str,
+                        required=False, help='.npy file with model inputs for calibration and the accuracy check.')
+    parser.add_argument('-n', '--n_samples', type=int, default=100,
+                        help='Number of samples to use.')
+    parser.add_argument('-t', '--threshold', type=float,
+                        required=False, help='Probability threshold for the accuracy check.')
+    parser.add_argument('--min_score', type=float, default=0.98,
+                        help='Lowest acceptable Dice, trap F1 or agreement.')
+    parser.add_argument('-j', '--nproc', type=int,
+                        required=False, help='Number of threads for inference.')
+    parser.add_argument('--onednn', action='store_true',
+                        help='Turn on oneDNN optimizations for the Keras model.')
+    parser.add_argument('--xla', action='store_true',
+                        help='Turn on XLA compilation for the Keras model.')
+    namespace = parser.parse_args()
+
+    # CPU settings have to be made before tensorflow is loaded
+    inference.configure_cpu(num_threads=namespace.nproc,
+                            onednn=True if namespace.onednn else None,
+                            xla=namespace.xla)
+
+    import mm3_helpers as mm3
+    import mm3_ml
+
+    p = None
+    if namespace.paramfile:
+        p = mm3.init_mm3_helpers(namespace.paramfile)
+
+    output_file = namespace.output
+    if not output_file:
+        output_file = os.path.splitext(namespace.modelfile)[0]
+        if namespace.quantize != 'none':
+            output_file += '_' + namespace.quantize
+        output_file += '.tflite'
+
+    # sample inputs for calibration and for the accuracy check
+    if namespace.samples:
+        samples = np.load(namespace.samples)[:namespace.n_samples].astype('float32')
+    elif p is not None and namespace.kind in ['cells', 'foci']:
+        mm3.information('Loading sample images from experiment.')
+        samples = get_experiment_samples(mm3, p, namespace.kind, namespace.n_samples)
+    else:
+        samples = None
+        mm3.warning('No samples given. Accuracy check will be skipped.')
+
+    quantize = None if namespace.quantize == 'none' else namespace.quantize
+    if quantize == 'int8' and samples is None:
+        mm3.warning('int8 quantization needs samples. Use -s or -f.')
+        sys.exit(1)
+
+    mm3.information('Converting {} to {}.'.format(namespace.modelfile, output_file))
+    custom_objects = mm3_ml.get_custom_objects()
+    inference.convert_model(namespace.modelfile, output_file,
+                            custom_objects=custom_objects,
+                            quantize=quantize,
+                            representative_images=samples)
+    mm3.information('Saved converted model.')
+
+    if samples is None:
+        sys.exit(0)
+
+    ### accuracy regression check
+    threshold = namespace.threshold
+    if threshold is None:
+        threshold = 0.5
+        if p is not None and namespace.kind == 'cells':
+            threshold = p['segment']['cell_class_threshold']
+        elif p is not None and namespace.kind == 'foci':
+            threshold = p['foci']['focus_threshold']
+
+    kind = {'cells' : 'segmentation',
+            'foci' : 'segmentation',
+            'traps' : 'traps',
+            'channel_picker' : 'classification',
+            'tracking' : 'tracking'}[namespace.kind]
+
+    mm3.information('Comparing converted model to original on {} samples.'.format(len(samples)))
+    model_ref = inference.load_model(namespace.modelfile, custom_objects=custom_objects)
+    model_test = inference.load_model(output_file, num_threads=namespace.nproc)
+    scores = inference.compare_models(model_ref, model_test, samples,
+                                      kind=kind, threshold=threshold)
+
+    for key, value in six.iteritems(scores):
+        print('{:>14} : {:.5f}'.format(key, value))
+
+    check_keys = [key for key in ['dice', 'trap_f1', 'agreement'] if key in scores]
+    failed = [key for key in check_keys if scores[key] < namespace.min_score]
+    if failed:
+        mm3.warning('Converted model is below {} for {}.'.format(namespace.min_score, ', '.join(failed)))
+        sys.exit(1)
+
+    mm3.information('Converted model passed the accuracy check.')
@@ -33,7 +33,6 @@ from multiprocessing import Pool
 import warnings
 import h5py
 
-from tensorflow.python.keras import models
 
 # user modules
 # realpath() will make your script run, even if you symlink it
@@ -909,11 +908,13 @@ if __name__ == "__main__":
         crosscorrs = None
         predictionDict = {}
 
+        import mm3_ml # CNN and U-net functions, imports tensorflow
+
         mm3.information('Loading model ....')
 
         # read in model for inference of empty vs good traps
         model_file_path = p['channel_picker']['channel_picker_model_file']
-        model = models.load_model(model_file_path)
+        model = mm3_ml.load_model(model_file_path)
 
         mm3.information("Model loaded.")
 
@@ -935,7 +936,7 @@ if __name__ == "__main__":
                       'n_channels': 1,
                       'shuffle': False}
             # set up the image data generator
-            channel_image_generator = mm3.TrapKymographPredictionDataGenerator(tiff_file_names, **cnn_params)
+            channel_image_generator = mm3_ml.TrapKymographPredictionDataGenerator(tiff_file_names, **cnn_params)
 
             # run the model
             predictions = model.predict_generator(channel_image_generator)
@@ -962,13 +963,15 @@ if __name__ == "__main__":
         crosscorrs = None
         predictionDict = {}
 
+        import mm3_ml # CNN and U-net functions, imports tensorflow
+
         mm3.information('Loading model ....')
 
         # read in model for inference of empty vs good traps
         model_file_path = p['segment']['model_file']
-        model = models.load_model(model_file_path,
-                                  custom_objects={'bce_dice_loss': mm3.bce_dice_loss,
-                                                  'dice_loss': mm3.dice_loss})
+        model = mm3_ml.load_model(model_file_path,
+                                  custom_objects={'bce_dice_loss': mm3_ml.bce_dice_loss,
+                                                  'dice_loss': mm3_ml.dice_loss})
         unet_shape = (p['segment']['trained_model_image_height'],
                       p['segment']['trained_model_image_width'])
 
@@ -1018,8 +1021,12 @@ if __name__ == "__main__":
                     img_stack[counter,...] = img_array[slice_increment*j,...]
                     counter += 1
 
-            pad_dict = mm3.get_pad_distances(unet_shape, img_height, img_width)
-            
+            # pad to the trained shape, or only up to the shape bucket with variable size inference
+            input_shape = unet_shape
+            if p['segment']['variable_size']:
+                input_shape = mm3.get_bucket_shape(img_height, img_width, p['segment']['size_multiple'])
+            pad_dict = mm3.get_pad_distances(input_shape, img_height, img_width)
+
             # pad image to correct size
             if p['debug']:
                 print("Padding dictionary:", pad_dict)
@@ -1032,9 +1039,13 @@ if __name__ == "__main__":
             img_stack = np.expand_dims(img_stack, -1)
 
             # set up image generator
-            image_generator = mm3.CellSegmentationDataGenerator(img_stack, **data_gen_args)
+            image_generator = mm3_ml.CellSegmentationDataGenerator(img_stack, **data_gen_args)
             # run predictions
             predictions = model.predict_generator(image_generator, **predict_args)[:,:,:,0]
+            # with variable size inference remove the padding, fixed shape labels the padded frames as before
+            if p['segment']['variable_size']:
+                predictions = predictions[:, pad_dict['top_pad']:predictions.shape[1]-pad_dict['bottom_pad'],
+                                             pad_dict['left_pad']:predictions.shape[2]-pad_dict['right_pad']]
             if p['debug']:
                 fig,ax = plt.subplots(ncols=5);
                 for i in range(5):
@@ -1043,21 +1054,8 @@ if __name__ == "__main__":
 
             # binarized and label (if there is a threshold value, otherwise, save a grayscale for debug)
             if cellClassThreshold:
-                predictions[predictions >= cellClassThreshold] = 1
-                predictions[predictions < cellClassThreshold] = 0
-                predictions = predictions.astype('uint8')
-
-                segmented_imgs = np.zeros(predictions.shape, dtype='uint8')
-                # process and label each frame of the channel
-                for frame in range(segmented_imgs.shape[0]):
-                    # get rid of small holes
-                    predictions[frame,:,:] = morphology.remove_small_holes(predictions[frame,:,:], min_object_size)
-                    # get rid of small objects.
-                    predictions[frame,:,:] = morphology.remove_small_objects(morphology.label(predictions[frame,:,:], connectivity=1), min_size=min_object_size)
-                    # remove labels which touch the boarder
-                    predictions[frame,:,:] = segmentation.clear_border(predictions[frame,:,:])
-                    # relabel now
-                    segmented_imgs[frame,:,:] = morphology.label(predictions[frame,:,:], connectivity=1)
+                segmented_imgs = mm3.label_prediction_stack(predictions, cellClassThreshold,
+                                                            min_object_size=min_object_size)
 
             else: # in this case you just want to scale the 0 to 1 float image to 0 to 255
                 information('Converting predictions to grayscale.')
@@ -1086,6 +1084,9 @@ if __name__ == "__main__":
         # a nested dict to hold cross corrs per channel per fov.
         crosscorrs = {}
 
+        # initialize one pool for all peaks in all FOVs
+        pool = Pool(p['num_analyzers'])
+
         # for each fov find cross correlations (sending to pull)
         for fov_id in fov_id_list:
             mm3.information("Calculating cross correlations for FOV %d." % fov_id)
@@ -1093,13 +1094,8 @@ if __name__ == "__main__":
             # nested dict keys are peak_ids and values are cross correlations
             crosscorrs[fov_id] = {}
 
-            # initialize pool for analyzing image metadata
-            pool = Pool(p['num_analyzers'])
-
             # find all peak ids in the current FOV
             for peak_id in sorted(channel_masks[fov_id].keys()):
-                mm3.information("Calculating cross correlations for peak %d." % peak_id)
-
                 # linear loop
                 # crosscorrs[fov_id][peak_id] = mm3.channel_xcorr(fov_id, peak_id)
 
@@ -1107,12 +1103,12 @@ if __name__ == "__main__":
                 crosscorrs[fov_id][peak_id] = pool.apply_async(mm3.channel_xcorr,
                                                                args=(fov_id, peak_id,))
 
-            mm3.information('Waiting for cross correlation pool to finish for FOV %d.' % fov_id)
+        mm3.information('Waiting for cross correlation pool to finish.')
 
-            pool.close() # tells the process nothing more will be added.
-            pool.join() # blocks script until everything has been processed and workers exit
+        pool.close() # tells the process nothing more will be added.
+        pool.join() # blocks script until everything has been processed and workers exit
 
-            mm3.information("Finished cross correlations for FOV %d." % fov_id)
+        mm3.information("Finished cross correlations.")
 
         # get results from the pool and put the results in the dictionary if succesful
         for fov_id, peaks in six.iteritems(crosscorrs):
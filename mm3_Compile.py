@@ -27,7 +27,6 @@ import h5py
 
 from matplotlib import pyplot as plt
 
-from tensorflow.python.keras import models
 
 # user modules
 # realpath() will make your script run, even if you symlink it
@@ -203,6 +202,7 @@ if __name__ == "__main__":
         elif p['compile']['find_channels_method'] == 'Unet':
             # Use Unet trained on trap and central channel locations to locate, crop, and align traps
             mm3.information("Identifying channel locations and aligning images using U-net.")
+            import mm3_ml # U-net functions, imports tensorflow
 
             # load model to pass to algorithm
             mm3.information("Loading model...")
@@ -212,9 +212,9 @@ if __name__ == "__main__":
             else:
                 model_file_path = p['compile']['model_file_traps']
             # *** Need parameter for weights
-            model = models.load_model(model_file_path,
-                                      custom_objects={'tversky_loss': mm3.tversky_loss,
-                                                      'cce_tversky_loss': mm3.cce_tversky_loss})
+            model = mm3_ml.load_model(model_file_path,
+                                      custom_objects={'tversky_loss': mm3_ml.tversky_loss,
+                                                      'cce_tversky_loss': mm3_ml.cce_tversky_loss})
             mm3.information("Model loaded.")
 
             # initialize pool for getting image metadata
@@ -279,7 +279,7 @@ if __name__ == "__main__":
                 dilator = np.ones((1,300))
 
                 # create weights for taking weighted mean of several runs of Unet over various crops of the first image in the series. This helps remove "blind spots" from the neural network at the edges of each crop of the original image.
-                stack_weights = mm3.get_weights_array(np.zeros((trap_align_metadata['full_frame_size'],trap_align_metadata['full_frame_size'])), trap_align_metadata['shift_distance'], subImageNumber=16, padSubImageNumber=25)[0,...]
+                stack_weights = mm3_ml.get_weights_array(np.zeros((trap_align_metadata['full_frame_size'],trap_align_metadata['full_frame_size'])), trap_align_metadata['shift_distance'], subImageNumber=16, padSubImageNumber=25)[0,...]
                 # print(stack_weights.shape) #uncomment for debugging
 
                 # get prediction of where traps are located in first image
@@ -287,7 +287,7 @@ if __name__ == "__main__":
                                        trap_align_metadata['first_frame_name'])
                 img = io.imread(imgPath)
                 # detect if there are multiple imaging channels, and rearrange image if necessary, keeping only the phase image
-                img = mm3.permute_image(img, trap_align_metadata)
+                img = mm3_ml.permute_image(img, trap_align_metadata)
                 if p['debug']:
                     io.imshow(img/np.max(img));
                     plt.title("Initial phase image");
@@ -295,13 +295,13 @@ if __name__ == "__main__":
 
                 # produces predition stack with 3 "pages", index 0 is for traps, index 1 is for central tough, index 2 is for background
                 mm3.information("Predicting trap locations for first frame.")
-                first_frame_trap_prediction = mm3.get_frame_predictions(img, 
-                                                                        model, 
-                                                                        stack_weights, 
-                                                                        trap_align_metadata['shift_distance'], 
-                                                                        subImageNumber=16, 
-                                                                        padSubImageNumber=25, 
-                                                                        debug=p['debug'])
+                first_frame_trap_prediction = mm3_ml.get_frame_predictions(img, 
+                                                                           model, 
+                                                                           stack_weights, 
+                                                                           trap_align_metadata['shift_distance'], 
+                                                                           subImageNumber=16, 
+                                                                           padSubImageNumber=25, 
+                                                                           debug=p['debug'])
 
                 if p['debug']:
                     fig,ax = plt.subplots(nrows=1, ncols=4, figsize=(12,12))
@@ -393,7 +393,7 @@ if __name__ == "__main__":
                     imgPath = os.path.join(p['experiment_directory'],p['image_directory'],fn)
                     frame_img = io.imread(imgPath)
                     # detect if there are multiple imaging channels, and rearrange image if necessary, keeping only the phase image
-                    frame_img = mm3.permute_image(frame_img, trap_align_metadata)
+                    frame_img = mm3_ml.permute_image(frame_img, trap_align_metadata)
                     align_region_stack[frame,:,:,0] = frame_img[centroid[0]-256:centroid[0]+256,
                                                              centroid[1]-256:centroid[1]+256]
 
@@ -419,7 +419,7 @@ if __name__ == "__main__":
                         'use_multiprocessing':True,
                         'workers':p['num_analyzers']}
 
-                img_generator = mm3.TrapSegmentationDataGenerator(align_region_stack, **data_gen_args)
+                img_generator = mm3_ml.TrapSegmentationDataGenerator(align_region_stack, **data_gen_args)
 
                 align_region_predictions = model.predict_generator(img_generator, **predict_gen_args)
                 #align_region_stack = mm3.apply_median_filter_and_normalize(align_region_stack)
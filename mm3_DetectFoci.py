@@ -17,7 +17,6 @@ except:
 import numpy as np
 from scipy.io import savemat
 
-from tensorflow.keras import models
 
 # user modules
 # realpath() will make your script run, even if you symlink it
@@ -99,6 +98,8 @@ if __name__ == "__main__":
     mm3.information("Detecting foci in channel {} using U-net.".format(p['foci']['foci_plane']))
 
     # load model to pass to algorithm
+    import mm3_ml # U-net functions, imports tensorflow
+
     mm3.information("Loading model...")
 
     if namespace.modelfile:
@@ -106,16 +107,16 @@ if __name__ == "__main__":
     else:
         model_file_path = p['foci']['foci_model_file']
     # *** Need parameter for weights
-    seg_model = models.load_model(model_file_path,
-                                custom_objects={'bce_dice_loss': mm3.bce_dice_loss,
-                                                'dice_loss': mm3.dice_loss,
-                                                'precision_m': mm3.precision_m,
-                                                'recall_m': mm3.recall_m,
-                                                'f_precision_m': mm3.f_precision_m})
+    seg_model = mm3_ml.load_model(model_file_path,
+                                custom_objects={'bce_dice_loss': mm3_ml.bce_dice_loss,
+                                                'dice_loss': mm3_ml.dice_loss,
+                                                'precision_m': mm3_ml.precision_m,
+                                                'recall_m': mm3_ml.recall_m,
+                                                'f_precision_m': mm3_ml.f_precision_m})
     mm3.information("Model loaded.")
 
     for fov_id in fov_id_list:
-        mm3.segment_fov_foci_unet(fov_id, specs, seg_model, color=p['foci']['foci_plane'])
+        mm3_ml.segment_fov_foci_unet(fov_id, specs, seg_model, color=p['foci']['foci_plane'])
 
     del seg_model
 
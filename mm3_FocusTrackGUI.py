@@ -574,7 +574,6 @@ class TrackItem(QGraphicsScene):
             pen = QPen()
             pen.setStyle(Qt.SolidLine)
             props = regions[region_id]['props']
-            coords = props.coords
             min_row, min_col, max_row, max_col = props.bbox
             label = props.label
             centroidY,centroidX = props.centroid
@@ -585,7 +584,6 @@ class TrackItem(QGraphicsScene):
 
             regions[region_id]['region_graphic'] = {'top_y':min_row, 'bottom_y':max_row,
                                                     'left_x':min_col, 'right_x':max_col,
-                                                    'coords':coords,
                                                     'pen':pen, 'brush':brush}
 
         return(phaseQpixmap, time_regions_and_events)
@@ -594,7 +592,10 @@ class TrackItem(QGraphicsScene):
 
         t_adj = 1
 
-        regions_by_time = {frame+t_adj: measure.regionprops(label_stack[frame,:,:], img_stack[frame,:,:]) for frame in range(label_stack.shape[0])}
+        # regions come from the region table of the stack, which is made once and saved
+        region_table = mm3.get_region_table(fov_id, peak_id, 'foci_seg_unet', label_stack=label_stack)
+        regions_by_time = {frame+t_adj: regions for frame, regions in
+                           enumerate(mm3.regions_from_table(region_table, label_stack.shape[0]))}
         regions_and_events_by_time = {frame+t_adj : {'regions' : {}, 'matrix' : None} for frame in range(label_stack.shape[0])}
 
         # loop through regions and add them to the main dictionary.
@@ -761,7 +762,7 @@ class TrackItem(QGraphicsScene):
         #      If a region disappears from t to t+1, it will receive a 1 in the column with index 0.
         #   'regions' is a dictionary with each region's label as a separate key.
         #      Each region in 'regions' is another dictionary, with 'events', which contains a 1D array identifying the events that correspond to the connections in 'matrix',
-        #                                                      and 'props', which contains all region properties that measure.regionprops retuns for the labelled image at time t.
+        #                                                      and 'props', the Region of the label at time t from the region table (see mm3.get_region_table).
         # The 'events' array is binary. The events are [migration, division, death, birth, appearance, disappearance, no_data], where a 0 at a given position in the 'events'
         #      array indicates the given event did not occur, and a 1 indicates it did occur.
 
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+from __future__ import print_function, division
+import six
+
+# import modules
+import sys
+import os
+import time
+import inspect
+import argparse
+import threading
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+# user modules
+# realpath() will make your script run, even if you symlink it
+cmd_folder = os.path.realpath(os.path.abspath(
+                              os.path.split(inspect.getfile(inspect.currentframe()))[0]))
+if cmd_folder not in sys.path:
+    sys.path.insert(0, cmd_folder)
+
+import mm3_inference as inference
+
+def model_file_signature(model_file):
+    '''Modification time and size of a model file, or of all files in a model
+    directory (e.g. a SavedModel). Changes when the model is saved again.'''
+
+    if os.path.isdir(model_file):
+        paths = []
+        for root, _, file_names in os.walk(model_file):
+            paths.extend([os.path.join(root, file_name) for file_name in file_names])
+    else:
+        paths = [model_file]
+
+    signature = []
+    for path in sorted(paths):
+        path_stat = os.stat(path)
+        signature.append((os.path.relpath(path, model_file), path_stat.st_mtime_ns, path_stat.st_size))
+
+    return tuple(signature)
+
+class ModelStore():
+    '''
+    Models kept loaded by the server, keyed by absolute file path. A model is
+    loaded again when the modification time or size of its file changes, so a
+    model retrained in place is not served with its old weights. Each model has
+    a lock so requests for the same model are run one at a time, while different
+    models can run at the same time.
+    '''
+
+    def __init__(self, custom_objects, num_threads=None):
+        self.custom_objects = custom_objects
+        self.num_threads = num_threads
+        self.models = {} # model_file : (signature, model)
+        self.locks = {}
+        self.store_lock = threading.Lock()
+
+    def get(self, model_file):
+        'Returns the model and its lock, loading the model if it is new or has changed.'
+
+        model_file = os.path.abspath(model_file)
+        with self.store_lock:
+            signature = model_file_signature(model_file)
+            if model_file not in self.models or self.models[model_file][0] != signature:
+                if model_file in self.models:
+                    mm3.information('Model {} changed, loading it again.'.format(model_file))
+                else:
+                    mm3.information('Loading model {}.'.format(model_file))
+                t0 = time.time()
+                model = inference.load_model(model_file,
+                                             custom_objects=self.custom_objects,
+                                             num_threads=self.num_threads)
+                self.models[model_file] = (signature, model)
+                self.locks.setdefault(model_file, threading.Lock())
+                mm3.information('Loaded model in {:.1f} s.'.format(time.time() - t0))
+
+        return self.models[model_file][1], self.locks[model_file]
+
+    def predict(self, model_file, x, batch_size=None):
+        'Runs predictions for one batch, or for a whole array if batch_size is given.'
+
+        model, lock = self.get(model_file)
+        with lock:
+            if batch_size is None:
+                return model.predict_on_batch(x)
+            return model.predict(x, batch_size=batch_size)
+
+class ModelRequestHandler(socketserver.BaseRequestHandler):
+    '''
+    Serves requests on one connection until the client closes it. Requests and
+    responses are dicts sent with mm3_inference.send_message. Connections from
+    other users are closed.
+    '''
+
+    def handle(self):
+        try:
+            inference.check_peer(self.request)
+        except (RuntimeError, OSError) as e:
+            mm3.warning('Refused connection: {}'.format(e))
+            return
+
+        while True:
+            try:
+                message = inference.recv_message(self.request)
+            except Exception as e:
+                mm3.warning('Could not read request: {}'.format(e))
+                return
+            if message is None:
+                return
+
+            try:
+                result = self.server.run(message)
+                response = {'status' : 'ok', 'result' : result}
+            except Exception as e:
+                mm3.warning('Request {} failed: {}'.format(message.get('cmd'), e))
+                response = {'status' : 'error', 'message' : repr(e)}
+
+            inference.send_message(self.request, response)
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    'Unix socket server that keeps mm3 models loaded between jobs.'
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, store):
+        self.store = store
+        socketserver.UnixStreamServer.__init__(self, socket_path, ModelRequestHandler)
+
+    def run(self, message):
+        'Carries out one request and returns the result to send back.'
+
+        cmd = message['cmd']
+        if cmd == 'ping':
+            return 'pong'
+        elif cmd == 'load':
+            self.store.get(message['model_file'])
+            return True
+        elif cmd == 'predict':
+            return self.store.predict(message['model_file'], message['x'],
+                                      batch_size=message.get('batch_size'))
+        elif cmd == 'list':
+            return sorted(self.store.models.keys())
+        elif cmd == 'shutdown':
+            # shutdown blocks until serve_forever returns, so call it from another thread
+            threading.Thread(target=self.shutdown).start()
+            return True
+
+        raise ValueError('Unknown command {}.'.format(cmd))
+
+def get_param_model_files(p):
+    'Model files named in a parameter file, to load when the server starts.'
+
+    model_files = []
+    for section, key in [('compile', 'model_file_traps'),
+                         ('channel_picker', 'channel_picker_model_file'),
+                         ('segment', 'model_file'),
+                         ('foci', 'foci_model_file')]:
+        if section in p and p[section].get(key):
+            model_files.append(p[section][key])
+
+    if 'tracking' in p:
+        for key in ['migrate_model', 'child_model', 'appear_model',
+                    'die_model', 'disappear_model', 'born_model']:
+            if p['tracking'].get(key):
+                model_files.append(p['tracking'][key])
+
+    return model_files
+
+# when using this script as a function and not as a library the following will execute
+if __name__ == "__main__":
+    '''
+    Starts a local model server. mm3_ml.load_model uses it when it is running and
+    inference: model_server is set, so models are loaded once instead of by every
+    script and every -o job. Only the user who started it can connect.
+    Stop it with Ctrl-C or with --stop.
+    '''
+
+    parser = argparse.ArgumentParser(prog='python mm3_ModelServer.py',
+                                     description='Keep mm3 models loaded between jobs.')
+    parser.add_argument('-f', '--paramfile', type=str,
+                        required=False, help='Yaml file containing parameters. All models named in it are loaded at start.')
+    parser.add_argument('-m', '--modelfiles', type=str, nargs='*', default=[],
+                        required=False, help='More model files to load at start.')
+    parser.add_argument('-s', '--socket', type=str,
+                        required=False, help='Path of the Unix socket. Defaults to inference: model_server if it is a path, or a socket in a directory private to this user.')
+    parser.add_argument('-j', '--nproc', type=int,
+                        required=False, help='Number of threads for inference.')
+    parser.add_argument('--stop', action='store_true',
+                        help='Stop the server running on the socket.')
+    namespace = parser.parse_args()
+
+    socket_path = namespace.socket
+
+    # stopping does not need tensorflow
+    if namespace.stop:
+        socket_path = socket_path or inference.default_socket_path()
+        if not inference.server_available(socket_path):
+            print('No model server running at {}.'.format(socket_path))
+            sys.exit(1)
+        inference.server_request(socket_path, {'cmd' : 'shutdown'})
+        print('Stopped model server at {}.'.format(socket_path))
+        sys.exit(0)
+
+    # CPU settings have to be made before tensorflow is loaded
+    inference.configure_cpu(num_threads=namespace.nproc)
+
+    import mm3_helpers as mm3
+    import mm3_ml
+
+    model_files = list(namespace.modelfiles)
+    num_threads = namespace.nproc
+    if namespace.paramfile:
+        mm3.information('Loading experiment parameters.')
+        p = mm3.init_mm3_helpers(namespace.paramfile)
+        model_files = get_param_model_files(p) + model_files
+        if 'inference' in p:
+            model_server = p['inference'].get('model_server')
+            if not socket_path and model_server and model_server is not True:
+                socket_path = model_server
+            if not num_threads:
+                num_threads = p['inference'].get('num_threads')
+    socket_path = socket_path or inference.default_socket_path()
+
+    if inference.server_available(socket_path):
+        mm3.warning('A model server is already running at {}.'.format(socket_path))
+        sys.exit(1)
+    if os.path.exists(socket_path):
+        os.remove(socket_path) # left over from a server that did not shut down cleanly
+
+    store = ModelStore(mm3_ml.get_custom_objects(), num_threads=num_threads)
+    for model_file in model_files:
+        store.get(model_file)
+
+    server = ModelServer(socket_path, store)
+    mm3.information('Model server listening at {}.'.format(socket_path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        mm3.information('Model server stopped.')
@@ -94,16 +94,7 @@ if __name__ == "__main__":
     ### Do Segmentation by FOV and then peak #######################################################
     mm3.information("Segmenting channels using Otsu method.")
 
-    for fov_id in fov_id_list:
-        # determine which peaks are to be analyzed (those which have been subtracted)
-        ana_peak_ids = []
-        for peak_id, spec in six.iteritems(specs[fov_id]):
-            if spec == 1: # 0 means it should be used for empty, -1 is ignore, 1 is analyzed
-                ana_peak_ids.append(peak_id)
-        ana_peak_ids = sorted(ana_peak_ids) # sort for repeatability
-
-        for peak_id in ana_peak_ids:
-            # send to segmentation
-            mm3.segment_chnl_stack(fov_id, peak_id)
+    # all channels of all FOVs are segmented by one pool
+    mm3.segment_experiment_otsu(fov_id_list, specs)
 
     mm3.information("Finished segmentation.")
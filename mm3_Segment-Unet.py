@@ -17,7 +17,6 @@ except:
 import numpy as np
 from scipy.io import savemat
 
-from tensorflow.keras import models
 
 # user modules
 # realpath() will make your script run, even if you symlink it
@@ -49,6 +48,14 @@ if __name__ == "__main__":
                         required=False, help='Number of processors to use.')
     parser.add_argument('-m', '--modelfile', type=str,
                         required=False, help='Path to trained U-net model.')
+    parser.add_argument('--from-predictions', action='store_true', dest='from_predictions',
+                        required=False, help='Do not run the model, only threshold and label the predictions stored by an earlier run with save_predictions.')
+    parser.add_argument('-t', '--threshold', type=float,
+                        required=False, help='Use this cell_class_threshold instead of the one in the parameter file.')
+    parser.add_argument('-s', '--min_object_size', type=int,
+                        required=False, help='Use this min_object_size instead of the one in the parameter file.')
+    parser.add_argument('--force', action='store_true',
+                        required=False, help='Segment all channels, even those whose results are up to date.')
     namespace = parser.parse_args()
 
     # Load the project parameters file
@@ -84,6 +91,12 @@ if __name__ == "__main__":
     p['seg_img'] = 'seg_unet'
     p['pred_img'] = 'pred_unet'
 
+    # post processing settings from the command line, for trying values on stored predictions
+    if namespace.threshold is not None:
+        p['segment']['cell_class_threshold'] = namespace.threshold
+    if namespace.min_object_size is not None:
+        p['segment']['min_object_size'] = namespace.min_object_size
+
     # load specs file
     specs = mm3.load_specs()
     # print(specs) # for debugging
@@ -97,10 +110,28 @@ if __name__ == "__main__":
 
     mm3.information("Processing %d FOVs." % len(fov_id_list))
 
+    # peaks are skipped if their phase stack, the model and these parameters are unchanged
+    param_keys = ['phase_plane', 'seg_img', 'pred_img']
+    param_keys += ['segment.' + key for key in ['cell_class_threshold', 'min_object_size',
+                   'normalize_to_one', 'trained_model_image_height', 'trained_model_image_width',
+                   'variable_size', 'size_multiple', 'save_predictions', 'prediction_dtype']]
+
+    ### Only label stored predictions ###############################################################
+    if namespace.from_predictions:
+        mm3.information("Labeling stored U-net predictions with threshold {} and min object size {}.".format(
+                        p['segment']['cell_class_threshold'], p['segment']['min_object_size']))
+        # relabeled stacks are not up to date for a normal run anymore
+        cache = mm3.ResultCache('segment_unet', param_keys)
+        mm3.relabel_experiment_unet(fov_id_list, specs, cache=cache)
+        mm3.information("Finished segmentation.")
+        sys.exit(0)
+
     ### Do Segmentation by FOV and then peak #######################################################
     mm3.information("Segmenting channels using U-net.")
 
     # load model to pass to algorithm
+    import mm3_ml # U-net functions, imports tensorflow
+
     mm3.information("Loading model...")
 
     if namespace.modelfile:
@@ -108,14 +139,22 @@ if __name__ == "__main__":
     else:
         model_file_path = p['segment']['model_file']
     # *** Need parameter for weights
-    seg_model = models.load_model(model_file_path,
-                              custom_objects={'bce_dice_loss': mm3.bce_dice_loss,
-                                              'dice_loss': mm3.dice_loss})
+    seg_model = mm3_ml.load_model(model_file_path,
+                              custom_objects={'bce_dice_loss': mm3_ml.bce_dice_loss,
+                                              'dice_loss': mm3_ml.dice_loss})
     mm3.information("Model loaded.")
 
-    for fov_id in fov_id_list:
-        mm3.segment_fov_unet(fov_id, specs, seg_model, color=p['phase_plane'])
+    cache = mm3.ResultCache('segment_unet', param_keys, model_file=model_file_path,
+                            force=namespace.force)
+
+    if p['segment']['batch_across_fovs']:
+        mm3_ml.segment_experiment_unet(fov_id_list, specs, seg_model, color=p['phase_plane'],
+                                       cache=cache)
+    else:
+        for fov_id in fov_id_list:
+            mm3_ml.segment_fov_unet(fov_id, specs, seg_model, color=p['phase_plane'], cache=cache)
 
     del seg_model
+    cache.summary()
 
     mm3.information("Finished segmentation.")
@@ -53,6 +53,12 @@ if __name__ == "__main__":
                         required=False, help='Number of processors to use.')
     parser.add_argument('-c', '--color', type=str,
                         required=False, help='Color plane to subtract. "c1", "c2", etc.')
+    parser.add_argument('-s', '--segment', action='store_true',
+                        required=False, help='Segment subtracted phase images with the Otsu method in the same pass.')
+    parser.add_argument('-n', '--no_save_subtracted', action='store_true',
+                        required=False, help='Do not save subtracted stacks. Only useful with --segment.')
+    parser.add_argument('--force', action='store_true',
+                        required=False, help='Subtract all channels, even those whose results are up to date.')
     namespace = parser.parse_args()
 
     # Load the project parameters file
@@ -84,12 +90,30 @@ if __name__ == "__main__":
     else:
         sub_plane = 'c1'
 
+    # fused subtraction and segmentation, only done for the phase plane
+    if namespace.segment:
+        p['subtract']['segment'] = True
+    if namespace.no_save_subtracted:
+        p['subtract']['save_subtracted'] = False
+    do_segment = p['subtract']['segment'] and sub_plane == p['phase_plane']
+    save_subtracted = p['subtract']['save_subtracted'] or not do_segment
+    if do_segment:
+        # set segmentation image name for saving segmented images
+        p['seg_img'] = 'seg_otsu'
+        mm3.information('Segmenting subtracted images with Otsu method in the same pass.')
+        if not save_subtracted:
+            mm3.information('Subtracted stacks will not be saved.')
+
     # Create folders for subtracted info if they don't exist
     if p['output'] == 'TIFF':
         if not os.path.exists(p['empty_dir']):
             os.makedirs(p['empty_dir'])
         if not os.path.exists(p['sub_dir']):
             os.makedirs(p['sub_dir'])
+        if do_segment and not os.path.exists(p['seg_dir']):
+            os.makedirs(p['seg_dir'])
+    if do_segment and not os.path.exists(p['cell_dir']):
+        os.makedirs(p['cell_dir'])
 
     # load specs file
     specs = mm3.load_specs()
@@ -137,10 +161,21 @@ if __name__ == "__main__":
     ### Subtract ##################################################################################
     if p['subtract']['do_subtraction']:
         mm3.information("Subtracting channels for channel {}.".format(sub_plane))
+
+        # peaks are skipped if their channel and empty stacks and these parameters are unchanged
+        param_keys = ['subtract.alignment_pad', 'phase_plane']
+        if do_segment:
+            param_keys += ['seg_img', 'segment.otsu', 'segment.min_object_size']
+        cache = mm3.ResultCache('subtract_{}'.format(sub_plane), param_keys, force=namespace.force)
+
         for fov_id in fov_id_list:
             # send to function which will create empty stack for each fov.
             subtraction_result = mm3.subtract_fov_stack(fov_id, specs,
-                                                        color=sub_plane, method=sub_method)
+                                                        color=sub_plane, method=sub_method,
+                                                        segment=do_segment,
+                                                        save_subtracted=save_subtracted,
+                                                        cache=cache)
+        cache.summary()
         mm3.information("Finished subtraction.")
 
     # Else just end, they only wanted to do empty averaging.
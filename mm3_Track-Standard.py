@@ -102,8 +102,8 @@ if __name__ == "__main__":
     # Load time table, which goes into params
     mm3.load_time_table()
 
-    # This dictionary holds information for all cells
-    Cells = {}
+    # This dictionary holds information for all cells, indexed by channel, label and time
+    Cells = mm3.CellIndex()
 
     # do lineage creation per fov, so pooling can be done by peak
     for fov_id in fov_id_list:
@@ -5,7 +5,7 @@ import six
 # import modules
 import sys
 import os
-# import time
+import time
 import inspect
 import argparse
 import yaml
@@ -16,9 +16,8 @@ except:
     import pickle
 import numpy as np
 from scipy.io import savemat
+from multiprocessing import Pool
 
-from skimage import measure
-from tensorflow.keras import models
 
 # user modules
 # realpath() will make your script run, even if you symlink it
@@ -52,6 +51,8 @@ if __name__ == "__main__":
                         required=False, help='Number of processors to use.')
     parser.add_argument('-m', '--modelfile', type=str,
                         required=False, help='Path to trained model.')
+    parser.add_argument('--force', action='store_true',
+                        required=False, help='Run the tracking models even if their predictions are saved.')
     namespace = parser.parse_args()
 
     # Load the project parameters file
@@ -106,62 +107,130 @@ if __name__ == "__main__":
     mm3.information("Processing %d FOVs." % len(fov_id_list))
 
     mm3.information("Creating cell lineages.")
-    mm3.information("Reading track models. This could take a few minutes.")
 
-    # read in models as dictionary
+    # Load time table, which goes into params
+    mm3.load_time_table()
+
+    # the linking workers are started before tensorflow is loaded with the models
+    pool = Pool(processes=p['num_analyzers'])
+
+    # the models are only read if some predictions are not saved yet
     # keys are 'migrate_model', 'child_model', 'appear_model', 'die_model', 'disappear_model', etc.
     # NOTE on 2019-07-15: For now, some of the models are ignored by the tracking algorithm, as they don't yet perform well
-    model_dict = mm3.get_tracking_model_dict()
+    model_dict = None
+    fused_model = None
+    model_keys = ['migrate_model', 'child_model', 'appear_model', 'die_model', 'disappear_model', 'born_model']
+    model_checksums = [mm3.file_checksum(p['tracking'][key]) for key in model_keys]
 
-    # Load time table, which goes into params
-    mm3.load_time_table()
+    # consider only the top six cells for a given trap when doing tracking
+    cell_number = 6
 
-    # This dictionary holds information for all cells
-    # Cells = {}
+    # the models are run once for all channels of a FOV, or of all FOVs
+    if p['track']['batch_across_fovs']:
+        fov_batches = [fov_id_list]
+    else:
+        fov_batches = [[fov_id] for fov_id in fov_id_list]
 
     # do lineage creation per fov, per trap
-    tracks = {}
-    for i,fov_id in enumerate(fov_id_list):
-        # tracks[fov_id] = {}
-        # update will add the output from make_lineages_function, which is a
-        # dict of Cell entries, into Cells
-        ana_peak_ids = [peak_id for peak_id in specs[fov_id].keys() if specs[fov_id][peak_id] == 1]
-        # ana_peak_ids = [9,13,15,19,25,33,36,37,38,39] # was used for debugging
-        for j,peak_id in enumerate(ana_peak_ids):
-
-            seg_stack = mm3.load_stack(fov_id, peak_id, color=p['seg_img'])
-            # run predictions for each tracking class
-            # consider only the top six cells for a given trap when doing tracking
-            cell_number = 6
-            frame_number = seg_stack.shape[0]
-            # get region properties
-            regions_by_time = [measure.regionprops(label_image=img) for img in seg_stack]
-
-            # have generator yield info for top six cells in all frames
-            prediction_generator = mm3.PredictTrackDataGenerator(regions_by_time, batch_size=frame_number, dim=(cell_number,5,9))
-            cell_info = prediction_generator.__getitem__(0)
-
-            predictions_dict = {}
-            # run data through each classification model
-            for key,mod in model_dict.items():
-
-                # Run predictions and add to dictionary
-                if key in ['zero_cell_model', 'one_cell_model' , 'two_cell_model', 'geq_three_cell_model']:
-                    continue
-
-                mm3.information('Predicting probability of {} events in FOV {}, trap {}.'.format('_'.join(key.split('_')[:-1]), fov_id, peak_id))
-                predictions_dict['{}_predictions'.format(key)] =  mod.predict(cell_info)
-
-            G,graph_df = mm3.initialize_track_graph(peak_id=peak_id,
-                                                    fov_id=fov_id,
-                                                    experiment_name=p['experiment_name'],
-                                                    predictions_dict=predictions_dict,
-                                                    regions_by_time = regions_by_time,
-                                                    born_threshold=0.85,
-                                                    appear_threshold=0.85)
-
-            # tracks[fov_id][peak_id] = mm3.create_lineages_from_graph_2(G, graph_df, fov_id, peak_id)
-            tracks.update(mm3.create_lineages_from_graph(G, graph_df, fov_id, peak_id))
+    tracks = mm3.CellIndex()
+    for fov_batch in fov_batches:
+
+        ### features of all peaks in the batch that have no saved predictions
+        peak_jobs = [] # (fov_id, peak_id, region_table, frame_number)
+        predictions = {} # (fov_id, peak_id) : predictions_dict
+        prediction_keys = {}
+        peak_features = []
+        feature_times = {}
+        frame_numbers = {}
+        for fov_id in fov_batch:
+            ana_peak_ids = sorted([peak_id for peak_id in specs[fov_id].keys() if specs[fov_id][peak_id] == 1])
+            for peak_id in ana_peak_ids:
+                t0 = time.time()
+                seg_stack = mm3.load_stack(fov_id, peak_id, color=p['seg_img'])
+                frame_number = seg_stack.shape[0]
+                # get region properties from the region table, made once per channel
+                region_table = mm3.get_region_table(fov_id, peak_id, p['seg_img'], label_stack=seg_stack)
+                peak_jobs.append((fov_id, peak_id, region_table, frame_number))
+                frame_numbers[(fov_id, peak_id)] = frame_number
+
+                # predictions are saved with the checksums of the segmented stack and the models
+                prediction_key = mm3.track_predictions_key(region_table['checksum'][()].decode(), model_checksums)
+                if not namespace.force:
+                    predictions_dict = mm3.load_track_predictions(fov_id, peak_id, prediction_key)
+                    if predictions_dict is not None:
+                        predictions[(fov_id, peak_id)] = predictions_dict
+                        feature_times[(fov_id, peak_id)] = time.time() - t0
+                        continue
+                prediction_keys[(fov_id, peak_id)] = prediction_key
+
+                # info for top six cells in all frames
+                peak_features.append(mm3.make_track_features(region_table, frame_number, max_cell_number=cell_number))
+                feature_times[(fov_id, peak_id)] = time.time() - t0
+
+        if not peak_jobs:
+            continue
+
+        ### run data through each classification model, once for all peaks
+        inference_time = 0
+        predict_peaks = [job[:2] for job in peak_jobs if job[:2] not in predictions]
+        if predict_peaks:
+            if model_dict is None:
+                import mm3_ml # tracking models, imports tensorflow
+                mm3.information("Reading track models. This could take a few minutes.")
+                model_dict = {key : mod for key, mod in mm3_ml.get_tracking_model_dict().items()
+                              if key not in ['zero_cell_model', 'one_cell_model' , 'two_cell_model', 'geq_three_cell_model']}
+                if p['track']['fused_models']:
+                    fused_model = mm3_ml.make_fused_tracking_model(model_dict)
+                    if fused_model is None:
+                        mm3.warning('Tracking models can only be fused when they are all Keras models. Running them separately.')
+
+            cell_info = np.concatenate(peak_features, axis=0)
+            del peak_features
+            split_indices = np.cumsum([frame_numbers[peak] for peak in predict_peaks])[:-1]
+
+            mm3.information('Predicting probability of tracking events in {} traps of FOV {}.'.format(
+                            len(predict_peaks), ', '.join(str(fov_id) for fov_id in fov_batch)))
+            t0 = time.time()
+            batch_predictions = mm3_ml.predict_tracking_models(model_dict, cell_info,
+                                                               batch_size=p['track']['batch_size'],
+                                                               fused_model=fused_model)
+            inference_time = time.time() - t0
+            del cell_info
+
+            for key, model_predictions in batch_predictions.items():
+                for peak, peak_predictions in zip(predict_peaks, np.split(model_predictions, split_indices)):
+                    predictions.setdefault(peak, {})[key] = peak_predictions
+            for fov_id, peak_id in predict_peaks:
+                mm3.save_track_predictions(predictions[(fov_id, peak_id)], fov_id, peak_id,
+                                           prediction_keys[(fov_id, peak_id)])
+        else:
+            mm3.information('Using saved tracking predictions for FOV {}.'.format(
+                            ', '.join(str(fov_id) for fov_id in fov_batch)))
+
+        ### link the detections of each peak in the pool
+        link_jobs = [(fov_id, peak_id, region_table, predictions[(fov_id, peak_id)],
+                      p['track']['born_threshold'], p['track']['appear_threshold'])
+                     for fov_id, peak_id, region_table, _ in peak_jobs]
+        total_frames = float(sum([frame_numbers[peak] for peak in predict_peaks]))
+
+        # inference time is given to the peaks by their share of the frames
+        peak_tracks = {}
+        for fov_id, peak_id, peak_cells, link_time in pool.imap_unordered(mm3.link_track_peak, link_jobs):
+            peak_tracks[(fov_id, peak_id)] = peak_cells
+            if (fov_id, peak_id) in prediction_keys:
+                peak_inference_time = inference_time * frame_numbers[(fov_id, peak_id)] / total_frames
+            else:
+                peak_inference_time = 0
+            mm3.information('FOV {}, trap {}: {} cells. Features {:.2f} s, inference {:.2f} s, linking {:.2f} s.'.format(
+                            fov_id, peak_id, len(peak_cells), feature_times[(fov_id, peak_id)],
+                            peak_inference_time, link_time))
+
+        # add the cells in channel order for repeatability
+        for fov_id, peak_id, _, _ in peak_jobs:
+            tracks.update(peak_tracks[(fov_id, peak_id)])
+
+    pool.close() # tells the process nothing more will be added.
+    pool.join() # blocks script until everything has been processed and workers exit
 
     mm3.information("Finished lineage creation.")
 
@@ -18,7 +18,6 @@ import numpy as np
 from scipy.io import savemat
 
 from skimage import measure
-from tensorflow.keras import models
 
 # user modules
 # realpath() will make your script run, even if you symlink it
@@ -0,0 +1,1816 @@
+#!/usr/bin/env python3
+'''
+Cell centric analysis after tracking: filtering cells, data frames, fluorescence
+intensities, foci, ring and profile analysis and pole ages.
+
+pandas and matplotlib are only imported by the functions that use them.
+'''
+from __future__ import print_function, division
+import six
+
+# import modules
+import os # interacting with file systems
+import time # getting time
+import warnings # error messaging
+import numpy as np # numbers package
+
+# scipy and image analysis
+from scipy.optimize import curve_fit # fitting ring profile
+from scipy.optimize import leastsq # fitting 2d gaussian
+from skimage.transform import rotate
+from skimage.feature import blob_log # used for foci finding
+from skimage.filters import median # segmentation
+from skimage import filters
+from skimage import morphology # many functions is segmentation used from this
+from skimage.measure import profile_line # used for ring an nucleoid analysis
+
+# Parralelization modules
+from multiprocessing import Pool
+
+from mm3_io import params, information, load_stack, load_time_table
+from mm3_tracking import Focus, CellIndex, create_focus_id, get_region_table, regions_from_table
+
+### functions for pruning a dictionary of cells
+# find cells with both a mother and two daughters
+def find_complete_cells(Cells):
+    '''Go through a dictionary of cells and return another dictionary
+    that contains just those with a parent and daughters'''
+
+    Complete_Cells = CellIndex() if isinstance(Cells, CellIndex) else {}
+
+    for cell_id in Cells:
+        if Cells[cell_id].daughters and Cells[cell_id].parent:
+            Complete_Cells[cell_id] = Cells[cell_id]
+
+    return Complete_Cells
+
+# finds cells whose birth label is 1
+def find_mother_cells(Cells):
+    '''Return only cells whose starting region label is 1.'''
+
+    if isinstance(Cells, CellIndex):
+        return Cells.of_birth_label([1])
+
+    Mother_Cells = {}
+
+    for cell_id in Cells:
+        if Cells[cell_id].birth_label == 1:
+            Mother_Cells[cell_id] = Cells[cell_id]
+
+    return Mother_Cells
+
+def filter_foci(Foci, label, t, debug=False):
+
+    Filtered_Foci = {}
+
+    for focus_id, focus in Foci.items():
+
+        # copy the times list so as not to update it in-place
+        times = focus.times
+        if debug:
+            print(times)
+
+        match_inds = [i for i,time in enumerate(times) if time == t]
+        labels = [focus.labels[idx] for idx in match_inds]
+
+        if label in labels:
+            Filtered_Foci[focus_id] = focus
+
+    return Filtered_Foci
+
+def filter_cells(Cells, attr, val, idx=None, debug=False):
+    '''Return only cells whose designated attribute equals "val".'''
+
+    # fov, peak and birth_label are looked up in the indexes of a CellIndex
+    if isinstance(Cells, CellIndex) and idx is None and attr in ['fov', 'peak', 'birth_label']:
+        return Cells.find(attr, [val])
+
+    Filtered_Cells = {}
+
+    for cell_id, cell in Cells.items():
+
+        at_val = getattr(cell, attr)
+        if debug:
+            print(at_val)
+            print("Times: ", cell.times)
+        if idx is not None:
+            at_val = at_val[idx]
+        if at_val == val:
+            Filtered_Cells[cell_id] = cell
+
+    return Filtered_Cells
+
+def filter_cells_containing_val_in_attr(Cells, attr, val):
+    '''Return only cells that have val in list attribute, attr.'''
+
+    if isinstance(Cells, CellIndex) and attr == 'times':
+        return Cells.at_time(val)
+
+    Filtered_Cells = {}
+
+    for cell_id, cell in Cells.items():
+
+        at_list = getattr(cell, attr)
+        if val in at_list:
+            Filtered_Cells[cell_id] = cell
+
+    return Filtered_Cells
+
+### functions for additional cell centric analysis
+def compile_cell_info_df(Cells):
+
+    import pandas as pd
+
+    # count the number of rows that will be in the long dataframe
+    quant_fluor = False
+    long_df_row_number = 0
+    for cell in Cells.values():
+
+        # first time through, evaluate whether we quantified cells' fluorescence
+        if long_df_row_number == 0:
+            if len(cell.area_mean_fluorescence.keys()) != 0:
+                quant_fluor = True
+                fluorescence_channels = [k for k in cell.area_mean_fluorescence.keys()]
+
+        long_df_row_number += len(cell.times)
+
+    # initialize some arrays for filling with data
+    data = {
+        # ids can be up to 100 characters long
+        'id': np.chararray(long_df_row_number, itemsize=100),
+        'times': np.zeros(long_df_row_number, dtype='uint16'),
+        'lengths': np.zeros(long_df_row_number),
+        'volumes': np.zeros(long_df_row_number),
+        'areas': np.zeros(long_df_row_number),
+        'abs_times': np.zeros(long_df_row_number, dtype='uint32')
+    }
+
+    if quant_fluor:
+        for fluorescence_channel in fluorescence_channels:
+            data['{}_area_mean_fluorescence'.format(fluorescence_channel)] = np.zeros(long_df_row_number)
+            data['{}_volume_mean_fluorescence'.format(fluorescence_channel)] = np.zeros(long_df_row_number)
+            data['{}_total_fluorescence'.format(fluorescence_channel)] = np.zeros(long_df_row_number)
+
+    data = populate_focus_arrays(Cells, data, cell_quants=True)
+    long_df = pd.DataFrame(data=data)
+
+    wide_df_row_number = len(Cells)
+    data = {
+        # ids can be up to 100 characters long
+        'id': np.chararray(wide_df_row_number, itemsize=100),
+        'fov': np.zeros(wide_df_row_number, dtype='uint8'),
+        'peak': np.zeros(wide_df_row_number, dtype='uint16'),
+        'parent_id': np.chararray(wide_df_row_number, itemsize=100),
+        'child1_id': np.chararray(wide_df_row_number, itemsize=100),
+        'child2_id': np.chararray(wide_df_row_number, itemsize=100),
+        'division_time': np.zeros(wide_df_row_number),
+        'birth_label': np.zeros(wide_df_row_number, dtype='uint8'),
+        'birth_time': np.zeros(wide_df_row_number, dtype='uint16'),
+        'sb': np.zeros(wide_df_row_number),
+        'sd': np.zeros(wide_df_row_number),
+        'delta': np.zeros(wide_df_row_number),
+        'tau': np.zeros(wide_df_row_number),
+        'elong_rate': np.zeros(wide_df_row_number),
+        'septum_position': np.zeros(wide_df_row_number),
+        'death': np.zeros(wide_df_row_number),
+        'disappear': np.zeros(wide_df_row_number)
+    }
+    data = populate_focus_arrays(Cells, data, cell_quants=True, wide=True)
+    # data['parent_id'] = data['parent_id'].decode()
+    # data['child1_id'] = data['child1_id'].decode()
+    # data['child2_id'] = data['child2_id'].decode()
+    wide_df = pd.DataFrame(data=data)
+
+    return(wide_df,long_df)
+
+def populate_focus_arrays(Foci, data_dict, cell_quants=False, wide=False):
+
+    focus_counter = 0
+    focus_count = len(Foci)
+    end_idx = 0
+
+    for i,focus in enumerate(Foci.values()):
+
+        if wide:
+            start_idx = i
+            end_idx = i + 1
+
+        else:
+
+            start_idx = end_idx
+            end_idx = len(focus) + start_idx
+
+        if focus_counter % 100 == 0:
+            print("Generating focus information for focus {} out of {}.".format(focus_counter+1, focus_count))
+
+        # loop over keys in data dictionary, and set
+        # values in appropriate array, at appropriate indices
+        # to those we find in the focus.
+        for key in data_dict.keys():
+
+            if '_id' in key:
+
+                if key == 'parent_id':
+                    if focus.parent is None:
+                        data_dict[key][start_idx:end_idx] = ''
+                    else:
+                        data_dict[key][start_idx:end_idx] = focus.parent.id
+
+                if focus.daughters is None:
+                    if key == 'child1_id' or key == 'child2_id':
+                        data_dict[key][start_idx:end_idx] = ''
+                elif len(focus.daughters) == 1:
+                    if key == 'child2_id':
+                        data_dict[key][start_idx:end_idx] = ''
+                elif key == 'child1_id':
+                    data_dict[key][start_idx:end_idx] = focus.daughters[0].id
+                elif key == 'child2_id':
+                    data_dict[key][start_idx:end_idx] = focus.daughters[1].id
+
+            else:
+                attr_vals = getattr(focus, key)
+                if (cell_quants and key=='abs_times'):
+                    if len(attr_vals) == end_idx-start_idx:
+                        data_dict[key][start_idx:end_idx] = attr_vals
+                    else:
+                        data_dict[key][start_idx:end_idx] = attr_vals[:-1]
+                else:
+                    # print(key)
+                    # print(attr_vals)
+                    data_dict[key][start_idx:end_idx] = attr_vals
+
+        focus_counter += 1
+
+    data_dict['id'] = data_dict['id'].decode()
+
+    return(data_dict)
+
+def compile_foci_info_long_df(Foci):
+    '''
+    Parameters
+    ----------------
+
+    Foci : dictionary, keys of which are focus_ids,
+           values of which are objects of class Focus
+
+    Returns
+    ----------------------
+
+    A long DataFrame with
+    detailed information about each timepoint for each focus.
+    '''
+
+    import pandas as pd
+
+    # count the number of rows that will be in the long dataframe
+    long_df_row_number = 0
+    for focus in Foci.values():
+        long_df_row_number += len(focus)
+
+    # initialize some arrays for filling with data
+    data = {
+        # ids can be up to 100 characters long
+        'id': np.chararray(long_df_row_number, itemsize=100),
+        'times': np.zeros(long_df_row_number, dtype='uint16'),
+        'lengths': np.zeros(long_df_row_number),
+        'volumes': np.zeros(long_df_row_number),
+        'areas': np.zeros(long_df_row_number),
+        'abs_times': np.zeros(long_df_row_number, dtype='uint32'),
+        'area_mean_fluorescence': np.zeros(long_df_row_number),
+        'volume_mean_fluorescence': np.zeros(long_df_row_number),
+        'total_fluorescence': np.zeros(long_df_row_number),
+        'median_fluorescence': np.zeros(long_df_row_number),
+        'sd_fluorescence': np.zeros(long_df_row_number),
+        'disp_l': np.zeros(long_df_row_number),
+        'disp_w': np.zeros(long_df_row_number)
+    }
+
+    data = populate_focus_arrays(Foci, data)
+
+    long_df = pd.DataFrame(data=data)
+
+    return(long_df)
+
+def find_all_cell_intensities(Cells,
+                              specs, time_table, channel_name='sub_c2',
+                              apply_background_correction=True):
+    '''
+    Finds fluorescenct information for cells. All the cells in Cells
+    should be from one fov/peak.
+    '''
+
+    # iterate over each fov in specs
+    for fov_id,fov_peaks in specs.items():
+
+        # iterate over each peak in fov
+        for peak_id,peak_value in fov_peaks.items():
+
+            # if peak_id's value is not 1, go to next peak
+            if peak_value != 1:
+                continue
+
+            print("Quantifying channel {} fluorescence in cells in fov {}, peak {}.".format(channel_name, fov_id, peak_id))
+            # Load fluorescent images and segmented images for this channel
+            fl_stack = load_stack(fov_id, peak_id, color=channel_name)
+            corrected_stack = np.zeros(fl_stack.shape)
+
+            for frame in range(fl_stack.shape[0]):
+                # median filter will be applied to every image
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    median_filtered = median(fl_stack[frame,...], selem=morphology.disk(1))
+
+                # subtract the gaussian-filtered image from true image to correct
+                #   uneven background fluorescence
+                if apply_background_correction:
+                    blurred = filters.gaussian(median_filtered, sigma=10, preserve_range=True)
+                    corrected_stack[frame,:,:] = median_filtered-blurred
+                else:
+                    corrected_stack[frame,:,:] = median_filtered
+
+            seg_stack = load_stack(fov_id, peak_id, color='seg_unet')
+
+            # evaluate whether each cell is in this fov/peak combination
+            for cell_id,cell in Cells.items():
+
+                cell_fov = cell.fov
+                if cell_fov != fov_id:
+                    continue
+
+                cell_peak = cell.peak
+                if cell_peak != peak_id:
+                    continue
+
+                cell_times = cell.times
+                cell_labels = cell.labels
+                cell.area_mean_fluorescence[channel_name] = []
+                cell.volume_mean_fluorescence[channel_name] = []
+                cell.total_fluorescence[channel_name] = []
+
+                # loop through cell's times
+                for i,t in enumerate(cell_times):
+                    frame = t-1
+                    cell_label = cell_labels[i]
+
+                    total_fluor = np.sum(corrected_stack[frame, seg_stack[frame, :,:] == cell_label])
+
+                    cell.area_mean_fluorescence[channel_name].append(total_fluor/cell.areas[i])
+                    cell.volume_mean_fluorescence[channel_name].append(total_fluor/cell.volumes[i])
+                    cell.total_fluorescence[channel_name].append(total_fluor)
+
+    # The cell objects in the original dictionary will be updated,
+    # no need to return anything specifically.
+    return
+
+def find_cell_intensities_worker(fov_id, peak_id, Cells, midline=True, channel='sub_c3'):
+    '''
+    Finds fluorescenct information for cells. All the cells in Cells
+    should be from one fov/peak. See the function
+    organize_cells_by_channel()
+    This version is the same as find_cell_intensities but return the Cells object for collection by the pool.
+    The original find_cell_intensities is kept for compatibility.
+    '''
+    information('Processing peak {} in FOV {}'.format(peak_id, fov_id))
+    # Load fluorescent images and segmented images for this channel
+    fl_stack = load_stack(fov_id, peak_id, color=channel)
+    seg_stack = load_stack(fov_id, peak_id, color='seg_otsu')
+
+    # determine absolute time index
+    time_table = params['time_table']
+    times_all = []
+    for fov in params['time_table']:
+        times_all = np.append(times_all, [int(x) for x in time_table[fov].keys()])
+    times_all = np.unique(times_all)
+    times_all = np.sort(times_all)
+    times_all = np.array(times_all,np.int_)
+    t0 = times_all[0] # first time index
+
+    # Loop through cells
+    for Cell in Cells.values():
+        # give this cell two lists to hold new information
+        Cell.fl_tots = [] # total fluorescence per time point
+        Cell.fl_area_avgs = [] # avg fluorescence per unit area by timepoint
+        Cell.fl_vol_avgs = [] # avg fluorescence per unit volume by timepoint
+
+        if midline:
+            Cell.mid_fl = [] # avg fluorescence of midline
+
+        # and the time points that make up this cell's life
+        for n, t in enumerate(Cell.times):
+            # create fluorescent image only for this cell and timepoint.
+            fl_image_masked = np.copy(fl_stack[t-t0])
+            fl_image_masked[seg_stack[t-t0] != Cell.labels[n]] = 0
+
+            # append total flourescent image
+            Cell.fl_tots.append(np.sum(fl_image_masked))
+            # and the average fluorescence
+            Cell.fl_area_avgs.append(np.sum(fl_image_masked) / Cell.areas[n])
+            Cell.fl_vol_avgs.append(np.sum(fl_image_masked) / Cell.volumes[n])
+
+            if midline:
+                # add the midline average by first applying morphology transform
+                bin_mask = np.copy(seg_stack[t-t0])
+                bin_mask[bin_mask != Cell.labels[n]] = 0
+                med_mask, _ = morphology.medial_axis(bin_mask, return_distance=True)
+                # med_mask[med_dist < np.floor(cap_radius/2)] = 0
+                # print(img_fluo[med_mask])
+                if (np.shape(fl_image_masked[med_mask])[0] > 0):
+                    Cell.mid_fl.append(np.nanmean(fl_image_masked[med_mask]))
+                else:
+                    Cell.mid_fl.append(0)
+
+    # return the cell object to the pool initiated by mm3_Colors.
+    return Cells
+
+def find_cell_intensities(fov_id, peak_id, Cells, midline=False, channel_name='sub_c2'):
+    '''
+    Finds fluorescenct information for cells. All the cells in Cells
+    should be from one fov/peak. See the function
+    organize_cells_by_channel()
+    '''
+
+    # Load fluorescent images and segmented images for this channel
+    fl_stack = load_stack(fov_id, peak_id, color=channel_name)
+    seg_stack = load_stack(fov_id, peak_id, color='seg_unet')
+
+    # determine absolute time index
+    times_all = []
+    for fov in params['time_table']:
+        times_all = np.append(times_all, time_table[fov].keys())
+    times_all = np.unique(times_all)
+    times_all = np.sort(times_all)
+    times_all = np.array(times_all,np.int_)
+    t0 = times_all[0] # first time index
+
+    # Loop through cells
+    for Cell in Cells.values():
+        # give this cell two lists to hold new information
+        Cell.fl_tots = [] # total fluorescence per time point
+        Cell.fl_area_avgs = [] # avg fluorescence per unit area by timepoint
+        Cell.fl_vol_avgs = [] # avg fluorescence per unit volume by timepoint
+
+        if midline:
+            Cell.mid_fl = [] # avg fluorescence of midline
+
+        # and the time points that make up this cell's life
+        for n, t in enumerate(Cell.times):
+            # create fluorescent image only for this cell and timepoint.
+            fl_image_masked = np.copy(fl_stack[t-t0])
+            fl_image_masked[seg_stack[t-t0] != Cell.labels[n]] = 0
+
+            # append total flourescent image
+            Cell.fl_tots.append(np.sum(fl_image_masked))
+            # and the average fluorescence
+            Cell.fl_area_avgs.append(np.sum(fl_image_masked) / Cell.areas[n])
+            Cell.fl_vol_avgs.append(np.sum(fl_image_masked) / Cell.volumes[n])
+
+            if midline:
+                # add the midline average by first applying morphology transform
+                bin_mask = np.copy(seg_stack[t-t0])
+                bin_mask[bin_mask != Cell.labels[n]] = 0
+                med_mask, _ = morphology.medial_axis(bin_mask, return_distance=True)
+                # med_mask[med_dist < np.floor(cap_radius/2)] = 0
+                # print(img_fluo[med_mask])
+                if (np.shape(fl_image_masked[med_mask])[0] > 0):
+                    Cell.mid_fl.append(np.nanmean(fl_image_masked[med_mask]))
+                else:
+                    Cell.mid_fl.append(0)
+
+    # The cell objects in the original dictionary will be updated,
+    # no need to return anything specifically.
+    return
+
+# find foci using a difference of gaussians method
+def foci_analysis(fov_id, peak_id, Cells):
+    '''Find foci in cells using a fluorescent image channel.
+    This function works on a single peak and all the cells therein.'''
+
+    # make directory for foci debug
+    # foci_dir = os.path.join(params['ana_dir'], 'overlay/')
+    # if not os.path.exists(foci_dir):
+    #     os.makedirs(foci_dir)
+
+    # Import segmented and fluorescenct images
+    image_data_seg = load_stack(fov_id, peak_id, color='seg_unet')
+    image_data_FL = load_stack(fov_id, peak_id,
+                               color='sub_{}'.format(params['foci']['foci_plane']))
+
+    # determine absolute time index
+    times_all = []
+    for fov, times in params['time_table'].items():
+        times_all = np.append(times_all, list(times.keys()))
+    times_all = np.unique(times_all)
+    times_all = np.sort(times_all)
+    times_all = np.array(times_all, np.int_)
+    t0 = times_all[0] # first time index
+
+    for cell_id, cell in six.iteritems(Cells):
+
+        information('Extracting foci information for %s.' % (cell_id))
+
+        # declare lists holding information about foci.
+        disp_l = []
+        disp_w = []
+        foci_h = []
+        # foci_stack = np.zeros((np.size(cell.times),
+        #                        image_data_seg[0,:,:].shape[0], image_data_seg[0,:,:].shape[1]))
+
+        # Go through each time point of this cell
+        for t in cell.times:
+            # retrieve this timepoint and images.
+            image_data_temp = image_data_FL[t-t0,:,:]
+            image_data_temp_seg = image_data_seg[t-t0,:,:]
+
+            # find foci as long as there is information in the fluorescent image
+            if np.sum(image_data_temp) != 0:
+                disp_l_tmp, disp_w_tmp, foci_h_tmp = foci_lap(image_data_temp_seg,
+                                                              image_data_temp, cell, t)
+
+                disp_l.append(disp_l_tmp)
+                disp_w.append(disp_w_tmp)
+                foci_h.append(foci_h_tmp)
+
+            # if there is no information, append an empty list.
+            # Should this be NaN?
+            else:
+                disp_l.append([])
+                disp_w.append([])
+                foci_h.append([])
+                # foci_stack[i] = image_data_temp_seg
+
+        # add information to the cell (will replace old data)
+        cell.disp_l = disp_l
+        cell.disp_w = disp_w
+        cell.foci_h = foci_h
+
+        # Create a stack of the segmented images with marked foci
+        # This should poentially be changed to the fluorescent images with marked foci
+        # foci_stack = np.uint16(foci_stack)
+        # foci_stack = np.stack(foci_stack, axis=0)
+        # # Export overlaid images
+        # foci_filename = params['experiment_name'] + 't%04d_xy%03d_p%04d_r%02d_overlay.tif' % (Cells[cell_id].birth_time, Cells[cell_id].fov, Cells[cell_id].peak, Cells[cell_id].birth_label)
+        # foci_filepath = foci_dir + foci_filename
+        #
+        # tiff.imsave(foci_filepath, foci_stack, compress=3) # save it
+
+        # test
+        # sys.exit()
+
+    return
+
+# foci pool (for parallel analysis)
+def foci_analysis_pool(fov_id, peak_id, Cells):
+    '''Find foci in cells using a fluorescent image channel.
+    This function works on a single peak and all the cells therein.'''
+
+    # make directory for foci debug
+    # foci_dir = os.path.join(params['ana_dir'], 'overlay/')
+    # if not os.path.exists(foci_dir):
+    #     os.makedirs(foci_dir)
+
+    # Import segmented and fluorescenct images
+    image_data_seg = load_stack(fov_id, peak_id, color='seg_unet')
+    image_data_FL = load_stack(fov_id, peak_id,
+                               color='sub_{}'.format(params['foci']['foci_plane']))
+
+    # Load time table to determine first image index.
+    times_all = np.array(np.sort(params['time_table'][fov_id].keys()), np.int_)
+    t0 = times_all[0] # first time index
+    tN = times_all[-1] # last time index
+
+    # call foci_cell for each cell object
+    pool = Pool(processes=params['num_analyzers'])
+    [pool.apply_async(foci_cell(cell_id, cell, t0, image_data_seg, image_data_FL)) for cell_id, cell in six.iteritems(Cells)]
+    pool.close()
+    pool.join()
+
+# parralel function for each cell
+def foci_cell(cell_id, cell, t0, image_data_seg, image_data_FL):
+    '''find foci in a cell, single instance to be called by the foci_analysis_pool for parallel processing.
+    '''
+    disp_l = []
+    disp_w = []
+    foci_h = []
+    # foci_stack = np.zeros((np.size(cell.times),
+    #                        image_data_seg[0,:,:].shape[0], image_data_seg[0,:,:].shape[1]))
+
+    # Go through each time point of this cell
+    for t in cell.times:
+        # retrieve this timepoint and images.
+        image_data_temp = image_data_FL[t-t0,:,:]
+        image_data_temp_seg = image_data_seg[t-t0,:,:]
+
+        # find foci as long as there is information in the fluorescent image
+        if np.sum(image_data_temp) != 0:
+            disp_l_tmp, disp_w_tmp, foci_h_tmp = foci_lap(image_data_temp_seg,
+                                                          image_data_temp, cell, t)
+
+            disp_l.append(disp_l_tmp)
+            disp_w.append(disp_w_tmp)
+            foci_h.append(foci_h_tmp)
+
+        # if there is no information, append an empty list.
+        # Should this be NaN?
+        else:
+            disp_l.append([])
+            disp_w.append([])
+            foci_h.append([])
+            # foci_stack[i] = image_data_temp_seg
+
+    # add information to the cell (will replace old data)
+    cell.disp_l = disp_l
+    cell.disp_w = disp_w
+    cell.foci_h = foci_h
+
+# actual worker function for foci detection
+def foci_lap(img, img_foci, cell, t):
+    '''foci_lap finds foci using a laplacian convolution then fits a 2D
+    Gaussian.
+
+    The returned information are the parameters of this Gaussian.
+    All the information is returned in the form of np.arrays which are the
+    length of the number of found foci across all cells in the image.
+
+    Parameters
+    ----------
+    img : 2D np.array
+        phase contrast or bright field image. Only used for debug
+    img_foci : 2D np.array
+        fluorescent image with foci.
+    cell : cell object
+    t : int
+        time point to which the images correspond
+
+    Returns
+    -------
+    disp_l : 1D np.array
+        displacement on long axis, in px, of a foci from the center of the cell
+    disp_w : 1D np.array
+        displacement on short axis, in px, of a foci from the center of the cell
+    foci_h : 1D np.array
+        Foci "height." Sum of the intensity of the gaussian fitting area.
+    '''
+
+    from matplotlib import pyplot as plt
+    from matplotlib.patches import Ellipse
+
+    # pull out useful information for just this time point
+    i = cell.times.index(t) # find position of the time point in lists (time points may be missing)
+    bbox = cell.bboxes[i]
+    orientation = cell.orientations[i]
+    centroid = cell.centroids[i]
+    region = cell.labels[i]
+
+    # declare arrays which will hold foci data
+    disp_l = [] # displacement in length of foci from cell center
+    disp_w = [] # displacement in width of foci from cell center
+    foci_h = [] # foci total amount (from raw image)
+
+    # define parameters for foci finding
+    minsig = params['foci']['foci_log_minsig']
+    maxsig = params['foci']['foci_log_maxsig']
+    thresh = params['foci']['foci_log_thresh']
+    peak_med_ratio = params['foci']['foci_log_peak_med_ratio']
+    debug_foci = params['foci']['debug_foci']
+
+    # test
+    #print ("minsig={:d}  maxsig={:d}  thres={:.4g}  peak_med_ratio={:.2g}".format(minsig,maxsig,thresh,peak_med_ratio))
+    # test
+
+    # calculate median cell intensity. Used to filter foci
+    img_foci_masked = np.copy(img_foci).astype(np.float)
+    img_foci_masked[img != region] = np.nan
+    cell_fl_median = np.nanmedian(img_foci_masked)
+    cell_fl_mean = np.nanmean(img_foci_masked)
+
+    img_foci_masked[img != region] = 0
+
+    # subtract this value from the cell
+    if False:
+        img_foci = img_foci.astype('int32') - cell_fl_median.astype('int32')
+        img_foci[img_foci < 0] = 0
+        img_foci = img_foci.astype('uint16')
+
+    # int_mask = np.zeros(img_foci.shape, np.uint8)
+    # avg_int = cv2.mean(img_foci, mask=int_mask)
+    # avg_int = avg_int[0]
+
+    # print('median', cell_fl_median)
+
+    # find blobs using difference of gaussian
+    over_lap = .95 # if two blobs overlap by more than this fraction, smaller blob is cut
+    numsig = (maxsig - minsig + 1) # number of division to consider between min ang max sig
+    blobs = blob_log(img_foci_masked, min_sigma=minsig, max_sigma=maxsig,
+                     overlap=over_lap, num_sigma=numsig, threshold=thresh)
+
+    # these will hold information about foci position temporarily
+    x_blob, y_blob, r_blob = [], [], []
+    x_gaus, y_gaus, w_gaus = [], [], []
+
+    # loop through each potential foci
+    for blob in blobs:
+        yloc, xloc, sig = blob # x location, y location, and sigma of gaus
+        xloc = int(np.around(xloc)) # switch to int for slicing images
+        yloc = int(np.around(yloc))
+        radius = int(np.ceil(np.sqrt(2)*sig)) # will be used to slice out area around foci
+
+        # ensure blob is inside the bounding box
+        # this might be better to check if (xloc, yloc) is in regions.coords
+        if yloc > np.int16(bbox[0]) and yloc < np.int16(bbox[2]) and xloc > np.int16(bbox[1]) and xloc < np.int16(bbox[3]):
+
+            x_blob.append(xloc) # for plotting
+            y_blob.append(yloc) # for plotting
+            r_blob.append(radius)
+
+            # cut out a small image from original image to fit gaussian
+            gfit_area = img_foci[yloc-radius:yloc+radius, xloc-radius:xloc+radius]
+            # gfit_area_0 = img_foci[max(0, yloc-1*radius):min(img_foci.shape[0], yloc+1*radius),
+            #                        max(0, xloc-1*radius):min(img_foci.shape[1], xloc+1*radius)]
+            gfit_area_fixed = img_foci[yloc-maxsig:yloc+maxsig, xloc-maxsig:xloc+maxsig]
+
+            # fit gaussian to proposed foci in small box
+            p = fitgaussian(gfit_area)
+            (peak_fit, x_fit, y_fit, w_fit) = p
+
+            # print('peak', peak_fit)
+            if x_fit <= 0 or x_fit >= radius*2 or y_fit <= 0 or y_fit >= radius*2:
+                if debug_foci: print('Throw out foci (gaus fit not in gfit_area)')
+                continue
+            elif peak_fit/cell_fl_median < peak_med_ratio:
+                if debug_foci: print('Peak does not pass height test.')
+                continue
+            else:
+                # find x and y position relative to the whole image (convert from small box)
+                x_rel = int(xloc - radius + x_fit)
+                y_rel = int(yloc - radius + y_fit)
+                x_gaus = np.append(x_gaus, x_rel) # for plotting
+                y_gaus = np.append(y_gaus, y_rel) # for plotting
+                w_gaus = np.append(w_gaus, w_fit) # for plotting
+
+                if debug_foci: print('x', xloc, x_rel, x_fit, 'y', yloc, y_rel, y_fit, 'w', sig, radius, w_fit, 'h', np.sum(gfit_area), np.sum(gfit_area_fixed), peak_fit)
+
+                # calculate distance of foci from middle of cell (scikit image)
+                if orientation < 0:
+                    orientation = np.pi+orientation
+                disp_y = (y_rel-centroid[0])*np.sin(orientation) - (x_rel-centroid[1])*np.cos(orientation)
+                disp_x = (y_rel-centroid[0])*np.cos(orientation) + (x_rel-centroid[1])*np.sin(orientation)
+
+                # append foci information to the list
+                disp_l = np.append(disp_l, disp_y)
+                disp_w = np.append(disp_w, disp_x)
+                foci_h = np.append(foci_h, np.sum(gfit_area_fixed))
+                # foci_h = np.append(foci_h, peak_fit)
+        else:
+            if debug_foci:
+                print ('Blob not in bounding box.')
+
+    # draw foci on image for quality control
+    if debug_foci:
+        outputdir = os.path.join(params['ana_dir'], 'debug_foci')
+        if not os.path.isdir(outputdir):
+            os.makedirs(outputdir)
+
+        # print(np.min(gfit_area), np.max(gfit_area), gfit_median, avg_int, peak)
+        # processing of image
+        fig = plt.figure(figsize=(12,12))
+        ax = fig.add_subplot(1,5,1)
+        plt.title('fluor image')
+        plt.imshow(img_foci, interpolation='nearest', cmap='gray')
+        ax = fig.add_subplot(1,5,2)
+        ax.set_title('segmented image')
+        ax.imshow(img, interpolation='nearest', cmap='gray')
+
+        ax = fig.add_subplot(1,5,3)
+        ax.set_title('DoG blobs')
+        ax.imshow(img_foci, interpolation='nearest', cmap='gray')
+        # add circles for where the blobs are
+        for i, spot in enumerate(x_blob):
+            foci_center = Ellipse([x_blob[i], y_blob[i]], r_blob[i], r_blob[i],
+                                  color=(1.0, 1.0, 0), linewidth=2, fill=False, alpha=0.5)
+            ax.add_patch(foci_center)
+
+        # show the shape of the gaussian for recorded foci
+        ax = fig.add_subplot(1,5,4)
+        ax.set_title('final foci')
+        ax.imshow(img_foci, interpolation='nearest', cmap='gray')
+        # print foci that pass and had gaussians fit
+        for i, spot in enumerate(x_gaus):
+            foci_ellipse = Ellipse([x_gaus[i], y_gaus[i]], w_gaus[i], w_gaus[i],
+                                    color=(0, 1.0, 0.0), linewidth=2, fill=False, alpha=0.5)
+            ax.add_patch(foci_ellipse)
+
+        ax = fig.add_subplot(1,5,5)
+        ax.set_title('overlay')
+        ax.imshow(img, interpolation='nearest', cmap='gray')
+        # print foci that pass and had gaussians fit
+        for i, spot in enumerate(x_gaus):
+            foci_ellipse = Ellipse([x_gaus[i], y_gaus[i]], 3, 3,
+                                    color=(1.0, 1.0, 0), linewidth=2, fill=False, alpha=0.5)
+            ax.add_patch(foci_ellipse)
+
+        #plt.show()
+        filename = 'foci_' + cell.id + '_time{:04d}'.format(t) + '.pdf'
+        fileout = os.path.join(outputdir,filename)
+        fig.savefig(fileout, bbox_inches='tight', pad_inches=0)
+        print (fileout)
+        plt.close('all')
+        nblobs = len(blobs)
+        print ("nblobs = {:d}".format(nblobs))
+
+    # img_overlay = img
+    # for i, spot in enumerate(xx):
+    #     y_temp = int(yy[i])
+    #     x_temp = int(xx[i])
+    #
+    #     img_overlay[y_temp-1,x_temp-1] = 12
+    #     img_overlay[y_temp-1,x_temp] = 12
+    #     img_overlay[y_temp-1,x_temp+1] = 12
+    #     img_overlay[y_temp,x_temp-1] = 12
+    #     img_overlay[y_temp,x_temp] = 12
+    #     img_overlay[y_temp,x_temp+1] = 12
+    #     img_overlay[y_temp+1,x_temp-1] = 12
+    #     img_overlay[y_temp+1,x_temp] = 12
+    #     img_overlay[y_temp+1,x_temp+1] = 12
+
+    return disp_l, disp_w, foci_h
+
+# actual worker function for foci detection
+def foci_info_unet(foci, Cells, specs, time_table, channel_name='sub_c2'):
+    '''foci_info_unet operates on cells in which foci have been found using
+    using Unet.
+
+    Parameters
+    ----------
+    Foci : empty dictionary for Focus objects to be placed into
+    Cells : dictionary of Cell objects to which foci will be added
+    specs : dictionary containing information on which fov/peak ids
+        are to be used, and which are to be excluded from analysis
+    time_table : dictionary containing information on which time
+        points correspond to which absolute times in seconds
+    channel_name : name of fluorescent channel for reading in
+        fluorescence images for focus quantification
+
+    Returns
+    -------
+    Updates cell information in Cells in-place.
+    Cells must have .foci attribute
+    '''
+
+    # index the cells once, so the cells of each channel and frame are looked up
+    if not isinstance(Cells, CellIndex):
+        Cells = CellIndex(Cells)
+
+    # iterate over each fov in specs
+    for fov_id,fov_peaks in specs.items():
+
+        # keep cells with this fov_id
+        fov_cells = filter_cells(Cells, attr='fov', val=fov_id)
+
+        # iterate over each peak in fov
+        for peak_id,peak_value in fov_peaks.items():
+
+            # print(fov_id, peak_id)
+            # keep cells with this peak_id
+            peak_cells = filter_cells(fov_cells, attr='peak', val=peak_id)
+
+            # if peak_id's value is not 1, go to next peak
+            if peak_value != 1:
+                continue
+
+            print("Analyzing foci in experiment {}, channel {}, fov {}, peak {}.".format(params['experiment_name'], channel_name, fov_id, peak_id))
+            # Load fluorescent images and segmented images for this channel
+            fl_stack = load_stack(fov_id, peak_id, color=channel_name)
+            seg_foci_stack = load_stack(fov_id, peak_id, color='foci_seg_unet')
+            seg_cell_stack = load_stack(fov_id, peak_id, color='seg_unet')
+            foci_table = get_region_table(fov_id, peak_id, 'foci_seg_unet', label_stack=seg_foci_stack)
+            foci_regions_by_time = regions_from_table(foci_table, seg_foci_stack.shape[0])
+
+            # loop over each frame
+            for frame in range(fl_stack.shape[0]):
+
+                fl_img = fl_stack[frame, ...]
+                seg_foci_img = seg_foci_stack[frame, ...]
+                seg_cell_img = seg_cell_stack[frame, ...]
+
+                # if there are no foci in this frame, move to next frame
+                if np.max(seg_foci_img) == 0:
+                    continue
+                # if there are no cells in this fov/peak/frame, move to next frame
+                if np.max(seg_cell_img) == 0:
+                    continue
+
+                t = frame+1
+                frame_cells = filter_cells_containing_val_in_attr(peak_cells, attr='times', val=t)
+                # loop over focus regions in this frame
+                focus_regions = list(foci_regions_by_time[frame])
+
+                # compare this frame's foci to prior frame's foci for tracking
+                if frame > 0:
+                    prior_seg_foci_img = seg_foci_stack[frame-1, ...]
+
+                    fov_foci = filter_cells(foci,
+                                            attr='fov',
+                                            val=fov_id)
+                    peak_foci = filter_cells(fov_foci,
+                                             attr='peak',
+                                             val=peak_id)
+                    prior_frame_foci = filter_cells_containing_val_in_attr(peak_foci, attr='times', val=t-1)
+
+                    # if there were foci in prior frame, do stuff
+                    if len(prior_frame_foci) > 0:
+                        # compare_array is prior_focus_number x this_focus_number
+                        #   contains dice indices for each pairwise comparison
+                        #   between focus positions
+                        compare_array = np.zeros((np.max(prior_seg_foci_img),
+                                                np.max(seg_foci_img)))
+                        # populate the array with dice indices
+                        for prior_focus_idx in range(np.max(prior_seg_foci_img)):
+
+                            prior_focus_mask = np.zeros(seg_foci_img.shape)
+                            prior_focus_mask[prior_seg_foci_img == (prior_focus_idx + 1)] = 1
+
+                            # apply gaussian blur with sigma=1 to prior focus mask
+                            sig = 1
+                            gaus_1 = filters.gaussian(prior_focus_mask, sigma=sig)
+
+                            for this_focus_idx in range(np.max(seg_foci_img)):
+
+                                this_focus_mask = np.zeros(seg_foci_img.shape)
+                                this_focus_mask[seg_foci_img == (this_focus_idx + 1)] = 1
+
+                                # apply gaussian blur with sigma=1 to this focus mask
+                                gaus_2 = filters.gaussian(this_focus_mask, sigma=sig)
+                                # multiply the two images and place max into campare_array
+                                product = gaus_1 * gaus_2
+                                compare_array[prior_focus_idx, this_focus_idx] = np.max(product)
+
+                        # which rows of each column are maximum product of gaussian blurs?
+                        max_inds = np.argmax(compare_array, axis=0)
+                        # because np.argmax returns zero if all rows are equal, we
+                        #   need to evaluate if all rows are equal.
+                        #   If std_dev is zero, then all were equal,
+                        #   and we omit that index from consideration for
+                        #   focus tracking.
+                        sd_vals = np.std(compare_array, axis=0)
+                        tracked_inds = np.where(sd_vals > 0)[0]
+                        # if there is an index from a tracked focus, do this
+                        if tracked_inds.size > 0:
+
+                            for tracked_idx in tracked_inds:
+                                # grab this frame's region belonging to tracked focus
+                                tracked_label = tracked_idx + 1
+                                (tracked_region_idx, tracked_region) = [(_,reg) for _,reg in enumerate(focus_regions) if reg.label == tracked_label][0]
+                                # pop the region from focus_regions
+                                del focus_regions[tracked_region_idx]
+
+                                # grab prior frame's region belonging to tracked focus
+                                prior_tracked_label = max_inds[tracked_idx] + 1
+                                # prior_tracked_region = [reg for reg in prior_regions if reg.label == prior_tracked_label][0]
+
+                                # grab the focus for which the prior_tracked_label is in
+                                #   any of the labels in the prior focus from the prior time
+                                prior_tracked_foci = filter_foci(
+                                    prior_frame_foci,
+                                    label=prior_tracked_label,
+                                    t = t-1,
+                                    debug=False
+                                )
+
+                                prior_tracked_focus = [val for val in prior_tracked_foci.values()][0]
+
+                                # determine which cell this focus belongs to
+                                for cell_id,cell in frame_cells.items():
+
+                                    cell_idx = cell.times.index(t)
+                                    cell_label = cell.labels[cell_idx]
+
+                                    masked_cell_img = np.zeros(seg_cell_img.shape)
+                                    masked_cell_img[seg_cell_img == cell_label] = 1
+
+                                    masked_focus_img = np.zeros(seg_foci_img.shape)
+                                    masked_focus_img[seg_foci_img == tracked_region.label] = 1
+
+                                    intersect_img = masked_cell_img + masked_focus_img
+
+                                    pixels_two = len(np.where(intersect_img == 2))
+                                    pixels_one = len(np.where(masked_focus_img == 1))
+
+                                    # if over half the focus is within this cell, do the following
+                                    if pixels_two/pixels_one >= 0.5:
+
+                                        prior_tracked_focus.grow(
+                                            region=tracked_region,
+                                            t=t,
+                                            seg_img=seg_foci_img,
+                                            intensity_image=fl_img,
+                                            current_cell=cell
+                                        )
+
+                # after tracking foci, those that were tracked have been removed from focus_regions list
+                # now we check if any regions remain in the list
+                # if there are any remaining, instantiate new foci
+                if len(focus_regions) > 0:
+                    new_ids = []
+
+                    for focus_region in focus_regions:
+
+                        # make the focus_id
+                        new_id = create_focus_id(
+                            region = focus_region,
+                            t = t,
+                            peak = peak_id,
+                            fov = fov_id,
+                            experiment_name = params['experiment_name'])
+                        # populate list for later checking if any are missing
+                        # from foci dictionary's keys
+                        new_ids.append(new_id)
+
+                        # determine which cell this focus belongs to
+                        for cell_id,cell in frame_cells.items():
+
+                            cell_idx = cell.times.index(t)
+                            cell_label = cell.labels[cell_idx]
+
+                            masked_cell_img = np.zeros(seg_cell_img.shape)
+                            masked_cell_img[seg_cell_img == cell_label] = 1
+
+                            masked_focus_img = np.zeros(seg_foci_img.shape)
+                            masked_focus_img[seg_foci_img == focus_region.label] = 1
+
+                            intersect_img = masked_cell_img + masked_focus_img
+
+                            pixels_two = len(np.where(intersect_img == 2))
+                            pixels_one = len(np.where(masked_focus_img == 1))
+
+                            # if over half the focus is within this cell, do the following
+                            if pixels_two/pixels_one >= 0.5:
+                                # set up the focus
+                                # if no foci in cell, just add this one.
+
+                                foci[new_id] = Focus(cell = cell,
+                                                     region = focus_region,
+                                                     seg_img = seg_foci_img,
+                                                     intensity_image = fl_img,
+                                                     t = t)
+
+                    for new_id in new_ids:
+                        # if new_id is not a key in the foci dictionary,
+                        #   that suggests the focus doesn't overlap well
+                        #   with any cells in this frame, so we'll relabel
+                        #   this frame of seg_foci_stack to zero for that
+                        #   focus to avoid trying to track a focus
+                        #   that doesn't exist.
+                        if new_id not in foci:
+
+                            # get label of new_id's region
+                            this_label = int(new_id[-2:])
+                            # set pixels in this frame that match this label to 0
+                            seg_foci_stack[frame, seg_foci_img == this_label] = 0
+
+    return
+
+# def dev_foci_info_unet(foci, Cells, specs, time_table, channel_name='sub_c2'):
+#     '''foci_info_unet operates on cells in which foci have been found using
+#     using Unet.
+
+#     Parameters
+#     ----------
+#     Foci : empty dictionary for Focus objects to be placed into
+#     Cells : dictionary of Cell objects to which foci will be added
+#     specs : dictionary containing information on which fov/peak ids
+#         are to be used, and which are to be excluded from analysis
+#     time_table : dictionary containing information on which time
+#         points correspond to which absolute times in seconds
+#     channel_name : name of fluorescent channel for reading in
+#         fluorescence images for focus quantification
+
+#     Returns
+#     -------
+#     Updates cell information in Cells in-place.
+#     Cells must have .foci attribute
+#     '''
+
+#     # iterate over each fov in specs
+#     for fov_id,fov_peaks in specs.items():
+
+#         # keep cells with this fov_id
+#         fov_cells = filter_cells(Cells, attr='fov', val=fov_id)
+
+#         # iterate over each peak in fov
+#         for peak_id,peak_value in fov_peaks.items():
+
+#             # print(fov_id, peak_id)
+#             # keep cells with this peak_id
+#             peak_cells = filter_cells(fov_cells, attr='peak', val=peak_id)
+
+#             # if peak_id's value is not 1, go to next peak
+#             if peak_value != 1:
+#                 continue
+
+#             print("Analyzing foci in experiment {}, channel {}, fov {}, peak {}.".format(params['experiment_name'], channel_name, fov_id, peak_id))
+#             # Load fluorescent images and segmented images for this channel
+#             fl_stack = load_stack(fov_id, peak_id, color=channel_name)
+#             seg_foci_stack = load_stack(fov_id, peak_id, color='foci_seg_unet')
+#             seg_cell_stack = load_stack(fov_id, peak_id, color='seg_unet')
+
+#             # loop over each frame
+#             for frame in range(fl_stack.shape[0]):
+
+#                 fl_img = fl_stack[frame, ...]
+#                 seg_foci_img = seg_foci_stack[frame, ...]
+#                 seg_cell_img = seg_cell_stack[frame, ...]
+
+#                 # if there are no foci in this frame, move to next frame
+#                 if np.max(seg_foci_img) == 0:
+#                     continue
+#                 # if there are no cells in this fov/peak/frame, move to next frame
+#                 if np.max(seg_cell_img) == 0:
+#                     continue
+
+#                 t = frame+1
+#                 frame_cells = filter_cells_containing_val_in_attr(peak_cells, attr='times', val=t)
+#                 next_frame_cells = filter_cells_containing_val_in_attr(peak_cells, attr='times', val=t+1)
+
+#                 # prepare focus regions in this frame
+#                 focus_regions = measure.regionprops(seg_foci_img)
+
+#                 # loop over cells in this frame, linking to same cell or inherited cells in next frame
+#                 for cell in frame_cells:
+
+#                     pass
+
+
+
+#                 # compare this frame's foci to prior frame's foci for tracking
+#                 if frame > 0:
+#                     prior_seg_foci_img = seg_foci_stack[frame-1, ...]
+
+#                     fov_foci = filter_cells(foci,
+#                                             attr='fov',
+#                                             val=fov_id)
+#                     peak_foci = filter_cells(fov_foci,
+#                                              attr='peak',
+#                                              val=peak_id)
+#                     prior_frame_foci = filter_cells_containing_val_in_attr(peak_foci, attr='times', val=t-1)
+
+#                     # if there were foci in prior frame, do stuff
+#                     if len(prior_frame_foci) > 0:
+#                         prior_regions = measure.regionprops(prior_seg_foci_img)
+
+#                         # compare_array is prior_focus_number x this_focus_number
+#                         #   contains dice indices for each pairwise comparison
+#                         #   between focus positions
+#                         compare_array = np.zeros((np.max(prior_seg_foci_img),
+#                                                 np.max(seg_foci_img)))
+#                         # populate the array with dice indices
+#                         for prior_focus_idx in range(np.max(prior_seg_foci_img)):
+
+#                             prior_focus_mask = np.zeros(seg_foci_img.shape)
+#                             prior_focus_mask[prior_seg_foci_img == (prior_focus_idx + 1)] = 1
+
+#                             # apply gaussian blur with sigma=1 to prior focus mask
+#                             sig = 1
+#                             gaus_1 = filters.gaussian(prior_focus_mask, sigma=sig)
+
+#                             for this_focus_idx in range(np.max(seg_foci_img)):
+
+#                                 this_focus_mask = np.zeros(seg_foci_img.shape)
+#                                 this_focus_mask[seg_foci_img == (this_focus_idx + 1)] = 1
+
+#                                 # apply gaussian blur with sigma=1 to this focus mask
+#                                 gaus_2 = filters.gaussian(this_focus_mask, sigma=sig)
+#                                 # multiply the two images and place max into campare_array
+#                                 product = gaus_1 * gaus_2
+#                                 compare_array[prior_focus_idx, this_focus_idx] = np.max(product)
+
+#                         # which rows of each column are maximum product of gaussian blurs?
+#                         max_inds = np.argmax(compare_array, axis=0)
+#                         # because np.argmax returns zero if all rows are equal, we
+#                         #   need to evaluate if all rows are equal.
+#                         #   If std_dev is zero, then all were equal,
+#                         #   and we omit that index from consideration for
+#                         #   focus tracking.
+#                         sd_vals = np.std(compare_array, axis=0)
+#                         tracked_inds = np.where(sd_vals > 0)[0]
+#                         # if there is an index from a tracked focus, do this
+#                         if tracked_inds.size > 0:
+
+#                             for tracked_idx in tracked_inds:
+#                                 # grab this frame's region belonging to tracked focus
+#                                 tracked_label = tracked_idx + 1
+#                                 (tracked_region_idx, tracked_region) = [(_,reg) for _,reg in enumerate(focus_regions) if reg.label == tracked_label][0]
+#                                 # pop the region from focus_regions
+#                                 del focus_regions[tracked_region_idx]
+
+#                                 # grab prior frame's region belonging to tracked focus
+#                                 prior_tracked_label = max_inds[tracked_idx] + 1
+#                                 # prior_tracked_region = [reg for reg in prior_regions if reg.label == prior_tracked_label][0]
+
+#                                 # grab the focus for which the prior_tracked_label is in
+#                                 #   any of the labels in the prior focus from the prior time
+#                                 prior_tracked_foci = filter_foci(
+#                                     prior_frame_foci,
+#                                     label=prior_tracked_label,
+#                                     t = t-1,
+#                                     debug=False
+#                                 )
+
+#                                 prior_tracked_focus = [val for val in prior_tracked_foci.values()][0]
+
+#                                 # determine which cell this focus belongs to
+#                                 for cell_id,cell in frame_cells.items():
+
+#                                     cell_idx = cell.times.index(t)
+#                                     cell_label = cell.labels[cell_idx]
+
+#                                     masked_cell_img = np.zeros(seg_cell_img.shape)
+#                                     masked_cell_img[seg_cell_img == cell_label] = 1
+
+#                                     masked_focus_img = np.zeros(seg_foci_img.shape)
+#                                     masked_focus_img[seg_foci_img == tracked_region.label] = 1
+
+#                                     intersect_img = masked_cell_img + masked_focus_img
+
+#                                     pixels_two = len(np.where(intersect_img == 2))
+#                                     pixels_one = len(np.where(masked_focus_img == 1))
+
+#                                     # if over half the focus is within this cell, do the following
+#                                     if pixels_two/pixels_one >= 0.5:
+
+#                                         prior_tracked_focus.grow(
+#                                             region=tracked_region,
+#                                             t=t,
+#                                             seg_img=seg_foci_img,
+#                                             intensity_image=fl_img,
+#                                             current_cell=cell
+#                                         )
+
+#                 # after tracking foci, those that were tracked have been removed from focus_regions list
+#                 # now we check if any regions remain in the list
+#                 # if there are any remaining, instantiate new foci
+#                 if len(focus_regions) > 0:
+#                     new_ids = []
+
+#                     for focus_region in focus_regions:
+
+#                         # make the focus_id
+#                         new_id = create_focus_id(
+#                             region = focus_region,
+#                             t = t,
+#                             peak = peak_id,
+#                             fov = fov_id,
+#                             experiment_name = params['experiment_name'])
+#                         # populate list for later checking if any are missing
+#                         # from foci dictionary's keys
+#                         new_ids.append(new_id)
+
+#                         # determine which cell this focus belongs to
+#                         for cell_id,cell in frame_cells.items():
+
+#                             cell_idx = cell.times.index(t)
+#                             cell_label = cell.labels[cell_idx]
+
+#                             masked_cell_img = np.zeros(seg_cell_img.shape)
+#                             masked_cell_img[seg_cell_img == cell_label] = 1
+
+#                             masked_focus_img = np.zeros(seg_foci_img.shape)
+#                             masked_focus_img[seg_foci_img == focus_region.label] = 1
+
+#                             intersect_img = masked_cell_img + masked_focus_img
+
+#                             pixels_two = len(np.where(intersect_img == 2))
+#                             pixels_one = len(np.where(masked_focus_img == 1))
+
+#                             # if over half the focus is within this cell, do the following
+#                             if pixels_two/pixels_one >= 0.5:
+#                                 # set up the focus
+#                                 # if no foci in cell, just add this one.
+
+#                                 foci[new_id] = Focus(cell = cell,
+#                                                      region = focus_region,
+#                                                      seg_img = seg_foci_img,
+#                                                      intensity_image = fl_img,
+#                                                      t = t)
+
+#                     for new_id in new_ids:
+#                         # if new_id is not a key in the foci dictionary,
+#                         #   that suggests the focus doesn't overlap well
+#                         #   with any cells in this frame, so we'll relabel
+#                         #   this frame of seg_foci_stack to zero for that
+#                         #   focus to avoid trying to track a focus
+#                         #   that doesn't exist.
+#                         if new_id not in foci:
+
+#                             # get label of new_id's region
+#                             this_label = int(new_id[-2:])
+#                             # set pixels in this frame that match this label to 0
+#                             seg_foci_stack[frame, seg_foci_img == this_label] = 0
+
+#     return
+
+def update_cell_foci(cells, foci):
+    '''Updates cells' .foci attribute in-place using information
+    in foci dictionary
+    '''
+    for focus_id, focus in foci.items():
+        for cell in focus.cells:
+
+            cell_id = cell.id
+            cells[cell_id].foci[focus_id] = focus
+
+# finds best fit for 2d gaussian using functin above
+def fitgaussian(data):
+    """Returns (height, x, y, width_x, width_y)
+    the gaussian parameters of a 2D distribution found by a fit
+    if params are not provided, they are calculated from the moments
+    params should be (height, x, y, width_x, width_y)"""
+    gparams = moments(data) # create guess parameters.
+    errorfunction = lambda p: np.ravel(gaussian(*p)(*np.indices(data.shape)) - data)
+    p, success = leastsq(errorfunction, gparams)
+    return p
+
+# calculate dice coefficient for two blobs
+def dice_coeff_foci(mask_1_f, mask_2_f):
+    '''Accepts two flattened numpy arrays from
+    binary masks of two blobs and compares them
+    using the dice metric.
+
+    Returns a single dice score.
+    '''
+    intersection = np.sum(mask_1_f * mask_2_f)
+    score = (2. * intersection) / (np.sum(mask_1_f) + np.sum(mask_2_f))
+    return score
+
+# returnes a 2D gaussian function
+def gaussian(height, center_x, center_y, width):
+    '''Returns a gaussian function with the given parameters. It is a circular gaussian.
+    width is 2*sigma x or y
+    '''
+    # return lambda x,y: height*np.exp(-(((center_x-x)/width_x)**2+((center_y-y)/width_y)**2)/2)
+    return lambda x,y: height*np.exp(-(((center_x-x)/width)**2+((center_y-y)/width)**2)/2)
+
+# moments of a 2D gaussian
+def moments(data):
+    '''
+    Returns (height, x, y, width_x, width_y)
+    The (circular) gaussian parameters of a 2D distribution by calculating its moments.
+    width_x and width_y are 2*sigma x and sigma y of the guassian.
+    '''
+    total = data.sum()
+    X, Y = np.indices(data.shape)
+    x = (X*data).sum()/total
+    y = (Y*data).sum()/total
+    col = data[:, int(y)]
+    width = float(np.sqrt(abs((np.arange(col.size)-y)**2*col).sum()/col.sum()))
+    row = data[int(x), :]
+    # width_y = np.sqrt(abs((np.arange(row.size)-x)**2*row).sum()/row.sum())
+    height = data.max()
+    return height, x, y, width
+
+# returns a 1D gaussian function
+def gaussian1d(x, height, mean, sigma):
+    '''
+    x : data
+    height : height
+    mean : center
+    sigma : RMS width
+    '''
+    return height * np.exp(-(x-mean)**2 / (2*sigma**2))
+
+# analyze ring fluroescence.
+def ring_analysis(fov_id, peak_id, Cells, ring_plane='c2'):
+    '''Add information to the Cell objects about the location of the Z ring. Sums the fluorescent channel along the long axis of the cell. This can be plotted directly to give a good idea about the development of the ring. Also fits a gaussian to the profile.
+
+    Parameters
+    ----------
+    fov_id : int
+        FOV number of the lineage to analyze.
+    peak_id : int
+        Peak number of the lineage to analyze.
+    Cells : dict of Cell objects (from a Lineages dictionary)
+        Cells should be prefiltered to match fov_id and peak_id.
+    ring_plane : str
+        The suffix of the channel to analyze. 'c1', 'c2', 'sub_c2', etc.
+
+    Usage
+    -----
+    for fov_id, peaks in Lineages.iteritems():
+        for peak_id, Cells in peaks.iteritems():
+            mm3.ring_analysis(fov_id, peak_id, Cells, ring_plane='sub_c2')
+    '''
+
+    peak_width_guess = 2
+
+    # Load data
+    ring_stack = load_stack(fov_id, peak_id, color=ring_plane)
+    seg_stack = load_stack(fov_id, peak_id, color='seg_unet')
+
+    # Load time table to determine first image index.
+    time_table = load_time_table()
+    times_all = np.array(np.sort(time_table[fov_id].keys()), np.int_)
+    t0 = times_all[0] # first time index
+
+    # Loop through cells
+    for Cell in Cells.values():
+
+        # initialize ring data arrays for cell
+        Cell.ring_locs = []
+        Cell.ring_heights = []
+        Cell.ring_widths = []
+        Cell.ring_medians = []
+        Cell.ring_profiles = []
+
+        # loop through each time point for this cell
+        for n, t in enumerate(Cell.times):
+            # Make mask of fluorescent channel using segmented image
+            ring_image_masked = np.copy(ring_stack[t-t0])
+            ring_image_masked[seg_stack[t-t0] != Cell.labels[n]] = 0
+
+            # Sum along long axis, use the profile_line function from skimage
+            # Use orientation of cell as calculated from the ellipsoid fit,
+            # the known length of the cell from the feret diameter,
+            # and a width that is greater than the cell width.
+
+            # find endpoints of line
+            centroid = Cell.centroids[n]
+            orientation = Cell.orientations[n]
+            length = Cell.lengths[n]
+            width = Cell.widths[n] * 1.25
+
+            # give 2 pixel buffer to each end to capture area outside cell.
+            p1 = (centroid[0] - np.sin(orientation) * (length+4)/2,
+                  centroid[1] - np.cos(orientation) * (length+4)/2)
+            p2 = (centroid[0] + np.sin(orientation) * (length+4)/2,
+                  centroid[1] + np.cos(orientation) * (length+4)/2)
+
+            # ensure old pole is always first point
+            if p1[0] > p2[0]:
+                p1, p2 = p2, p1 # python is cool
+
+            profile = profile_line(ring_image_masked, p1, p2, linewidth=width,
+                                   order=1, mode='constant', cval=0)
+            profile_indicies = np.arange(len(profile))
+
+            # subtract median from profile, using non-zero values for median
+            profile_median = np.median(profile[np.nonzero(profile)])
+            profile_sub = profile - profile_median
+            profile_sub[profile_sub < 0] = 0
+
+            # find peak position simply using maximum.
+            peak_index = np.argmax(profile)
+            peak_height = profile[peak_index]
+            peak_height_sub = profile_sub[peak_index]
+
+            try:
+                # Fit gaussian
+                p_guess = [peak_height_sub, peak_index, peak_width_guess]
+                popt, pcov = curve_fit(gaussian1d, profile_indicies,
+                                       profile_sub, p0=p_guess)
+
+                peak_width = popt[2]
+            except:
+                # information('Ring gaussian fit failed. {} {} {}'.format(fov_id, peak_id, t))
+                peak_width = np.float('NaN')
+
+            # Add data to cells
+            Cell.ring_locs.append(peak_index - 3) # minus 3 because we added 2 before and line_profile adds 1.
+            Cell.ring_heights.append(peak_height)
+            Cell.ring_widths.append(peak_width)
+            Cell.ring_medians.append(profile_median)
+            Cell.ring_profiles.append(profile) # append whole profile
+
+    return
+
+# Calculate Y projection intensity of a fluorecent channel per cell
+def profile_analysis(fov_id, peak_id, Cells, profile_plane='c2'):
+    '''Calculate profile of plane along cell and add information to Cell object. Sums the fluorescent channel along the long axis of the cell.
+
+    Parameters
+    ----------
+    fov_id : int
+        FOV number of the lineage to analyze.
+    peak_id : int
+        Peak number of the lineage to analyze.
+    Cells : dict of Cell objects (from a Lineages dictionary)
+        Cells should be prefiltered to match fov_id and peak_id.
+    profile_plane : str
+        The suffix of the channel to analyze. 'c1', 'c2', 'sub_c2', etc.
+
+    Usage
+    -----
+
+    '''
+
+    # Load data
+    fl_stack = load_stack(fov_id, peak_id, color=profile_plane)
+    seg_stack = load_stack(fov_id, peak_id, color='seg_unet')
+
+    # Load time table to determine first image index.
+    # load_time_table()
+    times_all = []
+    for fov in params['time_table']:
+        times_all = np.append(times_all, list(params['time_table'][fov].keys()))
+    times_all = np.unique(times_all)
+    times_all = np.sort(times_all)
+    times_all = np.array(times_all,np.int_)
+    t0 = times_all[0] # first time index
+
+    # Loop through cells
+    for Cell in Cells.values():
+
+        # initialize ring data arrays for cell
+        fl_profiles = []
+
+        # loop through each time point for this cell
+        for n, t in enumerate(Cell.times):
+            # Make mask of fluorescent channel using segmented image
+            image_masked = np.copy(fl_stack[t-t0])
+            image_masked[seg_stack[t-t0] != Cell.labels[n]] = 0
+
+            # Sum along long axis, use the profile_line function from skimage
+            # Use orientation of cell as calculated from the ellipsoid fit,
+            # the known length of the cell from the feret diameter,
+            # and a width that is greater than the cell width.
+
+            # find endpoints of line
+            centroid = Cell.centroids[n]
+            orientation = Cell.orientations[n]
+            length = Cell.lengths[n]
+            width = Cell.widths[n] * 1.25
+
+            # give 2 pixel buffer to each end to capture area outside cell.
+            p1 = (centroid[0] - np.sin(orientation) * (length+4)/2,
+                  centroid[1] - np.cos(orientation) * (length+4)/2)
+            p2 = (centroid[0] + np.sin(orientation) * (length+4)/2,
+                  centroid[1] + np.cos(orientation) * (length+4)/2)
+
+            # ensure old pole is always first point
+            if p1[0] > p2[0]:
+                p1, p2 = p2, p1 # python is cool
+
+            profile = profile_line(image_masked, p1, p2, linewidth=width,
+                                   order=1, mode='constant', cval=0)
+
+            fl_profiles.append(profile)
+
+        # append whole profile, using plane name
+        setattr(Cell, 'fl_profiles_'+profile_plane, fl_profiles)
+
+    return
+
+# Calculate X projection at midcell and quarter position
+def x_profile_analysis(fov_id, peak_id, Cells, profile_plane='sub_c2'):
+    '''Calculate profile of plane along cell and add information to Cell object. Sums the fluorescent channel along the long axis of the cell.
+
+    Parameters
+    ----------
+    fov_id : int
+        FOV number of the lineage to analyze.
+    peak_id : int
+        Peak number of the lineage to analyze.
+    Cells : dict of Cell objects (from a Lineages dictionary)
+        Cells should be prefiltered to match fov_id and peak_id.
+    profile_plane : str
+        The suffix of the channel to analyze. 'c1', 'c2', 'sub_c2', etc.
+
+    '''
+
+    # width to sum over in pixels
+    line_width = 6
+
+    # Load data
+    fl_stack = load_stack(fov_id, peak_id, color=profile_plane)
+    seg_stack = load_stack(fov_id, peak_id, color='seg_unet')
+
+    # Load time table to determine first image index.
+    time_table = load_time_table()
+    t0 = times_all[0] # first time index
+
+    # Loop through cells
+    for Cell in Cells.values():
+
+        # print(Cell.id)
+
+        # initialize data arrays for cell
+        midcell_fl_profiles = []
+        midcell_pts = []
+        quarter_fl_profiles = []
+        quarter_pts = []
+
+        # loop through each time point for this cell
+        for n, t in enumerate(Cell.times):
+            # Make mask of fluorescent channel using segmented image
+            image_masked = np.copy(fl_stack[t-t0])
+            # image_masked[seg_stack[t-t0] != Cell.labels[n]] = 0
+
+            # Sum along short axis, use the profile_line function from skimage
+            # Use orientation of cell as calculated from the ellipsoid fit,
+            # the known length of the cell from the feret diameter,
+            # and a width that is greater than the cell width.
+
+            # find end points for summing
+            centroid = Cell.centroids[n]
+            orientation = Cell.orientations[n]
+            length = Cell.lengths[n]
+            width = Cell.widths[n]
+
+            # midcell
+            # give 2 pixel buffer to each end to capture area outside cell.
+            md_p1 = (centroid[0] - np.cos(orientation) * (width+8)/2,
+                     centroid[1] - np.sin(orientation) * (width+8)/2)
+            md_p2 = (centroid[0] + np.cos(orientation) * (width+8)/2,
+                     centroid[1] + np.sin(orientation) * (width+8)/2)
+
+            # ensure lower x point is always first
+            if md_p1[1] > md_p2[1]:
+                md_p1, md_p2 = md_p2, md_p1 # python is cool
+            midcell_pts.append((md_p1, md_p2))
+
+            # print(t, centroid, orientation, md_p1, md_p2)
+            md_profile = profile_line(image_masked, md_p1, md_p2,
+                                      linewidth=line_width,
+                                      order=1, mode='constant', cval=0)
+            midcell_fl_profiles.append(md_profile)
+
+            # quarter position, want to measure at mother end
+            if orientation > 0:
+                yq = centroid[0] - np.sin(orientation) * 0.5 * (length * 0.5)
+                xq = centroid[1] + np.cos(orientation) * 0.5 * (length * 0.5)
+            else:
+                yq = centroid[0] + np.sin(orientation) * 0.5 * (length * 0.5)
+                xq = centroid[1] - np.cos(orientation) * 0.5 * (length * 0.5)
+
+            q_p1 = (yq - np.cos(orientation) * (width+8)/2,
+                    xq - np.sin(orientation) * (width+8)/2)
+            q_p2 = (yq + np.cos(orientation) * (width+8)/2,
+                    xq + np.sin(orientation) * (width+8)/2)
+
+            if q_p1[1] > q_p2[1]:
+                q_p1, q_p2 = q_p2, q_p1
+            quarter_pts.append((q_p1, q_p2))
+
+            q_profile = profile_line(image_masked, q_p1, q_p2,
+                                     linewidth=line_width,
+                                     order=1, mode='constant', cval=0)
+            quarter_fl_profiles.append(q_profile)
+
+        # append whole profile, using plane name
+        setattr(Cell, 'fl_md_profiles_'+profile_plane, midcell_fl_profiles)
+        setattr(Cell, 'midcell_pts', midcell_pts)
+        setattr(Cell, 'fl_quar_profiles_'+profile_plane, quarter_fl_profiles)
+        setattr(Cell, 'quarter_pts', quarter_pts)
+
+    return
+
+# Calculate X projection at midcell and quarter position
+def constriction_analysis(fov_id, peak_id, Cells, plane='sub_c1'):
+    '''Calculate profile of plane along cell and add information to Cell object. Sums the fluorescent channel along the long axis of the cell.
+
+    Parameters
+    ----------
+    fov_id : int
+        FOV number of the lineage to analyze.
+    peak_id : int
+        Peak number of the lineage to analyze.
+    Cells : dict of Cell objects (from a Lineages dictionary)
+        Cells should be prefiltered to match fov_id and peak_id.
+    plane : str
+        The suffix of the channel to analyze. 'c1', 'c2', 'sub_c2', etc.
+
+    '''
+
+    # Load data
+    sub_stack = load_stack(fov_id, peak_id, color=plane)
+    seg_stack = load_stack(fov_id, peak_id, color='seg_unet')
+
+    # Load time table to determine first image index.
+    time_table = load_time_table()
+    t0 = times_all[0] # first time index
+
+    # Loop through cells
+    for Cell in Cells.values():
+
+        # print(Cell.id)
+
+        # initialize data arrays for cell
+        midcell_imgs = [] # Just a small image of the midcell
+        midcell_sums = [] # holds sum of pixel values in midcell area
+        midcell_vars = [] # variances
+
+        coeffs_2nd = [] # coeffiients for fitting
+
+        # loop through each time point for this cell
+        for n, t in enumerate(Cell.times):
+            # Make mask of subtracted image
+            image_masked = np.copy(sub_stack[t-t0])
+            image_masked[seg_stack[t-t0] != Cell.labels[n]] = 0
+
+            # make a box aroud the midcell from which to calculate stats
+            centroid = Cell.centroids[n]
+            orientation = Cell.orientations[n]
+            length = Cell.lengths[n]
+            slice_l = np.around(length/4).astype('int')
+            width = Cell.widths[n]
+            slice_w = np.around(width/2).astype('int') + 3
+            slice_l = slice_w
+
+            # rotate box and then slice out area around centroid
+            if orientation > 0:
+                rot_angle = 90 - orientation * (180 / np.pi)
+            else:
+                rot_angle = -90 - orientation * (180 / np.pi)
+
+            rotated = rotate(image_masked, rot_angle, resize=False,
+                             center=centroid, mode='constant', cval=0)
+            centroid = [int(coord) for coord in centroid]
+            cropped_md = rotated[centroid[0]-slice_l:centroid[0]+slice_l,
+                                 centroid[1]-slice_w:centroid[1]+slice_w]
+
+            # sum across with widths
+            md_widths = np.array([np.around(sum(row),5) for row in cropped_md])
+
+            # fit widths
+            x_pixels = np.arange(1, len(md_widths)+1) - (len(md_widths)+1)/2
+            p_guess = (1, 1, 1)
+            popt, pcov = curve_fit(poly2o, x_pixels, md_widths, p0=p_guess)
+            a, b, c = popt
+            # save coefficients
+            coeffs_2nd.append(a)
+
+            # go backwards through coeeficients and find at which index the coeff becomes negative.
+            constriction_index = None
+            for i, coeff in enumerate(reversed(coeffs_2nd), start=0):
+                if coeff < 0:
+                    constriction_index = i
+                    break
+
+            # fix index
+            if constriction_index == None:
+                constriction_index = len(coeffs_2nd) - 1 # make it last point if it was not found
+            else:
+                constriction_index = len(coeffs_2nd) - constriction_index - 1
+
+            # midcell_imgs.append(cropped_md)
+            # midcell_sums.append(np.sum(cropped_md))
+            # midcell_vars.append(np.var(cropped_md))
+
+        # append whole profile, using plane name
+        # setattr(Cell, 'md_image_'+plane, midcell_imgs)
+        # setattr(Cell, 'md_sums', midcell_sums)
+        # setattr(Cell, 'md_vars', midcell_vars)
+
+        setattr(Cell, 'constriction_time', Cell.times[constriction_index])
+
+    return
+
+# Calculate pole age of cell and add as attribute
+def calculate_pole_age(Cells):
+    '''Finds the pole age of each end of the cell. Adds this information to the cell object.
+
+    This should maybe move to helpers
+    '''
+
+    # run through once and set up default
+    for cell_id, cell_tmp in six.iteritems(Cells):
+        cell_tmp.poleage = None
+
+    for cell_id, cell_tmp in six.iteritems(Cells):
+        # start from r1 cells which have r1 parents in the list.
+        # these cells are old pole mothers.
+    #     if cell_tmp.parent in Cells and cell_tmp.birth_label == 1:
+
+        # less stringent requirement that the cell just r1
+        if cell_tmp.birth_label == 1:
+
+            # label this cell
+            cell_tmp.poleage = (1000, 0) # closed end age first, 1000 for old pole.
+
+            # label the daughter cell 01 if it is in the list
+            if cell_tmp.daughters[1] in Cells:
+                # sets poleage of this cell and recursively goes through descendents.
+                Cells = set_poleages(cell_tmp.daughters[1], 1, Cells)
+
+    return Cells
+
+def set_poleages(cell_id, daughter_index, Cells):
+    '''Determines pole ages for cells. Only for cells which are not old-pole mother.'''
+
+    parent_poleage = Cells[Cells[cell_id].parent].poleage
+
+    # the lower daughter
+    if daughter_index == 0:
+        Cells[cell_id].poleage = (parent_poleage[0]+1, 0)
+    elif daughter_index == 1:
+        Cells[cell_id].poleage = (0, parent_poleage[1]+1)
+
+    for i, daughter_id in enumerate(Cells[cell_id].daughters):
+        if daughter_id in Cells:
+            Cells = set_poleages(daughter_id, i, Cells)
+
+    return Cells
+
+def poly2o(x, a, b, c):
+    '''Second order polynomial of the form
+       y = a*x^2 + bx + c'''
+
+    return a*x**2 + b*x + c
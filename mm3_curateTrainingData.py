@@ -25,7 +25,6 @@ except:
 import numpy as np
 from scipy.io import savemat
 
-from tensorflow.python.keras import models
 
 # user modules
 # realpath() will make your script run, even if you symlink it
@@ -0,0 +1,2025 @@
+#!/usr/bin/env python3
+'''
+Image operations: finding and slicing channels from raw TIFFs, alignment,
+background subtraction and Otsu segmentation, plus labeling of U-net predictions.
+'''
+from __future__ import print_function, division
+import six
+
+# import modules
+import sys # input, output, errors, and files
+import os # interacting with file systems
+import time # getting time
+import yaml # parameter importing
+import re # regular expressions
+from pprint import pprint # for human readable file output
+import traceback # for error messaging
+import numpy as np # numbers package
+import h5py # working with HDF5 files
+
+# scipy and image analysis
+from scipy.signal import find_peaks_cwt # used in channel finding
+from scipy import ndimage as ndi # labeling and distance transform
+from skimage import io
+from skimage import segmentation # used in make_masks and segmentation
+try:
+    from skimage.segmentation import watershed # marker based segmentation
+except ImportError:
+    from skimage.morphology import watershed # older scikit-image
+from skimage.feature import match_template # used to align images
+from skimage.filters import threshold_otsu # segmentation
+from skimage import morphology # many functions is segmentation used from this
+from skimage import measure
+from skimage.external import tifffile as tiff
+
+# Parralelization modules
+from multiprocessing import Pool
+
+from mm3_io import (params, information, warning, load_stack, save_stack, get_stack_length,
+                    stack_exists, array_checksum, get_tif_metadata_elements, get_tif_metadata_nd2ToTIFF,
+                    get_tif_metadata_filename)
+
+### functions for dealing with raw TIFF images
+
+# get params is the major function which processes raw TIFF images
+def get_initial_tif_params(image_filename):
+    '''This is a function for getting the information
+    out of an image for later trap identification, cropping, and aligning with Unet. It loads a tiff file and pulls out the image metadata.
+
+    it returns a dictionary like this for each image:
+
+    'filename': image_filename,
+    'fov' : image_metadata['fov'], # fov id
+    't' : image_metadata['t'], # time point
+    'jdn' : image_metadata['jdn'], # absolute julian time
+    'x' : image_metadata['x'], # x position on stage [um]
+    'y' : image_metadata['y'], # y position on stage [um]
+    'plane_names' : image_metadata['plane_names'] # list of plane names
+
+    Called by
+    mm3_Compile.py __main__
+
+    Calls
+    mm3.extract_metadata
+    mm3.find_channels
+    '''
+
+    try:
+        # open up file and get metadata
+        with tiff.TiffFile(os.path.join(params['TIFF_dir'],image_filename)) as tif:
+            image_data = tif.asarray()
+            #print(image_data.shape) # uncomment for debug
+            #if len(image_data.shape) == 2:
+            #    img_shape = [image_data.shape[0],image_data.shape[1]]
+            #else:
+            img_shape = [image_data.shape[1],image_data.shape[2]]
+            plane_list = [str(i+1) for i in range(image_data.shape[0])]
+            #print(plane_list) # uncomment for debug
+
+            if params['TIFF_source'] == 'elements':
+                image_metadata = get_tif_metadata_elements(tif)
+            elif params['TIFF_source'] == 'nd2ToTIFF':
+                image_metadata = get_tif_metadata_nd2ToTIFF(tif)
+            else:
+                image_metadata = get_tif_metadata_filename(tif)
+
+        information('Analyzed %s' % image_filename)
+
+        # return the file name, the data for the channels in that image, and the metadata
+        return {'filepath': os.path.join(params['TIFF_dir'], image_filename),
+                'fov' : image_metadata['fov'], # fov id
+                't' : image_metadata['t'], # time point
+                'jd' : image_metadata['jd'], # absolute julian time
+                'x' : image_metadata['x'], # x position on stage [um]
+                'y' : image_metadata['y'], # y position on stage [um]
+                'planes' : plane_list, # list of plane names
+                'shape' : img_shape} # image shape x y in pixels
+
+    except:
+        warning('Failed get_params for ' + image_filename.split("/")[-1])
+        print(sys.exc_info()[0])
+        print(sys.exc_info()[1])
+        print(traceback.print_tb(sys.exc_info()[2]))
+        return {'filepath': os.path.join(params['TIFF_dir'],image_filename), 'analyze_success': False}
+
+# get params is the major function which processes raw TIFF images
+def get_tif_params(image_filename, find_channels=True):
+    '''This is a damn important function for getting the information
+    out of an image. It loads a tiff file, pulls out the image data, and the metadata,
+    including the location of the channels if flagged.
+
+    it returns a dictionary like this for each image:
+
+    'filename': image_filename,
+    'fov' : image_metadata['fov'], # fov id
+    't' : image_metadata['t'], # time point
+    'jdn' : image_metadata['jdn'], # absolute julian time
+    'x' : image_metadata['x'], # x position on stage [um]
+    'y' : image_metadata['y'], # y position on stage [um]
+    'plane_names' : image_metadata['plane_names'] # list of plane names
+    'channels': cp_dict, # dictionary of channel locations, in the case of Unet-based channel segmentation, it's a dictionary of channel labels
+
+    Called by
+    mm3_Compile.py __main__
+
+    Calls
+    mm3.extract_metadata
+    mm3.find_channels
+    '''
+
+    try:
+        # open up file and get metadata
+        with tiff.TiffFile(os.path.join(params['TIFF_dir'],image_filename)) as tif:
+            image_data = tif.asarray()
+
+            if params['TIFF_source'] == 'elements':
+                image_metadata = get_tif_metadata_elements(tif)
+            elif params['TIFF_source'] == 'nd2ToTIFF':
+                image_metadata = get_tif_metadata_nd2ToTIFF(tif)
+            else:
+                image_metadata = get_tif_metadata_filename(tif)
+
+        # look for channels if flagged
+        if find_channels:
+            # fix the image orientation and get the number of planes
+            image_data = fix_orientation(image_data)
+
+            # if the image data has more than 1 plane restrict image_data to phase,
+            # which should have highest mean pixel data
+            if len(image_data.shape) > 2:
+                #ph_index = np.argmax([np.mean(image_data[ci]) for ci in range(image_data.shape[0])])
+                ph_index = int(params['phase_plane'][1:]) - 1
+                image_data = image_data[ph_index]
+
+            # get shape of single plane
+            img_shape = [image_data.shape[0], image_data.shape[1]]
+
+            # find channels on the processed image
+            chnl_loc_dict = find_channel_locs(image_data)
+
+        information('Analyzed %s' % image_filename)
+
+        # return the file name, the data for the channels in that image, and the metadata
+        return {'filepath': os.path.join(params['TIFF_dir'], image_filename),
+                'fov' : image_metadata['fov'], # fov id
+                't' : image_metadata['t'], # time point
+                'jd' : image_metadata['jd'], # absolute julian time
+                'x' : image_metadata['x'], # x position on stage [um]
+                'y' : image_metadata['y'], # y position on stage [um]
+                'planes' : image_metadata['planes'], # list of plane names
+                'shape' : img_shape, # image shape x y in pixels
+                # 'channels' : {1 : {'A' : 1, 'B' : 2}, 2 : {'C' : 3, 'D' : 4}}}
+                'channels' : chnl_loc_dict} # dictionary of channel locations
+
+    except:
+        warning('Failed get_params for ' + image_filename.split("/")[-1])
+        print(sys.exc_info()[0])
+        print(sys.exc_info()[1])
+        print(traceback.print_tb(sys.exc_info()[2]))
+        return {'filepath': os.path.join(params['TIFF_dir'],image_filename), 'analyze_success': False}
+
+# saves traps sliced via Unet
+def save_tiffs(imgDict, analyzed_imgs, fov_id):
+
+    savePath = os.path.join(params['experiment_directory'],
+                            params['analysis_directory'],
+                            params['chnl_dir'])
+    img_names = [key for key in analyzed_imgs.keys()]
+    image_params = analyzed_imgs[img_names[0]]
+
+    for peak,img in six.iteritems(imgDict):
+
+        img = img.astype('uint16')
+        if not os.path.isdir(savePath):
+            os.mkdir(savePath)
+
+        for planeNumber in image_params['planes']:
+
+            channel_filename = os.path.join(savePath, params['experiment_name'] + '_xy{0:0=3}_p{1:0=4}_c{2}.tif'.format(fov_id, peak, planeNumber))
+            io.imsave(channel_filename, img[:,:,:,int(planeNumber)-1])
+
+# slice_and_write cuts up the image files one at a time and writes them out to tiff stacks
+def tiff_stack_slice_and_write(images_to_write, channel_masks, analyzed_imgs):
+    '''Writes out 4D stacks of TIFF images per channel.
+    Loads all tiffs from and FOV into memory and then slices all time points at once.
+
+    Called by
+    __main__
+    '''
+
+    # make an array of images and then concatenate them into one big stack
+    image_fov_stack = []
+
+    # go through list of images and get the file path
+    for n, image in enumerate(images_to_write):
+        # analyzed_imgs dictionary will be found in main scope. [0] is the key, [1] is jd
+        image_params = analyzed_imgs[image[0]]
+
+        information("Loading %s." % image_params['filepath'].split('/')[-1])
+
+        if n == 1:
+            # declare identification variables for saving using first image
+            fov_id = image_params['fov']
+
+        # load the tif and store it in array
+        with tiff.TiffFile(image_params['filepath']) as tif:
+            image_data = tif.asarray()
+
+        # channel finding was also done on images after orientation was fixed
+        image_data = fix_orientation(image_data)
+
+        # add additional axis if the image is flat
+        if len(image_data.shape) == 2:
+            image_data = np.expand_dims(image_data, 0)
+
+        # change axis so it goes Y, X, Plane
+        image_data = np.rollaxis(image_data, 0, 3)
+
+        # add it to list. The images should be in time order
+        image_fov_stack.append(image_data)
+
+    # concatenate the list into one big ass stack
+    image_fov_stack = np.stack(image_fov_stack, axis=0)
+
+    # cut out the channels as per channel masks for this fov
+    for peak, channel_loc in six.iteritems(channel_masks[fov_id]):
+        #information('Slicing and saving channel peak %s.' % channel_filename.split('/')[-1])
+        information('Slicing and saving channel peak %d.' % peak)
+
+        # channel masks should only contain ints, but you can use this for hard fix
+        # for i in range(len(channel_loc)):
+        #     for j in range(len(channel_loc[i])):
+        #         channel_loc[i][j] = int(channel_loc[i][j])
+
+        # slice out channel.
+        # The function should recognize the shape length as 4 and cut all time points
+        channel_stack = cut_slice(image_fov_stack, channel_loc)
+
+        # save a different time stack for all colors
+        for color_index in range(channel_stack.shape[3]):
+            # this is the filename for the channel
+            # # chnl_dir and p will be looked for in the scope above (__main__)
+            channel_filename = os.path.join(params['chnl_dir'], params['experiment_name'] + '_xy%03d_p%04d_c%1d.tif' % (fov_id, peak, color_index+1))
+            # save stack
+            tiff.imsave(channel_filename, channel_stack[:,:,:,color_index], compress=4)
+
+    return
+
+# saves traps sliced via Unet to an hdf5 file
+def save_hdf5(imgDict, img_names, analyzed_imgs, fov_id, channel_masks):
+    '''Writes out 4D stacks of images to an HDF5 file.
+
+    Called by
+    mm3_Compile.py
+    '''
+
+    savePath = params['hdf5_dir']
+
+    if not os.path.isdir(savePath):
+        os.mkdir(savePath)
+
+    img_times = [analyzed_imgs[key]['t'] for key in img_names]
+    img_jds = [analyzed_imgs[key]['jd'] for key in img_names]
+    fov_ids = [analyzed_imgs[key]['fov'] for key in img_names]
+
+    # get image_params from first image from current fov
+    image_params = analyzed_imgs[img_names[0]]
+
+    # establish some variables for hdf5 attributes
+    fov_id = image_params['fov']
+    x_loc = image_params['x']
+    y_loc = image_params['y']
+    image_shape = image_params['shape']
+    image_planes = image_params['planes']
+
+    fov_channel_masks = channel_masks[fov_id]
+
+    with h5py.File(os.path.join(savePath,'{}_xy{:0=2}.hdf5'.format(params['experiment_name'],fov_id)), 'w', libver='earliest') as h5f:
+
+        # add in metadata for this FOV
+        # these attributes should be common for all channel
+        h5f.attrs.create('fov_id', fov_id)
+        h5f.attrs.create('stage_x_loc', x_loc)
+        h5f.attrs.create('stage_y_loc', y_loc)
+        h5f.attrs.create('image_shape', image_shape)
+        # encoding is because HDF5 has problems with numpy unicode
+        h5f.attrs.create('planes', [plane.encode('utf8') for plane in image_planes])
+        h5f.attrs.create('peaks', sorted([key for key in imgDict.keys()]))
+
+        # this is for things that change across time, for these create a dataset
+        img_names = np.asarray(img_names)
+        img_names = np.expand_dims(img_names, 1)
+        img_names = img_names.astype('S100')
+        h5ds = h5f.create_dataset(u'filenames', data=img_names,
+                                  chunks=True, maxshape=(None, 1), dtype='S100',
+                                  compression="gzip", shuffle=True, fletcher32=True)
+        h5ds = h5f.create_dataset(u'times', data=np.expand_dims(img_times, 1),
+                                  chunks=True, maxshape=(None, 1),
+                                  compression="gzip", shuffle=True, fletcher32=True)
+        h5ds = h5f.create_dataset(u'times_jd', data=np.expand_dims(img_jds, 1),
+                                  chunks=True, maxshape=(None, 1),
+                                  compression="gzip", shuffle=True, fletcher32=True)
+
+        # cut out the channels as per channel masks for this fov
+        for peak,channel_stack in six.iteritems(imgDict):
+
+            channel_stack = channel_stack.astype('uint16')
+            # create group for this trap
+            h5g = h5f.create_group('channel_%04d' % peak)
+
+            # add attribute for peak_id, channel location
+            # add attribute for peak_id, channel location
+            h5g.attrs.create('peak_id', peak)
+            channel_loc = fov_channel_masks[peak]
+            h5g.attrs.create('channel_loc', channel_loc)
+
+            # save a different dataset for all colors
+            for color_index in range(channel_stack.shape[3]):
+
+                # create the dataset for the image. Review docs for these options.
+                h5ds = h5g.create_dataset(u'p%04d_c%1d' % (peak, color_index+1),
+                                data=channel_stack[:,:,:,color_index],
+                                chunks=(1, channel_stack.shape[1], channel_stack.shape[2]),
+                                maxshape=(None, channel_stack.shape[1], channel_stack.shape[2]),
+                                compression="gzip", shuffle=True, fletcher32=True)
+
+                # h5ds.attrs.create('plane', image_planes[color_index].encode('utf8'))
+
+                # write the data even though we have more to write (free up memory)
+                h5f.flush()
+
+    return
+
+# same thing as tiff_stack_slice_and_write but do it for hdf5
+def hdf5_stack_slice_and_write(images_to_write, channel_masks, analyzed_imgs):
+    '''Writes out 4D stacks of TIFF images to an HDF5 file.
+
+    Called by
+    __main__
+    '''
+
+    # make an array of images and then concatenate them into one big stack
+    image_fov_stack = []
+
+    # make arrays for filenames and times
+    image_filenames = []
+    image_times = [] # times is still an integer but may be indexed arbitrarily
+    image_jds = [] # jds = julian dates (times)
+
+    # go through list of images, load and fix them, and create arrays of metadata
+    for n, image in enumerate(images_to_write):
+        image_name = image[0] # [0] is the key, [1] is jd
+
+        # analyzed_imgs dictionary will be found in main scope.
+        image_params = analyzed_imgs[image_name]
+        information("Loading %s." % image_params['filepath'].split('/')[-1])
+
+        # add information to metadata arrays
+        image_filenames.append(image_name)
+        image_times.append(image_params['t'])
+        image_jds.append(image_params['jd'])
+
+        # declare identification variables for saving using first image
+        if n == 1:
+            # same across fov
+            fov_id = image_params['fov']
+            x_loc = image_params['x']
+            y_loc = image_params['y']
+            image_shape = image_params['shape']
+            image_planes = image_params['planes']
+
+        # load the tif and store it in array
+        with tiff.TiffFile(image_params['filepath']) as tif:
+            image_data = tif.asarray()
+
+        # channel finding was also done on images after orientation was fixed
+        image_data = fix_orientation(image_data)
+
+        # add additional axis if the image is flat
+        if len(image_data.shape) == 2:
+            image_data = np.expand_dims(image_data, 0)
+
+        #change axis so it goes X, Y, Plane
+        image_data = np.rollaxis(image_data, 0, 3)
+
+        # add it to list. The images should be in time order
+        image_fov_stack.append(image_data)
+
+    # concatenate the list into one big ass stack
+    image_fov_stack = np.stack(image_fov_stack, axis=0)
+
+    # create the HDF5 file for the FOV, first time this is being done.
+    with h5py.File(os.path.join(params['hdf5_dir'],'xy%03d.hdf5' % fov_id), 'w', libver='earliest') as h5f:
+
+        # add in metadata for this FOV
+        # these attributes should be common for all channel
+        h5f.attrs.create('fov_id', fov_id)
+        h5f.attrs.create('stage_x_loc', x_loc)
+        h5f.attrs.create('stage_y_loc', y_loc)
+        h5f.attrs.create('image_shape', image_shape)
+        # encoding is because HDF5 has problems with numpy unicode
+        h5f.attrs.create('planes', [plane.encode('utf8') for plane in image_planes])
+        h5f.attrs.create('peaks', sorted(channel_masks[fov_id].keys()))
+
+        # this is for things that change across time, for these create a dataset
+        h5ds = h5f.create_dataset(u'filenames', data=np.expand_dims(image_filenames, 1),
+                                  chunks=True, maxshape=(None, 1), dtype='S100',
+                                  compression="gzip", shuffle=True, fletcher32=True)
+        h5ds = h5f.create_dataset(u'times', data=np.expand_dims(image_times, 1),
+                                  chunks=True, maxshape=(None, 1),
+                                  compression="gzip", shuffle=True, fletcher32=True)
+        h5ds = h5f.create_dataset(u'times_jd', data=np.expand_dims(image_jds, 1),
+                                  chunks=True, maxshape=(None, 1),
+                                  compression="gzip", shuffle=True, fletcher32=True)
+
+        # cut out the channels as per channel masks for this fov
+        for peak, channel_loc in six.iteritems(channel_masks[fov_id]):
+            #information('Slicing and saving channel peak %s.' % channel_filename.split('/')[-1])
+            information('Slicing and saving channel peak %d.' % peak)
+
+            # create group for this channel
+            h5g = h5f.create_group('channel_%04d' % peak)
+
+            # add attribute for peak_id, channel location
+            h5g.attrs.create('peak_id', peak)
+            h5g.attrs.create('channel_loc', channel_loc)
+
+            # channel masks should only contain ints, but you can use this for a hard fix
+            # for i in range(len(channel_loc)):
+            #     for j in range(len(channel_loc[i])):
+            #         channel_loc[i][j] = int(channel_loc[i][j])
+
+            # slice out channel.
+            # The function should recognize the shape length as 4 and cut all time points
+            channel_stack = cut_slice(image_fov_stack, channel_loc)
+
+            # save a different dataset for all colors
+            for color_index in range(channel_stack.shape[3]):
+
+                # create the dataset for the image. Review docs for these options.
+                h5ds = h5g.create_dataset(u'p%04d_c%1d' % (peak, color_index+1),
+                                data=channel_stack[:,:,:,color_index],
+                                chunks=(1, channel_stack.shape[1], channel_stack.shape[2]),
+                                maxshape=(None, channel_stack.shape[1], channel_stack.shape[2]),
+                                compression="gzip", shuffle=True, fletcher32=True)
+
+                # h5ds.attrs.create('plane', image_planes[color_index].encode('utf8'))
+
+                # write the data even though we have more to write (free up memory)
+                h5f.flush()
+
+    return
+
+# takes initial U-net centroids for trap locations, and creats bounding boxes for each trap at the defined height and width
+def get_frame_trap_bounding_boxes(trapLabels, trapProps, trapAreaThreshold=2000, trapWidth=27, trapHeight=256):
+
+    badTrapLabels = [reg.label for reg in trapProps if reg.area < trapAreaThreshold] # filter out small "trap" regions
+    goodTraps = trapLabels.copy()
+
+    for label in badTrapLabels:
+        goodTraps[goodTraps == label] = 0 # re-label bad traps as background (0)
+
+    goodTrapProps = measure.regionprops(goodTraps)
+    trapCentroids = [(int(np.round(reg.centroid[0])),int(np.round(reg.centroid[1]))) for reg in goodTrapProps] # get centroids as integers
+    trapBboxes = []
+
+    for centroid in trapCentroids:
+        rowIndex = centroid[0]
+        colIndex = centroid[1]
+
+        minRow = rowIndex-trapHeight//2
+        maxRow = rowIndex+trapHeight//2
+        minCol = colIndex-trapWidth//2
+        maxCol = colIndex+trapWidth//2
+        if trapWidth % 2 != 0:
+            maxCol += 1
+
+        coordArray = np.array([minRow,maxRow,minCol,maxCol])
+
+        # remove any traps at edges of image
+        if np.any(coordArray > goodTraps.shape[0]):
+            continue
+        if np.any(coordArray < 0):
+            continue
+
+        trapBboxes.append((minRow,minCol,maxRow,maxCol))
+
+    return(trapBboxes)
+
+# this function performs image alignment as defined by the shifts passed as an argument
+def crop_traps(fileNames, trapProps, labelledTraps, bboxesDict, trap_align_metadata):
+
+    frameNum = trap_align_metadata['frame_count']
+    channelNum = trap_align_metadata['plane_number']
+    trapImagesDict = {key:np.zeros((frameNum,
+                                       trap_align_metadata['trap_height'],
+                                       trap_align_metadata['trap_width'],
+                                       channelNum)) for key in bboxesDict}
+    trapClosedEndPxDict = {}
+    flipImageDict = {}
+    trapMask = labelledTraps
+
+    for frame in range(frameNum):
+
+        if (frame+1) % 20 == 0:
+            print("Cropping trap regions for frame number {} of {}.".format(frame+1, frameNum))
+
+        imgPath = os.path.join(params['experiment_directory'],params['image_directory'],fileNames[frame])
+        fullFrameImg = io.imread(imgPath)
+        if len(fullFrameImg.shape) == 3:
+            if fullFrameImg.shape[0] < 3: # for tifs with less than three imaging channels, the first dimension separates channels
+                fullFrameImg = np.transpose(fullFrameImg, (1,2,0))
+        trapClosedEndPxDict[fileNames[frame]] = {key:{} for key in bboxesDict.keys()}
+
+        for key in trapImagesDict.keys():
+
+            bbox = bboxesDict[key][frame]
+            trapImagesDict[key][frame,:,:,:] = fullFrameImg[bbox[0]:bbox[2],bbox[1]:bbox[3],:]
+
+            #tmpImg = np.reshape(fullFrameImg[trapMask==key], (trapHeight,trapWidth,channelNum))
+
+            if frame == 0:
+                medianProfile = np.median(trapImagesDict[key][frame,:,:,0],axis=1) # get intensity of middle column of trap
+                maxIntensityRow = np.argmax(medianProfile)
+
+                if maxIntensityRow > trap_align_metadata['trap_height']//2:
+                    flipImageDict[key] = 0
+                else:
+                    flipImageDict[key] = 1
+
+            if flipImageDict[key] == 1:
+                trapImagesDict[key][frame,:,:,:] = trapImagesDict[key][frame,::-1,:,:]
+                trapClosedEndPxDict[fileNames[frame]][key]['closed_end_px'] = bbox[0]
+                trapClosedEndPxDict[fileNames[frame]][key]['open_end_px'] = bbox[2]
+            else:
+                trapClosedEndPxDict[fileNames[frame]][key]['closed_end_px'] = bbox[2]
+                trapClosedEndPxDict[fileNames[frame]][key]['open_end_px'] = bbox[0]
+                continue
+
+    return(trapImagesDict, trapClosedEndPxDict)
+
+# gets shifted bounding boxes to crop traps through time
+def shift_bounding_boxes(bboxesDict, shifts, imgSize):
+    bboxesShiftDict = {}
+
+    for key in bboxesDict.keys():
+        bboxesShiftDict[key] = []
+        bboxes = bboxesDict[key]
+
+        for i in range(shifts.shape[0]):
+
+            if i == 0:
+                bboxesShiftDict[key].append(bboxes)
+            else:
+                minRow = bboxes[0]+shifts[i,0]
+                minCol = bboxes[1]+shifts[i,1]
+                maxRow = bboxes[2]+shifts[i,0]
+                maxCol = bboxes[3]+shifts[i,1]
+                bboxesShiftDict[key].append((minRow,
+                                            minCol,
+                                            maxRow,
+                                            maxCol))
+                if np.any(np.asarray([minRow,minCol,maxRow,maxCol]) < 0):
+                    print("channel {} removed: out of frame".format(key))
+                    del bboxesShiftDict[key]
+                    break
+                if np.any(np.asarray([minRow,minCol,maxRow,maxCol]) > imgSize):
+                    print("channel {} removed: out of frame".format(key))
+                    del bboxesShiftDict[key]
+                    break
+
+    return(bboxesShiftDict)
+
+# finds the location of channels in a tif
+def find_channel_locs(image_data):
+    '''Finds the location of channels from a phase contrast image. The channels are returned in
+    a dictionary where the key is the x position of the channel in pixel and the value is a
+    dicionary with the open and closed end in pixels in y.
+
+
+    Called by
+    mm3_Compile.get_tif_params
+
+    '''
+
+    # declare temp variables from yaml parameter dict.
+    chan_w = params['compile']['channel_width']
+    chan_sep = params['compile']['channel_separation']
+    crop_wp = int(params['compile']['channel_width_pad'] + chan_w/2)
+    chan_snr = params['compile']['channel_detection_snr']
+
+    # Detect peaks in the x projection (i.e. find the channels)
+    projection_x = image_data.sum(axis=0).astype(np.int32)
+    # find_peaks_cwt is a function which attempts to find the peaks in a 1-D array by
+    # convolving it with a wave. here the wave is the default Mexican hat wave
+    # but the minimum signal to noise ratio is specified
+    # *** The range here should be a parameter or changed to a fraction.
+    peaks = find_peaks_cwt(projection_x, np.arange(chan_w-5,chan_w+5), min_snr=chan_snr)
+
+    # If the left-most peak position is within half of a channel separation,
+    # discard the channel from the list.
+    if peaks[0] < (chan_sep / 2):
+        peaks = peaks[1:]
+    # If the diference between the right-most peak position and the right edge
+    # of the image is less than half of a channel separation, discard the channel.
+    if image_data.shape[1] - peaks[-1] < (chan_sep / 2):
+        peaks = peaks[:-1]
+
+    # Find the average channel ends for the y-projected image
+    projection_y = image_data.sum(axis=1)
+    # find derivative, must use int32 because it was unsigned 16b before.
+    proj_y_d = np.diff(projection_y.astype(np.int32))
+    # use the top third to look for closed end, is pixel location of highest deriv
+    onethirdpoint_y = int(projection_y.shape[0]/3.0)
+    default_closed_end_px = proj_y_d[:onethirdpoint_y].argmax()
+    # use bottom third to look for open end, pixel location of lowest deriv
+    twothirdpoint_y = int(projection_y.shape[0]*2.0/3.0)
+    default_open_end_px = twothirdpoint_y + proj_y_d[twothirdpoint_y:].argmin()
+    default_length = default_open_end_px - default_closed_end_px # used for checks
+
+    # go through peaks and assign information
+    # dict for channel dimensions
+    chnl_loc_dict = {}
+    # key is peak location, value is dict with {'closed_end_px': px, 'open_end_px': px}
+
+    for peak in peaks:
+        # set defaults
+        chnl_loc_dict[peak] = {'closed_end_px': default_closed_end_px,
+                                 'open_end_px': default_open_end_px}
+        # redo the previous y projection finding with just this channel
+        channel_slice = image_data[:, peak-crop_wp:peak+crop_wp]
+        slice_projection_y = channel_slice.sum(axis = 1)
+        slice_proj_y_d = np.diff(slice_projection_y.astype(np.int32))
+        slice_closed_end_px = slice_proj_y_d[:onethirdpoint_y].argmax()
+        slice_open_end_px = twothirdpoint_y + slice_proj_y_d[twothirdpoint_y:].argmin()
+        slice_length = slice_open_end_px - slice_closed_end_px
+
+        # check if these values make sense. If so, use them. If not, use default
+        # make sure lenght is not 30 pixels bigger or smaller than default
+        # *** This 15 should probably be a parameter or at least changed to a fraction.
+        if slice_length + 15 < default_length or slice_length - 15 > default_length:
+            continue
+        # make sure ends are greater than 15 pixels from image edge
+        if slice_closed_end_px < 15 or slice_open_end_px > image_data.shape[0] - 15:
+            continue
+
+        # if you made it to this point then update the entry
+        chnl_loc_dict[peak] = {'closed_end_px' : slice_closed_end_px,
+                                 'open_end_px' : slice_open_end_px}
+
+    return chnl_loc_dict
+
+# make masks from initial set of images (same images as clusters)
+def make_masks(analyzed_imgs):
+    '''
+    Make masks goes through the channel locations in the image metadata and builds a consensus
+    Mask for each image per fov, which it returns as dictionary named channel_masks.
+    The keys in this dictionary are fov id, and the values is a another dictionary. This dict's keys are channel locations (peaks) and the values is a [2][2] array:
+    [[minrow, maxrow],[mincol, maxcol]] of pixel locations designating the corner of each mask
+    for each channel on the whole image
+
+    One important consequence of these function is that the channel ids and the size of the
+    channel slices are decided now. Updates to mask must coordinate with these values.
+
+    Parameters
+    analyzed_imgs : dict
+        image information created by get_params
+
+    Returns
+    channel_masks : dict
+        dictionary of consensus channel masks.
+
+    Called By
+    mm3_Compile.py
+
+    Calls
+    '''
+    information("Determining initial channel masks...")
+
+    # declare temp variables from yaml parameter dict.
+    crop_wp = int(params['compile']['channel_width_pad'] + params['compile']['channel_width']/2)
+    chan_lp = int(params['compile']['channel_length_pad'])
+
+    #intiaize dictionary
+    channel_masks = {}
+
+    # get the size of the images (hope they are the same)
+    for img_k in analyzed_imgs.keys():
+        img_v = analyzed_imgs[img_k]
+        image_rows = img_v['shape'][0] # x pixels
+        image_cols = img_v['shape'][1] # y pixels
+        break # just need one. using iteritems mean the whole dict doesn't load
+
+    # get the fov ids
+    fovs = []
+    for img_k in analyzed_imgs.keys():
+        img_v = analyzed_imgs[img_k]
+        if img_v['fov'] not in fovs:
+            fovs.append(img_v['fov'])
+
+    # max width and length across all fovs. channels will get expanded by these values
+    # this important for later updates to the masks, which should be the same
+    max_chnl_mask_len = 0
+    max_chnl_mask_wid = 0
+
+    # for each fov make a channel_mask dictionary from consensus mask
+    for fov in fovs:
+        # initialize a the dict and consensus mask
+        channel_masks_1fov = {} # dict which holds channel masks {peak : [[y1, y2],[x1,x2]],...}
+        consensus_mask = np.zeros([image_rows, image_cols]) # mask for labeling
+
+        # bring up information for each image
+        for img_k in analyzed_imgs.keys():
+            img_v = analyzed_imgs[img_k]
+            # skip this one if it is not of the current fov
+            if img_v['fov'] != fov:
+                continue
+
+            # for each channel in each image make a single mask
+            img_chnl_mask = np.zeros([image_rows, image_cols])
+
+            # and add the channel mask to it
+            for chnl_peak, peak_ends in six.iteritems(img_v['channels']):
+                # pull out the peak location and top and bottom location
+                # and expand by padding (more padding done later for width)
+                x1 = max(chnl_peak - crop_wp, 0)
+                x2 = min(chnl_peak + crop_wp, image_cols)
+                y1 = max(peak_ends['closed_end_px'] - chan_lp, 0)
+                y2 = min(peak_ends['open_end_px'] + chan_lp, image_rows)
+
+                # add it to the mask for this image
+                img_chnl_mask[y1:y2, x1:x2] = 1
+
+            # add it to the consensus mask
+            consensus_mask += img_chnl_mask
+
+        # Normalize concensus mask between 0 and 1.
+        consensus_mask = consensus_mask.astype('float32') / float(np.amax(consensus_mask))
+
+        # threshhold and homogenize each channel mask within the mask, label them
+        # label when value is above 0.1 (so 90% occupancy), transpose.
+        # the [0] is for the array ([1] is the number of regions)
+        # It transposes and then transposes again so regions are labeled left to right
+        # clear border it to make sure the channels are off the edge
+        consensus_mask = segmentation.clear_border(consensus_mask.T > 0.1)
+        consensus_mask = ndi.label(consensus_mask)[0].T
+
+        # go through each label
+        for label in np.unique(consensus_mask):
+            if label == 0: # label zero is the background
+                continue
+            binary_core = consensus_mask == label
+
+            # clean up the rough edges
+            poscols = np.any(binary_core, axis = 0) # column positions where true (any)
+            posrows = np.any(binary_core, axis = 1) # row positions where true (any)
+
+            # channel_id givin by horizontal position
+            # this is important. later updates to the positions will have to check
+            # if their channels contain this median value to match up
+            channel_id = int(np.median(np.where(poscols)[0]))
+
+            # store the edge locations of the channel mask in the dictionary. Will be ints
+            min_row = np.min(np.where(posrows)[0])
+            max_row = np.max(np.where(posrows)[0])
+            min_col = np.min(np.where(poscols)[0])
+            max_col = np.max(np.where(poscols)[0])
+
+            # if the min/max cols are within the image bounds,
+            # add the mask, as 4 points, to the dictionary
+            if min_col > 0 and max_col < image_cols:
+                channel_masks_1fov[channel_id] = [[min_row, max_row], [min_col, max_col]]
+
+                # find the largest channel width and height while you go round
+                max_chnl_mask_len = int(max(max_chnl_mask_len, max_row - min_row))
+                max_chnl_mask_wid = int(max(max_chnl_mask_wid, max_col - min_col))
+
+        # add channel_mask dictionary to the fov dictionary, use copy to play it safe
+        channel_masks[fov] = channel_masks_1fov.copy()
+
+    # update all channel masks to be the max size
+    cm_copy = channel_masks.copy()
+
+    for fov, peaks in six.iteritems(channel_masks):
+        # f_id = int(fov)
+        for peak, chnl_mask in six.iteritems(peaks):
+            # p_id = int(peak)
+            # just add length to the open end (bottom of image, low column)
+            if chnl_mask[0][1] - chnl_mask[0][0] !=  max_chnl_mask_len:
+                cm_copy[fov][peak][0][1] = chnl_mask[0][0] + max_chnl_mask_len
+            # enlarge widths around the middle, but make sure you don't get floats
+            if chnl_mask[1][1] - chnl_mask[1][0] != max_chnl_mask_wid:
+                wid_diff = max_chnl_mask_wid - (chnl_mask[1][1] - chnl_mask[1][0])
+                if wid_diff % 2 == 0:
+                    cm_copy[fov][peak][1][0] = max(chnl_mask[1][0] - wid_diff/2, 0)
+                    cm_copy[fov][peak][1][1] = min(chnl_mask[1][1] + wid_diff/2, image_cols - 1)
+                else:
+                    cm_copy[fov][peak][1][0] = max(chnl_mask[1][0] - (wid_diff-1)/2, 0)
+                    cm_copy[fov][peak][1][1] = min(chnl_mask[1][1] + (wid_diff+1)/2, image_cols - 1)
+
+            # convert all values to ints
+            chnl_mask[0][0] = int(chnl_mask[0][0])
+            chnl_mask[0][1] = int(chnl_mask[0][1])
+            chnl_mask[1][0] = int(chnl_mask[1][0])
+            chnl_mask[1][1] = int(chnl_mask[1][1])
+
+            # cm_copy[fov][peak] = {'y_top': chnl_mask[0][0],
+            #                       'y_bot': chnl_mask[0][1],
+            #                       'x_left': chnl_mask[1][0],
+            #                       'x_right': chnl_mask[1][1]}
+            # print(type(cm_copy[fov][peak][1][0]), cm_copy[fov][peak][1][0])
+
+    #save the channel mask dictionary to a pickle and a text file
+    # with open(os.path.join(params['ana_dir'], 'channel_masks.pkl'), 'wb') as cmask_file:
+    #     pickle.dump(cm_copy, cmask_file, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(os.path.join(params['ana_dir'], 'channel_masks.txt'), 'w') as cmask_file:
+        pprint(cm_copy, stream=cmask_file)
+    with open(os.path.join(params['ana_dir'], 'channel_masks.yaml'), 'w') as cmask_file:
+        yaml.dump(data=cm_copy, stream=cmask_file, default_flow_style=False, tags=None)
+
+    information("Channel masks saved.")
+
+    return cm_copy
+
+# get each fov_id, peak_id, frame's mask bounding box from bounding boxes arrived at by convolutional neural network
+def make_channel_masks_CNN(bboxes_dict):
+    '''
+    The keys in this dictionary are peak_ids and the values of each is an array of shape (frameNumber,2,2):
+    Each frameNumber's 2x2 slice of the array represents the given peak_id's [[minrow, maxrow],[mincol, maxcol]].
+
+    One important consequence of these function is that the channel ids and the size of the
+    channel slices are decided now. Updates to mask must coordinate with these values.
+
+    Parameters
+    analyzed_imgs : dict
+        image information created by get_params
+
+    Returns
+    channel_masks : dict
+        dictionary of consensus channel masks.
+
+    Called By
+    mm3_Compile.py
+
+    Calls
+    '''
+
+    # initialize the new channel_masks dict
+    channel_masks = {}
+
+    # reorder elements of tuples in bboxes_dict to match [[minrow, maxrow], [mincol, maxcol]] convention above
+    peak_ids = [peak_id for peak_id in bboxes_dict.keys()]
+    peak_ids.sort()
+
+    bbox_array = np.zeros((len(bboxes_dict[peak_ids[0]]),2,2), dtype='uint16')
+    for peak_id in peak_ids:
+        # get each frame's bounding boxes for the given peak_id
+        frame_bboxes = bboxes_dict[peak_id]
+
+        for frame_index in range(len(frame_bboxes)):
+            # replace the values in bbox_array with the proper ones from frame_bboxes
+            minrow = frame_bboxes[frame_index][0]
+            maxrow = frame_bboxes[frame_index][2]
+            mincol = frame_bboxes[frame_index][1]
+            maxcol = frame_bboxes[frame_index][3]
+            bbox_array[frame_index,0,0] = minrow
+            bbox_array[frame_index,0,1] = maxrow
+            bbox_array[frame_index,1,0] = mincol
+            bbox_array[frame_index,1,1] = maxcol
+
+        channel_masks[peak_id] = bbox_array
+
+    return(channel_masks)
+
+### functions about trimming, padding, and manipulating images
+
+# define function for flipping the images on an FOV by FOV basis
+def fix_orientation(image_data):
+    '''
+    Fix the orientation. The standard direction for channels to open to is down.
+
+    called by
+    process_tif
+    get_params
+    '''
+
+    # user parameter indicates how things should be flipped
+    image_orientation = params['compile']['image_orientation']
+
+    # if this is just a phase image give in an extra layer so rest of code is fine
+    flat = False # flag for if the image is flat or multiple levels
+    if len(image_data.shape) == 2:
+        image_data = np.expand_dims(image_data, 0)
+        flat = True
+
+    # setting image_orientation to 'auto' will use autodetection
+    if image_orientation == "auto":
+         # use 'phase_plane' to find the phase plane in image_data, assuming c1, c2, c3... naming scheme here.
+        try:
+            ph_channel = int(re.search('[0-9]', params['phase_plane']).group(0)) - 1
+        except:
+            # Pick the plane to analyze with the highest mean px value (should be phase)
+            ph_channel = np.argmax([np.mean(image_data[ci]) for ci in range(image_data.shape[0])])
+
+        # flip based on the index of the higest average row value
+        # this should be closer to the opening
+        if np.argmax(image_data[ph_channel].mean(axis = 1)) < image_data[ph_channel].shape[0] / 2:
+            image_data = image_data[:,::-1,:]
+        else:
+            pass # no need to do anything
+
+    # flip if up is chosen
+    elif image_orientation == "up":
+        return image_data[:,::-1,:]
+
+    # do not flip the images if "down is the specified image orientation"
+    elif image_orientation == "down":
+        pass
+
+    if flat:
+        image_data = image_data[0] # just return that first layer
+
+    return image_data
+
+# cuts out channels from the image
+def cut_slice(image_data, channel_loc):
+    '''Takes an image and cuts out the channel based on the slice location
+    slice location is the list with the peak information, in the form
+    [][y1, y2],[x1, x2]]. Returns the channel slice as a numpy array.
+    The numpy array will be a stack if there are multiple planes.
+
+    if you want to slice all the channels from a picture with the channel_masks
+    dictionary use a loop like this:
+
+    for channel_loc in channel_masks[fov_id]: # fov_id is the fov of the image
+        channel_slice = cut_slice[image_pixel_data, channel_loc]
+        # ... do something with the slice
+
+    NOTE: this function will try to determine what the shape of your
+    image is and slice accordingly. It expects the images are in the order
+    [t, x, y, c]. It assumes images with three dimensions are [x, y, c] not
+    [t, x, y].
+    '''
+
+    # case where image is in form [x, y]
+    if len(image_data.shape) == 2:
+        # make slice object
+        channel_slicer = np.s_[channel_loc[0][0]:channel_loc[0][1],
+                               channel_loc[1][0]:channel_loc[1][1]]
+
+    # case where image is in form [x, y, c]
+    elif len(image_data.shape) == 3:
+        channel_slicer = np.s_[channel_loc[0][0]:channel_loc[0][1],
+                               channel_loc[1][0]:channel_loc[1][1],:]
+
+    # case where image in form [t, x , y, c]
+    elif len(image_data.shape) == 4:
+        channel_slicer = np.s_[:,channel_loc[0][0]:channel_loc[0][1],
+                                 channel_loc[1][0]:channel_loc[1][1],:]
+
+    # slice based on appropriate slicer object.
+    channel_slice = image_data[channel_slicer]
+
+    # pad y of channel if slice happened to be outside of image
+    y_difference  = (channel_loc[0][1] - channel_loc[0][0]) - channel_slice.shape[1]
+    if y_difference > 0:
+        paddings = [[0, 0], # t
+                    [0, y_difference], # y
+                    [0, 0], # x
+                    [0, 0]] # c
+        channel_slice = np.pad(channel_slice, paddings, mode='edge')
+
+    return channel_slice
+
+# calculate cross correlation between pixels in channel stack
+def channel_xcorr(fov_id, peak_id):
+    '''
+    Function calculates the cross correlation of images in a
+    stack to the first image in the stack. The output is an
+    array that is the length of the stack with the best cross
+    correlation between that image and the first image.
+
+    Only the subsampled frames are read from disk and the cross
+    correlations are computed for all of them at once with normxcorr_stack.
+
+    The very first value should be 1.
+    '''
+
+    pad_size = params['subtract']['alignment_pad']
+
+    # Use this number of images to calculate cross correlations
+    number_of_images = 20
+
+    # if there are more images than number_of_images, use number_of_images images evenly
+    # spaced across the range
+    stack_length = get_stack_length(fov_id, peak_id, color=params['phase_plane'])
+    frames = list(range(stack_length))
+    if stack_length > number_of_images:
+        spacing = int(stack_length / number_of_images)
+        frames = frames[::spacing][:number_of_images]
+
+    # load only those phase contrast images
+    image_data = load_stack(fov_id, peak_id, color=params['phase_plane'], frames=frames)
+
+    # we will compare all images to this one, needs to be padded to account for image drift
+    first_img = np.pad(image_data[0,:,:], pad_size, mode='reflect')
+
+    # best cross correlation for each image against the first image
+    xcorr_array = list(np.max(normxcorr_stack(first_img, image_data), axis=(1,2)))
+
+    return xcorr_array
+
+# normalized cross correlation of a stack of templates against one image
+def normxcorr_stack(image, templates):
+    '''
+    Vectorized version of skimage.feature.match_template (pad_input=False) for
+    many templates of the same size matched against one image. Uses FFTs for the
+    correlation and summed area tables for the local image statistics.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        2D image, shape (H, W)
+    templates : np.ndarray
+        Stack of 2D templates, shape (n, h, w) with h <= H and w <= W
+
+    Returns
+    -------
+    xcorrs : np.ndarray
+        Normalized cross correlations, shape (n, H - h + 1, W - w + 1)
+    '''
+
+    image = image.astype(np.float64)
+    templates = templates.astype(np.float64)
+    H, W = image.shape
+    n, h, w = templates.shape
+    out_shape = (H - h + 1, W - w + 1)
+
+    # templates are made zero mean so the local image mean drops out of the numerator
+    templates = templates - templates.mean(axis=(1,2), keepdims=True)
+    template_ssd = np.sum(templates**2, axis=(1,2))
+
+    # circular correlation has no wrap around for the valid offsets when the FFT is image sized
+    image_fft = np.fft.rfft2(image)
+    templates_fft = np.fft.rfft2(templates, s=(H, W))
+    numerator = np.fft.irfft2(templates_fft.conj() * image_fft, s=(H, W))
+    numerator = numerator[:, :out_shape[0], :out_shape[1]]
+
+    # local sums of the image under every template position
+    def window_sum(img):
+        sat = np.pad(img.cumsum(axis=0).cumsum(axis=1), ((1,0),(1,0)), mode='constant')
+        return sat[h:, w:] - sat[:-h, w:] - sat[h:, :-w] + sat[:-h, :-w]
+
+    image_window_sum = window_sum(image)
+    image_window_sum2 = window_sum(image**2)
+    image_window_var = image_window_sum2 - image_window_sum**2 / (h * w)
+    image_window_var[image_window_var < 0] = 0
+
+    denominator = np.sqrt(image_window_var[np.newaxis, :, :] * template_ssd[:, np.newaxis, np.newaxis])
+
+    # same handling of flat regions as match_template
+    xcorrs = np.zeros((n,) + out_shape, dtype=np.float64)
+    mask = denominator > np.finfo(np.float64).eps
+    xcorrs[mask] = numerator[mask] / denominator[mask]
+
+    return xcorrs
+
+### functions about subtraction
+
+# average empty channels from stacks, making another TIFF stack
+def average_empties_stack(fov_id, specs, color='c1', align=True):
+    '''Takes the fov file name and the peak names of the designated empties,
+    averages them and saves the image
+
+    Parameters
+    fov_id : int
+        FOV number
+    specs : dict
+        specifies whether a channel should be analyzed (1), used for making
+        an average empty (0), or ignored (-1).
+    color : string
+        Which plane to use.
+    align : boolean
+        Flag that is passed to the worker function average_empties, indicates
+        whether images should be aligned be for averaging (use False for fluorescent images)
+
+    Returns
+        True if succesful.
+        Saves empty stack to analysis folder
+
+    '''
+
+    information("Creating average empty channel for FOV %d." % fov_id)
+
+    # get peak ids of empty channels for this fov
+    empty_peak_ids = []
+    for peak_id, spec in six.iteritems(specs[fov_id]):
+        if spec == 0: # 0 means it should be used for empty
+            empty_peak_ids.append(peak_id)
+    empty_peak_ids = sorted(empty_peak_ids) # sort for repeatability
+
+    # depending on how many empties there are choose what to do
+    # if there is no empty the user is going to have to copy another empty stack
+    if len(empty_peak_ids) == 0:
+        information("No empty channel designated for FOV %d." % fov_id)
+        return False
+
+    # if there is just one then you can just copy that channel
+    elif len(empty_peak_ids) == 1:
+        peak_id = empty_peak_ids[0]
+        information("One empty channel (%d) designated for FOV %d." % (peak_id, fov_id))
+
+        # load the one phase contrast as the empties
+        avg_empty_stack = load_stack(fov_id, peak_id, color=color)
+
+    # but if there is more than one empty you need to align and average them per timepoint
+    elif len(empty_peak_ids) > 1:
+        # load the image stacks into memory
+        empty_stacks = [] # list which holds phase image stacks of designated empties
+        for peak_id in empty_peak_ids:
+            # load data and append to list
+            image_data = load_stack(fov_id, peak_id, color=color)
+
+            empty_stacks.append(image_data)
+
+        information("%d empty channels designated for FOV %d." % (len(empty_stacks), fov_id))
+
+        # go through time points and create list of averaged empties
+        avg_empty_stack = [] # list will be later concatentated into numpy array
+        time_points = range(image_data.shape[0]) # index is time
+        for t in time_points:
+            # get images from one timepoint at a time and send to alignment and averaging
+            imgs = [stack[t] for stack in empty_stacks]
+            avg_empty = average_empties(imgs, align=align) # function is in mm3
+            avg_empty_stack.append(avg_empty)
+
+        # concatenate list and then save out to tiff stack
+        avg_empty_stack = np.stack(avg_empty_stack, axis=0)
+
+    # save out data
+    if params['output'] == 'TIFF':
+        # make new name and save it
+        empty_filename = params['experiment_name'] + '_xy%03d_empty_%s.tif' % (fov_id, color)
+        tiff.imsave(os.path.join(params['empty_dir'],empty_filename), avg_empty_stack, compress=4)
+
+    if params['output'] == 'HDF5':
+        h5f = h5py.File(os.path.join(params['hdf5_dir'],'xy%03d.hdf5' % fov_id), 'r+')
+
+        # delete the dataset if it exists (important for debug)
+        if 'empty_%s' % color in h5f:
+            del h5f[u'empty_%s' % color]
+
+        # the empty channel should be it's own dataset
+        h5ds = h5f.create_dataset(u'empty_%s' % color,
+                        data=avg_empty_stack,
+                        chunks=(1, avg_empty_stack.shape[1], avg_empty_stack.shape[2]),
+                        maxshape=(None, avg_empty_stack.shape[1], avg_empty_stack.shape[2]),
+                        compression="gzip", shuffle=True, fletcher32=True)
+
+        # give attribute which says which channels contribute
+        h5ds.attrs.create('empty_channels', empty_peak_ids)
+        h5f.close()
+
+    information("Saved empty channel for FOV %d." % fov_id)
+
+    return True
+
+# averages a list of empty channels
+def average_empties(imgs, align=True):
+    '''
+    This function averages a set of images (empty channels) and returns a single image
+    of the same size. It first aligns the images to the first image before averaging.
+
+    Alignment is done by enlarging the first image using edge padding.
+    Subsequent images are then aligned to this image and the offset recorded.
+    These images are padded such that they are the same size as the first (padded) image but
+    with the image in the correct (aligned) place. Edge padding is again used.
+    The images are then placed in a stack and aveaged. This image is trimmed so it is the size
+    of the original images
+
+    Called by
+    average_empties_stack
+    '''
+
+    aligned_imgs = [] # list contains the aligned, padded images
+
+    if align:
+        # pixel size to use for padding (ammount that alignment could be off)
+        pad_size = params['subtract']['alignment_pad']
+
+        for n, img in enumerate(imgs):
+            # if this is the first image, pad it and add it to the stack
+            if n == 0:
+                ref_img = np.pad(img, pad_size, mode='reflect') # padded reference image
+                aligned_imgs.append(ref_img)
+
+            # otherwise align this image to the first padded image
+            else:
+                # find correlation between a convolution of img against the padded reference
+                match_result = match_template(ref_img, img)
+
+                # find index of highest correlation (relative to top left corner of img)
+                y, x = np.unravel_index(np.argmax(match_result), match_result.shape)
+
+                # pad img so it aligns and is the same size as reference image
+                pad_img = np.pad(img, ((y, ref_img.shape[0] - (y + img.shape[0])),
+                                       (x, ref_img.shape[1] - (x + img.shape[1]))), mode='reflect')
+                aligned_imgs.append(pad_img)
+    else:
+        # don't align, just link the names to go forward easily
+        aligned_imgs = imgs
+
+    # stack the aligned data along 3rd axis
+    aligned_imgs = np.dstack(aligned_imgs)
+    # get a mean image along 3rd axis
+    avg_empty = np.nanmean(aligned_imgs, axis=2)
+    # trim off the padded edges (only if images were alinged, otherwise there was no padding)
+    if align:
+        avg_empty = avg_empty[pad_size:-1*pad_size, pad_size:-1*pad_size]
+    # change type back to unsigned 16 bit not floats
+    avg_empty = avg_empty.astype(dtype='uint16')
+
+    return avg_empty
+
+# this function is used when one FOV doesn't have an empty
+def copy_empty_stack(from_fov, to_fov, color='c1'):
+    '''Copy an empty stack from one FOV to another'''
+
+    # load empty stack from one FOV
+    information('Loading empty stack from FOV {} to save for FOV {}.'.format(from_fov, to_fov))
+    avg_empty_stack = load_stack(from_fov, 0, color='empty_{}'.format(color))
+
+    # save out data
+    if params['output'] == 'TIFF':
+        # make new name and save it
+        empty_filename = params['experiment_name'] + '_xy%03d_empty_%s.tif' % (to_fov, color)
+        tiff.imsave(os.path.join(params['empty_dir'],empty_filename), avg_empty_stack, compress=4)
+
+    if params['output'] == 'HDF5':
+        h5f = h5py.File(os.path.join(params['hdf5_dir'],'xy%03d.hdf5' % to_fov), 'r+')
+
+        # delete the dataset if it exists (important for debug)
+        if 'empty_%s' % color in h5f:
+            del h5f[u'empty_%s' % color]
+
+        # the empty channel should be it's own dataset
+        h5ds = h5f.create_dataset(u'empty_%s' % color,
+                        data=avg_empty_stack,
+                        chunks=(1, avg_empty_stack.shape[1], avg_empty_stack.shape[2]),
+                        maxshape=(None, avg_empty_stack.shape[1], avg_empty_stack.shape[2]),
+                        compression="gzip", shuffle=True, fletcher32=True)
+
+        # give attribute which says which channels contribute. Just put 0
+        h5ds.attrs.create('empty_channels', [0])
+        h5f.close()
+
+    information("Saved empty channel for FOV %d." % to_fov)
+
+# Do subtraction for an fov over many timepoints
+def subtract_fov_stack(fov_id, specs, color='c1', method='phase',
+                       segment=False, save_subtracted=True, cache=None):
+    '''
+    For a given FOV, loads the precomputed empty stack and does subtraction on
+    all peaks in the FOV designated to be analyzed
+
+    Parameters
+    ----------
+    color : string, 'c1', 'c2', etc.
+        This is the channel to subtraction. will be appended to the word empty.
+    segment : boolean
+        If True, each subtracted frame is passed straight to segment_image in the
+        same worker and the segmented stack is saved as params['seg_img'].
+        Only used with method='phase'.
+    save_subtracted : boolean
+        Save the subtracted stack. Can be turned off when segmenting in the same
+        pass and the subtracted images are not needed.
+    cache : ResultCache
+        Skip peaks whose outputs are up to date with their channel stack, the empty
+        stack and the subtraction parameters.
+
+    Called by
+    mm3_Subtract.py
+
+    Calls
+    mm3.subtract_phase
+    mm3.subtract_segment_phase
+
+    '''
+
+    information('Subtracting peaks for FOV %d.' % fov_id)
+
+    # load empty stack feed dummy peak number to get empty
+    avg_empty_stack = load_stack(fov_id, 0, color='empty_{}'.format(color))
+
+    # determine which peaks are to be analyzed
+    ana_peak_ids = []
+    for peak_id, spec in six.iteritems(specs[fov_id]):
+        if spec == 1: # 0 means it should be used for empty, -1 is ignore
+            ana_peak_ids.append(peak_id)
+    ana_peak_ids = sorted(ana_peak_ids) # sort for repeatability
+    information("Subtracting %d channels for FOV %d." % (len(ana_peak_ids), fov_id))
+
+    # just break if there are to peaks to analize
+    if not ana_peak_ids:
+        return False
+
+    # segmentation is only done on the subtracted phase images
+    if segment and method != 'phase':
+        warning('Segmentation during subtraction requires phase subtraction. Not segmenting.')
+        segment = False
+
+    output_colors = []
+    if save_subtracted:
+        output_colors.append('sub_%s' % color)
+    if segment:
+        output_colors.append(params['seg_img'])
+    if cache is not None:
+        empty_checksum = array_checksum(avg_empty_stack)
+
+    # load images for the peak and get phase images
+    for peak_id in ana_peak_ids:
+        image_data = load_stack(fov_id, peak_id, color=color)
+
+        if cache is not None:
+            cache.fingerprint(fov_id, peak_id, [image_data, empty_checksum])
+            if cache.is_current(fov_id, peak_id, output_colors):
+                information('Peak %d is up to date.' % peak_id)
+                continue
+
+        information('Subtracting peak %d.' % peak_id)
+
+        # make a list for all time points to send to a multiprocessing pool
+        # list will length of image_data with tuples (image, empty)
+        subtract_pairs = zip(image_data, avg_empty_stack)
+
+        # set up multiprocessing pool to do subtraction. Should wait until finished
+        pool = Pool(processes=params['num_analyzers'])
+
+        if segment:
+            # each chunk of frames is subtracted and segmented by the same worker
+            results = pool.map(subtract_segment_phase, subtract_pairs, chunksize=10)
+            subtracted_imgs = [result[0] for result in results]
+            segmented_imgs = [result[1] for result in results]
+        elif method == 'phase':
+            subtracted_imgs = pool.map(subtract_phase, subtract_pairs, chunksize=10)
+        elif method == 'fluor':
+            subtracted_imgs = pool.map(subtract_fluor, subtract_pairs, chunksize=10)
+
+        pool.close() # tells the process nothing more will be added.
+        pool.join() # blocks script until everything has been processed and workers exit
+
+        # linear loop for debug
+        # subtracted_imgs = [subtract_phase(subtract_pair) for subtract_pair in subtract_pairs]
+
+        # stack them up along a time axis and save out the subtracted stack
+        if save_subtracted:
+            subtracted_stack = np.stack(subtracted_imgs, axis=0)
+            save_stack(subtracted_stack, fov_id, peak_id, 'sub_%s' % color, compress=4)
+            information("Saved subtracted channel %d." % peak_id)
+
+        if segment:
+            segmented_stack = np.stack(segmented_imgs, axis=0).astype('uint8')
+            save_stack(segmented_stack, fov_id, peak_id, params['seg_img'], compress=5)
+            information("Saved segmented channel %d." % peak_id)
+
+        if cache is not None:
+            cache.record(fov_id, peak_id)
+
+    return True
+
+# subtracts one phase contrast image from another.
+def subtract_phase(image_pair):
+    '''subtract_phase aligns and subtracts a .
+    Modified from subtract_phase_only by jt on 20160511
+    The subtracted image returned is the same size as the image given. It may however include
+    data points around the edge that are meaningless but not marked.
+
+    We align the empty channel to the phase channel, then subtract.
+
+    Parameters
+    image_pair : tuple of length two with; (image, empty_mean)
+
+    Returns
+    channel_subtracted : np.array
+        The subtracted image
+
+    Called by
+    subtract_fov_stack
+    '''
+    # get out data and pad
+    cropped_channel, empty_channel = image_pair # [channel slice, empty slice]
+
+    # this is for aligning the empty channel to the cell channel.
+    ### Pad cropped channel.
+    pad_size = params['subtract']['alignment_pad'] # pixel size to use for padding (ammount that alignment could be off)
+    padded_chnl = np.pad(cropped_channel, pad_size, mode='reflect')
+
+    # ### Align channel to empty using match template.
+    # use match template to get a correlation array and find the position of maximum overlap
+    match_result = match_template(padded_chnl, empty_channel)
+    # get row and colum of max correlation value in correlation array
+    y, x = np.unravel_index(np.argmax(match_result), match_result.shape)
+
+    # pad the empty channel according to alignment to be overlayed on padded channel.
+    empty_paddings = [[y, padded_chnl.shape[0] - (y + empty_channel.shape[0])],
+                      [x, padded_chnl.shape[1] - (x + empty_channel.shape[1])]]
+    aligned_empty = np.pad(empty_channel, empty_paddings, mode='reflect')
+    # now trim it off so it is the same size as the original channel
+    aligned_empty = aligned_empty[pad_size:-1*pad_size, pad_size:-1*pad_size]
+
+    ### Compute the difference between the empty and channel phase contrast images
+    # subtract cropped cell image from empty channel.
+    channel_subtracted = aligned_empty.astype('int32') - cropped_channel.astype('int32')
+    # channel_subtracted = cropped_channel.astype('int32') - aligned_empty.astype('int32')
+
+    # just zero out anything less than 0. This is what Sattar does
+    channel_subtracted[channel_subtracted < 0] = 0
+    channel_subtracted = channel_subtracted.astype('uint16') # change back to 16bit
+
+    return channel_subtracted
+
+# subtracts and then segments one phase contrast image
+def subtract_segment_phase(image_pair):
+    '''Does subtract_phase and then segment_image on the result in the same worker,
+    so the subtracted image never has to be written and read back before segmentation.
+
+    Parameters
+    image_pair : tuple of length two with; (image, empty_mean)
+
+    Returns
+    (channel_subtracted, labeled_image) : tuple of np.array
+
+    Called by
+    subtract_fov_stack
+    '''
+
+    channel_subtracted = subtract_phase(image_pair)
+    labeled_image = segment_image(channel_subtracted)
+
+    return channel_subtracted, labeled_image
+
+# subtract one fluorescence image from another.
+def subtract_fluor(image_pair):
+    ''' subtract_fluor does a simple subtraction of one image to another. Unlike subtract_phase,
+    there is no alignment. Also, the empty channel is subtracted from the full channel.
+
+    Parameters
+    image_pair : tuple of length two with; (image, empty_mean)
+
+    Returns
+    channel_subtracted : np.array
+        The subtracted image.
+
+    Called by
+    subtract_fov_stack
+    '''
+    # get out data and pad
+    cropped_channel, empty_channel = image_pair # [channel slice, empty slice]
+
+    # check frame size of cropped channel and background, always keep crop channel size the same
+    crop_size = np.shape(cropped_channel)[:2]
+    empty_size = np.shape(empty_channel)[:2]
+    if crop_size != empty_size:
+        if crop_size[0] > empty_size[0] or crop_size[1] > empty_size[1]:
+            pad_row_length = max(crop_size[0]  - empty_size[0], 0) # prevent negatives
+            pad_column_length = max(crop_size[1]  - empty_size[1], 0)
+            empty_channel = np.pad(empty_channel,
+                [[np.int(.5*pad_row_length), pad_row_length-np.int(.5*pad_row_length)],
+                [np.int(.5*pad_column_length),  pad_column_length-np.int(.5*pad_column_length)],
+                [0,0]], 'edge')
+            # mm3.information('size adjusted 1')
+        empty_size = np.shape(empty_channel)[:2]
+        if crop_size[0] < empty_size[0] or crop_size[1] < empty_size[1]:
+            empty_channel = empty_channel[:crop_size[0], :crop_size[1],]
+
+    ### Compute the difference between the empty and channel phase contrast images
+    # subtract cropped cell image from empty channel.
+    channel_subtracted = cropped_channel.astype('int32') - empty_channel.astype('int32')
+    # channel_subtracted = cropped_channel.astype('int32') - aligned_empty.astype('int32')
+
+    # just zero out anything less than 0.
+    channel_subtracted[channel_subtracted < 0] = 0
+    channel_subtracted = channel_subtracted.astype('uint16') # change back to 16bit
+
+    return channel_subtracted
+
+### functions that deal with segmentation and lineages
+
+# Do segmentation for an channel time stack
+def segment_chnl_stack(fov_id, peak_id):
+    '''
+    For a given fov and peak (channel), do segmentation for all images in the
+    subtracted .tif stack.
+
+    Called by
+    mm3_Segment.py
+
+    Calls
+    mm3.segment_image
+    '''
+
+    information('Segmenting FOV %d, channel %d.' % (fov_id, peak_id))
+
+    # load subtracted images
+    sub_stack = load_stack(fov_id, peak_id, color='sub_{}'.format(params['phase_plane']))
+
+    # set up multiprocessing pool to do segmentation. Will do everything before going on.
+    pool = Pool(processes=params['num_analyzers'])
+
+    # send the 3d array to multiprocessing
+    segmented_imgs = pool.map(segment_image, sub_stack, chunksize=8)
+
+    pool.close() # tells the process nothing more will be added.
+    pool.join() # blocks script until everything has been processed and workers exit
+
+    # # image by image for debug
+    # segmented_imgs = []
+    # for sub_image in sub_stack:
+    #     segmented_imgs.append(segment_image(sub_image))
+
+    # stack them up along a time axis
+    segmented_imgs = np.stack(segmented_imgs, axis=0)
+    segmented_imgs = segmented_imgs.astype('uint8')
+
+    # save out the segmented stack
+    if params['output'] == 'TIFF':
+        seg_filename = params['experiment_name'] + '_xy%03d_p%04d_%s.tif' % (fov_id, peak_id, params['seg_img'])
+        tiff.imsave(os.path.join(params['seg_dir'],seg_filename),
+                    segmented_imgs, compress=5)
+
+    if params['output'] == 'HDF5':
+        h5f = h5py.File(os.path.join(params['hdf5_dir'],'xy%03d.hdf5' % fov_id), 'r+')
+
+        # put segmented channel in correct group
+        h5g = h5f['channel_%04d' % peak_id]
+
+        # delete the dataset if it exists (important for debug)
+        if 'p%04d_%s' % (peak_id, params['seg_img']) in h5g:
+            del h5g['p%04d_%s' % (peak_id, params['seg_img'])]
+
+        h5ds = h5g.create_dataset(u'p%04d_%s' % (peak_id, params['seg_img']),
+                        data=segmented_imgs,
+                        chunks=(1, segmented_imgs.shape[1], segmented_imgs.shape[2]),
+                        maxshape=(None, segmented_imgs.shape[1], segmented_imgs.shape[2]),
+                        compression="gzip", shuffle=True, fletcher32=True)
+        h5f.close()
+
+    information("Saved segmented channel %d." % peak_id)
+
+    return True
+
+# Do segmentation for many channel time stacks with one pool
+def segment_experiment_otsu(fov_id_list, specs, chunk_size=20):
+    '''
+    Segments all analyzed peaks of the given FOVs with a single multiprocessing pool.
+
+    Every channel stack is split into (fov_id, peak_id, frame chunk) tasks which are
+    all put on the same pool, so short stacks do not leave cores idle and the pool
+    is only started once. Chunks are put back together per peak as they come in and
+    the segmented stack is saved as soon as a peak is complete. With HDF5 output
+    the stacks of a FOV are saved once all its chunks are back, as workers can not
+    read a FOV's file while it is open for writing. Tasks are ordered by FOV so
+    only about one FOV is held in memory.
+
+    Channels with an empty subtracted stack are not segmented and a warning is
+    given for each.
+
+    Parameters
+    ----------
+    fov_id_list : list of int
+    specs : dict
+    chunk_size : int
+        Number of frames segmented per task.
+
+    Called by
+    mm3_Segment-Otsu.py
+
+    Calls
+    mm3.segment_chunk
+    mm3.segment_image
+    '''
+
+    sub_color = 'sub_{}'.format(params['phase_plane'])
+
+    # make the task list and remember how many chunks each peak needs
+    tasks = []
+    peak_chunks = {} # (fov_id, peak_id) : [stack_length, chunks remaining, {start : labeled chunk}]
+    fov_chunks = {} # fov_id : chunks remaining for the FOV
+    for fov_id in sorted(fov_id_list):
+        ana_peak_ids = sorted([peak_id for peak_id, spec in six.iteritems(specs[fov_id]) if spec == 1])
+        for peak_id in ana_peak_ids:
+            stack_length = get_stack_length(fov_id, peak_id, color=sub_color)
+            if stack_length == 0:
+                warning('Subtracted stack of FOV %d, channel %d has no frames. Not segmenting it.'
+                        % (fov_id, peak_id))
+                continue
+            starts = range(0, stack_length, chunk_size)
+            peak_chunks[(fov_id, peak_id)] = [stack_length, len(starts), {}]
+            fov_chunks[fov_id] = fov_chunks.get(fov_id, 0) + len(starts)
+            for start in starts:
+                tasks.append((fov_id, peak_id, start, min(start + chunk_size, stack_length)))
+
+    total_frames = sum([chunks[0] for chunks in peak_chunks.values()])
+    information('Segmenting %d frames from %d channels in %d tasks.'
+                % (total_frames, len(peak_chunks), len(tasks)))
+
+    pool = Pool(processes=params['num_analyzers'])
+
+    t_start = time.time()
+    frames_done = 0
+    peaks_done = 0
+    finished_peaks = {} # fov_id : [(peak_id, segmented stack)] waiting for the rest of the FOV
+    for fov_id, peak_id, start, labeled_chunk in pool.imap_unordered(segment_chunk, tasks):
+        chunks = peak_chunks[(fov_id, peak_id)]
+        chunks[1] -= 1
+        chunks[2][start] = labeled_chunk
+        fov_chunks[fov_id] -= 1
+        frames_done += labeled_chunk.shape[0]
+
+        # all chunks for this peak are in, stack in time order
+        if chunks[1] == 0:
+            segmented_imgs = np.concatenate([chunks[2][s] for s in sorted(chunks[2].keys())], axis=0)
+            finished_peaks.setdefault(fov_id, []).append((peak_id, segmented_imgs.astype('uint8')))
+            del peak_chunks[(fov_id, peak_id)]
+
+        # TIFF stacks are separate files and are saved right away, HDF5 stacks
+        # only when no worker is reading the FOV's file anymore
+        if params['output'] == 'HDF5' and fov_chunks[fov_id] > 0:
+            continue
+
+        for finished_peak_id, segmented_imgs in finished_peaks.pop(fov_id, []):
+            save_stack(segmented_imgs, fov_id, finished_peak_id, params['seg_img'], compress=5)
+            peaks_done += 1
+
+            elapsed = time.time() - t_start
+            information('Saved segmented FOV %d, channel %d. %d/%d frames, %.1f frames/s.'
+                        % (fov_id, finished_peak_id, frames_done, total_frames, frames_done / elapsed))
+
+    pool.close() # tells the process nothing more will be added.
+    pool.join() # blocks script until everything has been processed and workers exit
+
+    elapsed = time.time() - t_start
+    information('Segmented %d channels (%d frames) in %.1f s, %.1f frames/s.'
+                % (peaks_done, frames_done, elapsed, frames_done / max(elapsed, 1e-6)))
+
+    return True
+
+# segment a range of frames from one subtracted channel stack
+def segment_chunk(task):
+    '''
+    Worker for segment_experiment_otsu. Loads only the requested frames.
+
+    Parameters
+    ----------
+    task : tuple
+        (fov_id, peak_id, start, stop) with frames start to stop-1
+
+    Returns
+    -------
+    (fov_id, peak_id, start, labeled_chunk) : tuple
+        labeled_chunk has shape (stop-start, y, x)
+    '''
+
+    fov_id, peak_id, start, stop = task
+
+    sub_stack = load_stack(fov_id, peak_id, color='sub_{}'.format(params['phase_plane']),
+                           frames=range(start, stop))
+    labeled_chunk = np.stack([segment_image(image) for image in sub_stack], axis=0)
+
+    return fov_id, peak_id, start, labeled_chunk.astype('uint8')
+
+# segmentation algorithm
+def segment_image(image):
+    '''Segments a subtracted image and returns a labeled image
+
+    Parameters
+    image : a ndarray which is an image. This should be the subtracted image
+
+    Returns
+    labeled_image : a ndarray which is also an image. Labeled values, which
+        should correspond to cells, all have the same integer value starting with 1.
+        Non labeled area should have value zero.
+    '''
+
+    # load in segmentation parameters
+    OTSU_threshold = params['segment']['otsu']['OTSU_threshold']
+    first_opening_size = params['segment']['otsu']['first_opening_size']
+    distance_threshold = params['segment']['otsu']['distance_threshold']
+    second_opening_size = params['segment']['otsu']['second_opening_size']
+    min_object_size = params['segment']['min_object_size']
+    method = params['segment']['otsu']['method']
+
+    # threshold image
+    try:
+        thresh = threshold_otsu(image) # finds optimal OTSU threshhold value
+    except:
+        return np.zeros_like(image)
+
+    threshholded = image > OTSU_threshold*thresh # will create binary image
+
+    # if there are no cells, good to clear the border
+    # because otherwise the OTSU is just for random bullshit, most
+    # likely on the side of the image
+    threshholded = segmentation.clear_border(threshholded)
+
+    # Opening = erosion then dialation.
+    # opening smooths images, breaks isthmuses, and eliminates protrusions.
+    # "opens" dark gaps between bright features.
+    morph = morphology.binary_opening(threshholded, morphology.disk(first_opening_size))
+
+    # if this image is empty at this point (likely if there were no cells), just return
+    # zero array
+    if np.amax(morph) == 0:
+        return np.zeros_like(image)
+
+    ### Calculate distance matrix, use as markers for random walker (diffusion watershed)
+    # Generate the markers based on distance to the background
+    distance = ndi.distance_transform_edt(morph)
+
+    # threshold distance image
+    distance_thresh = np.zeros_like(distance)
+    distance_thresh[distance < distance_threshold] = 0
+    distance_thresh[distance >= distance_threshold] = 1
+
+    # do an extra opening on the distance
+    distance_opened = morphology.binary_opening(distance_thresh,
+                                                morphology.disk(second_opening_size))
+
+    # remove artifacts connected to image border
+    cleared = segmentation.clear_border(distance_opened)
+    # remove small objects. Remove small objects wants a
+    # labeled image and will fail if there is only one label. Return zero image in that case
+    # could have used try/except but remove_small_objects loves to issue warnings.
+    cleared, label_num = morphology.label(cleared, connectivity=1, return_num=True)
+    if label_num > 1:
+        cleared = morphology.remove_small_objects(cleared, min_size=min_object_size)
+    else:
+        # if there are no labels, then just return the cleared image as it is zero
+        return np.zeros_like(image)
+
+    # relabel now that small objects and labels on edges have been cleared
+    markers = morphology.label(cleared, connectivity=1)
+
+    # just break if there is no label
+    if np.amax(markers) == 0:
+        return np.zeros_like(image)
+
+    # the binary image for the watershed, which uses the unmodified OTSU threshold
+    threshholded_watershed = threshholded
+    threshholded_watershed = segmentation.clear_border(threshholded_watershed)
+
+    # marker controlled watershed on the inverted image, restricted to the OTSU mask.
+    # Much faster than the random walker and uses the same markers.
+    if method == 'watershed':
+        labeled_image = watershed(-1*image.astype('float64'), markers,
+                                  mask=threshholded_watershed)
+        return labeled_image
+
+    # label using the random walker (diffusion watershed) algorithm
+    try:
+        # set anything outside of OTSU threshold to -1 so it will not be labeled
+        markers[threshholded_watershed == 0] = -1
+        # here is the main algorithm
+        labeled_image = segmentation.random_walker(-1*image, markers)
+        # put negative values back to zero for proper image
+        labeled_image[labeled_image == -1] = 0
+    except:
+        return np.zeros_like(image)
+
+    return labeled_image
+
+def get_pad_distances(unet_shape, img_height, img_width):
+    '''Finds padding and trimming sizes to make the input image the same as the size expected by the U-net model.
+
+    Padding is done evenly to the top and bottom of the image. Trimming is only done from the right or bottom.
+    '''
+
+    half_width_pad = (unet_shape[1]-img_width)/2
+    if half_width_pad > 0:
+        left_pad = int(np.floor(half_width_pad))
+        right_pad = int(np.ceil(half_width_pad))
+        right_trim = 0
+    else:
+        left_pad = 0
+        right_pad = 0
+        right_trim = img_width - unet_shape[1]
+
+    half_height_pad = (unet_shape[0]-img_height)/2
+    if half_height_pad > 0:
+        top_pad = int(np.floor(half_height_pad))
+        bottom_pad = int(np.ceil(half_height_pad))
+        bottom_trim = 0
+    else:
+        top_pad = 0
+        bottom_pad = 0
+        bottom_trim = img_height - unet_shape[0]
+
+    pad_dict = {'top_pad' : top_pad,
+                'bottom_pad' : bottom_pad,
+                'right_pad' : right_pad,
+                'left_pad' : left_pad,
+                'bottom_trim' : bottom_trim,
+                'right_trim' : right_trim}
+
+    return pad_dict
+
+def get_bucket_shape(img_height, img_width, size_multiple):
+    '''Rounds an image shape up to the next multiple of size_multiple.
+
+    Used for variable size inference with fully convolutional U-nets, which need
+    each side to be divisible by their total downsampling (2**number of pooling
+    layers). Stacks are padded to their bucket with get_pad_distances(bucket_shape,
+    img_height, img_width), so nothing is trimmed and stacks of the same bucket
+    can share batches.
+    '''
+
+    bucket_height = int(np.ceil(img_height / size_multiple)) * size_multiple
+    bucket_width = int(np.ceil(img_width / size_multiple)) * size_multiple
+
+    return (bucket_height, bucket_width)
+
+def label_prediction_stack(predictions, threshold, min_object_size=0,
+                           fill_holes=True, connectivity=1):
+    '''
+    Turns a stack of U-net probability maps into labeled images.
+
+    Gives the same result as doing, frame by frame,
+        binary = predictions >= threshold
+        morphology.remove_small_holes(binary, min_object_size)
+        morphology.remove_small_objects(morphology.label(binary, connectivity), min_object_size)
+        segmentation.clear_border(...)
+        morphology.label(..., connectivity)
+    but labels the whole (t, y, x) stack at once with a structuring element that
+    does not connect across time. Object sizes come from one bincount and border
+    clearing and relabeling are done with lookup tables over all labels.
+
+    Parameters
+    ----------
+    predictions : np.ndarray
+        Probability maps, shape (t, y, x).
+    threshold : float
+        Pixels >= threshold are foreground.
+    min_object_size : int
+        Holes and objects smaller than this many pixels are filled and removed.
+    fill_holes : bool
+        Fill holes smaller than min_object_size before labeling.
+    connectivity : int
+        1 or 2, same meaning as in skimage.measure.label for one frame.
+
+    Returns
+    -------
+    labeled_stack : np.ndarray
+        uint8 labeled stack, labels start at 1 in every frame.
+    '''
+
+    n_frames = predictions.shape[0]
+
+    # 2D structuring element placed in the middle of a 3D one, so nothing connects in time
+    structure = np.zeros((3,3,3), dtype=bool)
+    structure[1] = ndi.generate_binary_structure(2, connectivity)
+
+    binary = predictions >= threshold
+
+    # holes are always found with connectivity 1, as in remove_small_holes
+    if fill_holes and min_object_size > 0:
+        hole_structure = np.zeros((3,3,3), dtype=bool)
+        hole_structure[1] = ndi.generate_binary_structure(2, 1)
+        holes, _ = ndi.label(~binary, structure=hole_structure)
+        small_holes = np.bincount(holes.ravel()) < min_object_size
+        small_holes[0] = False
+        binary[small_holes[holes]] = True
+
+    labels, n_labels = ndi.label(binary, structure=structure)
+
+    # size filter
+    keep = np.ones(n_labels + 1, dtype=bool)
+    if min_object_size > 0:
+        keep = np.bincount(labels.ravel(), minlength=n_labels + 1) >= min_object_size
+    keep[0] = False
+
+    # objects touching the image border of their frame
+    border_labels = np.concatenate((labels[:,0,:].ravel(), labels[:,-1,:].ravel(),
+                                    labels[:,:,0].ravel(), labels[:,:,-1].ravel()))
+    keep[border_labels] = False
+
+    # labels are given in scan order, so every frame owns a contiguous range of them.
+    # relabel so each frame starts at 1 and keeps that order
+    frame_last_label = np.maximum.accumulate(labels.reshape(n_frames, -1).max(axis=1))
+    frame_first_label = np.concatenate(([0], frame_last_label[:-1]))
+    label_frame = np.searchsorted(frame_last_label, np.arange(n_labels + 1), side='left')
+    label_frame[label_frame >= n_frames] = n_frames - 1
+    kept_count = np.cumsum(keep)
+    new_labels = kept_count - kept_count[frame_first_label[label_frame]]
+    new_labels[~keep] = 0
+
+    return new_labels[labels].astype('uint8')
+
+def encode_predictions(predictions, dtype='float16'):
+    '''Converts U-net probabilities for the stack store, as float16 or as uint8
+    quantized to 1/255 steps.'''
+
+    if dtype == 'uint8':
+        return np.around(predictions * 255).astype('uint8')
+
+    return predictions.astype(dtype)
+
+def decode_predictions(pred_stack):
+    '''Returns stored predictions as float32 probabilities. uint8 stacks, also those
+    written before predictions were stored as float16, are scaled back to 0 to 1.'''
+
+    if pred_stack.dtype == np.uint8:
+        return pred_stack.astype('float32') / 255
+
+    return pred_stack.astype('float32')
+
+def label_cells_unet(predictions, fov_id, peak_id):
+    '''Thresholds and labels U-net cell predictions for one peak and saves the
+    segmented stack. Uses params['segment'] cell_class_threshold and min_object_size.'''
+
+    cellClassThreshold = params['segment']['cell_class_threshold']
+    if cellClassThreshold == 'None': # yaml imports None as a string
+        cellClassThreshold = False
+    min_object_size = params['segment']['min_object_size']
+
+    # binarized and label (if there is a threshold value, otherwise, save a grayscale for debug)
+    if cellClassThreshold:
+        # fill small holes, remove small objects and objects touching the border, label
+        segmented_imgs = label_prediction_stack(predictions, cellClassThreshold,
+                                                min_object_size=min_object_size)
+
+    else: # in this case you just want to scale the 0 to 1 float image to 0 to 255
+        information('Converting predictions to grayscale.')
+        segmented_imgs = np.around(predictions * 100)
+
+    # both binary and grayscale should be 8bit. This may be ensured above and is unneccesary
+    segmented_imgs = segmented_imgs.astype('uint8')
+
+    # save out the segmented stacks
+    save_stack(segmented_imgs, fov_id, peak_id, params['seg_img'], compress=4)
+
+    return
+
+def relabel_experiment_unet(fov_id_list, specs, cache=None):
+    '''
+    Makes the segmented stacks again from stored U-net predictions (saved with
+    params['segment']['save_predictions']) without running the model. Used to try
+    other values of cell_class_threshold or min_object_size.
+
+    Each FOV is one task, so the predictions and segmented stacks of a FOV's HDF5
+    file are only read and written by one process.
+
+    The segmented stacks no longer match their fingerprints of the segment_unet
+    stage, so the fingerprints of relabeled channels are deleted from cache
+    before the stacks are written. The next normal run segments them again.
+
+    Called by
+    mm3_Segment-Unet.py --from-predictions
+
+    Calls
+    mm3.relabel_fov_unet
+    '''
+
+    tasks = []
+    for fov_id in fov_id_list:
+        ana_peak_ids = sorted([peak_id for peak_id, spec in six.iteritems(specs[fov_id]) if spec == 1])
+        peak_ids = []
+        for peak_id in ana_peak_ids:
+            if stack_exists(fov_id, peak_id, params['pred_img']):
+                peak_ids.append(peak_id)
+                if cache is not None:
+                    cache.forget(fov_id, peak_id)
+            else:
+                warning('No stored predictions for FOV %d, channel %d.' % (fov_id, peak_id))
+        if peak_ids:
+            tasks.append((fov_id, peak_ids))
+
+    information('Labeling stored predictions of %d channels.' % sum([len(task[1]) for task in tasks]))
+
+    pool = Pool(processes=params['num_analyzers'])
+
+    t_start = time.time()
+    peaks_done = 0
+    for fov_id, n_peaks in pool.imap_unordered(relabel_fov_unet, tasks):
+        information('Labeled %d channels of FOV %d.' % (n_peaks, fov_id))
+        peaks_done += n_peaks
+
+    pool.close()
+    pool.join()
+
+    information('Labeled %d channels in %.1f s.' % (peaks_done, time.time() - t_start))
+
+    return peaks_done
+
+# label the stored predictions of the channels of one FOV
+def relabel_fov_unet(task):
+    '''Loads the stored predictions of the given channels of one FOV and labels
+    them, one channel after the other. task is (fov_id, peak_ids).
+    Returns (fov_id, number of channels labeled).'''
+
+    fov_id, peak_ids = task
+
+    for peak_id in peak_ids:
+        pred_stack = load_stack(fov_id, peak_id, color=params['pred_img'])
+        label_cells_unet(decode_predictions(pred_stack), fov_id, peak_id)
+
+    return fov_id, len(peak_ids)
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+'''
+CPU inference backend for the mm3 Keras models.
+
+Models can be exported with aux/mm3_ConvertModel.py to TensorFlow Lite files
+(frozen graph, optionally float16 or int8 quantized). Conversion and the
+interpreter work with TensorFlow 1.13; quantization needs TensorFlow 2.3 or later. load_model returns either
+a regular Keras model or a TFLiteModel depending on the file extension.
+RemoteModel runs a model kept loaded by mm3_ModelServer.py. All of them have
+predict, predict_on_batch and predict_generator, so the rest of mm3 does not
+need to know which one it has.
+'''
+from __future__ import print_function, division
+
+import sys
+import os
+import io
+import json
+import stat
+import socket
+import struct
+import tempfile
+import numpy as np
+from scipy import ndimage as ndi
+
+def configure_cpu(num_threads=None, onednn=None, xla=None):
+    '''
+    Sets TensorFlow CPU options. They are passed as environment variables, which
+    TensorFlow reads when it is imported, so this does not import it. If it is
+    already imported the thread and XLA settings are applied directly.
+
+    Parameters
+    ----------
+    num_threads : int
+        Threads for intra op parallelism (and for the TFLite interpreter).
+    onednn : bool
+        Turn oneDNN optimizations on or off (TF_ENABLE_ONEDNN_OPTS).
+    xla : bool
+        Turn on XLA auto clustering for Keras models.
+    '''
+
+    if num_threads:
+        os.environ['TF_NUM_INTRAOP_THREADS'] = str(num_threads)
+    if onednn is not None:
+        os.environ['TF_ENABLE_ONEDNN_OPTS'] = '1' if onednn else '0'
+    if xla:
+        os.environ['TF_XLA_FLAGS'] = '--tf_xla_auto_jit=2 --tf_xla_cpu_global_jit'
+
+    if not 'tensorflow' in sys.modules:
+        return
+
+    import tensorflow as tf
+    if num_threads:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        except (AttributeError, RuntimeError):
+            pass # old TensorFlow or already initialized
+    if xla:
+        try:
+            tf.config.optimizer.set_jit(True)
+        except AttributeError:
+            pass
+
+    return
+
+def load_model(model_file, custom_objects=None, num_threads=None):
+    '''
+    Loads a model for inference. Files ending in .tflite are run with the
+    TensorFlow Lite interpreter, anything else is loaded with Keras.
+    '''
+
+    if model_file.endswith('.tflite'):
+        return TFLiteModel(model_file, num_threads=num_threads)
+
+    from tensorflow.keras import models
+    return models.load_model(model_file, custom_objects=custom_objects)
+
+class TFLiteModel():
+    '''
+    Wrapper around tf.lite.Interpreter with the predict methods of a Keras model.
+    The batch dimension of the input is resized to fit each call. Inputs and
+    outputs of full integer (int8) models are quantized and dequantized here, so
+    callers always pass and get floats.
+    '''
+
+    def __init__(self, model_file, num_threads=None):
+        import tensorflow as tf
+
+        self.model_file = model_file
+        try:
+            self.interpreter = tf.lite.Interpreter(model_path=model_file, num_threads=num_threads)
+        except TypeError:
+            # the interpreter of TensorFlow 1 has no num_threads
+            self.interpreter = tf.lite.Interpreter(model_path=model_file)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()
+        self.input_shape = tuple(self.input_detail['shape'])
+
+    def predict_on_batch(self, x):
+        'Runs one batch through the interpreter.'
+        x = quantize_tensor(np.asarray(x, dtype=np.float32), self.input_detail)
+
+        if tuple(x.shape) != self.input_shape:
+            self.interpreter.resize_tensor_input(self.input_detail['index'], x.shape)
+            self.interpreter.allocate_tensors()
+            self.input_shape = tuple(x.shape)
+
+        self.interpreter.set_tensor(self.input_detail['index'], x)
+        self.interpreter.invoke()
+
+        outputs = [dequantize_tensor(self.interpreter.get_tensor(detail['index']), detail)
+                   for detail in self.output_details]
+        if len(outputs) == 1:
+            return outputs[0]
+        return outputs
+
+    def predict(self, x, batch_size=32, **kwargs):
+        'Predicts a whole array in batches of batch_size.'
+        if batch_size is None:
+            batch_size = 32
+        outputs = [self.predict_on_batch(x[i:i+batch_size]) for i in range(0, len(x), batch_size)]
+
+        return concatenate_outputs(outputs)
+
+    def predict_generator(self, generator, **kwargs):
+        'Predicts all batches of a keras.utils.Sequence.'
+        outputs = []
+        for i in range(len(generator)):
+            batch = generator[i]
+            if isinstance(batch, tuple): # (X, y) generators
+                batch = batch[0]
+            outputs.append(self.predict_on_batch(batch))
+
+        return concatenate_outputs(outputs)
+
+def quantize_tensor(x, detail):
+    'Converts float input to the dtype of an interpreter input, with its scale and zero point for integer inputs.'
+
+    dtype = detail['dtype']
+    scale, zero_point = detail.get('quantization', (0.0, 0))
+    if not np.issubdtype(dtype, np.integer) or not scale:
+        return x.astype(dtype)
+
+    limits = np.iinfo(dtype)
+    return np.clip(np.round(x / scale + zero_point), limits.min, limits.max).astype(dtype)
+
+def dequantize_tensor(x, detail):
+    'Converts an interpreter output back to float32 if it is quantized.'
+
+    scale, zero_point = detail.get('quantization', (0.0, 0))
+    if not np.issubdtype(x.dtype, np.integer) or not scale:
+        return x
+
+    return ((x.astype(np.float32) - zero_point) * scale).astype(np.float32)
+
+def concatenate_outputs(outputs):
+    'Concatenates per batch outputs, which may be lists for multi output models.'
+
+    if isinstance(outputs[0], list):
+        return [np.concatenate(output, axis=0) for output in zip(*outputs)]
+
+    return np.concatenate(outputs, axis=0)
+
+def convert_model(model_file, output_file, custom_objects=None,
+                  quantize=None, representative_images=None):
+    '''
+    Converts a Keras .hdf5 model to a frozen TensorFlow Lite model for CPU inference.
+    Works with TensorFlow 1.13 and 2. Quantization needs TensorFlow 2.3 or later.
+
+    Parameters
+    ----------
+    model_file : str
+        Path to the .hdf5 model.
+    output_file : str
+        Path of the .tflite file to write.
+    custom_objects : dict
+        Custom losses and metrics needed to load the model.
+    quantize : str
+        None for float32, 'float16' for float16 weights or 'int8' for full
+        integer post-training quantization of weights, activations, inputs and
+        outputs. TFLiteModel converts the int8 inputs and outputs from and to floats.
+    representative_images : np.ndarray
+        Input samples for calibrating int8 quantization. Required for 'int8'.
+    '''
+
+    import tensorflow as tf
+    from tensorflow.keras import models, utils
+
+    tf2 = hasattr(tf.lite.TFLiteConverter, 'from_keras_model')
+    if tf2:
+        model = models.load_model(model_file, custom_objects=custom_objects, compile=False)
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    else:
+        # TensorFlow 1 loads the model from the file itself
+        with utils.custom_object_scope(custom_objects or {}):
+            converter = tf.lite.TFLiteConverter.from_keras_model_file(model_file)
+
+    # the converter of TensorFlow 2.3 and later has the integer input and output types
+    if quantize is not None and not (tf2 and hasattr(converter, 'inference_input_type')):
+        raise ValueError('{} quantization needs TensorFlow 2.3 or later.'.format(quantize))
+
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        if representative_images is None:
+            raise ValueError('int8 quantization needs representative images.')
+
+        def representative_dataset():
+            for image in representative_images:
+                yield [np.expand_dims(image, 0).astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        # integer kernels only, and int8 inputs and outputs
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif quantize is not None:
+        raise ValueError('Unknown quantization {}.'.format(quantize))
+
+    tflite_model = converter.convert()
+    with open(output_file, 'wb') as out_file:
+        out_file.write(tflite_model)
+
+    return output_file
+
+### accuracy checks between an original model and its converted version
+
+def dice_score(mask_ref, mask_test):
+    'Dice coefficient of two binary arrays.'
+
+    total = np.sum(mask_ref) + np.sum(mask_test)
+    if total == 0:
+        return 1.0
+
+    return 2.0 * np.sum(mask_ref & mask_test) / total
+
+def object_f1_score(mask_ref, mask_test, iou_threshold=0.5):
+    '''
+    F1 score of objects (connected components per image) matched one to one at
+    IoU > iou_threshold. Used for trap detection.
+
+    Parameters
+    ----------
+    mask_ref, mask_test : np.ndarray
+        Binary arrays of shape (n, y, x).
+    '''
+
+    n_matched, n_ref, n_test = 0, 0, 0
+    for ref, test in zip(mask_ref, mask_test):
+        labels_ref, count_ref = ndi.label(ref)
+        labels_test, count_test = ndi.label(test)
+        n_ref += count_ref
+        n_test += count_test
+        if count_ref == 0 or count_test == 0:
+            continue
+
+        overlap = np.zeros((count_ref + 1, count_test + 1), dtype=np.int64)
+        np.add.at(overlap, (labels_ref.ravel(), labels_test.ravel()), 1)
+        area_ref = overlap.sum(axis=1)[1:, np.newaxis]
+        area_test = overlap.sum(axis=0)[np.newaxis, 1:]
+        intersection = overlap[1:, 1:]
+        iou = intersection / (area_ref + area_test - intersection)
+        n_matched += int(np.sum(iou > iou_threshold))
+
+    if n_ref == 0 and n_test == 0:
+        return 1.0
+    precision = n_matched / n_test if n_test else 0.0
+    recall = n_matched / n_ref if n_ref else 0.0
+    if precision + recall == 0:
+        return 0.0
+
+    return 2 * precision * recall / (precision + recall)
+
+def compare_models(model_ref, model_test, images, kind='segmentation',
+                   threshold=0.5, batch_size=32):
+    '''
+    Runs the same images through two models and reports how well the outputs agree.
+
+    Parameters
+    ----------
+    model_ref, model_test : models with a predict method
+    images : np.ndarray
+        Model inputs.
+    kind : str
+        'segmentation' : Dice of the thresholded masks (cells, foci)
+        'traps' : Dice and object F1 of the thresholded trap masks
+        'classification' : agreement of the argmax (channel picker)
+        'tracking' : agreement of the thresholded scores
+    threshold : float
+        Probability threshold for masks and scores.
+
+    Returns
+    -------
+    scores : dict
+    '''
+
+    pred_ref = np.asarray(model_ref.predict(images, batch_size=batch_size), dtype=np.float32)
+    pred_test = np.asarray(model_test.predict(images, batch_size=batch_size), dtype=np.float32)
+
+    scores = {'max_abs_diff' : float(np.max(np.abs(pred_ref - pred_test))),
+              'mean_abs_diff' : float(np.mean(np.abs(pred_ref - pred_test)))}
+
+    if kind in ['segmentation', 'traps']:
+        mask_ref = pred_ref >= threshold
+        mask_test = pred_test >= threshold
+        scores['dice'] = float(dice_score(mask_ref, mask_test))
+        if kind == 'traps':
+            # trap class is the first channel of the prediction
+            scores['trap_f1'] = float(object_f1_score(mask_ref[..., 0], mask_test[..., 0]))
+    elif kind == 'classification':
+        scores['agreement'] = float(np.mean(np.argmax(pred_ref, axis=-1) == np.argmax(pred_test, axis=-1)))
+    elif kind == 'tracking':
+        scores['agreement'] = float(np.mean((pred_ref >= threshold) == (pred_test >= threshold)))
+
+    return scores
+
+### model server client. The server is mm3_ModelServer.py
+
+def default_socket_path():
+    '''
+    Socket of the model server when none is given. It is kept in a directory only
+    this user can open, $XDG_RUNTIME_DIR/mm3 or mm3-<uid> in the temp directory,
+    so other users can neither listen on it nor replace it.
+    '''
+
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        socket_dir = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'mm3')
+    else:
+        socket_dir = os.path.join(tempfile.gettempdir(), 'mm3-{}'.format(os.getuid()))
+
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, mode=0o700)
+
+    # the temp directory is shared, so someone else could have made it first
+    dir_stat = os.lstat(socket_dir)
+    if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid() \
+       or stat.S_IMODE(dir_stat.st_mode) & 0o077:
+        raise RuntimeError('Model server directory {} must be a directory owned by this user '
+                           'with mode 0700.'.format(socket_dir))
+
+    return os.path.join(socket_dir, 'model_server.sock')
+
+def check_peer(sock, socket_path=None):
+    '''
+    Raises RuntimeError if the other end of a connected Unix socket is not run by
+    this user. Uses SO_PEERCRED where there is one (Linux), otherwise the owner
+    of the socket file.
+    '''
+
+    if hasattr(socket, 'SO_PEERCRED'):
+        credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        peer_uid = struct.unpack('3i', credentials)[1]
+    elif socket_path is not None:
+        peer_uid = os.stat(socket_path).st_uid
+    else:
+        return
+
+    if peer_uid != os.getuid():
+        raise RuntimeError('Model server connection from uid {}, not this user.'.format(peer_uid))
+
+def send_message(sock, message):
+    '''
+    Sends a message of dicts, lists, strings, numbers and numpy arrays. The
+    structure goes as JSON and the arrays in .npy format, so receiving a message
+    never runs code. The lengths of the parts are sent in front of them.
+    '''
+
+    arrays = []
+    def encode(value):
+        if isinstance(value, (np.ndarray, np.generic)):
+            arrays.append(np.asarray(value))
+            return {'__array__' : len(arrays) - 1}
+        if isinstance(value, dict):
+            return {key : encode(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [encode(item) for item in value]
+        return value
+
+    header = json.dumps(encode(message)).encode()
+    parts = [struct.pack('!QQ', len(header), len(arrays)), header]
+    for array in arrays:
+        array_file = io.BytesIO()
+        np.save(array_file, array, allow_pickle=False)
+        data = array_file.getvalue()
+        parts.extend([struct.pack('!Q', len(data)), data])
+
+    sock.sendall(b''.join(parts))
+
+def recv_message(sock):
+    'Receives one message sent by send_message. Returns None if the connection closed.'
+
+    lengths = recv_exactly(sock, 16)
+    if lengths is None:
+        return None
+    header_length, n_arrays = struct.unpack('!QQ', lengths)
+    header = recv_exactly(sock, header_length)
+    if header is None:
+        return None
+
+    arrays = []
+    for _ in range(n_arrays):
+        array_length = recv_exactly(sock, 8)
+        if array_length is None:
+            return None
+        data = recv_exactly(sock, struct.unpack('!Q', array_length)[0])
+        if data is None:
+            return None
+        arrays.append(np.load(io.BytesIO(data), allow_pickle=False))
+
+    def decode(value):
+        if isinstance(value, dict):
+            if list(value.keys()) == ['__array__']:
+                return arrays[value['__array__']]
+            return {key : decode(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        return value
+
+    return decode(json.loads(header.decode()))
+
+def recv_exactly(sock, n_bytes):
+    'Reads n_bytes from a socket, or returns None if it closes first.'
+
+    chunks = []
+    while n_bytes > 0:
+        chunk = sock.recv(min(n_bytes, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        n_bytes -= len(chunk)
+
+    return b''.join(chunks)
+
+def server_request(socket_path, message, timeout=None):
+    'Sends one request to the model server and returns the result.'
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        check_peer(sock, socket_path)
+        send_message(sock, message)
+        response = recv_message(sock)
+    finally:
+        sock.close()
+
+    if response is None:
+        raise RuntimeError('Model server closed the connection.')
+    if response['status'] != 'ok':
+        raise RuntimeError('Model server error: {}'.format(response['message']))
+
+    return response['result']
+
+def server_available(socket_path):
+    'True if a model server run by this user is listening on socket_path.'
+
+    if not socket_path or not os.path.exists(socket_path):
+        return False
+
+    try:
+        return server_request(socket_path, {'cmd' : 'ping'}, timeout=5) == 'pong'
+    except (socket.error, RuntimeError):
+        return False
+
+class RemoteModel():
+    '''
+    Client for a model kept warm by the model server. Has the same predict methods
+    as a Keras model. Opens a new connection per request, so it can be used from
+    forked pool workers.
+    '''
+
+    def __init__(self, model_file, socket_path):
+        self.model_file = os.path.abspath(model_file)
+        self.socket_path = socket_path
+        # the server loads the model now if it does not have it yet
+        server_request(self.socket_path, {'cmd' : 'load', 'model_file' : self.model_file})
+
+    def predict_on_batch(self, x):
+        'Predicts one batch on the server.'
+        return server_request(self.socket_path, {'cmd' : 'predict',
+                                                 'model_file' : self.model_file,
+                                                 'x' : np.asarray(x),
+                                                 'batch_size' : None})
+
+    def predict(self, x, batch_size=32, **kwargs):
+        'Predicts a whole array on the server in batches of batch_size.'
+        return server_request(self.socket_path, {'cmd' : 'predict',
+                                                 'model_file' : self.model_file,
+                                                 'x' : np.asarray(x),
+                                                 'batch_size' : batch_size})
+
+    def predict_generator(self, generator, **kwargs):
+        'Predicts all batches of a keras.utils.Sequence.'
+        outputs = []
+        for i in range(len(generator)):
+            batch = generator[i]
+            if isinstance(batch, tuple): # (X, y) generators
+                batch = batch[0]
+            outputs.append(self.predict_on_batch(batch))
+
+        return concatenate_outputs(outputs)
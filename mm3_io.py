@@ -0,0 +1,936 @@
+#!/usr/bin/env python3
+'''
+Parameters, logging and reading and writing of image stacks, specs and time
+tables.
+
+params is the global parameter dictionary shared by all mm3 modules. It is
+filled in place by init_mm3_helpers, so modules that imported it see the values.
+'''
+from __future__ import print_function, division
+import six
+
+# import modules
+import sys # input, output, errors, and files
+import os # interacting with file systems
+import time # getting time
+import datetime
+import yaml # parameter importing
+import json # for importing tiff metadata
+import hashlib # fingerprints of results
+try:
+    import cPickle as pickle # loading and saving python objects
+except:
+    import pickle
+import numpy as np # numbers package
+import struct # for interpretting strings as binary data
+import re # regular expressions
+import h5py # working with HDF5 files
+import multiprocessing
+import threading # locks for HDF5 files shared by threads
+from skimage.external import tifffile as tiff
+
+import mm3_inference as inference # CPU inference backend for converted models
+
+# global parameter dictionary, filled by init_mm3_helpers
+params = {}
+
+### functions ###########################################################
+# alert the use what is up
+
+# print a warning
+def warning(*objs):
+    print(time.strftime("%H:%M:%S WARNING:", time.localtime()), *objs, file=sys.stderr)
+
+# print information
+def information(*objs):
+    print(time.strftime("%H:%M:%S", time.localtime()), *objs, file=sys.stdout)
+
+# load the parameters file into a global dictionary for this module
+def init_mm3_helpers(param_file_path):
+    # load all the parameters into the global dictionary. It is updated in place
+    # because the other mm3 modules hold a reference to it
+    with open(param_file_path, 'r') as param_file:
+        loaded_params = yaml.safe_load(param_file)
+    params.clear()
+    params.update(loaded_params)
+
+    # set up how to manage cores for multiprocessing
+    params['num_analyzers'] = multiprocessing.cpu_count()
+
+    # useful folder shorthands for opening files
+    params['TIFF_dir'] = os.path.join(params['experiment_directory'], params['image_directory'])
+    params['ana_dir'] = os.path.join(params['experiment_directory'], params['analysis_directory'])
+    params['hdf5_dir'] = os.path.join(params['ana_dir'], 'hdf5')
+    params['chnl_dir'] = os.path.join(params['ana_dir'], 'channels')
+    params['empty_dir'] = os.path.join(params['ana_dir'], 'empties')
+    params['sub_dir'] = os.path.join(params['ana_dir'], 'subtracted')
+    params['seg_dir'] = os.path.join(params['ana_dir'], 'segmented')
+    params['pred_dir'] = os.path.join(params['ana_dir'], 'predictions')
+    params['foci_seg_dir'] = os.path.join(params['ana_dir'], 'segmented_foci')
+    params['foci_pred_dir'] = os.path.join(params['ana_dir'], 'predictions_foci')
+    params['cell_dir'] = os.path.join(params['ana_dir'], 'cell_data')
+    params['lineage_dir'] = os.path.join(params['cell_dir'], 'lineages')
+    params['track_dir'] = os.path.join(params['ana_dir'], 'tracking')
+    params['foci_track_dir'] = os.path.join(params['ana_dir'], 'tracking_foci')
+    params['fingerprint_dir'] = os.path.join(params['ana_dir'], 'fingerprints')
+
+    # use jd time in image metadata to make time table. Set to false if no jd time
+    if params['TIFF_source'] == 'elements' or params['TIFF_source'] == 'nd2ToTIFF':
+        params['use_jd'] = True
+    else:
+        params['use_jd'] = False
+
+    # CPU settings for model inference
+    if 'inference' in params.keys():
+        inference.configure_cpu(num_threads=params['inference'].get('num_threads'),
+                                onednn=params['inference'].get('onednn'),
+                                xla=params['inference'].get('xla'))
+
+    if not 'save_predictions' in params['segment'].keys():
+        params['segment']['save_predictions'] = False
+    if not 'prediction_dtype' in params['segment'].keys():
+        params['segment']['prediction_dtype'] = 'float16'
+    if not 'batch_across_fovs' in params['segment'].keys():
+        params['segment']['batch_across_fovs'] = False
+
+    # U-nets run at the trained shape unless variable size inference is turned on
+    for section in ['segment', 'foci']:
+        if section in params.keys():
+            if not 'variable_size' in params[section].keys():
+                params[section]['variable_size'] = False
+            if not 'size_multiple' in params[section].keys():
+                params[section]['size_multiple'] = 16
+
+    # Otsu segmentation finishes with the random walker unless watershed is chosen
+    if 'otsu' in params['segment'].keys():
+        if not 'method' in params['segment']['otsu'].keys():
+            params['segment']['otsu']['method'] = 'random_walker'
+
+    # standard tracking links regions to the closest leaf unless global assignment is chosen
+    if 'track' in params.keys():
+        if not 'assignment' in params['track'].keys():
+            params['track']['assignment'] = 'nearest'
+        # mm3_Track.py walks the track graph greedily unless the trellis decoder is chosen
+        if not 'linker' in params['track'].keys():
+            params['track']['linker'] = 'greedy'
+        # mm3_Track.py runs the tracking models on all channels of a FOV at once
+        if not 'batch_size' in params['track'].keys():
+            params['track']['batch_size'] = 1024
+        if not 'batch_across_fovs' in params['track'].keys():
+            params['track']['batch_across_fovs'] = False
+        if not 'fused_models' in params['track'].keys():
+            params['track']['fused_models'] = False
+        # probabilities a detection needs to start a new cell, used by both linkers
+        if not 'born_threshold' in params['track'].keys():
+            params['track']['born_threshold'] = 0.85
+        if not 'appear_threshold' in params['track'].keys():
+            params['track']['appear_threshold'] = 0.85
+
+    # fused subtraction and Otsu segmentation is off by default
+    if 'subtract' in params.keys():
+        if not 'segment' in params['subtract'].keys():
+            params['subtract']['segment'] = False
+        if not 'save_subtracted' in params['subtract'].keys():
+            params['subtract']['save_subtracted'] = True
+
+    return params
+
+def julian_day_number():
+    """
+    Need this to solve a bug in pims_nd2.nd2reader.ND2_Reader instance initialization.
+    The bug is in /usr/local/lib/python2.7/site-packages/pims_nd2/ND2SDK.py in function `jdn_to_datetime_local`, when the year number in the metadata (self._lim_metadata_desc) is not in the correct range. This causes a problem when calling self.metadata.
+    https://en.wikipedia.org/wiki/Julian_day
+    """
+    dt=datetime.datetime.now()
+    tt=dt.timetuple()
+    jdn=(1461.*(tt.tm_year + 4800. + (tt.tm_mon - 14.)/12))/4. + (367.*(tt.tm_mon - 2. - 12.*((tt.tm_mon -14.)/12)))/12. - (3.*((tt.tm_year + 4900. + (tt.tm_mon - 14.)/12.)/100.))/4. + tt.tm_mday - 32075
+
+    return jdn
+
+def get_plane(filepath):
+    pattern = r'(c\d+).tif'
+    res = re.search(pattern,filepath)
+    if (res != None):
+        return res.group(1)
+    else:
+        return None
+
+def get_fov(filepath):
+    pattern = r'xy(\d+)\w*.tif'
+    res = re.search(pattern,filepath)
+    if (res != None):
+        return int(res.group(1))
+    else:
+        return None
+
+def get_time(filepath):
+    pattern = r't(\d+)xy\w+.tif'
+    res = re.search(pattern,filepath)
+    if (res != None):
+        return np.int_(res.group(1))
+    else:
+        return None
+
+### HDF5 file locks
+# HDF5 refuses to open a file for writing while it is open for reading, also
+# within one process. Threads that load and save stacks of the same FOV at the
+# same time (e.g. the loader and writer of mm3_ml.segment_peaks_unet) take turns
+# with the lock of the FOV, which all HDF5 access in this module holds.
+hdf5_locks = {}
+hdf5_locks_lock = threading.Lock()
+
+def hdf5_lock(fov_id):
+    'Returns the lock of the HDF5 file of a FOV, for use with a with statement.'
+
+    with hdf5_locks_lock:
+        if fov_id not in hdf5_locks:
+            hdf5_locks[fov_id] = threading.RLock()
+        return hdf5_locks[fov_id]
+
+# loads and image stack from TIFF or HDF5 using mm3 conventions
+def load_stack(fov_id, peak_id, color='c1', image_return_number=None, frames=None):
+    '''
+    Loads an image stack.
+
+    Supports reading TIFF stacks or HDF5 files.
+
+    Parameters
+    ----------
+    fov_id : int
+        The FOV id
+    peak_id : int
+        The peak (channel) id. Dummy None value incase color='empty'
+    color : str
+        The image stack type to return. Can be:
+        c1 : phase stack
+        cN : where n is an integer for arbitrary color channel
+        sub : subtracted images
+        seg : segmented images
+        pred : U-net predictions
+        empty : get the empty channel for this fov, slightly different
+    frames : list of int
+        Sorted time indices to read. Only these frames are read from disk.
+        Default None reads the whole stack. Not used for empty stacks.
+
+    Returns
+    -------
+    image_stack : np.ndarray
+        The image stack through time. Shape is (t, y, x)
+    '''
+
+    # things are slightly different for empty channels
+    if 'empty' in color:
+        if params['output'] == 'TIFF':
+            img_filename = params['experiment_name'] + '_xy%03d_%s.tif' % (fov_id, color)
+
+            with tiff.TiffFile(os.path.join(params['empty_dir'],img_filename)) as tif:
+                img_stack = tif.asarray()
+
+        if params['output'] == 'HDF5':
+            with hdf5_lock(fov_id), h5py.File(os.path.join(params['hdf5_dir'],'xy%03d.hdf5' % fov_id), 'r') as h5f:
+                img_stack = h5f[color][:]
+
+        return img_stack
+
+    # load normal images for either TIFF or HDF5
+    if params['output'] == 'TIFF':
+        if color[0] == 'c':
+            img_dir = params['chnl_dir']
+        elif 'sub' in color:
+            img_dir = params['sub_dir']
+        elif 'foci' in color:
+            img_dir = params['foci_seg_dir']
+        elif 'pred' in color:
+            img_dir = params['pred_dir']
+        elif 'seg' in color:
+            img_dir = params['seg_dir']
+
+        img_filename = params['experiment_name'] + '_xy%03d_p%04d_%s.tif' % (fov_id, peak_id, color)
+
+        with tiff.TiffFile(os.path.join(img_dir, img_filename)) as tif:
+            if frames is None:
+                img_stack = tif.asarray()
+            else:
+                # one page per time point, only decompress the requested ones
+                img_stack = tif.asarray(key=list(frames))
+                if img_stack.ndim == 2:
+                    img_stack = np.expand_dims(img_stack, 0)
+
+    if params['output'] == 'HDF5':
+        with hdf5_lock(fov_id), h5py.File(os.path.join(params['hdf5_dir'], 'xy%03d.hdf5' % fov_id), 'r') as h5f:
+            # normal naming
+            # need to use [:] to get a copy, else it references the closed hdf5 dataset
+            if frames is None:
+                img_stack = h5f['channel_%04d/p%04d_%s' % (peak_id, peak_id, color)][:]
+            else:
+                img_stack = h5f['channel_%04d/p%04d_%s' % (peak_id, peak_id, color)][list(frames)]
+
+    return img_stack
+
+# number of time points in a stack without loading the image data
+def get_stack_length(fov_id, peak_id, color='c1'):
+    '''Returns the number of frames in a channel stack. Reads only the file header.'''
+
+    if params['output'] == 'TIFF':
+        if color[0] == 'c':
+            img_dir = params['chnl_dir']
+        elif 'sub' in color:
+            img_dir = params['sub_dir']
+        elif 'foci' in color:
+            img_dir = params['foci_seg_dir']
+        elif 'pred' in color:
+            img_dir = params['pred_dir']
+        elif 'seg' in color:
+            img_dir = params['seg_dir']
+
+        img_filename = params['experiment_name'] + '_xy%03d_p%04d_%s.tif' % (fov_id, peak_id, color)
+
+        with tiff.TiffFile(os.path.join(img_dir, img_filename)) as tif:
+            stack_length = len(tif.pages)
+
+    if params['output'] == 'HDF5':
+        with hdf5_lock(fov_id), h5py.File(os.path.join(params['hdf5_dir'], 'xy%03d.hdf5' % fov_id), 'r') as h5f:
+            stack_length = h5f['channel_%04d/p%04d_%s' % (peak_id, peak_id, color)].shape[0]
+
+    return stack_length
+
+# saves an image stack to TIFF or HDF5 using mm3 conventions
+def save_stack(image_stack, fov_id, peak_id, color, compress=4):
+    '''
+    Saves an image stack. Counterpart to load_stack.
+
+    Parameters
+    ----------
+    image_stack : np.ndarray
+        The image stack through time. Shape is (t, y, x)
+    fov_id : int
+        The FOV id
+    peak_id : int
+        The peak (channel) id
+    color : str
+        The image stack type, used for the file or dataset name. Can be:
+        sub_cN : subtracted images
+        seg_otsu, seg_unet, ... : segmented images
+        pred_unet : U-net predictions
+        foci_... : segmented foci
+    compress : int
+        Compression level for TIFF output.
+    '''
+
+    if params['output'] == 'TIFF':
+        if 'sub' in color:
+            img_dir = params['sub_dir']
+        elif 'foci' in color:
+            img_dir = params['foci_seg_dir']
+        elif 'pred' in color:
+            img_dir = params['pred_dir']
+        elif 'seg' in color:
+            img_dir = params['seg_dir']
+        else:
+            img_dir = params['chnl_dir']
+
+        img_filename = params['experiment_name'] + '_xy%03d_p%04d_%s.tif' % (fov_id, peak_id, color)
+        tiff.imsave(os.path.join(img_dir, img_filename), image_stack, compress=compress)
+
+    if params['output'] == 'HDF5':
+        with hdf5_lock(fov_id), h5py.File(os.path.join(params['hdf5_dir'], 'xy%03d.hdf5' % fov_id), 'r+') as h5f:
+            # put the stack in the correct channel group
+            h5g = h5f['channel_%04d' % peak_id]
+
+            # delete the dataset if it exists (important for debug)
+            if 'p%04d_%s' % (peak_id, color) in h5g:
+                del h5g['p%04d_%s' % (peak_id, color)]
+
+            h5g.create_dataset(u'p%04d_%s' % (peak_id, color),
+                               data=image_stack,
+                               chunks=(1, image_stack.shape[1], image_stack.shape[2]),
+                               maxshape=(None, image_stack.shape[1], image_stack.shape[2]),
+                               compression="gzip", shuffle=True, fletcher32=True)
+
+    return
+
+### region tables
+def save_region_table(table, fov_id, peak_id, color):
+    '''
+    Saves the region table of a segmented stack next to the stack. For TIFF
+    output this is a .npz file with the name of the stack, for HDF5 a group with
+    one dataset per column in the channel group.
+
+    Parameters
+    ----------
+    table : dict
+        Column name : np.ndarray, see mm3_tracking.make_region_table.
+    color : str
+        Color of the segmented stack the table was made from.
+    '''
+
+    if params['output'] == 'TIFF':
+        table_filename = params['experiment_name'] + '_xy%03d_p%04d_%s_regions.npz' % (fov_id, peak_id, color)
+        table_path = os.path.join(get_stack_dir(color), table_filename)
+        # write then rename, so a reader never sees a partial table
+        with open(table_path + '.tmp', 'wb') as table_file:
+            np.savez(table_file, **table)
+        os.rename(table_path + '.tmp', table_path)
+
+    if params['output'] == 'HDF5':
+        with hdf5_lock(fov_id), h5py.File(os.path.join(params['hdf5_dir'], 'xy%03d.hdf5' % fov_id), 'r+') as h5f:
+            h5g = h5f['channel_%04d' % peak_id]
+            group_name = 'p%04d_%s_regions' % (peak_id, color)
+            if group_name in h5g:
+                del h5g[group_name]
+            table_group = h5g.create_group(group_name)
+            for column, values in six.iteritems(table):
+                table_group.create_dataset(column, data=values)
+
+    return
+
+def load_region_table(fov_id, peak_id, color):
+    '''Loads a region table saved with save_region_table. Raises IOError if
+    there is none.'''
+
+    if params['output'] == 'TIFF':
+        table_filename = params['experiment_name'] + '_xy%03d_p%04d_%s_regions.npz' % (fov_id, peak_id, color)
+        with np.load(os.path.join(get_stack_dir(color), table_filename)) as table_file:
+            return {column : table_file[column] for column in table_file.files}
+
+    if params['output'] == 'HDF5':
+        with hdf5_lock(fov_id), h5py.File(os.path.join(params['hdf5_dir'], 'xy%03d.hdf5' % fov_id), 'r') as h5f:
+            group_name = 'channel_%04d/p%04d_%s_regions' % (peak_id, peak_id, color)
+            if group_name not in h5f:
+                raise IOError('No region table {} in FOV {}.'.format(group_name, fov_id))
+            return {column : np.asarray(h5f[group_name][column][()]) for column in h5f[group_name]}
+
+### lineage tables
+def get_lineage_table_path(fov_id, peak_id):
+    'Path of the lineage table of one channel, in the lineages folder of cell_dir.'
+
+    table_filename = params['experiment_name'] + '_xy%03d_p%04d_lineage.npz' % (fov_id, peak_id)
+    return os.path.join(params['lineage_dir'], table_filename)
+
+def save_lineage_table(table, fov_id, peak_id):
+    '''
+    Saves the cells of one channel as a .npz file with one array per column.
+    Lineages are made per channel in worker processes, which write their table
+    so the cells do not have to be sent back to the main process.
+
+    Parameters
+    ----------
+    table : dict
+        Column name : np.ndarray, see mm3_tracking.CellStore.to_table.
+    '''
+
+    table_path = get_lineage_table_path(fov_id, peak_id)
+    # write then rename, so a reader never sees a partial table
+    with open(table_path + '.tmp', 'wb') as table_file:
+        np.savez(table_file, **table)
+    os.rename(table_path + '.tmp', table_path)
+
+    return
+
+def load_lineage_table(fov_id, peak_id):
+    '''Loads a lineage table saved with save_lineage_table.'''
+
+    with np.load(get_lineage_table_path(fov_id, peak_id)) as table_file:
+        return {column : table_file[column] for column in table_file.files}
+
+def get_track_predictions_path(fov_id, peak_id):
+    'Path of the saved tracking model predictions of one channel, in track_dir.'
+
+    predictions_filename = params['experiment_name'] + '_xy%03d_p%04d_track_predictions.npz' % (fov_id, peak_id)
+    return os.path.join(params['track_dir'], predictions_filename)
+
+def track_predictions_key(stack_checksum, model_checksums):
+    '''Key of the tracking model predictions of a channel, from the array_checksum
+    of its segmented stack and the file_checksum of each model.'''
+
+    return hashlib.sha1('|'.join([stack_checksum] + list(model_checksums)).encode()).hexdigest()
+
+def save_track_predictions(predictions_dict, fov_id, peak_id, key):
+    '''
+    Saves the tracking model predictions of one channel, so the linker can be run
+    again, e.g. with other thresholds, without running the models.
+
+    Parameters
+    ----------
+    predictions_dict : dict
+        '<model>_predictions' : np.ndarray
+    key : str
+        See track_predictions_key. load_track_predictions only returns the
+        predictions for the same key.
+    '''
+
+    if not os.path.exists(params['track_dir']):
+        os.makedirs(params['track_dir'])
+
+    predictions_path = get_track_predictions_path(fov_id, peak_id)
+    # write then rename, so a reader never sees partial predictions
+    with open(predictions_path + '.tmp', 'wb') as predictions_file:
+        np.savez(predictions_file, cache_key=np.array(key), **predictions_dict)
+    os.rename(predictions_path + '.tmp', predictions_path)
+
+    return
+
+def load_track_predictions(fov_id, peak_id, key):
+    '''Loads predictions saved with save_track_predictions. Returns None if there
+    are none, or if they were made with another key.'''
+
+    try:
+        with np.load(get_track_predictions_path(fov_id, peak_id)) as predictions_file:
+            if str(predictions_file['cache_key']) != key:
+                return None
+            return {name : predictions_file[name] for name in predictions_file.files
+                    if name != 'cache_key'}
+    except (IOError, KeyError, ValueError):
+        return None
+
+### result cache
+def array_checksum(array):
+    'SHA-1 of the shape, dtype and pixel data of an image stack.'
+
+    array = np.ascontiguousarray(array)
+    sha = hashlib.sha1()
+    sha.update(str((array.shape, array.dtype.str)).encode())
+    sha.update(array.data)
+
+    return sha.hexdigest()
+
+def file_checksum(path):
+    'SHA-1 of a file, or of all files in a directory (e.g. a SavedModel).'
+
+    sha = hashlib.sha1()
+    if os.path.isdir(path):
+        paths = []
+        for root, _, file_names in os.walk(path):
+            paths.extend([os.path.join(root, file_name) for file_name in file_names])
+    else:
+        paths = [path]
+
+    for file_path in sorted(paths):
+        sha.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, 'rb') as in_file:
+            for block in iter(lambda: in_file.read(1 << 20), b''):
+                sha.update(block)
+
+    return sha.hexdigest()
+
+def get_stack_dir(color):
+    'Directory of TIFF stacks of this color, as used by load_stack and save_stack.'
+
+    if 'sub' in color:
+        return params['sub_dir']
+    elif 'foci' in color:
+        return params['foci_seg_dir']
+    elif 'pred' in color:
+        return params['pred_dir']
+    elif 'seg' in color:
+        return params['seg_dir']
+    return params['chnl_dir']
+
+def stack_exists(fov_id, peak_id, color):
+    'True if the stack that save_stack would write for this color is on disk.'
+
+    if params['output'] == 'TIFF':
+        img_filename = params['experiment_name'] + '_xy%03d_p%04d_%s.tif' % (fov_id, peak_id, color)
+        return os.path.exists(os.path.join(get_stack_dir(color), img_filename))
+
+    if params['output'] == 'HDF5':
+        hdf5_filename = os.path.join(params['hdf5_dir'], 'xy%03d.hdf5' % fov_id)
+        if not os.path.exists(hdf5_filename):
+            return False
+        with hdf5_lock(fov_id), h5py.File(hdf5_filename, 'r') as h5f:
+            return 'channel_%04d/p%04d_%s' % (peak_id, peak_id, color) in h5f
+
+    return False
+
+class ResultCache():
+    '''
+    Skips (fov_id, peak_id) outputs of a stage that are already up to date.
+
+    The fingerprint of an output is the SHA-1 of the checksums of its input stacks,
+    the checksum of the model file and the values of the parameters that change the
+    result. It is saved in params['fingerprint_dir'] once the outputs are written.
+    When a later run finds the same fingerprint and the outputs still exist, the
+    peak is skipped.
+
+    Usage:
+        fingerprint = cache.fingerprint(fov_id, peak_id, [image_stack])
+        if cache.is_current(fov_id, peak_id, output_colors):
+            continue
+        ... compute and save outputs ...
+        cache.record(fov_id, peak_id)
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage, e.g. 'subtract_c1' or 'segment_unet'.
+    param_keys : list of str
+        Parameters that change the result, as dotted paths into params, e.g.
+        'segment.cell_class_threshold'. A whole section can be given.
+    model_file : str
+        Model used by the stage, if any.
+    force : bool
+        Never skip, but still record fingerprints for the next run.
+    '''
+
+    def __init__(self, stage, param_keys, model_file=None, force=False):
+        self.stage = stage
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self.pending = {} # (fov_id, peak_id) : fingerprint not yet recorded
+
+        param_values = {}
+        for key in param_keys:
+            value = params
+            for part in key.split('.'):
+                value = value.get(part) if isinstance(value, dict) else None
+            param_values[key] = value
+        self.params_checksum = hashlib.sha1(json.dumps(param_values, sort_keys=True,
+                                                       default=str).encode()).hexdigest()
+
+        self.model_checksum = file_checksum(model_file) if model_file else ''
+
+        if not os.path.exists(params['fingerprint_dir']):
+            os.makedirs(params['fingerprint_dir'])
+
+    def fingerprint_path(self, fov_id, peak_id):
+        return os.path.join(params['fingerprint_dir'],
+                            'xy%03d_p%04d_%s.txt' % (fov_id, peak_id, self.stage))
+
+    def fingerprint(self, fov_id, peak_id, inputs):
+        '''Computes the fingerprint of one output from its inputs, which are image
+        stacks or checksums already computed with array_checksum.'''
+
+        input_checksums = [item if isinstance(item, str) else array_checksum(item) for item in inputs]
+        fingerprint = hashlib.sha1('|'.join([self.stage, self.model_checksum, self.params_checksum]
+                                            + input_checksums).encode()).hexdigest()
+        self.pending[(fov_id, peak_id)] = fingerprint
+
+        return fingerprint
+
+    def is_current(self, fov_id, peak_id, output_colors):
+        '''True if the saved fingerprint matches the one just computed and all
+        outputs exist. Counts the hit or miss.'''
+
+        current = False
+        if not self.force and all([stack_exists(fov_id, peak_id, color) for color in output_colors]):
+            try:
+                with open(self.fingerprint_path(fov_id, peak_id), 'r') as fingerprint_file:
+                    current = fingerprint_file.read().strip() == self.pending[(fov_id, peak_id)]
+            except IOError:
+                pass
+
+        if current:
+            self.hits += 1
+            del self.pending[(fov_id, peak_id)]
+        else:
+            self.misses += 1
+
+        return current
+
+    def record(self, fov_id, peak_id):
+        'Saves the fingerprint after the outputs of a peak have been written.'
+
+        fingerprint = self.pending.pop((fov_id, peak_id), None)
+        if fingerprint is None:
+            return
+
+        # write then rename, so a crash never leaves a fingerprint for missing outputs
+        path = self.fingerprint_path(fov_id, peak_id)
+        with open(path + '.tmp', 'w') as fingerprint_file:
+            fingerprint_file.write(fingerprint + '\n')
+        os.rename(path + '.tmp', path)
+
+    def forget(self, fov_id, peak_id):
+        'Deletes the saved fingerprint of a peak whose outputs are changed outside the stage.'
+
+        self.pending.pop((fov_id, peak_id), None)
+        try:
+            os.remove(self.fingerprint_path(fov_id, peak_id))
+        except OSError:
+            pass
+
+    def summary(self):
+        information('Result cache {}: {} up to date and skipped, {} computed.'.format(
+                    self.stage, self.hits, self.misses))
+
+# load the time table and add it to the global params
+def load_time_table():
+    '''Add the time table dictionary to the params global dictionary.
+    This is so it can be used during Cell creation.
+    '''
+
+    # try first for yaml, then for pkl
+    try:
+        with open(os.path.join(params['ana_dir'], 'time_table.yaml'), 'rb') as time_table_file:
+            params['time_table'] = yaml.safe_load(time_table_file)
+    except:
+        with open(os.path.join(params['ana_dir'], 'time_table.pkl'), 'rb') as time_table_file:
+            params['time_table'] = pickle.load(time_table_file)
+
+    return
+
+# function for loading the channel masks
+def load_channel_masks():
+    '''Load channel masks dictionary. Should be .yaml but try pickle too.
+    '''
+    information("Loading channel masks dictionary.")
+
+    # try loading from .yaml before .pkl
+    try:
+        information('Path:', os.path.join(params['ana_dir'], 'channel_masks.yaml'))
+        with open(os.path.join(params['ana_dir'], 'channel_masks.yaml'), 'r') as cmask_file:
+            channel_masks = yaml.safe_load(cmask_file)
+    except:
+        warning('Could not load channel masks dictionary from .yaml.')
+
+        try:
+            information('Path:', os.path.join(params['ana_dir'], 'channel_masks.pkl'))
+            with open(os.path.join(params['ana_dir'], 'channel_masks.pkl'), 'rb') as cmask_file:
+                channel_masks = pickle.load(cmask_file)
+        except ValueError:
+            warning('Could not load channel masks dictionary from .pkl.')
+
+    return channel_masks
+
+# function for loading the specs file
+def load_specs():
+    '''Load specs file which indicates which channels should be analyzed, used as empties, or ignored.'''
+
+    try:
+        with open(os.path.join(params['ana_dir'], 'specs.yaml'), 'r') as specs_file:
+            specs = yaml.safe_load(specs_file)
+    except:
+        try:
+            with open(os.path.join(params['ana_dir'], 'specs.pkl'), 'rb') as specs_file:
+                specs = pickle.load(specs_file)
+        except ValueError:
+            warning('Could not load specs file.')
+
+    return specs
+
+# finds metdata in a tiff image which has been expoted with Nikon Elements.
+def get_tif_metadata_elements(tif):
+    '''This function pulls out the metadata from a tif file and returns it as a dictionary.
+    This if tiff files as exported by Nikon Elements as a stacked tiff, each for one tpoint.
+    tif is an opened tif file (using the package tifffile)
+
+
+    arguments:
+        fname (tifffile.TiffFile): TIFF file object from which data will be extracted
+    returns:
+        dictionary of values:
+            'jdn' (float)
+            'x' (float)
+            'y' (float)
+            'plane_names' (list of strings)
+
+    Called by
+    mm3.Compile
+
+    '''
+
+    # image Metadata
+    idata = { 'fov': -1,
+              't' : -1,
+              'jd': -1 * 0.0,
+              'x': -1 * 0.0,
+              'y': -1 * 0.0,
+              'planes': []}
+
+    # get the fov and t simply from the file name
+    idata['fov'] = int(tif.fname.split('xy')[1].split('.tif')[0])
+    idata['t'] = int(tif.fname.split('xy')[0].split('t')[-1])
+
+    # a page is plane, or stack, in the tiff. The other metdata is hidden down in there.
+    for page in tif:
+        for tag in page.tags.values():
+            #print("Checking tag",tag.name,tag.value)
+            t = tag.name, tag.value
+            t_string = u""
+            time_string = u""
+            # Interesting tag names: 65330, 65331 (binary data; good stuff), 65332
+            # we wnat to work with the tag of the name 65331
+            # if the tag name is not in the set of tegs we find interesting then skip this cycle of the loop
+            if tag.name not in ('65331', '65332', 'strip_byte_counts', 'image_width', 'orientation', 'compression', 'new_subfile_type', 'fill_order', 'max_sample_value', 'bits_per_sample', '65328', '65333'):
+                #print("*** " + tag.name)
+                #print(tag.value)
+                pass
+            #if tag.name == '65330':
+            #    return tag.value
+            if tag.name in ('65331'):
+                # make info list a list of the tag values 0 to 65535 by zipoing up a paired list of two bytes, at two byte intervals i.e. ::2
+                # note that 0X100 is hex for 256
+                infolist = [a+b*0x100 for a,b in zip(tag.value[0::2], tag.value[1::2])]
+                # get char values for each element in infolist
+                for c_entry in range(0, len(infolist)):
+                    # the element corresponds to an ascii char for a letter or bracket (and a few other things)
+                    if infolist[c_entry] < 127 and infolist[c_entry] > 64:
+                        # add the letter to the unicode string t_string
+                        t_string += chr(infolist[c_entry])
+                    #elif infolist[c_entry] == 0:
+                    #    continue
+                    else:
+                        t_string += " "
+
+                # this block will find the dTimeAbsolute and print the subsequent integers
+                # index 170 is counting seconds, and rollover of index 170 leads to increment of index 171
+                # rollover of index 171 leads to increment of index 172
+                # get the position of the array by finding the index of the t_string at which dTimeAbsolute is listed not that 2*len(dTimeAbsolute)=26
+                #print(t_string)
+
+                arraypos = t_string.index("dXPos") * 2 + 16
+                xarr = tag.value[arraypos:arraypos+4]
+                b = ''.join(chr(i) for i in xarr)
+                idata['x'] = float(struct.unpack('<f', b)[0])
+
+                arraypos = t_string.index("dYPos") * 2 + 16
+                yarr = tag.value[arraypos:arraypos+4]
+                b = ''.join(chr(i) for i in yarr)
+                idata['y'] = float(struct.unpack('<f', b)[0])
+
+                arraypos = t_string.index("dTimeAbsolute") * 2 + 26
+                shortarray = tag.value[arraypos+2:arraypos+10]
+                b = ''.join(chr(i) for i in shortarray)
+                idata['jd'] = float(struct.unpack('<d', b)[0])
+
+                # extract plane names
+                il = [a+b*0x100 for a,b in zip(tag.value[0::2], tag.value[1::2])]
+                li = [a+b*0x100 for a,b in zip(tag.value[1::2], tag.value[2::2])]
+
+                strings = list(zip(il, li))
+
+                allchars = ""
+                for c_entry in range(0, len(strings)):
+                    if 31 < strings[c_entry][0] < 127:
+                        allchars += chr(strings[c_entry][0])
+                    elif 31 < strings[c_entry][1] < 127:
+                        allchars += chr(strings[c_entry][1])
+                    else:
+                        allchars += " "
+
+                allchars = re.sub(' +',' ', allchars)
+
+                words = allchars.split(" ")
+
+                planes = []
+                for idx in [i for i, x in enumerate(words) if x == "sOpticalConfigName"]:
+                    planes.append(words[idx+1])
+
+                idata['planes'] = planes
+
+    return idata
+
+# finds metdata in a tiff image which has been expoted with nd2ToTIFF.py.
+def get_tif_metadata_nd2ToTIFF(tif):
+    '''This function pulls out the metadata from a tif file and returns it as a dictionary.
+    This if tiff files as exported by the mm3 function mm3_nd2ToTIFF.py. All the metdata
+    is found in that script and saved in json format to the tiff, so it is simply extracted here
+
+    Paramters:
+        tif: TIFF file object from which data will be extracted
+    Returns:
+        dictionary of values:
+            'fov': int,
+            't' : int,
+            'jdn' (float)
+            'x' (float)
+            'y' (float)
+            'planes' (list of strings)
+
+    Called by
+    mm3_Compile.get_tif_params
+
+    '''
+    # get the first page of the tiff and pull out image description
+    # this dictionary should be in the above form
+    idata = tif[0].image_description
+    idata = json.loads(idata.decode('utf-8'))
+
+    return idata
+
+# Finds metadata from the filename
+def get_tif_metadata_filename(tif):
+    '''This function pulls out the metadata from a tif file and returns it as a dictionary.
+    This just gets the tiff metadata from the filename and is a backup option when the known format of the metadata is not known.
+
+    Paramters:
+        tif: TIFF file object from which data will be extracted
+    Returns:
+        dictionary of values:
+            'fov': int,
+            't' : int,
+            'jdn' (float)
+            'x' (float)
+            'y' (float)
+
+    Called by
+    mm3_Compile.get_tif_params
+
+    '''
+    idata = {'fov' : get_fov(tif.filename), # fov id
+             't' : get_time(tif.filename), # time point
+             'jd' : -1 * 0.0, # absolute julian time
+             'x' : -1 * 0.0, # x position on stage [um]
+             'y' : -1 * 0.0} # y position on stage [um]
+
+    return idata
+
+# make a lookup time table for converting nominal time to elapsed time in seconds
+def make_time_table(analyzed_imgs):
+    '''
+    Loops through the analyzed images and uses the jd time in the metadata to find the elapsed
+    time in seconds that each picture was taken. This is later used for more accurate elongation
+    rate calculation.
+
+    Parametrs
+    ---------
+    analyzed_imgs : dict
+        The output of get_tif_params.
+    params['use_jd'] : boolean
+        If set to True, 'jd' time will be used from the image metadata to use to create time table. Otherwise the 't' index will be used, and the parameter 'seconds_per_time_index' will be used from the parameters.yaml file to convert to seconds.
+
+    Returns
+    -------
+    time_table : dict
+        Look up dictionary with keys for the FOV and then the time point.
+    '''
+    information('Making time table...')
+
+    # initialize
+    time_table = {}
+
+    first_time = float('inf')
+
+    # need to go through the data once to find the first time
+    for iname, idata in six.iteritems(analyzed_imgs):
+        if params['use_jd']:
+            if idata['jd'] < first_time:
+                first_time = idata['jd']
+        else:
+            if idata['t'] < first_time:
+                first_time = idata['t']
+
+        # init dictionary for specific times per FOV
+        if idata['fov'] not in time_table:
+            time_table[idata['fov']] = {}
+
+    for iname, idata in six.iteritems(analyzed_imgs):
+        if params['use_jd']:
+            # convert jd time to elapsed time in seconds
+            t_in_seconds = np.around((idata['jd'] - first_time) * 24*60*60, decimals=0).astype('uint32')
+        else:
+            t_in_seconds = np.around((idata['t'] - first_time) * params['moviemaker']['seconds_per_time_index'], decimals=0).astype('uint32')
+
+        time_table[int(idata['fov'])][int(idata['t'])] = int(t_in_seconds)
+
+    # save to .pkl. This pkl will be loaded into the params
+    # with open(os.path.join(params['ana_dir'], 'time_table.pkl'), 'wb') as time_table_file:
+    #     pickle.dump(time_table, time_table_file, protocol=pickle.HIGHEST_PROTOCOL)
+    # with open(os.path.join(params['ana_dir'], 'time_table.txt'), 'w') as time_table_file:
+    #     pprint(time_table, stream=time_table_file)
+    with open(os.path.join(params['ana_dir'], 'time_table.yaml'), 'w') as time_table_file:
+        yaml.dump(data=time_table, stream=time_table_file, default_flow_style=False, tags=None)
+    information('Time table saved.')
+
+    return time_table
@@ -0,0 +1,1295 @@
+#!/usr/bin/env python3
+'''
+Deep learning: U-net segmentation of cells, foci and traps, the Keras data
+generators, losses and metrics, and loading of the tracking models.
+
+This module imports tensorflow, so mm3_helpers does not import it. Scripts
+import mm3_ml where they load a model, so scripts that do not need one start
+quickly.
+'''
+from __future__ import print_function, division
+import six
+
+# import modules
+import os # interacting with file systems
+import collections
+import warnings # error messaging
+import numpy as np # numbers package
+import h5py # working with HDF5 files
+
+# image analysis
+from skimage import io
+from skimage import morphology
+from skimage import util
+from skimage.external import tifffile as tiff
+
+# deep learning
+import tensorflow as tf # ignore message about how tf was compiled
+from tensorflow.keras import losses
+from tensorflow.keras import utils
+from tensorflow.keras import backend as K
+# os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3' # supress warnings
+
+# Parralelization modules
+from multiprocessing.pool import ThreadPool
+
+import mm3_preprocessing as preprocessing # vectorized stack preprocessing
+import mm3_inference as inference # CPU inference backend for converted models
+from mm3_io import params, information, load_stack, save_stack
+from mm3_image import (get_pad_distances, get_bucket_shape, label_prediction_stack,
+                        encode_predictions, label_cells_unet)
+from mm3_tracking import make_track_features, region_table_from_regions
+
+# load a Keras model, or a .tflite model made by aux/mm3_ConvertModel.py
+def load_model(model_file, custom_objects=None):
+    '''
+    Loads a model for inference. Use this instead of models.load_model so that
+    converted CPU models (.tflite) can be given anywhere a .hdf5 model is expected.
+
+    If inference: model_server is set and a model server (mm3_ModelServer.py) of
+    this user is running, the model is kept warm there and a client is returned
+    instead. Otherwise the model is loaded in this process.
+
+    All kinds of model have predict, predict_on_batch and predict_generator.
+    '''
+
+    num_threads = None
+    socket_path = None
+    if 'inference' in params.keys():
+        num_threads = params['inference'].get('num_threads')
+        # blank or False turns the server off, True uses the default socket
+        model_server = params['inference'].get('model_server')
+        if model_server is True:
+            socket_path = inference.default_socket_path()
+        elif model_server:
+            socket_path = model_server
+
+    if socket_path and inference.server_available(socket_path):
+        information('Using model server at {} for {}.'.format(socket_path, model_file))
+        return inference.RemoteModel(model_file, socket_path=socket_path)
+
+    return inference.load_model(model_file, custom_objects=custom_objects,
+                                num_threads=num_threads)
+
+def tileImage(img, subImageNumber):
+    divisor = int(np.sqrt(subImageNumber))
+    M = img.shape[0]//divisor
+    N = img.shape[0]//divisor
+    #print(img.shape, M, N, divisor, subImageNumber)
+    tiles = np.asarray([img[x:x+M,y:y+N] for x in range(0,img.shape[0],M) for y in range(0,img.shape[1],N)])
+    return(tiles)
+
+def get_weights(img, subImageNumber):
+    divisor = int(np.sqrt(subImageNumber))
+    M = img.shape[0]//divisor
+    N = img.shape[0]//divisor
+    weights = np.ones((img.shape[0],img.shape[1]),dtype='uint8')
+    for i in range(divisor-1):
+        weights[(M*(i+1))-25:(M*(i+1)+25),:] = 0
+        weights[:,(N*(i+1))-25:(N*(i+1)+25)] = 0
+    return(weights)
+
+def permute_image(img, trap_align_metadata):
+    # are there three dimensions?
+    if len(img.shape) == 3:
+        if img.shape[0] < 3: # for tifs with fewer than three imageing channels, the first dimension separates channels
+            # img = np.transpose(img, (1,2,0))
+            img = img[trap_align_metadata['phase_plane_index'],:,:] # grab just the phase channel
+        else:
+            img = img[:,:,trap_align_metadata['phase_plane_index']] # grab just the phase channel
+
+    return(img)
+
+def imageConcatenatorFeatures(imgStack, subImageNumber = 64):
+
+    rowNumPerImage = int(np.sqrt(subImageNumber)) # here I'm assuming our large images are square, with equal number of crops in each dimension
+    #print(rowNumPerImage)
+    imageNum = int(imgStack.shape[0]/subImageNumber) # total number of sub-images divided by the number of sub-images in each original large image
+    iterNum = int(imageNum*rowNumPerImage)
+    imageDims = int(np.sqrt(imgStack.shape[1]*imgStack.shape[2]*subImageNumber))
+    featureNum = int(imgStack.shape[3])
+    bigImg = np.zeros(shape=(imageNum, imageDims, imageDims, featureNum), dtype='float32') # create array to store reconstructed images
+
+    featureRowDicts = []
+
+    for j in range(featureNum):
+
+        rowDict = {}
+
+        for i in range(iterNum):
+            baseNum = int(i*iterNum/imageNum)
+            # concatenate columns of 256x256 images to build each 256x2048 row
+            rowDict[i] = np.column_stack((imgStack[baseNum,:,:,j],imgStack[baseNum+1,:,:,j],
+                                          imgStack[baseNum+2,:,:,j], imgStack[baseNum+3,:,:,j]))#,
+                                          #imgStack[baseNum+4,:,:,j],imgStack[baseNum+5,:,:,j],
+                                          #imgStack[baseNum+6,:,:,j],imgStack[baseNum+7,:,:,j]))
+        featureRowDicts.append(rowDict)
+
+    for j in range(featureNum):
+
+        for i in range(imageNum):
+            baseNum = int(i*rowNumPerImage)
+            # concatenate appropriate 256x2048 rows to build a 2048x2048 image and place it into bigImg
+            bigImg[i,:,:,j] = np.row_stack((featureRowDicts[j][baseNum],featureRowDicts[j][baseNum+1],
+                                            featureRowDicts[j][baseNum+2],featureRowDicts[j][baseNum+3]))#,
+                                            #featureRowDicts[j][baseNum+4],featureRowDicts[j][baseNum+5],
+                                            #featureRowDicts[j][baseNum+6],featureRowDicts[j][baseNum+7]))
+
+    return(bigImg)
+
+def imageConcatenatorFeatures2(imgStack, subImageNumber = 81):
+
+    rowNumPerImage = int(np.sqrt(subImageNumber)) # here I'm assuming our large images are square, with equal number of crops in each dimension
+    imageNum = int(imgStack.shape[0]/subImageNumber) # total number of sub-images divided by the number of sub-images in each original large image
+    iterNum = int(imageNum*rowNumPerImage)
+    imageDims = int(np.sqrt(imgStack.shape[1]*imgStack.shape[2]*subImageNumber))
+    featureNum = int(imgStack.shape[3])
+    bigImg = np.zeros(shape=(imageNum, imageDims, imageDims, featureNum), dtype='float32') # create array to store reconstructed images
+
+    featureRowDicts = []
+
+    for j in range(featureNum):
+
+        rowDict = {}
+
+        for i in range(iterNum):
+            baseNum = int(i*iterNum/imageNum)
+            # concatenate columns of 256x256 images to build each 256x2048 row
+            rowDict[i] = np.column_stack((imgStack[baseNum,:,:,j],imgStack[baseNum+1,:,:,j],
+                                          imgStack[baseNum+2,:,:,j], imgStack[baseNum+3,:,:,j],
+                                          imgStack[baseNum+4,:,:,j]))#,imgStack[baseNum+5,:,:,j],
+                                          #imgStack[baseNum+6,:,:,j],imgStack[baseNum+7,:,:,j],
+                                         #imgStack[baseNum+8,:,:,j]))
+        featureRowDicts.append(rowDict)
+
+    for j in range(featureNum):
+
+        for i in range(imageNum):
+            baseNum = int(i*rowNumPerImage)
+            # concatenate appropriate 256x2048 rows to build a 2048x2048 image and place it into bigImg
+            bigImg[i,:,:,j] = np.row_stack((featureRowDicts[j][baseNum],featureRowDicts[j][baseNum+1],
+                                            featureRowDicts[j][baseNum+2],featureRowDicts[j][baseNum+3],
+                                            featureRowDicts[j][baseNum+4]))#,featureRowDicts[j][baseNum+5],
+                                            #featureRowDicts[j][baseNum+6],featureRowDicts[j][baseNum+7],
+                                            #featureRowDicts[j][baseNum+8]))
+
+    return(bigImg)
+
+def get_weights_array(arr=np.zeros((2048,2048)), shiftDistance=128, subImageNumber=64, padSubImageNumber=81):
+
+    originalImageWeights = get_weights(arr, subImageNumber=subImageNumber)
+    shiftLeftWeights = np.pad(originalImageWeights, pad_width=((0,0),(0,shiftDistance)),
+                      mode='constant', constant_values=((0,0),(0,0)))[:,shiftDistance:]
+    shiftRightWeights = np.pad(originalImageWeights, pad_width=((0,0),(shiftDistance,0)),
+                      mode='constant', constant_values=((0,0),(0,0)))[:,:(-1*shiftDistance)]
+    shiftUpWeights = np.pad(originalImageWeights, pad_width=((0,shiftDistance),(0,0)),
+                      mode='constant', constant_values=((0,0),(0,0)))[shiftDistance:,:]
+    shiftDownWeights = np.pad(originalImageWeights, pad_width=((shiftDistance,0),(0,0)),
+                      mode='constant', constant_values=((0,0),(0,0)))[:(-1*shiftDistance),:]
+    expandedImageWeights = get_weights(np.zeros((arr.shape[0]+2*shiftDistance,arr.shape[1]+2*shiftDistance)), subImageNumber=padSubImageNumber)[shiftDistance:-shiftDistance,shiftDistance:-shiftDistance]
+
+    allWeights = np.stack((originalImageWeights, expandedImageWeights, shiftUpWeights, shiftDownWeights, shiftLeftWeights,shiftRightWeights), axis=-1)
+    stackWeights = np.stack((allWeights,allWeights),axis=0)
+    stackWeights = np.stack((stackWeights,stackWeights,stackWeights),axis=3)
+    return(stackWeights)
+
+# predicts locations of channels in an image using deep learning model
+def get_frame_predictions(img,model,stackWeights, shiftDistance=256, subImageNumber=16, padSubImageNumber=25, debug=False):
+
+    pred = predict_first_image_channels(img, model, shiftDistance=shiftDistance,
+                                     subImageNumber=subImageNumber, padSubImageNumber=padSubImageNumber, debug=debug)[0,...]
+    # print(pred.shape)
+    if debug:
+        print(pred.shape)
+
+
+    compositePrediction = np.average(pred, axis=3, weights=stackWeights)
+    # print(compositePrediction.shape)
+
+    padSize = (compositePrediction.shape[0]-img.shape[0])//2
+    compositePrediction = util.crop(compositePrediction,((padSize,padSize),
+                                                        (padSize,padSize),
+                                                        (0,0)))
+    # print(compositePrediction.shape)
+
+    return(compositePrediction)
+
+def apply_median_filter_normalize(imgs):
+
+    # median filter each image and normalize it to its own max
+    imgs = preprocessing.median_normalize_stack(imgs[...,0], 3, per_frame=True,
+                                                normalize_median=True)
+
+    return(np.expand_dims(imgs, axis=-1))
+
+def predict_first_image_channels(img, model,
+                              subImageNumber=16, padSubImageNumber=25,
+                              shiftDistance=128, batchSize=1,
+                              debug=False):
+    imgSize = img.shape[0]
+    padSize = (2048-imgSize)//2 # how much to pad on each side to get up to 2048x2048?
+    imgStack = np.pad(img, pad_width=((padSize,padSize),(padSize,padSize)),
+                      mode='constant', constant_values=((0,0),(0,0))) # pad the images to make them 2048x2048
+    # pad the stack by 128 pixels on each side to get complemetary crops that I can run the network on. This
+    #    should help me fill in low-confidence regions where the crop boundaries were for the original image
+    imgStackExpand = np.pad(imgStack, pad_width=((shiftDistance,shiftDistance),(shiftDistance,shiftDistance)),
+                            mode='constant', constant_values=((0,0),(0,0)))
+    imgStackShiftRight = np.pad(imgStack, pad_width=((0,0),(0,shiftDistance)),
+                                mode='constant', constant_values=((0,0),(0,0)))[:,shiftDistance:]
+    imgStackShiftLeft = np.pad(imgStack, pad_width=((0,0),(shiftDistance,0)),
+                                mode='constant', constant_values=((0,0),(0,0)))[:,:-shiftDistance]
+    imgStackShiftDown = np.pad(imgStack, pad_width=((0,shiftDistance),(0,0)),
+                               mode='constant', constant_values=((0,0),(0,0)))[shiftDistance:,:]
+    imgStackShiftUp = np.pad(imgStack, pad_width=((shiftDistance,0),(0,0)),
+                               mode='constant', constant_values=((0,0),(0,0)))[:-shiftDistance,:]
+    #print(imgStackShiftUp.shape)
+
+    crops = tileImage(imgStack, subImageNumber=subImageNumber)
+    crops = np.expand_dims(crops, -1)
+
+    data_gen_args = {'batch_size':params['compile']['channel_prediction_batch_size'],
+                         'n_channels':1,
+                         'normalize_to_one':True,
+                         'shuffle':False}
+    predict_gen_args = {'verbose':1,
+                        'use_multiprocessing':True,
+                        'workers':params['num_analyzers']}
+
+    img_generator = TrapSegmentationDataGenerator(crops, **data_gen_args)
+    predictions = model.predict_generator(img_generator, **predict_gen_args)
+    prediction = imageConcatenatorFeatures(predictions, subImageNumber=subImageNumber)
+    #print(prediction.shape)
+
+    cropsExpand = tileImage(imgStackExpand, subImageNumber=padSubImageNumber)
+    cropsExpand = np.expand_dims(cropsExpand, -1)
+    img_generator = TrapSegmentationDataGenerator(cropsExpand, **data_gen_args)
+    predictions = model.predict_generator(img_generator, **predict_gen_args)
+    predictionExpand = imageConcatenatorFeatures2(predictions, subImageNumber=padSubImageNumber)
+    predictionExpand = util.crop(predictionExpand, ((0,0),(shiftDistance,shiftDistance),(shiftDistance,shiftDistance),(0,0)))
+    #print(predictionExpand.shape)
+
+    cropsShiftLeft = tileImage(imgStackShiftLeft, subImageNumber=subImageNumber)
+    cropsShiftLeft = np.expand_dims(cropsShiftLeft, -1)
+    img_generator = TrapSegmentationDataGenerator(cropsShiftLeft, **data_gen_args)
+    predictions = model.predict_generator(img_generator, **predict_gen_args)
+    predictionLeft = imageConcatenatorFeatures(predictions, subImageNumber=subImageNumber)
+    predictionLeft = np.pad(predictionLeft, pad_width=((0,0),(0,0),(0,shiftDistance),(0,0)),
+                      mode='constant', constant_values=((0,0),(0,0),(0,0),(0,0)))[:,:,shiftDistance:,:]
+    #print(predictionLeft.shape)
+
+    cropsShiftRight = tileImage(imgStackShiftRight, subImageNumber=subImageNumber)
+    cropsShiftRight = np.expand_dims(cropsShiftRight, -1)
+    img_generator = TrapSegmentationDataGenerator(cropsShiftRight, **data_gen_args)
+    predictions = model.predict_generator(img_generator, **predict_gen_args)
+    predictionRight = imageConcatenatorFeatures(predictions, subImageNumber=subImageNumber)
+    predictionRight = np.pad(predictionRight, pad_width=((0,0),(0,0),(shiftDistance,0),(0,0)),
+                      mode='constant', constant_values=((0,0),(0,0),(0,0),(0,0)))[:,:,:(-1*shiftDistance),:]
+    #print(predictionRight.shape)
+
+    cropsShiftUp = tileImage(imgStackShiftUp, subImageNumber=subImageNumber)
+    #print(cropsShiftUp.shape)
+    cropsShiftUp = np.expand_dims(cropsShiftUp, -1)
+    img_generator = TrapSegmentationDataGenerator(cropsShiftUp, **data_gen_args)
+    predictions = model.predict_generator(img_generator, **predict_gen_args)
+    predictionUp = imageConcatenatorFeatures(predictions, subImageNumber=subImageNumber)
+    predictionUp = np.pad(predictionUp, pad_width=((0,0),(0,shiftDistance),(0,0),(0,0)),
+                      mode='constant', constant_values=((0,0),(0,0),(0,0),(0,0)))[:,shiftDistance:,:,:]
+    #print(predictionUp.shape)
+
+    cropsShiftDown = tileImage(imgStackShiftDown, subImageNumber=subImageNumber)
+    cropsShiftDown = np.expand_dims(cropsShiftDown, -1)
+    img_generator = TrapSegmentationDataGenerator(cropsShiftDown, **data_gen_args)
+    predictions = model.predict_generator(img_generator, **predict_gen_args)
+    predictionDown = imageConcatenatorFeatures(predictions, subImageNumber=subImageNumber)
+    predictionDown = np.pad(predictionDown, pad_width=((0,0),(shiftDistance,0),(0,0),(0,0)),
+                      mode='constant', constant_values=((0,0),(0,0),(0,0),(0,0)))[:,:(-1*shiftDistance),:,:]
+    #print(predictionDown.shape)
+
+    allPredictions = np.stack((prediction, predictionExpand,
+                               predictionUp, predictionDown,
+                               predictionLeft, predictionRight), axis=-1)
+
+    return(allPredictions)
+
+# loss functions for model
+def dice_coeff(y_true, y_pred):
+    smooth = 1.
+    # Flatten
+    y_true_f = tf.reshape(y_true, [-1])
+    y_pred_f = tf.reshape(y_pred, [-1])
+    intersection = tf.reduce_sum(y_true_f * y_pred_f)
+    score = (2. * intersection + smooth) / (tf.reduce_sum(y_true_f) + tf.reduce_sum(y_pred_f) + smooth)
+    return score
+
+def dice_loss(y_true, y_pred):
+    loss = 1 - dice_coeff(y_true, y_pred)
+    return loss
+
+def bce_dice_loss(y_true, y_pred):
+    loss = losses.binary_crossentropy(y_true, y_pred) + dice_loss(y_true, y_pred)
+    return loss
+
+def tversky_loss(y_true, y_pred):
+    alpha = 0.5
+    beta  = 0.5
+
+    ones = K.ones((512,512,3)) #K.ones(K.shape(y_true))
+    p0 = y_pred      # proba that voxels are class i
+    p1 = ones-y_pred # proba that voxels are not class i
+    g0 = y_true
+    g1 = ones-y_true
+
+    num = K.sum(p0*g0, (0,1,2))
+    den = num + alpha*K.sum(p0*g1,(0,1,2)) + beta*K.sum(p1*g0,(0,1,2))
+
+    T = K.sum(num/den) # when summing over classes, T has dynamic range [0 Ncl]
+
+    Ncl = K.cast(K.shape(y_true)[-1], 'float32')
+    return Ncl-T
+
+def cce_tversky_loss(y_true, y_pred):
+    loss = losses.categorical_crossentropy(y_true, y_pred) + tversky_loss(y_true, y_pred)
+    return loss
+
+def segment_cells_unet(ana_peak_ids, fov_id, pad_dict, unet_shape, model):
+    '''
+    Segments the given peaks of one FOV with the U-net. Frames from all peaks
+    are batched together, see segment_peaks_unet.
+    '''
+
+    peak_jobs = [(fov_id, peak_id, pad_dict, unet_shape) for peak_id in ana_peak_ids]
+    segment_peaks_unet(peak_jobs, model)
+
+    return
+
+def segment_peaks_unet(peak_jobs, model, cache=None):
+    '''
+    Inference scheduler for U-net cell segmentation.
+
+    Normalized and padded frames from all peaks are streamed into batches of
+    params['segment']['batch_size'] frames, regardless of which peak they come
+    from. Each batch is predicted as a plain numpy array and the predictions are
+    split back by peak. Loading and preprocessing of the next batch and post
+    processing and saving of finished peaks run in background threads while the
+    model is predicting. The threads take turns with the HDF5 file of a FOV, see
+    mm3_io.hdf5_lock.
+
+    Parameters
+    ----------
+    peak_jobs : list of tuples
+        (fov_id, peak_id, pad_dict, unet_shape) for every peak to segment, see
+        get_unet_peak_jobs. Peaks from different FOVs can be mixed.
+    model : TensorFlow model
+    cache : ResultCache
+        Skip peaks whose outputs are up to date with their phase stack, the
+        model and the segmentation parameters.
+
+    Calls
+    mm3.iter_unet_batches
+    mm3.postprocess_cells_unet
+    '''
+
+    batch_size = params['segment']['batch_size']
+
+    # one thread prepares batches ahead of the model, one post processes and writes
+    loader = ThreadPool(processes=1)
+    writer = ThreadPool(processes=1)
+    written = []
+
+    batch_iter = iter_unet_batches(peak_jobs, batch_size, cache=cache)
+    next_batch = loader.apply_async(next, (batch_iter, None))
+
+    peak_preds = {} # (fov_id, peak_id) : list of prediction arrays for that peak, in time order
+    while True:
+        batch = next_batch.get()
+        if batch is None:
+            break
+        # start preparing the following batch while this one is predicted
+        next_batch = loader.apply_async(next, (batch_iter, None))
+
+        images, owners = batch
+        predictions = np.asarray(model.predict_on_batch(images))
+
+        # split the predictions back by peak
+        batch_idx = 0
+        for fov_id, peak_id, pad_dict, unet_shape, n_frames, stack_length in owners:
+            preds = peak_preds.setdefault((fov_id, peak_id), [])
+            preds.append(predictions[batch_idx:batch_idx+n_frames])
+            batch_idx += n_frames
+
+            # peak is complete, hand it to the writer
+            if sum([pred.shape[0] for pred in preds]) == stack_length:
+                peak_stack = np.concatenate(peak_preds.pop((fov_id, peak_id)), axis=0)
+                written.append(writer.apply_async(postprocess_cells_unet,
+                                                  (peak_stack, fov_id, peak_id, pad_dict, unet_shape, cache)))
+
+    loader.close()
+    writer.close()
+    writer.join()
+    loader.join()
+
+    # raise any errors from the background threads
+    for result in written:
+        result.get()
+
+    return
+
+def iter_unet_batches(peak_jobs, batch_size, cache=None):
+    '''
+    Generator of batches of preprocessed frames for segment_peaks_unet.
+
+    A batch only holds frames of one input shape. Peaks are grouped by shape, so
+    with the fixed trained shape this is one group. With variable size inference
+    the number of frames per batch is scaled so that a batch has about as many
+    pixels as batch_size frames of the trained shape. Peaks that the cache
+    finds up to date are left out.
+
+    Yields
+    ------
+    images : np.ndarray
+        Shape (n, height, width, 1). The last batch of each shape may be smaller.
+    owners : list of tuples
+        (fov_id, peak_id, pad_dict, unet_shape, n_frames, stack_length) for each
+        consecutive run of frames in the batch.
+    '''
+
+    trained_area = params['segment']['trained_model_image_height'] * \
+                   params['segment']['trained_model_image_width']
+
+    output_colors = [params['seg_img']]
+    if params['segment']['save_predictions']:
+        output_colors.append(params['pred_img'])
+
+    # stable sort, so peaks keep their order within a shape
+    peak_jobs = sorted(peak_jobs, key=lambda job: job[3])
+
+    images = []
+    owners = []
+    n_batch = 0
+    batch_shape = None
+    for fov_id, peak_id, pad_dict, unet_shape in peak_jobs:
+        # batches can not mix shapes
+        if unet_shape != batch_shape:
+            if n_batch:
+                yield np.concatenate(images, axis=0), owners
+                images = []
+                owners = []
+                n_batch = 0
+            batch_shape = unet_shape
+            batch_frames = max(1, int(batch_size * trained_area // (unet_shape[0] * unet_shape[1])))
+
+        img_stack = load_stack(fov_id, peak_id, color=params['phase_plane'])
+
+        if cache is not None:
+            cache.fingerprint(fov_id, peak_id, [img_stack])
+            if cache.is_current(fov_id, peak_id, output_colors):
+                information('FOV {}, peak {} is up to date.'.format(fov_id, peak_id))
+                continue
+
+        information('Segmenting FOV {}, peak {}.'.format(fov_id, peak_id))
+
+        img_stack = preprocess_cells_unet(img_stack, pad_dict, unet_shape)
+        stack_length = img_stack.shape[0]
+
+        start = 0
+        while start < stack_length:
+            n_frames = min(batch_frames - n_batch, stack_length - start)
+            images.append(img_stack[start:start+n_frames])
+            owners.append((fov_id, peak_id, pad_dict, unet_shape, n_frames, stack_length))
+            n_batch += n_frames
+            start += n_frames
+
+            if n_batch == batch_frames:
+                yield np.concatenate(images, axis=0), owners
+                images = []
+                owners = []
+                n_batch = 0
+
+    if n_batch:
+        yield np.concatenate(images, axis=0), owners
+
+def preprocess_cells_unet(img_stack, pad_dict, unet_shape):
+    '''Normalizes, trims and pads a phase stack for the cell segmentation U-net.
+    unet_shape is either the trained shape or the shape bucket of the stack.
+
+    Returns
+    -------
+    img_stack : np.ndarray
+        float32 array of shape (t, unet_shape[0], unet_shape[1], 1)
+    '''
+
+    if params['segment']['normalize_to_one'] is not None:
+        # robust normalization of peak's image stack to 1
+        img_stack = preprocessing.median_normalize_stack(img_stack, 1)
+
+    # trim and pad image to correct size
+    img_stack = img_stack[:, :unet_shape[0], :unet_shape[1]]
+    img_stack = np.pad(img_stack,
+                       ((0,0),
+                       (pad_dict['top_pad'],pad_dict['bottom_pad']),
+                       (pad_dict['left_pad'],pad_dict['right_pad'])),
+                       mode='constant')
+    img_stack = np.expand_dims(img_stack, -1) # TF expects images to be 4D
+
+    return img_stack.astype('float32')
+
+def postprocess_cells_unet(predictions, fov_id, peak_id, pad_dict, unet_shape, cache=None):
+    '''Un-pads U-net predictions for one peak, thresholds and labels them and saves
+    the segmented stack (and the predictions if params['segment']['save_predictions']).
+    The fingerprint of the peak is recorded in cache afterwards.'''
+
+    # post processing
+    # remove padding including the added last dimension
+    predictions = predictions[:, pad_dict['top_pad']:unet_shape[0]-pad_dict['bottom_pad'],
+                                 pad_dict['left_pad']:unet_shape[1]-pad_dict['right_pad'], 0]
+
+    # pad back incase the image had been trimmed
+    predictions = np.pad(predictions,
+                         ((0,0),
+                         (0,pad_dict['bottom_trim']),
+                         (0,pad_dict['right_trim'])),
+                         mode='constant')
+
+    # keep the probabilities so they can be thresholded again with mm3_Segment-Unet.py --from-predictions
+    if params['segment']['save_predictions']:
+        if params['output'] == 'TIFF' and not os.path.isdir(params['pred_dir']):
+            os.makedirs(params['pred_dir'])
+        save_stack(encode_predictions(predictions, params['segment']['prediction_dtype']),
+                   fov_id, peak_id, params['pred_img'], compress=4)
+
+    label_cells_unet(predictions, fov_id, peak_id)
+    information('Saved segmented FOV {}, peak {}.'.format(fov_id, peak_id))
+
+    if cache is not None:
+        cache.record(fov_id, peak_id)
+
+    return
+
+def get_unet_peak_jobs(fov_id, specs, unet_shape, color=None, size_multiple=None):
+    '''
+    Returns the (fov_id, peak_id, pad_dict, unet_shape) tuples for the analyzed
+    peaks of one FOV, as used by segment_peaks_unet.
+
+    Parameters
+    ----------
+    unet_shape : tuple
+        (height, width) the model was trained on. All peaks are trimmed or padded
+        to this shape, unless size_multiple is given.
+    size_multiple : int
+        For variable size inference with a fully convolutional model. Each peak
+        keeps its own size, padded up to the next multiple of size_multiple
+        (see get_bucket_shape), and nothing is trimmed.
+    '''
+
+    if color is None:
+        color = params['phase_plane']
+
+    # dermine how many channels we have to analyze for this FOV
+    ana_peak_ids = []
+    for peak_id, spec in six.iteritems(specs[fov_id]):
+        if spec == 1:
+            ana_peak_ids.append(peak_id)
+    ana_peak_ids.sort() # sort for repeatability
+
+    if size_multiple:
+        peak_jobs = []
+        for peak_id in ana_peak_ids:
+            img_height, img_width = load_stack(fov_id, peak_id, color=color, frames=[0]).shape[1:]
+            bucket_shape = get_bucket_shape(img_height, img_width, size_multiple)
+            pad_dict = get_pad_distances(bucket_shape, img_height, img_width)
+            peak_jobs.append((fov_id, peak_id, pad_dict, bucket_shape))
+
+        return peak_jobs
+
+    ### determine stitching of images.
+    # need channel shape, specifically the width. load first for example
+    # this assumes that all channels are the same size for this FOV, which they should
+    for peak_id, spec in six.iteritems(specs[fov_id]):
+        if spec == 1:
+            break # just break out with the current peak_id
+
+    img_stack = load_stack(fov_id, peak_id, color=color, frames=[0])
+    img_height = img_stack.shape[1]
+    img_width = img_stack.shape[2]
+
+    pad_dict = get_pad_distances(unet_shape, img_height, img_width)
+
+    return [(fov_id, peak_id, pad_dict, unet_shape) for peak_id in ana_peak_ids]
+
+def segment_fov_unet(fov_id, specs, model, color=None, cache=None):
+    '''
+    Segments the channels from one fov using the U-net CNN model.
+
+    Parameters
+    ----------
+    fov_id : int
+    specs : dict
+    model : TensorFlow model
+    cache : ResultCache
+        See segment_peaks_unet.
+    '''
+
+    information('Segmenting FOV {} with U-net.'.format(fov_id))
+
+    # load segmentation parameters
+    unet_shape = (params['segment']['trained_model_image_height'],
+                  params['segment']['trained_model_image_width'])
+
+    size_multiple = None
+    if params['segment']['variable_size']:
+        size_multiple = params['segment']['size_multiple']
+
+    peak_jobs = get_unet_peak_jobs(fov_id, specs, unet_shape, color=color,
+                                   size_multiple=size_multiple)
+    segment_peaks_unet(peak_jobs, model, cache=cache)
+
+    information("Finished segmentation for FOV {}.".format(fov_id))
+
+    return
+
+def segment_experiment_unet(fov_id_list, specs, model, color=None, cache=None):
+    '''
+    Segments the channels from many FOVs using the U-net CNN model. Frames are
+    batched across FOVs as well as across peaks.
+    '''
+
+    unet_shape = (params['segment']['trained_model_image_height'],
+                  params['segment']['trained_model_image_width'])
+
+    size_multiple = None
+    if params['segment']['variable_size']:
+        size_multiple = params['segment']['size_multiple']
+
+    peak_jobs = []
+    for fov_id in fov_id_list:
+        peak_jobs.extend(get_unet_peak_jobs(fov_id, specs, unet_shape, color=color,
+                                            size_multiple=size_multiple))
+
+    information('Segmenting {} channels from {} FOVs with U-net.'.format(len(peak_jobs), len(fov_id_list)))
+    segment_peaks_unet(peak_jobs, model, cache=cache)
+
+    return
+
+def segment_foci_unet(ana_peak_ids, fov_id, pad_dict, unet_shape, model):
+    '''
+    Segments foci in the given peaks of one FOV. All peaks are padded with
+    pad_dict to unet_shape, which is the trained shape or a shape bucket.
+    '''
+
+    # batch_size = params['foci']['batch_size']
+    focusClassThreshold = params['foci']['focus_threshold']
+    if focusClassThreshold == 'None': # yaml imports None as a string
+        focusClassThreshold = False
+
+    # arguments to data generator
+    data_gen_args = {'batch_size':params['foci']['batch_size'],
+                     'n_channels':1,
+                     'normalize_to_one':False,
+                     'shuffle':False}
+    # arguments to predict_generator
+    predict_args = dict(use_multiprocessing=False,
+                        # workers=params['num_analyzers'],
+                        verbose=1)
+
+    for peak_id in ana_peak_ids:
+        information('Segmenting foci in peak {}.'.format(peak_id))
+        # print(peak_id) # debugging a shape error at some traps
+
+        img_stack = load_stack(fov_id, peak_id, color=params['foci']['foci_plane'])
+
+        # pad image to correct size
+        img_stack = np.pad(img_stack,
+                           ((0,0),
+                           (pad_dict['top_pad'],pad_dict['bottom_pad']),
+                           (pad_dict['left_pad'],pad_dict['right_pad'])),
+                           mode='constant')
+        img_stack = np.expand_dims(img_stack, -1)
+        # set up image generator
+        image_generator = FocusSegmentationDataGenerator(img_stack, **data_gen_args)
+
+        # predict foci locations.
+        predictions = model.predict_generator(image_generator, **predict_args)
+
+        # post processing
+        # remove padding including the added last dimension
+        predictions = predictions[:, pad_dict['top_pad']:unet_shape[0]-pad_dict['bottom_pad'],
+                                     pad_dict['left_pad']:unet_shape[1]-pad_dict['right_pad'], 0]
+
+        if params['foci']['save_predictions']:
+            pred_filename = params['experiment_name'] + '_xy%03d_p%04d_%s.tif' % (fov_id, peak_id, params['pred_img'])
+            if not os.path.isdir(params['foci_pred_dir']):
+                os.makedirs(params['foci_pred_dir'])
+            int_preds = (predictions * 255).astype('uint8')
+            tiff.imsave(os.path.join(params['foci_pred_dir'], pred_filename),
+                            int_preds, compress=4)
+
+        # binarized and label (if there is a threshold value, otherwise, save a grayscale for debug)
+        if focusClassThreshold:
+            # remove foci which touch the border and label
+            segmented_imgs = label_prediction_stack(predictions, focusClassThreshold,
+                                                    fill_holes=False, connectivity=2)
+
+        else: # in this case you just want to scale the 0 to 1 float image to 0 to 255
+            information('Converting predictions to grayscale.')
+            segmented_imgs = np.around(predictions * 100)
+
+        # both binary and grayscale should be 8bit. This may be ensured above and is unneccesary
+        segmented_imgs = segmented_imgs.astype('uint8')
+
+        # save out the segmented stacks
+        if params['output'] == 'TIFF':
+            seg_filename = params['experiment_name'] + '_xy%03d_p%04d_%s.tif' % (fov_id, peak_id, params['seg_img'])
+            tiff.imsave(os.path.join(params['foci_seg_dir'], seg_filename),
+                            segmented_imgs, compress=4)
+
+        if params['output'] == 'HDF5':
+            h5f = h5py.File(os.path.join(params['hdf5_dir'],'xy%03d.hdf5' % fov_id), 'r+')
+            # put segmented channel in correct group
+            h5g = h5f['channel_%04d' % peak_id]
+            # delete the dataset if it exists (important for debug)
+            if 'p%04d_%s' % (peak_id, params['seg_img']) in h5g:
+                del h5g['p%04d_%s' % (peak_id, params['seg_img'])]
+
+            h5ds = h5g.create_dataset(u'p%04d_%s' % (peak_id, params['seg_img']),
+                                data=segmented_imgs,
+                                chunks=(1, segmented_imgs.shape[1], segmented_imgs.shape[2]),
+                                maxshape=(None, segmented_imgs.shape[1], segmented_imgs.shape[2]),
+                                compression="gzip", shuffle=True, fletcher32=True)
+            h5f.close()
+
+def segment_fov_foci_unet(fov_id, specs, model, color=None):
+    '''
+    Segments the channels from one fov using the U-net CNN model.
+
+    Parameters
+    ----------
+    fov_id : int
+    specs : dict
+    model : TensorFlow model
+    '''
+
+    information('Segmenting FOV {} with U-net.'.format(fov_id))
+
+    if color is None:
+        color = params['phase_plane']
+
+    # load segmentation parameters
+    unet_shape = (params['segment']['trained_model_image_height'],
+                  params['segment']['trained_model_image_width'])
+
+    size_multiple = None
+    if params['foci']['variable_size']:
+        size_multiple = params['foci']['size_multiple']
+
+    # peaks that share a shape are segmented together
+    peak_groups = collections.OrderedDict()
+    for _, peak_id, pad_dict, peak_shape in get_unet_peak_jobs(fov_id, specs, unet_shape,
+                                                               color=color,
+                                                               size_multiple=size_multiple):
+        peak_groups.setdefault((peak_shape, tuple(sorted(pad_dict.items()))), []).append(peak_id)
+
+    for (peak_shape, pad_items), ana_peak_ids in six.iteritems(peak_groups):
+        segment_foci_unet(ana_peak_ids, fov_id, dict(pad_items), peak_shape, model)
+
+    information("Finished segmentation for FOV {}.".format(fov_id))
+    return
+
+# class for image generation for predicting cell locations in phase-contrast images
+class CellSegmentationDataGenerator(utils.Sequence):
+    'Generates data for Keras'
+    def __init__(self,
+                 img_array,
+                 batch_size=32,
+                 n_channels=1,
+                 shuffle=False,
+                 normalize_to_one=False):
+        'Initialization'
+        self.dim = (img_array.shape[1], img_array.shape[2])
+        self.batch_size = batch_size
+        self.img_array = img_array
+        self.img_number = img_array.shape[0]
+        self.n_channels = n_channels
+        self.shuffle = shuffle
+        self.on_epoch_end()
+        self.normalize_to_one = normalize_to_one
+
+    def __len__(self):
+        'Denotes the number of batches per epoch'
+        return(int(np.ceil(self.img_number / self.batch_size)))
+
+    def __getitem__(self, index):
+        'Generate one batch of data'
+        # Generate indexes of the batch
+        indexes = self.indexes[index*self.batch_size:(index+1)*self.batch_size]
+
+        # Get the batch as a (n_samples, y, x) stack
+        batch_stack = self.img_array[indexes,:,:,0]
+
+        # Generate data
+        X = self.__data_generation(batch_stack)
+
+        return X
+
+    def on_epoch_end(self):
+        'Updates indexes after each epoch'
+        self.indexes = np.arange(self.img_number)
+        if self.shuffle == True:
+            np.random.shuffle(self.indexes)
+
+    def __data_generation(self, batch_stack):
+        'Generates data containing batch_size samples' # X : (n_samples, *dim, n_channels)
+        # ensure images are uint8
+        batch_stack = preprocessing.uint16_to_uint8(batch_stack)
+
+        if self.normalize_to_one:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                X = preprocessing.median_normalize_stack(batch_stack, 1, per_frame=True)
+        else:
+            X = batch_stack.astype('float32')
+
+        return (np.expand_dims(X, axis=-1))
+
+class TemporalCellDataGenerator(utils.Sequence):
+    'Generates data for Keras'
+    def __init__(self,
+                 fileName,
+                 batch_size=32,
+                 dim=(32,32,32),
+                 n_channels=1,
+                 n_classes=10,
+                 shuffle=False,
+                 normalize_to_one=False):
+        'Initialization'
+        self.dim = dim
+        self.batch_size = batch_size
+        self.fileName = fileName
+        self.n_channels = n_channels
+        self.n_classes = n_classes
+        self.shuffle = shuffle
+        self.on_epoch_end()
+        self.normalize_to_one = normalize_to_one
+        if normalize_to_one:
+            self.selem = morphology.disk(1)
+
+    def __len__(self):
+        'Denotes the number of batches per epoch'
+        return int(np.ceil(self.batch_size / self.batch_size))
+
+    def __getitem__(self, index):
+        'Generate one batch of data'
+
+        # Generate data
+        X = self.__data_generation()
+
+        return X
+
+    def on_epoch_end(self):
+        'Updates indexes after each epoch'
+        pass
+
+    def __data_generation(self):
+        'Generates data containing batch_size samples' # X : (n_samples, *dim, n_channels)
+        # Initialization
+        X = np.zeros((self.batch_size, self.dim[0], self.dim[1], self.dim[2], self.n_channels), 'float32')
+
+        full_stack = io.imread(self.fileName)
+
+        # ensure images are uint8
+        full_stack = preprocessing.uint16_to_uint8(full_stack)
+
+        img_height = full_stack.shape[1]
+        img_width = full_stack.shape[2]
+
+        pad_dict = get_pad_distances(self.dim, img_height, img_width)
+
+        full_stack = np.pad(full_stack,
+                           ((0,0),
+                            (pad_dict['top_pad'],pad_dict['bottom_pad']),
+                            (pad_dict['left_pad'],pad_dict['right_pad'])
+                           ),
+                           mode='constant')
+
+        full_stack = full_stack.transpose(1,2,0)
+
+        # Generate data
+        for i in range(self.batch_size):
+
+            if i == 0:
+                tmpImg = np.zeros((self.dim[0], self.dim[1], self.dim[2], 1))
+                tmpImg[:,:,0,0] = full_stack[:,:,0]
+                for j in range(1,self.dim[2]):
+                    tmpImg[:,:,j,0] = full_stack[:,:,j]
+
+            elif i == (self.batch_size - 1):
+                tmpImg = np.zeros((self.dim[0], self.dim[1], self.dim[2], 1))
+                tmpImg[:,:,-1,0] = full_stack[:,:,-1]
+                for j in range(self.dim[2]-1):
+                    tmpImg[:,:,j,0] = full_stack[:,:,j]
+
+            else:
+                tmpImg = np.zeros((self.dim[0], self.dim[1], self.dim[2], 1))
+                tmpImg[:,:,:,0] = full_stack[:,:,(i-1):(i+2)]
+
+            X[i,:,:,:,:] = tmpImg
+
+        return X
+
+# class for image generation for predicting cell locations in phase-contrast images
+class FocusSegmentationDataGenerator(utils.Sequence):
+    'Generates data for Keras'
+    def __init__(self,
+                 img_array,
+                 batch_size=32,
+                 n_channels=1,
+                 shuffle=False,
+                 normalize_to_one=False):
+        'Initialization'
+        self.dim = (img_array.shape[1], img_array.shape[2])
+        self.batch_size = batch_size
+        self.img_array = img_array
+        self.img_number = img_array.shape[0]
+        self.n_channels = n_channels
+        self.shuffle = shuffle
+        self.on_epoch_end()
+        self.normalize_to_one = normalize_to_one
+
+    def __len__(self):
+        'Denotes the number of batches per epoch'
+        return(int(np.ceil(self.img_number / self.batch_size)))
+
+    def __getitem__(self, index):
+        'Generate one batch of data'
+        # Generate indexes of the batch
+        indexes = self.indexes[index*self.batch_size:(index+1)*self.batch_size]
+
+        # Get the batch as a (n_samples, y, x) stack
+        batch_stack = self.img_array[indexes,:,:,0]
+
+        # Generate data
+        X = self.__data_generation(batch_stack)
+
+        return X
+
+    def on_epoch_end(self):
+        'Updates indexes after each epoch'
+        self.indexes = np.arange(self.img_number)
+        if self.shuffle == True:
+            np.random.shuffle(self.indexes)
+
+    def __data_generation(self, batch_stack):
+        'Generates data containing batch_size samples' # X : (n_samples, *dim, n_channels)
+        if self.normalize_to_one:
+            # scale so the brightest pixel in the batch is 255, then clip at one
+            channel_max = preprocessing.stack_max(batch_stack) / (2**8 - 1)
+            X = preprocessing.max_normalize_stack(batch_stack, max_val=channel_max)
+        else:
+            X = batch_stack.astype('float32')
+
+        return (np.expand_dims(X, axis=-1))
+
+# class for image generation for predicting trap locations in phase-contrast images
+class TrapSegmentationDataGenerator(utils.Sequence):
+    'Generates data for Keras'
+    def __init__(self, img_array, batch_size=32,
+                 n_channels=1, normalize_to_one=False, shuffle=False):
+        'Initialization'
+        self.dim = (img_array.shape[1], img_array.shape[2])
+        self.img_number = img_array.shape[0]
+        self.img_array = img_array
+        self.batch_size = batch_size
+        self.n_channels = n_channels
+        self.shuffle = shuffle
+        self.on_epoch_end()
+        self.normalize_to_one = normalize_to_one
+
+    def __len__(self):
+        'Denotes the number of batches per epoch'
+        return int(np.ceil(self.img_number / self.batch_size))
+
+    def __getitem__(self, index):
+        'Generate one batch of data'
+        # Generate indexes of the batch
+        indexes = self.indexes[index*self.batch_size:(index+1)*self.batch_size]
+
+        # Get the batch as a (n_samples, y, x) stack
+        batch_stack = self.img_array[indexes,:,:,0]
+
+        # Generate data
+        X = self.__data_generation(batch_stack)
+
+        return X
+
+    def on_epoch_end(self):
+        'Updates indexes after each epoch'
+        self.indexes = np.arange(self.img_number)
+        if self.shuffle == True:
+            np.random.shuffle(self.indexes)
+
+    def __data_generation(self, batch_stack):
+        'Generates data containing batch_size samples' # X : (n_samples, *dim, n_channels)
+        if self.normalize_to_one:
+            # median filtered images normalized to their own max
+            X = preprocessing.median_normalize_stack(batch_stack, 3, per_frame=True,
+                                                     normalize_median=True)
+        else:
+            X = batch_stack.astype('float32')
+
+        return (np.expand_dims(X, axis=-1))
+
+# class for image generation for classifying traps as good, empty, out-of-focus, or defective
+class TrapKymographPredictionDataGenerator(utils.Sequence):
+    'Generates data for Keras'
+    def __init__(self, list_fileNames, batch_size=32, dim=(32,32,32), n_channels=1,
+                 n_classes=10, shuffle=False):
+        'Initialization'
+        self.dim = dim
+        self.batch_size = batch_size
+        self.list_fileNames = list_fileNames
+        self.n_channels = n_channels
+        self.n_classes = n_classes
+        self.shuffle = shuffle
+        self.on_epoch_end()
+
+    def __len__(self):
+        'Denotes the number of batches per epoch'
+        return int(np.ceil(len(self.list_fileNames) / self.batch_size))
+
+    def __getitem__(self, index):
+        'Generate one batch of data'
+        # Generate indexes of the batch
+        indexes = self.indexes[index*self.batch_size:(index+1)*self.batch_size]
+
+        # Find list of IDs
+        list_fileNames_temp = [self.list_fileNames[k] for k in indexes]
+
+        # Generate data
+        X = self.__data_generation(list_fileNames_temp)
+
+        return X
+
+    def on_epoch_end(self):
+        'Updates indexes after each epoch'
+        self.indexes = np.arange(len(self.list_fileNames))
+        if self.shuffle == True:
+            np.random.shuffle(self.indexes)
+
+    def __data_generation(self, list_fileNames_temp):
+        'Generates data containing batch_size samples' # X : (n_samples, *dim, n_channels)
+        # Initialization
+        X = np.zeros((self.batch_size, self.dim[0], self.dim[1], self.n_channels))
+
+        # Generate data
+        for i, fName in enumerate(list_fileNames_temp):
+            # Store sample
+            tmpImg = io.imread(fName)
+            tmpImgShape = tmpImg.shape
+            if tmpImgShape[0] < self.dim[0]:
+                t_end = tmpImgShape[0]
+            else:
+                t_end = self.dim[0]
+            X[i,:t_end,:,:] = np.expand_dims(tmpImg[:t_end,:,tmpImg.shape[-1]//2], axis=-1)
+
+        return X
+
+def absolute_diff(y_true, y_pred):
+    y_true_sum = K.sum(y_true)
+    y_pred_sum = K.sum(y_pred)
+    diff = K.abs(y_pred_sum - y_true_sum)/tf.to_float(tf.size(y_true))
+    return diff
+
+def all_loss(y_true, y_pred):
+    loss = losses.binary_crossentropy(y_true, y_pred) + dice_loss(y_true, y_pred) + absolute_diff(y_true, y_pred)
+    return loss
+
+def absolute_dice_loss(y_true, y_pred):
+    loss = dice_loss(y_true, y_pred) + absolute_diff(y_true, y_pred)
+    return loss
+
+def recall_m(y_true, y_pred):
+    true_positives = K.sum(K.round(K.clip(y_true * y_pred, 0, 1)))
+    possible_positives = K.sum(K.round(K.clip(y_true, 0, 1)))
+    recall = true_positives / (possible_positives + K.epsilon())
+    return recall
+
+def precision_m(y_true, y_pred):
+    true_positives = K.sum(K.round(K.clip(y_true * y_pred, 0, 1)))
+    predicted_positives = K.sum(K.round(K.clip(y_pred, 0, 1)))
+    precision = true_positives / (predicted_positives + K.epsilon())
+    return precision
+
+def f1_m(y_true, y_pred):
+    precision = precision_m(y_true, y_pred)
+    recall = recall_m(y_true, y_pred)
+    return 2*((precision*recall)/(precision+recall+K.epsilon()))
+
+def f2_m(y_true, y_pred, beta=2):
+    precision = precision_m(y_true, y_pred)
+    recall = recall_m(y_true, y_pred)
+    numer = (1+beta**2)*recall*precision
+    denom =  recall + (beta**2)*precision + K.epsilon()
+    return numer/denom
+
+def f_precision_m(y_true, y_pred, beta=0.5):
+    precision = precision_m(y_true, y_pred)
+    recall = recall_m(y_true, y_pred)
+    numer = (1+beta**2)*recall*precision
+    denom =  recall + (beta**2)*precision + K.epsilon()
+    return numer/denom
+
+def get_custom_objects():
+    'All custom losses and metrics used by the mm3 models, for loading any of them.'
+    return {'bce_dice_loss' : bce_dice_loss,
+            'dice_loss' : dice_loss,
+            'tversky_loss' : tversky_loss,
+            'cce_tversky_loss' : cce_tversky_loss,
+            'all_loss' : all_loss,
+            'absolute_dice_loss' : absolute_dice_loss,
+            'f2_m' : f2_m,
+            'precision_m' : precision_m,
+            'recall_m' : recall_m,
+            'f_precision_m' : f_precision_m}
+
+def get_tracking_model_dict():
+
+    model_dict = {}
+
+    if not 'migrate_model' in model_dict:
+        model_dict['migrate_model'] = load_model(params['tracking']['migrate_model'],
+                                                                    custom_objects={'all_loss':all_loss,
+                                                                        'f2_m':f2_m})
+    if not 'child_model' in model_dict:
+        model_dict['child_model'] = load_model(params['tracking']['child_model'],
+                                        custom_objects={'bce_dice_loss':bce_dice_loss,
+                                                                    'f2_m':f2_m})
+    if not 'appear_model' in model_dict:
+        model_dict['appear_model'] = load_model(params['tracking']['appear_model'],
+                                        custom_objects={'all_loss':all_loss,
+                                                                    'f2_m':f2_m})
+    if not 'die_model' in model_dict:
+        model_dict['die_model'] = load_model(params['tracking']['die_model'],
+                                        custom_objects={'all_loss':all_loss,
+                                                                    'f2_m':f2_m})
+    if not 'disappear_model' in model_dict:
+        model_dict['disappear_model'] = load_model(params['tracking']['disappear_model'],
+                                        custom_objects={'all_loss':all_loss,
+                                                                    'f2_m':f2_m})
+    if not 'born_model' in model_dict:
+        model_dict['born_model'] = load_model(params['tracking']['born_model'],
+                                        custom_objects={'all_loss':all_loss,
+                                                                    'f2_m':f2_m})
+    # if not 'zero_cell_model' in model_dict:
+    #     model_dict['zero_cell_model'] = load_model(params['tracking']['zero_cell_model'],
+    #                                     custom_objects={'absolute_dice_loss':absolute_dice_loss,
+    #                                                                 'f2_m':f2_m})
+    # if not 'one_cell_model' in model_dict:
+    #     model_dict['one_cell_model'] = load_model(params['tracking']['one_cell_model'],
+    #                                     custom_objects={'bce_dice_loss':bce_dice_loss,
+    #                                                                 'f2_m':f2_m})
+    # if not 'two_cell_model' in model_dict:
+    #     model_dict['two_cell_model'] = load_model(params['tracking']['two_cell_model'],
+    #                                     custom_objects={'all_loss':all_loss,
+    #                                                                 'f2_m':f2_m})
+    # if not 'geq_three_cell_model' in model_dict:
+    #     model_dict['geq_three_cell_model'] = load_model(params['tracking']['geq_three_cell_model'],
+    #                                     custom_objects={'bce_dice_loss':bce_dice_loss,
+    #                                                                 'f2_m':f2_m})
+
+    return(model_dict)
+
+def make_fused_tracking_model(model_dict):
+    '''
+    Puts the tracking models behind one shared input, so one predict call runs
+    them all and the features are only read once. The layers and weights are
+    shared with the models in model_dict.
+
+    The outputs are a list in the order of the sorted keys of model_dict, as
+    older TensorFlow versions do not keep the names of dict outputs.
+
+    Returns None if any of the models is not a Keras model, e.g. a converted
+    .tflite model or a model server client.
+    '''
+
+    from tensorflow.keras import layers, models
+
+    keys = sorted(model_dict.keys())
+    if not keys or not all([isinstance(model_dict[key], models.Model) for key in keys]):
+        return None
+
+    inputs = layers.Input(shape=model_dict[keys[0]].input_shape[1:])
+    outputs = [model_dict[key](inputs) for key in keys]
+
+    return models.Model(inputs=inputs, outputs=outputs)
+
+def predict_tracking_models(model_dict, cell_info, batch_size=32, fused_model=None):
+    '''
+    Runs the tracking models on the features of a batch of frames, see
+    make_track_features.
+
+    Parameters
+    ----------
+    fused_model : Keras model
+        Made by make_fused_tracking_model from the same model_dict. If given,
+        all models are run with one predict call.
+
+    Returns
+    -------
+    predictions_dict : dict
+        '<key>_predictions' : np.ndarray for each key of model_dict.
+    '''
+
+    if fused_model is not None:
+        keys = sorted(model_dict.keys())
+        outputs = fused_model.predict(cell_info, batch_size=batch_size)
+        # a model with one output returns an array instead of a list
+        if len(keys) == 1:
+            outputs = [outputs]
+        return {'{}_predictions'.format(key) : np.asarray(value) for key, value in zip(keys, outputs)}
+
+    predictions_dict = {}
+    for key, mod in six.iteritems(model_dict):
+        predictions_dict['{}_predictions'.format(key)] = mod.predict(cell_info, batch_size=batch_size)
+
+    return predictions_dict
+
+class PredictTrackDataGenerator(utils.Sequence):
+    '''Generates data for running tracking class preditions
+    Input is a list of the regions in each frame of a stack. The features of all
+    frames are made once with make_track_features.'''
+    def __init__(self,
+                 data,
+                 batch_size=32,
+                 dim=(4,5,9)):
+
+        'Initialization'
+        self.batch_size = batch_size
+        self.data = data
+        self.dim = dim
+        self.features = make_track_features(region_table_from_regions(data), len(data),
+                                            max_cell_number=dim[0], n_window_frames=dim[1])
+        self.on_epoch_end()
+
+    def __len__(self):
+        'Denotes the number of batches per epoch'
+        return int(np.ceil(len(self.data) / self.batch_size))
+
+    def __getitem__(self, index):
+        'Generate one batch of data'
+        # Generate keys of the batch
+        batch_indices = self.indices[index*self.batch_size:(index+1)*self.batch_size]
+
+        # Generate data
+        X = self.__data_generation(batch_indices)
+
+        return X
+
+    def on_epoch_end(self):
+        'Updates indexes after each epoch'
+        self.indices = np.arange(len(self.data))
+
+    def __data_generation(self, batch_indices):
+        'Generates data containing batch_size samples' # X : (n_samples, *dim, n_channels)
+        # shape is (batch_size, max_cell_num, frame_num, cell_feature_num, 1)
+        X = self.features[batch_indices]
+
+        return X
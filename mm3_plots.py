@@ -157,6 +157,9 @@ def find_cells_of_birth_label(Cells, label_num=1):
     if type(label_num) is int:
         label_num = [label_num]
 
+    if isinstance(Cells, mm3.CellIndex):
+        return Cells.of_birth_label(label_num)
+
     for cell_id in Cells:
         if Cells[cell_id].birth_label in label_num:
             fCells[cell_id] = Cells[cell_id]
@@ -176,6 +179,9 @@ def find_cells_of_fov(Cells, FOVs=[]):
     if type(FOVs) is int:
         FOVs = [FOVs]
 
+    if isinstance(Cells, mm3.CellIndex):
+        return Cells.of_fov(FOVs)
+
     fCells = {cell_id : cell_tmp for cell_id, cell_tmp in six.iteritems(Cells) if cell_tmp.fov in FOVs}
 
     return fCells
@@ -188,6 +194,9 @@ def find_cells_of_fov_and_peak(Cells, fov_id, peak_id):
     peak_id : int correstonging to peak
     '''
 
+    if isinstance(Cells, mm3.CellIndex):
+        return Cells.of_fov_and_peak(fov_id, peak_id)
+
     fCells = {} # f is for filtered
 
     for cell_id in Cells:
@@ -204,6 +213,9 @@ def find_cells_born_before(Cells, born_before=None):
     if born_before == None:
         return Cells
 
+    if isinstance(Cells, mm3.CellIndex):
+        return Cells.born_between(end=born_before)
+
     fCells = {cell_id : Cell for cell_id, Cell in six.iteritems(Cells) if Cell.birth_time <= born_before}
 
     return fCells
@@ -216,6 +228,9 @@ def find_cells_born_after(Cells, born_after=None):
     if born_after == None:
         return Cells
 
+    if isinstance(Cells, mm3.CellIndex):
+        return Cells.born_between(start=born_after)
+
     fCells = {cell_id : Cell for cell_id, Cell in six.iteritems(Cells) if Cell.birth_time >= born_after}
 
     return fCells
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+'''
+Image stack preprocessing shared by the U-net data generators and the
+segment_* functions in mm3_helpers.
+
+All functions work on whole (t, y, x) stacks at once. Filters only act within a
+frame, never across time.
+'''
+from __future__ import print_function, division
+
+import numpy as np
+from scipy import ndimage as ndi
+from skimage import morphology
+
+def median_filter_stack(img_stack, radius):
+    '''
+    Median filters every frame of a stack with a disk footprint.
+
+    Done in one pass with a 3D footprint that is one frame deep. Pixels at least
+    radius away from the border match skimage.filters.median(frame,
+    morphology.disk(radius)) of each frame. Border pixels may differ: the edge
+    values are repeated here (mode='nearest'), while skimage.filters.rank.median
+    only uses the part of the footprint inside the image.
+
+    Parameters
+    ----------
+    img_stack : np.ndarray
+        Shape (t, y, x)
+    radius : int
+        Radius of the disk footprint.
+
+    Returns
+    -------
+    med_stack : np.ndarray
+        Same shape and dtype as img_stack.
+    '''
+
+    footprint = morphology.disk(radius)[np.newaxis, :, :]
+
+    return ndi.median_filter(img_stack, footprint=footprint, mode='nearest')
+
+def stack_max(img_stack, per_frame=False):
+    '''
+    Maximum of a (t, y, x) stack, either over the whole stack (scalar) or per
+    frame (shape (t, 1, 1) so it broadcasts against the stack).
+    '''
+
+    if per_frame:
+        return np.max(img_stack, axis=(1, 2), keepdims=True)
+
+    return np.max(img_stack)
+
+def max_normalize_stack(img_stack, max_val=None, per_frame=False, clip=True):
+    '''
+    Divides a stack by a maximum value and returns float32.
+
+    Parameters
+    ----------
+    img_stack : np.ndarray
+        Shape (t, y, x)
+    max_val : float or np.ndarray
+        Value to divide by. Can be a scalar or per frame values of shape (t, 1, 1),
+        for example from stack_max of a median filtered stack. Defaults to the
+        max of img_stack itself.
+    per_frame : bool
+        When max_val is not given, use the max of each frame instead of the
+        whole stack.
+    clip : bool
+        Set values above 1 to 1.
+
+    Returns
+    -------
+    norm_stack : np.ndarray
+        float32 array with the same shape as img_stack.
+    '''
+
+    if max_val is None:
+        max_val = stack_max(img_stack, per_frame=per_frame)
+
+    norm_stack = img_stack.astype(np.float32)
+    norm_stack /= np.asarray(max_val, dtype=np.float32)
+    if clip:
+        norm_stack[norm_stack > 1] = 1
+
+    return norm_stack
+
+def median_normalize_stack(img_stack, radius, per_frame=False, normalize_median=False):
+    '''
+    Robust normalization of a stack to one.
+
+    The stack is median filtered and the max of the filtered stack (or of each
+    filtered frame) is used for normalization, so single hot pixels do not set the
+    scale. Values above one are clipped.
+
+    Parameters
+    ----------
+    img_stack : np.ndarray
+        Shape (t, y, x)
+    radius : int
+        Radius of the median filter disk.
+    per_frame : bool
+        Normalize each frame by its own max instead of the max of the stack.
+    normalize_median : bool
+        Return the normalized median filtered stack instead of the normalized
+        original stack.
+
+    Returns
+    -------
+    norm_stack : np.ndarray
+        float32 array with the same shape as img_stack.
+    '''
+
+    med_stack = median_filter_stack(img_stack, radius)
+    max_val = stack_max(med_stack, per_frame=per_frame)
+
+    if normalize_median:
+        return max_normalize_stack(med_stack, max_val=max_val)
+
+    return max_normalize_stack(img_stack, max_val=max_val)
+
+def uint16_to_uint8(img_stack):
+    '''
+    Converts a uint16 stack to uint8 by keeping the high byte, as done by
+    img / 2**16 * 2**8. Other dtypes are returned unchanged.
+    '''
+
+    if img_stack.dtype == np.uint16:
+        return (img_stack >> 8).astype(np.uint8)
+
+    return img_stack
@@ -0,0 +1,3450 @@
+#!/usr/bin/env python3
+'''
+Lineage creation: the CellStore, Cell, Focus and Detection classes, rule based tracking
+and building lineages from the tracking graph of mm3_Track.py.
+
+pandas and networkx are only imported by the functions that use them.
+'''
+from __future__ import print_function, division
+import six
+
+# import modules
+import collections
+import itertools
+import os
+import time
+import numpy as np # numbers package
+
+# scipy and image analysis
+from scipy.optimize import linear_sum_assignment # global linking of regions to leaves
+from skimage.measure import regionprops_table # used for creating lineages
+
+# Parralelization modules
+from multiprocessing import Pool
+
+from mm3_io import (params, information, warning, load_stack, array_checksum,
+                    save_region_table, load_region_table,
+                    save_lineage_table, load_lineage_table)
+
+# finds lineages for all peaks in a fov
+def make_lineages_fov(fov_id, specs):
+    '''
+    For a given fov, create the lineages from the segmented images.
+
+    Called by
+    mm3_Segment.py
+
+    Calls
+    mm3.save_lineage_chnl_stack
+
+    Each channel is tracked in a worker process, which saves its cells to a
+    lineage table. Only the channel ids come back through the pool, and the
+    tables are loaded here into one CellStore per channel. Region tables that the
+    workers had to make are sent back and saved here once the pool is done, so no
+    worker writes to the FOV's HDF5 file while others read it.
+    '''
+    ana_peak_ids = [] # channels to be analyzed
+    for peak_id, spec in six.iteritems(specs[fov_id]):
+        if spec == 1: # 1 means analyze
+            ana_peak_ids.append(peak_id)
+    ana_peak_ids = sorted(ana_peak_ids) # sort for repeatability
+
+    information('Creating lineage for FOV %d with %d channels.' % (fov_id, len(ana_peak_ids)))
+
+    # just break if there are no peaks to analize
+    if not ana_peak_ids:
+        # returning empty dictionary will add nothing to current cells dictionary
+        return CellIndex()
+
+    # This is a list of tuples (fov_id, peak_id) to send to the Pool command
+    fov_and_peak_ids_list = [(fov_id, peak_id) for peak_id in ana_peak_ids]
+
+    if not os.path.exists(params['lineage_dir']):
+        os.makedirs(params['lineage_dir'])
+
+    # set up multiprocessing pool. will complete pool before going on
+    pool = Pool(processes=params['num_analyzers'])
+
+    # create the lineages for each peak individually. Channels are handed out
+    # one at a time, so a slow channel does not hold up the others
+    new_region_tables = {} # peak_id : region table made by a worker
+    for _, peak_id, n_cells, region_table in pool.imap_unordered(save_lineage_chnl_stack, fov_and_peak_ids_list):
+        information('Saved %d cells of FOV %d, channel %d.' % (n_cells, fov_id, peak_id))
+        if region_table is not None:
+            new_region_tables[peak_id] = region_table
+
+    pool.close() # tells the process nothing more will be added.
+    pool.join() # blocks script until everything has been processed and workers exit
+
+    # the workers are done reading, save the new region tables for the later stages
+    for peak_id in sorted(new_region_tables.keys()):
+        try:
+            save_region_table(new_region_tables[peak_id], fov_id, peak_id, params['track']['seg_img'])
+        except (IOError, OSError) as e:
+            warning('Could not save region table for FOV {}, peak {}: {}'.format(fov_id, peak_id, e))
+
+    # This is the non-parallelized version (useful for debug)
+    # for fov_and_peak_ids in fov_and_peak_ids_list:
+    #     save_lineage_chnl_stack(fov_and_peak_ids)
+
+    # combine the cells of all channels, in channel order for repeatability
+    Cells = CellIndex() # create dictionary to hold all information
+    for peak_id in ana_peak_ids:
+        store = cell_store_from_table(load_lineage_table(fov_id, peak_id))
+        Cells.update(store.cells())
+
+    return Cells
+
+def save_lineage_chnl_stack(fov_and_peak_id):
+    '''
+    Creates the lineage of one channel with make_lineage_chnl_stack and saves
+    its cells with save_lineage_table. Used as the pool function of
+    make_lineages_fov. The region table is not saved here, see make_lineages_fov.
+
+    Returns
+    -------
+    (fov_id, peak_id, n_cells, region_table)
+        region_table is None if a current one was saved already.
+    '''
+
+    fov_id, peak_id = fov_and_peak_id
+
+    label_stack = load_stack(fov_id, peak_id, color=params['track']['seg_img'])
+    region_table = load_current_region_table(fov_id, peak_id, params['track']['seg_img'], label_stack)
+    new_region_table = None
+    if region_table is None:
+        region_table = new_region_table = make_region_table(label_stack)
+
+    store = CellStore()
+    make_lineage_chnl_stack(fov_and_peak_id, store=store,
+                            label_stack=label_stack, region_table=region_table)
+    save_lineage_table(store.to_table(), fov_id, peak_id)
+
+    return fov_id, peak_id, len(store), new_region_table
+
+# get number of cells in each frame and total number of pairwise interactions
+def get_cell_counts(regionprops_list):
+
+    cell_count_list = [len(time_regions) for time_regions in regionprops_list]
+    interaction_count_list = []
+
+    for i,cell_count in enumerate(cell_count_list):
+        if i+1 == len(cell_count_list):
+            break
+        interaction_count_list.append(cell_count*cell_count_list[i+1])
+
+    total_cells = np.sum(cell_count_list)
+    total_interactions = np.sum(interaction_count_list)
+
+    return(total_cells, total_interactions, cell_count_list, interaction_count_list)
+
+# get cells' information for track prediction
+def gather_interactions_and_events(regionprops_list):
+
+    total_cells, total_interactions, cell_count_list, interaction_count_list = get_cell_counts(regionprops_list)
+
+    # instantiate an array with a 2x4 array for each pair of cells'
+    #   min_y, max_y, centroid_y, and area
+    # in reality it would be much, much more efficient to
+    #   look this information up in the data generator at run time
+    #   for now, this will work
+    pairwise_cell_data = np.zeros((total_interactions,2,5,1))
+
+    # make a dictionary, the keys of which will be row indices so that we
+    #   can quickly look up which timepoints/cells correspond to which
+    #   rows of our model's ouput
+    pairwise_cell_lookup = {}
+
+    # populate arrays
+    interaction_count = 0
+    cell_count = 0
+
+    for frame, frame_regions in enumerate(regionprops_list):
+
+        for region in frame_regions:
+
+            cell_label = region.label
+            y,x = region.centroid
+            bbox = region.bbox
+            orientation = region.orientation
+            min_y = bbox[0]
+            max_y = bbox[2]
+            area = region.area
+            cell_label = region.label
+            cell_info = (min_y, max_y, y, area, orientation)
+            cell_count += 1
+
+            try:
+                frame_plus_one_regions = regionprops_list[frame+1]
+            except IndexError as e:
+                # print(e)
+                break
+
+            for region_plus_one in frame_plus_one_regions:
+
+                paired_cell_label = region_plus_one.label
+                y,x = region_plus_one.centroid
+                bbox = region_plus_one.bbox
+                min_y = bbox[0]
+                max_y = bbox[2]
+                area = region_plus_one.area
+                paired_cell_label = region_plus_one.label
+
+                pairwise_cell_data[interaction_count,0,:,0] = cell_info
+                pairwise_cell_data[interaction_count,1,:,0] = (min_y, max_y, y, area, orientation)
+
+                pairwise_cell_lookup[interaction_count] = {'frame':frame, 'cell_label':cell_label, 'paired_cell_label':paired_cell_label}
+
+                interaction_count += 1
+
+    return(pairwise_cell_data, pairwise_cell_lookup)
+
+# look up which cells are interacting according to the track model
+def cell_interaction_lookup(predictions, lookup_table):
+    '''
+    Accepts prediction matrix and
+    '''
+
+    import pandas as pd
+
+    frame = []
+    cell_label = []
+    paired_cell_label = []
+    interaction_type = []
+
+    # loop over rows of predictions
+    for row_index in range(predictions.shape[0]):
+
+        row_predictions = predictions[row_index]
+        row_relationship = np.where(row_predictions > 0.95)[0]
+        if row_relationship.size == 0:
+            continue
+        elif row_relationship[0] == 3:
+            continue
+        elif row_relationship[0] == 0:
+            interaction_type.append('migration')
+        elif row_relationship[0] == 1:
+            interaction_type.append('child')
+        elif row_relationship[0] == 2:
+            interaction_type.append('false_join')
+
+        frame.append(lookup_table[row_index]['frame'])
+        cell_label.append(lookup_table[row_index]['cell_label'])
+        paired_cell_label.append(lookup_table[row_index]['paired_cell_label'])
+
+    track_df = pd.DataFrame(data={'frame':frame,
+                              'cell_label':cell_label,
+                              'paired_cell_label':paired_cell_label,
+                              'interaction_type':interaction_type})
+    return(track_df)
+
+# Creates lineage for a single channel
+def make_lineage_chnl_stack(fov_and_peak_id, store=None, label_stack=None, region_table=None):
+    '''
+    Create the lineage for a set of segmented images for one channel. Start by making the regions in the first time points potenial cells. Go forward in time and map regions in the timepoint to the potential cells in previous time points, building the life of a cell. Used basic checks such as the regions should overlap, and grow by a little and not shrink too much. If regions do not link back in time, discard them. If two regions map to one previous region, check if it is a sensible division event.
+
+    The regions of each time point are matched to all leaves at once with
+    match_regions_to_leaves, and the growth and division checks are evaluated
+    for all leaves together with check_growth_arrays and check_division_arrays.
+
+    Parameters
+    ----------
+    fov_and_peak_ids : tuple.
+        (fov_id, peak_id)
+    store : CellStore
+        Store for the cells. A new store is made if none is given.
+    label_stack : np.ndarray
+        The segmented stack, if it is already loaded.
+    region_table : dict
+        The region table of label_stack. Made with get_region_table if not given.
+
+    Returns
+    -------
+    Cells : dict
+        A dictionary of all the cells from this lineage, divided and undivided
+
+    '''
+
+    # load in parameters
+    # if leaf regions see no action for longer than this, drop them
+    lost_cell_time = params['track']['lost_cell_time']
+    # only cells with y positions below this value will recieve the honor of becoming new
+    # cells, unless they are daughters of current cells
+    new_cell_y_cutoff = params['track']['new_cell_y_cutoff']
+    # only regions with labels less than or equal to this value will be considered to start cells
+    new_cell_region_cutoff = params['track']['new_cell_region_cutoff']
+    # 'nearest' links each region to the closest leaf, 'global' solves a minimum cost assignment
+    assignment = params['track']['assignment']
+
+    # get the specific ids from the tuple
+    fov_id, peak_id = fov_and_peak_id
+
+    # start time is the first time point for this series of TIFFs.
+    start_time_index = min(params['time_table'][fov_id].keys())
+
+    information('Creating lineage for FOV %d, channel %d.' % (fov_id, peak_id))
+
+    # load segmented data
+    image_data_seg = label_stack
+    if image_data_seg is None:
+        image_data_seg = load_stack(fov_id, peak_id, color=params['track']['seg_img'])
+
+    # Region features for all time points, made once and shared with the other stages.
+    # this list will be length of the number of time points
+    if region_table is None:
+        region_table = get_region_table(fov_id, peak_id, params['track']['seg_img'], label_stack=image_data_seg)
+    regions_by_time = regions_from_table(region_table, len(image_data_seg))
+
+    # Set up data structures.
+    Cells = {} # Dict that holds all the cell objects, divided and undivided
+    if store is None:
+        store = CellStore() # holds the data of the cells in Cells
+    cell_leaves = [] # cell ids of the current leaves of the growing lineage tree
+
+    # go through regions by timepoint and build lineages
+    # timepoints start with the index of the first image
+    for t, regions in enumerate(regions_by_time, start=start_time_index):
+        # if there are cell leaves who are still waiting to be linked, but
+        # too much time has passed, remove them.
+        cell_leaves = [leaf_id for leaf_id in cell_leaves
+                       if t - store.point_value(Cells[leaf_id].row, 'times') <= lost_cell_time]
+
+        if not regions:
+            continue
+
+        region_data = get_region_arrays(region_table, t - start_time_index)
+        # regions near the closed end with low labels can start new cells
+        can_start = ((region_data['y'] < new_cell_y_cutoff) &
+                     (region_data['label'] <= new_cell_region_cutoff))
+
+        # make all the regions leaves if there are no current leaves
+        if not cell_leaves:
+            for r in np.flatnonzero(can_start):
+                # Create cell and put in cell dictionary
+                cell_id = create_cell_id(regions[r], t, peak_id, fov_id)
+                Cells[cell_id] = Cell(cell_id, regions[r], t, parent_id=None, store=store)
+
+                # add thes id to list of current leaves
+                cell_leaves.append(cell_id)
+            continue
+
+        ### Determine if the regions are children of current leaves
+        frame_leaves = list(cell_leaves)
+        leaf_data = get_leaf_arrays([Cells[leaf_id] for leaf_id in frame_leaves])
+        region_leaf, region_dist = match_regions_to_leaves(leaf_data['y'], region_data['y'],
+                                                           method=assignment)
+
+        # each leaf keeps its closest two regions, in region order
+        first, second, discarded = limit_leaf_regions(region_leaf, region_dist, len(frame_leaves))
+
+        # discarded regions become new leaves if they are near the closed end of the channel.
+        # they are checked by distance and a leaf's remaining regions are skipped at the first failure
+        stopped_leaves = set()
+        for r in discarded:
+            if region_leaf[r] in stopped_leaves:
+                continue
+            if can_start[r]:
+                cell_id = create_cell_id(regions[r], t, peak_id, fov_id)
+                Cells[cell_id] = Cell(cell_id, regions[r], t, parent_id=None, store=store)
+                cell_leaves.append(cell_id) # add to leaves
+            elif region_leaf[r] >= 0:
+                stopped_leaves.add(region_leaf[r])
+
+        ### check all proposed links of this time point at once
+        # 1 if the cell grows by the first region, 2 if it grows by the second,
+        # 3 if it divides into both and 0 if nothing should happen
+        first_data = {key : values[np.maximum(first, 0)] for key, values in six.iteritems(region_data)}
+        second_data = {key : values[np.maximum(second, 0)] for key, values in six.iteritems(region_data)}
+        grows_first = check_growth_arrays(leaf_data, first_data)
+        grows_second = check_growth_arrays(leaf_data, second_data)
+        divides = check_division_arrays(leaf_data, first_data, second_data)
+
+        one_link = (first >= 0) & (second < 0)
+        two_links = second >= 0
+        result = np.zeros(len(frame_leaves), dtype=int)
+        result[one_link & grows_first] = 1
+        result[two_links] = np.where(grows_first, 1,
+                                     np.where(grows_second, 2,
+                                              np.where(divides, 3, 0)))[two_links]
+
+        ### apply the results, leaf by leaf in the order of the leaves
+        for l in np.flatnonzero(result):
+            leaf_id = frame_leaves[l]
+            region1 = regions[first[l]]
+
+            # grow the cell by the first region. If there was a second region,
+            # it can be a new leaf if it passes the requirements
+            if result[l] == 1:
+                Cells[leaf_id].grow(region1, t)
+
+                if second[l] >= 0 and can_start[second[l]]:
+                    region2 = regions[second[l]]
+                    cell_id = create_cell_id(region2, t, peak_id, fov_id)
+                    Cells[cell_id] = Cell(cell_id, region2, t, parent_id=None, store=store)
+                    cell_leaves.append(cell_id) # add to leaves
+
+            # ditto for 2
+            elif result[l] == 2:
+                region2 = regions[second[l]]
+                Cells[leaf_id].grow(region2, t)
+
+                if can_start[first[l]]:
+                    cell_id = create_cell_id(region1, t, peak_id, fov_id)
+                    Cells[cell_id] = Cell(cell_id, region1, t, parent_id=None, store=store)
+                    cell_leaves.append(cell_id) # add to leaves
+
+            # create two new cells and divide the mother
+            elif result[l] == 3:
+                region2 = regions[second[l]]
+                daughter1_id = create_cell_id(region1, t, peak_id, fov_id)
+                daughter2_id = create_cell_id(region2, t, peak_id, fov_id)
+                Cells[daughter1_id] = Cell(daughter1_id, region1, t,
+                                           parent_id=leaf_id, store=store)
+                Cells[daughter2_id] = Cell(daughter2_id, region2, t,
+                                           parent_id=leaf_id, store=store)
+                Cells[leaf_id].divide(Cells[daughter1_id], Cells[daughter2_id], t)
+
+                # remove mother from current leaves
+                cell_leaves.remove(leaf_id)
+
+                # add the daughter ids to list of current leaves if they pass cutoffs
+                if can_start[first[l]]:
+                    cell_leaves.append(daughter1_id)
+
+                if can_start[second[l]]:
+                    cell_leaves.append(daughter2_id)
+
+    # cell cycle stats of all divided cells, then put the time points of each cell together
+    store.compute_stats()
+    store.pack()
+
+    # return the dictionary with all the cells
+    return Cells
+
+def get_region_arrays(region_table, frame):
+    '''Properties of the regions of one frame used for linking, as arrays with
+    one entry per region in label order.'''
+
+    start, stop = np.searchsorted(region_table['frame'], [frame, frame + 1])
+
+    return {'label' : region_table['label'][start:stop],
+            'y' : region_table['centroid_y'][start:stop],
+            'length' : region_table['major_axis_length'][start:stop],
+            'area' : region_table['area'][start:stop].astype(float)}
+
+def get_leaf_arrays(cells):
+    '''Last known properties of the leaf cells, as arrays with one entry per
+    leaf. Failed Feret diameters become NaN, so no region passes the growth
+    checks for that leaf.'''
+
+    def last_values(column):
+        return np.array([cell.store.point_value(cell.row, column) for cell in cells], dtype=float)
+
+    return {'y' : last_values('centroid_y'),
+            'top' : last_values('min_row'),
+            'bottom' : last_values('max_row'),
+            'length' : last_values('lengths'),
+            'area' : last_values('areas')}
+
+def match_regions_to_leaves(leaf_y, region_y, method='nearest'):
+    '''
+    Links the regions of one time point to the current leaves by their y
+    centroids. Cells in a channel are ordered along y, so the closest leaf is
+    found with a binary search in the sorted leaf positions.
+
+    Parameters
+    ----------
+    leaf_y, region_y : np.ndarray
+        y centroids of the leaves and of the regions.
+    method : str
+        'nearest' links every region to its closest leaf. Ties go to the leaf
+        that comes first in leaf_y. 'global' solves a minimum total distance
+        assignment where every leaf can take at most two regions. Regions left
+        over when there are more than two per leaf are not linked.
+
+    Returns
+    -------
+    region_leaf : np.ndarray
+        Index into leaf_y for each region, -1 if the region is not linked.
+    region_dist : np.ndarray
+        Distance in y to that leaf, inf if the region is not linked.
+    '''
+
+    if method == 'global':
+        # each leaf appears twice, so it can be matched to two daughters
+        cost = np.abs(region_y[:, None] - np.repeat(leaf_y, 2)[None, :])
+        rows, cols = linear_sum_assignment(cost)
+
+        region_leaf = np.full(len(region_y), -1, dtype=int)
+        region_dist = np.full(len(region_y), np.inf)
+        region_leaf[rows] = cols // 2
+        region_dist[rows] = cost[rows, cols]
+
+        return region_leaf, region_dist
+
+    order = np.argsort(leaf_y, kind='stable')
+    sorted_y = leaf_y[order]
+    n_leaves = len(sorted_y)
+
+    # closest leaf above and below each region. Leaves at the same position are
+    # represented by the first of them, as a loop over the leaves would pick it
+    upper = np.searchsorted(sorted_y, region_y, side='left')
+    lower = np.clip(upper - 1, 0, n_leaves - 1)
+    lower = np.searchsorted(sorted_y, sorted_y[lower], side='left')
+    upper = np.clip(upper, 0, n_leaves - 1)
+
+    lower_dist = np.abs(region_y - sorted_y[lower])
+    upper_dist = np.abs(region_y - sorted_y[upper])
+    use_upper = (upper_dist < lower_dist) | ((upper_dist == lower_dist) & (order[upper] < order[lower]))
+
+    region_leaf = np.where(use_upper, order[upper], order[lower])
+    region_dist = np.where(use_upper, upper_dist, lower_dist)
+
+    return region_leaf, region_dist
+
+def limit_leaf_regions(region_leaf, region_dist, n_leaves):
+    '''
+    Keeps the two closest regions of each leaf.
+
+    Returns
+    -------
+    first, second : np.ndarray
+        For each leaf the index of the upper and lower kept region, -1 if none.
+    discarded : list of int
+        Regions not kept, grouped by leaf and in order of distance within a
+        leaf. Unlinked regions come first.
+    '''
+
+    first = np.full(n_leaves, -1, dtype=int)
+    second = np.full(n_leaves, -1, dtype=int)
+
+    # sort by leaf, then distance, then region order
+    region_idx = np.arange(len(region_leaf))
+    order = np.lexsort((region_idx, region_dist, region_leaf))
+    sorted_leaf = region_leaf[order]
+
+    # rank of each region among the regions of its leaf
+    group_start = np.searchsorted(sorted_leaf, sorted_leaf, side='left')
+    rank = np.arange(len(order)) - group_start
+
+    linked = sorted_leaf >= 0
+    closest = order[linked & (rank == 0)]
+    next_closest = order[linked & (rank == 1)]
+    first[region_leaf[closest]] = closest
+    second[region_leaf[next_closest]] = next_closest
+
+    # put the kept pair in region order so the top region is first
+    swap = (second >= 0) & (second < first)
+    first[swap], second[swap] = second[swap], first[swap]
+
+    discarded = list(order[~linked | (rank >= 2)])
+
+    return first, second, discarded
+
+### Cell class and related functions
+
+# this is the object that holds all information for a detection
+class Detection():
+    '''
+    The Detection is a single detection in a single frame.
+    '''
+
+    # initialize (birth) the cell
+    def __init__(self, detection_id, region, t):
+        '''The detection must be given a unique detection_id and passed the region
+        information from the segmentation
+
+        Parameters
+        __________
+
+        detection_id : str
+            detection_id is a string in the form fXpXtXrX
+            f is 3 digit FOV number
+            p is 4 digit peak number
+            t is 4 digit time point
+            r is region label for that segmentation
+            Use the function create_detection_id to return a proper string.
+
+        region : region properties object
+            Information about the labeled region from
+            skimage.measure.regionprops(), or a Region from a region table
+            (see get_region_table)
+
+            '''
+
+        # create all the attributes
+        # id
+        self.id = detection_id
+
+        # identification convenience
+        self.fov = int(detection_id.split('f')[1].split('p')[0])
+        self.peak = int(detection_id.split('p')[1].split('t')[0])
+        self.t = t
+
+        self.cell_count = 1
+
+        # self.abs_times = [params['time_table'][self.fov][t]] # elapsed time in seconds
+        if region is not None:
+            self.label = region.label
+            self.bbox = region.bbox
+            self.area = region.area
+
+            # calculating cell length and width by using Feret Diamter. These values are in pixels
+            length_tmp, width_tmp = region_length_width(region)
+            if length_tmp == None:
+                mm3.warning('feretdiameter() failed for ' + self.id + ' at t=' + str(t) + '.')
+            self.length = length_tmp
+            self.width = width_tmp
+
+            # calculate cell volume as cylinder plus hemispherical ends (sphere). Unit is px^3
+            self.volume = (length_tmp - width_tmp) * np.pi * (width_tmp/2)**2 + (4/3) * np.pi * (width_tmp/2)**3
+
+            # angle of the fit elipsoid and centroid location
+            self.orientation = region.orientation
+            self.centroid = region.centroid
+
+        else:
+            self.label = None
+            self.bbox = None
+            self.area = None
+
+            # calculating cell length and width by using Feret Diamter. These values are in pixels
+            length_tmp, width_tmp = (None, None)
+            self.length = None
+            self.width = None
+
+            # calculate cell volume as cylinder plus hemispherical ends (sphere). Unit is px^3
+            self.volume = None
+
+            # angle of the fit elipsoid and centroid location
+            self.orientation = None
+            self.centroid = None
+
+# this is the object that holds the data of all cells of a lineage
+class CellStore():
+    '''
+    The CellStore holds the data of many cells in columns. Values measured at every
+    time point (times, lengths, centroids...) have one array per attribute with a
+    row per cell time point. Values a cell has once (birth time, sb, tau...) have
+    one array per attribute with a row per cell. Cell and CellFromGraph objects are
+    views onto one cell row of a store.
+
+    While tracking, time points are added in the order they are found. pack() puts
+    the time points of each cell next to each other, so the data of cell row i is
+    offsets[i]:offsets[i+1], and converts the measurements to float16. A store is
+    packed before it is pickled.
+    '''
+
+    # per time point columns and their dtype while tracking
+    point_columns = {'times' : 'int32',
+                     'abs_times' : 'float64', # elapsed time in seconds
+                     'labels' : 'int32',
+                     'areas' : 'int32',
+                     'lengths' : 'float64', # Feret diameters, in pixels
+                     'widths' : 'float64',
+                     'volumes' : 'float64', # px^3
+                     'orientations' : 'float64',
+                     'centroid_y' : 'float64',
+                     'centroid_x' : 'float64',
+                     'min_row' : 'int32',
+                     'min_col' : 'int32',
+                     'max_row' : 'int32',
+                     'max_col' : 'int32'}
+    # these become float16 when the store is packed. No need for float64
+    # see https://docs.scipy.org/doc/numpy-1.13.0/user/basics.types.html
+    float16_columns = ['lengths', 'widths', 'volumes', 'orientations', 'centroid_y', 'centroid_x']
+
+    # per cell columns. -1 and NaN mean None
+    cell_columns = {'fov' : 'int32',
+                    'peak' : 'int32',
+                    'birth_label' : 'int32',
+                    'birth_time' : 'int32',
+                    'division_time' : 'int32',
+                    'division_abs_time' : 'float64',
+                    'death' : 'int32',
+                    'disappear' : 'int32',
+                    'sb' : 'float16', # in um
+                    'sd' : 'float16', # combined lengths of daughters, in um
+                    'delta' : 'float16',
+                    'tau' : 'float16',
+                    'elong_rate' : 'float16',
+                    'septum_position' : 'float16',
+                    'width' : 'float16',
+                    'division_width' : 'float16'} # mean width of the daughters at birth, in um
+
+    def __init__(self):
+        self.n_cells = 0
+        self.n_points = 0
+        self.point_data = {column : np.zeros(0, dtype=dtype)
+                           for column, dtype in six.iteritems(self.point_columns)}
+        self.cell_data = {column : np.zeros(0, dtype=dtype)
+                          for column, dtype in six.iteritems(self.cell_columns)}
+
+        # per cell Python objects
+        self.ids = []
+        self.parents = [] # parent id, or parent object for CellFromGraph
+        self.daughters = []
+        self.extras = [] # attributes added after tracking, like fluorescence or foci
+
+        # row numbers of the time points of each cell while tracking.
+        # When packed this is None and offsets is used instead
+        self.cell_points = []
+        self.offsets = None
+
+        self.pxl2um = None # set when a cell divides
+
+    def __len__(self):
+        return self.n_cells
+
+    def __getstate__(self):
+        self.pack()
+        return self.__dict__
+
+    def add_rows(self, columns, n, values):
+        '''Writes values to row n of a dictionary of arrays, doubling the arrays when full.'''
+
+        if n == len(columns[next(iter(columns))]):
+            for column, data in list(six.iteritems(columns)):
+                grown = np.empty(max(16, 2 * n), dtype=data.dtype)
+                grown[:n] = data[:n]
+                grown[n:] = -1 if data.dtype.kind == 'i' else np.nan
+                columns[column] = grown
+
+        for column, value in six.iteritems(values):
+            columns[column][n] = value
+
+    def add_cell(self, cell_id, fov, peak, birth_label, t, parent=None):
+        '''Adds a cell without time points and returns its row.'''
+
+        row = self.n_cells
+        self.add_rows(self.cell_data, row, {'fov' : fov,
+                                            'peak' : peak,
+                                            'birth_label' : birth_label,
+                                            'birth_time' : t})
+        self.n_cells += 1
+
+        self.ids.append(cell_id)
+        self.parents.append(parent)
+        self.daughters.append(None)
+        self.extras.append(None)
+        if self.offsets is None:
+            self.cell_points.append([])
+        else:
+            self.offsets = np.append(self.offsets, self.n_points)
+
+        return row
+
+    def add_point_values(self, row, values):
+        '''Adds a time point with the given column values to cell row.'''
+
+        if self.offsets is not None:
+            self.unpack()
+
+        self.add_rows(self.point_data, self.n_points, values)
+        self.cell_points[row].append(self.n_points)
+        self.n_points += 1
+
+    def add_point(self, row, region, t):
+        '''Adds a time point to cell row from a region of the segmentation.'''
+
+        fov = int(self.cell_data['fov'][row])
+
+        # calculating cell length and width by using Feret Diamter. These values are in pixels
+        length, width = region_length_width(region)
+        if length is None:
+            warning('feretdiameter() failed for ' + self.ids[row] + ' at t=' + str(t) + '.')
+            length, width = np.nan, np.nan
+
+        self.add_point_values(row, {'times' : t,
+                                    'abs_times' : params['time_table'][fov][t],
+                                    'labels' : region.label,
+                                    'areas' : region.area,
+                                    'lengths' : length,
+                                    'widths' : width,
+                                    # cylinder plus hemispherical ends (sphere)
+                                    'volumes' : ((length - width) * np.pi * (width/2)**2 +
+                                                 (4/3) * np.pi * (width/2)**3),
+                                    'orientations' : region.orientation,
+                                    'centroid_y' : region.centroid[0],
+                                    'centroid_x' : region.centroid[1],
+                                    'min_row' : region.bbox[0],
+                                    'min_col' : region.bbox[1],
+                                    'max_row' : region.bbox[2],
+                                    'max_col' : region.bbox[3]})
+
+    def point_index(self, row):
+        '''Rows of the time points of cell row, a slice if the store is packed.'''
+
+        if self.offsets is None:
+            return self.cell_points[row]
+        return slice(self.offsets[row], self.offsets[row+1])
+
+    def points(self, row, column):
+        '''Values of one column at all time points of cell row.'''
+
+        return self.point_data[column][self.point_index(row)]
+
+    def point_value(self, row, column, i=-1):
+        '''Value of one column at the i-th time point of cell row.'''
+
+        if self.offsets is None:
+            return self.point_data[column][self.cell_points[row][i]]
+        n = self.offsets[row+1] - self.offsets[row]
+        return self.point_data[column][self.offsets[row] + (i % n)]
+
+    def get_value(self, row, column):
+        '''Value of a per cell column, None if it is not set. The division stats
+        of a cell that has divided are returned even if they are NaN.'''
+
+        value = self.cell_data[column][row]
+        if value.dtype.kind == 'i':
+            return None if value < 0 else int(value)
+        if np.isnan(value) and self.cell_data['division_time'][row] < 0:
+            return None
+        return value
+
+    def set_value(self, row, column, value):
+        if value is None:
+            value = -1 if self.cell_data[column].dtype.kind == 'i' else np.nan
+        self.cell_data[column][row] = value
+
+    def point_order(self):
+        '''Point rows sorted by cell and the offsets of each cell in them.'''
+
+        if self.offsets is not None:
+            return np.arange(self.n_points), self.offsets
+
+        order = np.fromiter(itertools.chain.from_iterable(self.cell_points),
+                            dtype=np.int64, count=self.n_points)
+        offsets = np.zeros(self.n_cells + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(points) for points in self.cell_points])
+
+        return order, offsets
+
+    def daughter_rows(self):
+        '''Rows of the divided cells whose two daughters are in this store, and
+        the rows of their daughters, daughter1 first.'''
+
+        index = {cell_id : row for row, cell_id in enumerate(self.ids)}
+
+        def daughter_row(daughter):
+            # daughters are ids for Cell and objects for CellFromGraph
+            if isinstance(daughter, Cell):
+                return daughter.row if daughter.store is self else None
+            return index.get(daughter)
+
+        rows, daughter_rows = [], []
+        for row in np.flatnonzero(self.cell_data['division_time'][:self.n_cells] >= 0):
+            if not self.daughters[row] or len(self.daughters[row]) != 2:
+                continue
+            d_rows = [daughter_row(daughter) for daughter in self.daughters[row]]
+            if None not in d_rows:
+                rows.append(row)
+                daughter_rows.append(d_rows)
+
+        return np.array(rows, dtype=np.int64), np.array(daughter_rows, dtype=np.int64).reshape(-1, 2)
+
+    def compute_stats(self):
+        '''
+        Calculates the cell cycle stats of all divided cells at once from their
+        time points and the first time point of their daughters: sb, sd, delta,
+        tau, elong_rate, septum_position and width. Tracking only records the
+        daughters and division time of a cell, this is run when a lineage is done.
+
+        The elongation rate is the slope of a least squares fit of log length
+        against time including the division point, as np.polyfit did for each
+        cell. It is made from sums over the time points of each cell.
+        '''
+
+        rows, daughter_rows = self.daughter_rows()
+        if not len(rows):
+            return
+
+        self.pxl2um = params['pxl2um']
+
+        order, offsets = self.point_order()
+        n_points = np.diff(offsets)
+        first = offsets[:-1] # first time point of each cell, in order
+        point_cell = np.repeat(np.arange(self.n_cells), n_points)
+
+        def column(name):
+            return self.point_data[name][order].astype('float64')
+
+        def cell_sums(values):
+            return np.bincount(point_cell, weights=values, minlength=self.n_cells)[rows]
+
+        abs_times = column('abs_times')
+        lengths = column('lengths') * self.pxl2um
+        widths = column('widths') * self.pxl2um
+        daughter1, daughter2 = first[daughter_rows[:, 0]], first[daughter_rows[:, 1]]
+
+        # size at birth
+        sb = lengths[first[rows]]
+        # force the division length to be the combined lengths of the daughters
+        sd = lengths[daughter1] + lengths[daughter2]
+        division_width = (widths[daughter1] + widths[daughter2]) / 2
+        # generation time. Use more accurate times and convert to minutes
+        tau = (abs_times[daughter1] - abs_times[first[rows]]) / 60.0
+
+        # the division is one more data point, from the daughters
+        n = n_points[rows] + 1.0
+
+        # elongation rate. Times in minutes from birth, the division is at tau
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = (abs_times - abs_times[first][point_cell]) / 60.0
+            y = np.log(lengths)
+            y_div = np.log(sd)
+            x_mean = (cell_sums(x) + tau) / n
+            y_mean = (cell_sums(y) + y_div) / n
+
+            # deviations from the mean of each cell, for all points of the divided cells
+            cell_mean_x = np.zeros(self.n_cells)
+            cell_mean_y = np.zeros(self.n_cells)
+            cell_mean_x[rows] = x_mean
+            cell_mean_y[rows] = y_mean
+            dx = x - cell_mean_x[point_cell]
+            dy = y - cell_mean_y[point_cell]
+
+            sxx = cell_sums(dx * dx) + (tau - x_mean)**2
+            sxy = cell_sums(dx * dy) + (tau - x_mean) * (y_div - y_mean)
+            elong_rate = sxy / sxx * 60.0 # convert to hours
+
+        failed = ~np.isfinite(elong_rate)
+        elong_rate[failed] = np.nan
+        for row in rows[failed]:
+            warning('Elongation rate calculate failed for {}.'.format(self.ids[row]))
+
+        # the float16 columns convert the stats to smaller floats
+        stats = {'division_abs_time' : abs_times[daughter1],
+                 'sb' : sb,
+                 'sd' : sd,
+                 'delta' : sd - sb, # delta is here for convenience
+                 'tau' : tau,
+                 'elong_rate' : elong_rate,
+                 # the septum position as a number between 0 and 1
+                 # which indicates the size of daughter closer to the closed end
+                 # compared to the total size
+                 'septum_position' : lengths[daughter1] / sd,
+                 # single width over cell's life
+                 'width' : (cell_sums(widths) + division_width) / n,
+                 'division_width' : division_width}
+        for name, values in six.iteritems(stats):
+            self.cell_data[name][rows] = values
+
+    def pack(self):
+        '''Sorts the time points by cell, trims the arrays and converts the
+        measurements to float16.'''
+
+        if self.offsets is not None:
+            return
+
+        order, self.offsets = self.point_order()
+
+        for column in self.point_data:
+            dtype = 'float16' if column in self.float16_columns else self.point_data[column].dtype
+            self.point_data[column] = self.point_data[column][order].astype(dtype)
+        for column in self.cell_data:
+            self.cell_data[column] = self.cell_data[column][:self.n_cells]
+
+        self.cell_points = None
+
+    def unpack(self):
+        '''Goes back to per cell lists of time points, so cells can grow again.'''
+
+        self.cell_points = [list(range(self.offsets[i], self.offsets[i+1]))
+                            for i in range(self.n_cells)]
+        self.offsets = None
+        for column, dtype in six.iteritems(self.point_columns):
+            self.point_data[column] = self.point_data[column].astype(dtype)
+
+    def cells(self, cell_class=None):
+        '''Dictionary of cell id : Cell view for all cells of the store.'''
+
+        cell_class = cell_class or Cell
+        return {cell_id : _cell_view(cell_class, self, row) for row, cell_id in enumerate(self.ids)}
+
+    def to_table(self):
+        '''
+        The store as a dictionary of arrays, for save_lineage_table. Point columns
+        start with point_ and cell columns with cell_. Parents and daughters are
+        saved as ids, '' for none. Attributes added to the cells after tracking
+        are not saved.
+        '''
+
+        self.pack()
+
+        table = {'point_' + column : data for column, data in six.iteritems(self.point_data)}
+        table.update({'cell_' + column : data for column, data in six.iteritems(self.cell_data)})
+        table['offsets'] = self.offsets
+        table['ids'] = np.array(self.ids, dtype=str)
+        table['parents'] = np.array([getattr(parent, 'id', parent) or '' for parent in self.parents], dtype=str)
+        daughter_ids = [[getattr(daughter, 'id', daughter) for daughter in daughters or []]
+                        for daughters in self.daughters]
+        table['daughters'] = np.array([ids + [''] * (2 - len(ids)) for ids in daughter_ids],
+                                      dtype=str).reshape(-1, 2)
+        table['pxl2um'] = np.float64(np.nan if self.pxl2um is None else self.pxl2um)
+
+        return table
+
+    def add_legacy_cell(self, state):
+        '''Adds a cell from the attribute dictionary of a Cell or CellFromGraph
+        pickled before cells were kept in a CellStore, and returns its row.'''
+
+        state = dict(state)
+        row = self.add_cell(state.pop('id'), state.pop('fov'), state.pop('peak'),
+                            state.pop('birth_label'), state.pop('birth_time'),
+                            parent=state.pop('parent'))
+        self.daughters[row] = state.pop('daughters')
+
+        times = state.pop('times')
+        abs_times = state.pop('abs_times')
+        point_lists = [state.pop(key) for key in ['labels', 'areas', 'lengths', 'widths',
+                                                  'volumes', 'orientations', 'centroids', 'bboxes']]
+        for i, t in enumerate(times):
+            label, area, length, width, volume, orientation, centroid, bbox = [values[i] for values in point_lists]
+            self.add_point_values(row, {'times' : t,
+                                        'abs_times' : abs_times[i],
+                                        'labels' : label,
+                                        'areas' : area,
+                                        'lengths' : np.nan if length is None else length,
+                                        'widths' : np.nan if width is None else width,
+                                        'volumes' : np.nan if volume is None else volume,
+                                        'orientations' : orientation,
+                                        'centroid_y' : centroid[0],
+                                        'centroid_x' : centroid[1],
+                                        'min_row' : bbox[0],
+                                        'min_col' : bbox[1],
+                                        'max_row' : bbox[2],
+                                        'max_col' : bbox[3]})
+
+        for column in ['division_time', 'death', 'disappear', 'sb', 'sd', 'delta', 'tau',
+                       'elong_rate', 'septum_position', 'width']:
+            self.set_value(row, column, state.pop(column, None))
+        if len(abs_times) > len(times):
+            self.cell_data['division_abs_time'][row] = abs_times[-1]
+        widths_w_div = state.pop('widths_w_div', None)
+        if widths_w_div is not None:
+            self.cell_data['division_width'][row] = widths_w_div[-1]
+        self.pxl2um = params.get('pxl2um')
+
+        # these are made from the columns
+        for key in ['times_w_div', 'lengths_w_div', 'volumes_w_div', 'regions']:
+            state.pop(key, None)
+        self.extras[row] = state or None
+
+        return row
+
+def cell_store_from_table(table):
+    '''Makes a packed CellStore from a table made by CellStore.to_table. Parents
+    and daughters are ids, as for Cell.'''
+
+    store = CellStore()
+    store.n_cells = len(table['ids'])
+    store.offsets = table['offsets']
+    store.n_points = int(store.offsets[-1])
+    store.cell_points = None
+    store.point_data = {column : table['point_' + column] for column in store.point_columns}
+    store.cell_data = {column : table['cell_' + column] for column in store.cell_columns}
+
+    store.ids = table['ids'].tolist()
+    store.parents = [parent or None for parent in table['parents'].tolist()]
+    store.daughters = [[daughter for daughter in daughters if daughter] or None
+                       for daughters in table['daughters'].tolist()]
+    store.extras = [None] * store.n_cells
+    if not np.isnan(table['pxl2um']):
+        store.pxl2um = float(table['pxl2um'])
+
+    return store
+
+def _cell_view(cell_class, store, row):
+    '''Makes a Cell or CellFromGraph view onto a row of a store. Used for unpickling.'''
+
+    cell = object.__new__(cell_class)
+    cell.store = store
+    cell.row = row
+    return cell
+
+def _point_attribute(column):
+    '''Per time point attribute of a cell, returned as a list.'''
+
+    def get_attribute(cell):
+        values = cell.store.points(cell.row, column)
+        return values.tolist() if values.dtype.kind == 'i' else list(values)
+
+    return property(get_attribute)
+
+def _cell_attribute(column):
+    '''Per cell attribute kept in a column of the store.'''
+
+    def get_attribute(cell):
+        return cell.store.get_value(cell.row, column)
+
+    def set_attribute(cell, value):
+        cell.store.set_value(cell.row, column, value)
+
+    return property(get_attribute, set_attribute)
+
+def _object_attribute(objects):
+    '''Per cell attribute kept in a list of the store.'''
+
+    def get_attribute(cell):
+        return getattr(cell.store, objects)[cell.row]
+
+    def set_attribute(cell, value):
+        getattr(cell.store, objects)[cell.row] = value
+
+    return property(get_attribute, set_attribute)
+
+# this is the object that holds all information for a cell
+class Cell():
+    '''
+    The Cell class is one cell that has been born. It is not neccesarily a cell that
+    has divided.
+
+    A Cell is a view onto one row of a CellStore, which holds the data of all cells
+    of a lineage. It has the attributes of a cell as before, with per time point
+    data as lists. Other attributes can be added to it as usual.
+    '''
+
+    __slots__ = ('store', 'row')
+
+    # attributes returned by vars()
+    attribute_names = ('id', 'fov', 'peak', 'birth_label', 'parent', 'daughters',
+                       'birth_time', 'division_time', 'times', 'abs_times', 'labels',
+                       'bboxes', 'areas', 'lengths', 'widths', 'volumes', 'orientations',
+                       'centroids', 'times_w_div', 'lengths_w_div', 'widths_w_div',
+                       'volumes_w_div', 'sb', 'sd', 'delta', 'tau', 'elong_rate',
+                       'septum_position', 'width', 'death')
+
+    # initialize (birth) the cell
+    def __init__(self, cell_id, region, t, parent_id=None, store=None):
+        '''The cell must be given a unique cell_id and passed the region
+        information from the segmentation
+
+        Parameters
+        __________
+
+        cell_id : str
+            cell_id is a string in the form fXpXtXrX
+            f is 3 digit FOV number
+            p is 4 digit peak number
+            t is 4 digit time point at time of birth
+            r is region label for that segmentation
+            Use the function create_cell_id to do return a proper string.
+
+        region : region properties object
+            Information about the labeled region from
+            skimage.measure.regionprops(), or a Region from a region table
+            (see get_region_table)
+
+        parent_id : str
+            id of the parent if there is one.
+
+        store : CellStore
+            Store to add the cell to. Cells of one lineage should share a store.
+            A new store is made if none is given.
+            '''
+
+        if store is None:
+            store = CellStore()
+
+        # identification convenience
+        fov = int(cell_id.split('f')[1].split('p')[0])
+        peak = int(cell_id.split('p')[1].split('t')[0])
+        birth_label = int(cell_id.split('r')[1])
+
+        self.store = store
+        self.row = store.add_cell(cell_id, fov, peak, birth_label, t, parent=parent_id)
+        store.add_point(self.row, region, t)
+
+    def __reduce__(self):
+        return (_cell_view, (type(self), self.store, self.row))
+
+    def __setstate__(self, state):
+        # cells pickled before the CellStore keep their attributes in a dictionary
+        self.store = CellStore()
+        self.row = self.store.add_legacy_cell(state)
+
+    def __getattr__(self, name):
+        # only called for attributes that are not columns of the store
+        if name in ('store', 'row') or name.startswith('__'):
+            raise AttributeError(name)
+        extras = self.store.extras[self.row]
+        if extras is None or name not in extras:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+        return extras[name]
+
+    def __setattr__(self, name, value):
+        if hasattr(type(self), name):
+            object.__setattr__(self, name, value)
+            return
+        if self.store.extras[self.row] is None:
+            self.store.extras[self.row] = {}
+        self.store.extras[self.row][name] = value
+
+    def to_dict(self):
+        '''All attributes of the cell in a dictionary.'''
+
+        cell_dict = {name : getattr(self, name) for name in self.attribute_names}
+        if self.store.extras[self.row]:
+            cell_dict.update(self.store.extras[self.row])
+        return cell_dict
+
+    # so vars(cell) works as for other objects
+    __dict__ = property(to_dict)
+
+    id = property(lambda cell: cell.store.ids[cell.row])
+    parent = _object_attribute('parents')
+    daughters = _object_attribute('daughters') # None if the cell did not divide
+
+    fov = _cell_attribute('fov')
+    peak = _cell_attribute('peak')
+    birth_label = _cell_attribute('birth_label')
+    birth_time = _cell_attribute('birth_time')
+    division_time = _cell_attribute('division_time') # filled out if cell divides
+    death = _cell_attribute('death')
+
+    # the following information is on a per timepoint basis
+    times = _point_attribute('times')
+    labels = _point_attribute('labels')
+    areas = _point_attribute('areas')
+    lengths = _point_attribute('lengths')
+    widths = _point_attribute('widths')
+    volumes = _point_attribute('volumes')
+    orientations = _point_attribute('orientations')
+
+    @property
+    def abs_times(self):
+        '''Elapsed time in seconds. Divided cells have the division time at the end.'''
+
+        abs_times = list(self.store.points(self.row, 'abs_times'))
+        if self.division_time is not None:
+            abs_times.append(self.store.cell_data['division_abs_time'][self.row])
+        return abs_times
+
+    @property
+    def centroids(self):
+        return list(zip(self.store.points(self.row, 'centroid_y'),
+                        self.store.points(self.row, 'centroid_x')))
+
+    @property
+    def bboxes(self):
+        return list(zip(*[self.store.points(self.row, column).tolist()
+                          for column in ['min_row', 'min_col', 'max_row', 'max_col']]))
+
+    # these include information from the daugthers for division.
+    # They are None if the cell did not divide
+    @property
+    def times_w_div(self):
+        if self.division_time is None:
+            return None
+        return self.times + [self.division_time]
+
+    @property
+    def lengths_w_div(self):
+        if self.division_time is None:
+            return None
+        lengths = self.store.points(self.row, 'lengths').astype('float64') * self.store.pxl2um
+        return list(np.append(lengths, self.sd).astype('float16'))
+
+    @property
+    def widths_w_div(self):
+        if self.division_time is None:
+            return None
+        widths = self.store.points(self.row, 'widths').astype('float64') * self.store.pxl2um
+        return list(np.append(widths, self.store.cell_data['division_width'][self.row]).astype('float16'))
+
+    @property
+    def volumes_w_div(self):
+        '''Volumes for all timepoints, in um^3.'''
+
+        if self.division_time is None:
+            return None
+        lengths = np.array(self.lengths_w_div, dtype='float64')
+        widths = np.array(self.widths_w_div, dtype='float64')
+        volumes = (lengths - widths) * np.pi * (widths/2)**2 + (4/3) * np.pi * (widths/2)**3
+        return list(volumes.astype('float16'))
+
+    # this information is the "production" information that
+    # we want to extract at the end. Some of this is for convenience.
+    # This is only filled out if a cell divides.
+    sb = _cell_attribute('sb') # in um
+    sd = _cell_attribute('sd') # this should be combined lengths of daughters, in um
+    delta = _cell_attribute('delta')
+    tau = _cell_attribute('tau')
+    elong_rate = _cell_attribute('elong_rate')
+    septum_position = _cell_attribute('septum_position')
+    width = _cell_attribute('width')
+
+    def grow(self, region, t):
+        '''Append data from a region to this cell.
+        use cell.times[-1] to get most current value'''
+
+        self.store.add_point(self.row, region, t)
+
+    def die(self, region, t):
+        '''
+        Annotate cell as dying from current t to next t.
+        '''
+        self.death = t
+
+    def divide(self, daughter1, daughter2, t):
+        '''Divide the cell.
+        daugther1 and daugther2 are instances of the Cell class.
+        daughter1 is the daugther closer to the closed end.
+        The stats are calculated with CellStore.compute_stats when the lineage is done.'''
+
+        # put the daugther ids into the cell
+        self.daughters = [daughter1.id, daughter2.id]
+
+        # give this guy a division time
+        self.division_time = daughter1.birth_time
+
+    def print_info(self):
+        '''prints information about the cell'''
+        print('id = %s' % self.id)
+        print('times = {}'.format(', '.join('{}'.format(t) for t in self.times)))
+        print('lengths = {}'.format(', '.join('{:.2f}'.format(l) for l in self.lengths)))
+
+# dictionary of cells with indexes for finding cells by channel, label and time
+class CellIndex(dict):
+    '''
+    A dictionary of cell id : cell like Cells, with indexes of the cells by FOV and
+    peak, by birth label, by the time points they were seen at and by birth time.
+    The filter functions of mm3_analysis and mm3_plots use them when they are given
+    a CellIndex, so a lookup takes time in proportion to the cells found. They
+    return a CellIndex as well, so filters can be chained.
+
+    An index is made the first time it is used, and dropped when cells are added or
+    removed. Cells are expected not to change after they are added.
+    '''
+
+    # the keys each index files a cell under
+    index_keys = {'fov_peak' : lambda cell: [(cell.fov, cell.peak)],
+                  'fov' : lambda cell: [cell.fov],
+                  'peak' : lambda cell: [cell.peak],
+                  'birth_label' : lambda cell: [cell.birth_label],
+                  'time' : lambda cell: cell.times}
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.indexes = {}
+
+    def __reduce__(self):
+        return (CellIndex, (list(six.iteritems(self)),))
+
+    # anything that changes the cells drops the indexes
+    def __setitem__(self, cell_id, cell):
+        dict.__setitem__(self, cell_id, cell)
+        self.indexes.clear()
+
+    def __delitem__(self, cell_id):
+        dict.__delitem__(self, cell_id)
+        self.indexes.clear()
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.indexes.clear()
+
+    def setdefault(self, cell_id, cell=None):
+        self.indexes.clear()
+        return dict.setdefault(self, cell_id, cell)
+
+    def pop(self, *args):
+        self.indexes.clear()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self.indexes.clear()
+        return dict.popitem(self)
+
+    def clear(self):
+        dict.clear(self)
+        self.indexes.clear()
+
+    def get_index(self, name):
+        '''An index by name, made if it is not there yet. 'position' is the order
+        of the cells and 'birth_time' the sorted birth times with the cell ids,
+        the others are dictionaries of key : list of cell ids.'''
+
+        if name not in self.indexes:
+            if name == 'position':
+                index = {cell_id : i for i, cell_id in enumerate(self)}
+            elif name == 'birth_time':
+                cell_ids = list(self)
+                birth_times = np.array([cell.birth_time for cell in six.itervalues(self)], dtype=float)
+                order = np.argsort(birth_times, kind='stable')
+                index = (birth_times[order], [cell_ids[i] for i in order])
+            else:
+                index = {}
+                get_keys = self.index_keys[name]
+                for cell_id, cell in six.iteritems(self):
+                    for key in get_keys(cell):
+                        index.setdefault(key, []).append(cell_id)
+            self.indexes[name] = index
+
+        return self.indexes[name]
+
+    def subset(self, cell_ids):
+        '''CellIndex of the given cell ids, in the order of this one.'''
+
+        position = self.get_index('position')
+        cell_ids = sorted(cell_ids, key=position.__getitem__)
+        return CellIndex((cell_id, self[cell_id]) for cell_id in cell_ids)
+
+    def find(self, name, values):
+        '''Cells filed under any of the values in an index.'''
+
+        index = self.get_index(name)
+        if len(values) == 1:
+            # the cells of one key are already in order
+            return CellIndex((cell_id, self[cell_id]) for cell_id in index.get(values[0], []))
+        return self.subset(itertools.chain.from_iterable(index.get(value, []) for value in values))
+
+    def of_fov_and_peak(self, fov_id, peak_id):
+        return self.find('fov_peak', [(fov_id, peak_id)])
+
+    def of_fov(self, fov_ids):
+        return self.find('fov', fov_ids)
+
+    def of_peak(self, peak_ids):
+        return self.find('peak', peak_ids)
+
+    def of_birth_label(self, labels):
+        return self.find('birth_label', labels)
+
+    def at_time(self, t):
+        '''Cells that have a region at time point t.'''
+
+        return self.find('time', [t])
+
+    def born_between(self, start=None, end=None):
+        '''Cells with start <= birth_time <= end. Either can be None.'''
+
+        birth_times, cell_ids = self.get_index('birth_time')
+        first = 0 if start is None else np.searchsorted(birth_times, start, side='left')
+        last = len(birth_times) if end is None else np.searchsorted(birth_times, end, side='right')
+        return self.subset(cell_ids[first:last])
+
+class CellTree():
+
+    def __init__(self):
+        self.cells = {}
+        self.scores = [] # probably needs to be different
+        self.score = 0
+        self.cell_id_list = []
+
+    def add_cell(self, cell):
+        self.cells[cell.id] = cell
+        self.cell_id_list.append(cell.id)
+        self.cell_id_list.sort()
+
+    def update_score(self):
+        pass
+
+    def get_cell(self, cell_id):
+        return(self.cells[cell_id])
+
+    def get_top_from_cell(self, cell_id):
+        pass
+
+# this is the object that holds all information for a cell
+class CellFromGraph(Cell):
+    '''
+    The CellFromGraph class is one cell that has been born.
+    It is not neccesarily a cell that has divided.
+
+    Like Cell, it is a view onto a row of a CellStore. Its parent and daughters
+    are CellFromGraph objects instead of ids.
+    '''
+
+    __slots__ = ()
+
+    attribute_names = Cell.attribute_names + ('regions', 'disappear')
+
+    # initialize (birth) the cell
+    def __init__(self, cell_id, region, t, parent=None, store=None):
+        '''The cell must be given a unique cell_id and passed the region
+        information from the segmentation
+
+        Parameters
+        __________
+
+        cell_id : str
+            cell_id is a string in the form fXpXtXrX
+            f is 3 digit FOV number
+            p is 4 digit peak number
+            t is 4 digit time point at time of birth
+            r is region label for that segmentation
+            Use the function create_cell_id to do return a proper string.
+
+        region : region properties object
+            Information about the labeled region from
+            skimage.measure.regionprops(), or a Region from a region table
+            (see get_region_table)
+
+        parent : CellFromGraph
+            the parent if there is one.
+
+        store : CellStore
+            Store to add the cell to. Cells of one lineage should share a store.
+            A new store is made if none is given.
+            '''
+
+        if store is None:
+            store = CellStore()
+
+        # identification convenience
+        fov = int(cell_id.split('f')[1].split('p')[0])
+        peak = int(cell_id.split('p')[1].split('t')[0])
+
+        self.store = store
+        self.row = store.add_cell(cell_id, fov, peak, int(region.label), t, parent=parent)
+        store.add_point(self.row, region, t)
+
+        self.area_mean_fluorescence = {}
+        self.volume_mean_fluorescence = {}
+        self.total_fluorescence = {}
+        self.foci = {}
+
+    disappear = _cell_attribute('disappear')
+
+    @property
+    def regions(self):
+        '''The regions of the cell at each time point, made from the store.
+        The axis lengths of the ellipse are not kept and are None.'''
+
+        return [Region(label, centroid, bbox, area, orientation, None, None, length, width)
+                for label, centroid, bbox, area, orientation, length, width
+                in zip(self.labels, self.centroids, self.bboxes, self.areas,
+                       self.orientations, self.lengths, self.widths)]
+
+    def __len__(self):
+        return(len(self.store.point_index(self.row)))
+
+    def add_parent(self, parent):
+        self.parent = parent
+
+    def disappears(self, region, t):
+        '''
+        Annotate cell as disappearing from current t to next t.
+        '''
+        self.disappear = t
+
+    def add_daughter(self, daughter, t):
+
+        if self.daughters is None:
+            self.daughters = [daughter]
+        else:
+            self.daughters.append(daughter)
+            assert len(self.daughters) < 3, "Too many daughter cells in cell {}".format(self.id)
+            # sort daughters by y position, with smaller y-value first.
+            # this will cause the daughter closer to the closed end of the trap to be listed first.
+            self.daughters.sort(key=lambda cell: cell.centroids[0][0])
+            self.divide(t)
+
+    def divide(self, t):
+        '''Divide the cell.
+        daughter1 is the daugther closer to the closed end.
+        The stats are calculated with CellStore.compute_stats when the lineage is done.'''
+
+        # give this guy a division time
+        self.division_time = self.daughters[0].birth_time
+
+    def add_focus(self, focus, t):
+        '''Adds a focus to the cell. See function foci_info_unet'''
+        self.foci[focus.id] = focus
+
+    def print_info(self):
+        '''prints information about the cell'''
+        print('id = %s' % self.id)
+        print('times = {}'.format(', '.join('{}'.format(t) for t in self.times)))
+        print('lengths = {}'.format(', '.join('{:.2f}'.format(l) for l in self.lengths)))
+        if self.daughters is not None:
+            print('daughters = {}'.format(', '.join('{}'.format(daughter.id) for daughter in self.daughters)))
+        if self.parent is not None:
+            print('parent = {}'.format(self.parent.id))
+
+    def make_wide_df(self):
+
+        import pandas as pd
+
+        data = {}
+        data['id'] = self.id
+        data['fov'] = self.fov
+        data['trap'] = self.peak
+        data['parent'] = self.parent
+        data['child1'] = None
+        data['child2'] = None
+        data['division_time'] = self.division_time
+        data['birth_label'] = self.birth_label
+        data['birth_time'] = self.birth_time
+        data['sb'] = self.sb
+        data['sd'] = self.sd
+        data['delta'] = self.delta
+        data['tau'] = self.tau
+        data['elong_rate'] = self.elong_rate
+        data['septum_position'] = self.septum_position
+        data['death'] = self.death
+        data['disappear'] = self.disappear
+
+        if self.daughters is not None:
+            data['child1'] = self.daughters[0]
+
+            if len(self.daughters) == 2:
+                data['child2'] = self.daughters[1]
+
+        df = pd.DataFrame(data, index=[self.id])
+        return(df)
+
+    def make_long_df(self):
+
+        import pandas as pd
+
+        data = {}
+        data['id'] = [self.id]*len(self.times)
+        data['times'] = self.times
+        data['length'] = self.lengths
+        data['volume'] = self.volumes
+        data['area'] = self.areas
+
+        # if a cell divides then there is one extra value in abs_times
+        if self.division_time is None:
+            data['seconds'] = self.abs_times
+        else:
+            data['seconds'] = self.abs_times[:-1]
+
+        # if there is fluorescence data, place it into the dataframe
+        if len(self.area_mean_fluorescence.keys()) != 0:
+
+            for fluorescence_channel in self.area_mean_fluorescence.keys():
+
+                data['{}_area_mean_fluorescence'.format(fluorescence_channel)] = self.area_mean_fluorescence[fluorescence_channel]
+                data['{}_volume_mean_fluorescence'.format(fluorescence_channel)] = self.volume_mean_fluorescence[fluorescence_channel]
+                data['{}_total_fluorescence'.format(fluorescence_channel)] = self.total_fluorescence[fluorescence_channel]
+
+        df = pd.DataFrame(data, index=data['id'])
+
+        return(df)
+
+# this is the object that holds all information for a fluorescent focus
+# this class can eventually be used in focus tracking, much like the Cell class
+# is used for cell tracking
+class Focus():
+    '''
+    The Focus class holds information on fluorescent foci.
+    A single focus can be present in multiple different cells.
+    '''
+
+    # initialize the focus
+    def __init__(self,
+                 cell,
+                 region,
+                 seg_img,
+                 intensity_image,
+                 t):
+        '''The cell must be given a unique cell_id and passed the region
+        information from the segmentation
+
+        Parameters
+        __________
+
+        cell : a Cell object
+
+        region : region properties object
+            Information about the labeled region from
+            skimage.measure.regionprops(), or a Region from a region table
+            (see get_region_table)
+
+        seg_img : 2D numpy array
+            Labelled image of cell segmentations
+
+        intensity_image : 2D numpy array
+            Fluorescence image with foci
+        '''
+
+        # create all the attributes
+        # id
+        focus_id = create_focus_id(region,
+                                   t,
+                                   cell.peak,
+                                   cell.fov,
+                                   experiment_name=params['experiment_name'])
+        self.id = focus_id
+
+        # identification convenience
+        self.appear_label = int(region.label)
+        self.regions = [region]
+        self.fov = cell.fov
+        self.peak = cell.peak
+
+        # cell is a CellFromGraph object
+        # cells are added later using the .add_cell method
+        self.cells = [cell]
+
+        # daughters is updated when focus splits
+        # if this is none then the focus did not split
+        self.parent = None
+        self.daughters = None
+        self.merger_partner = None
+
+        # appearance and split time
+        self.appear_time = t
+        self.split_time = None # filled out if focus splits
+
+        # the following information is on a per timepoint basis
+        self.times = [t]
+        self.abs_times = [params['time_table'][cell.fov][t]] # elapsed time in seconds
+        self.labels = [region.label]
+        self.bboxes = [region.bbox]
+        self.areas = [region.area]
+
+        # calculating focus length and width by using Feret Diamter.
+        #   These values are in pixels
+        # NOTE: in the future, update to straighten a focus an get straightened length/width
+        # print(region)
+        length_tmp = region.major_axis_length
+        width_tmp = region.minor_axis_length
+        # length_tmp, width_tmp = feretdiameter(region)
+        # if length_tmp == None:
+            # mm3.warning('feretdiameter() failed for ' + self.id + ' at t=' + str(t) + '.')
+        self.lengths = [length_tmp]
+        self.widths = [width_tmp]
+
+        # calculate focus volume as cylinder plus hemispherical ends (sphere). Unit is px^3
+        self.volumes = [(length_tmp - width_tmp) * np.pi * (width_tmp/2)**2 +
+                       (4/3) * np.pi * (width_tmp/2)**3]
+
+        # angle of the fit elipsoid and centroid location
+        self.orientations = [region.orientation]
+        self.centroids = [region.centroid]
+
+        # special information for focci
+        self.elong_rate = None
+        self.disappear = None
+        self.area_mean_fluorescence = []
+        self.volume_mean_fluorescence = []
+        self.total_fluorescence = []
+        self.median_fluorescence = []
+        self.sd_fluorescence = []
+        self.disp_l = []
+        self.disp_w = []
+
+        self.calculate_fluorescence(seg_img, intensity_image, region)
+
+    def __len__(self):
+        return(len(self.times))
+
+    def __str__(self):
+        return(self.print_info())
+
+    def add_cell(self, cell):
+        self.cells.append(cell)
+
+    def add_parent_focus(self, parent):
+        self.parent = parent
+
+    def merge(self, partner):
+        self.merger_partner = partner
+
+    def grow(self,
+             region,
+             t,
+             seg_img,
+             intensity_image,
+             current_cell):
+        '''Append data from a region to this focus.
+        use self.times[-1] to get most current value.'''
+
+        if current_cell is not self.cells[-1]:
+            self.add_cell(current_cell)
+
+        self.times.append(t)
+        self.abs_times.append(params['time_table'][self.cells[-1].fov][t])
+        self.labels.append(region.label)
+        self.bboxes.append(region.bbox)
+        self.areas.append(region.area)
+        self.regions.append(region)
+
+        #calculating focus length and width by using Feret Diamter
+        length_tmp = region.major_axis_length
+        width_tmp = region.minor_axis_length
+        # length_tmp, width_tmp = feretdiameter(region)
+        # if length_tmp == None:
+            # mm3.warning('feretdiameter() failed for ' + self.id + ' at t=' + str(t) + '.')
+        self.lengths.append(length_tmp)
+        self.widths.append(width_tmp)
+        self.volumes.append((length_tmp - width_tmp) * np.pi * (width_tmp/2)**2 +
+                            (4/3) * np.pi * (width_tmp/2)**3)
+
+        self.orientations.append(region.orientation)
+        self.centroids.append(region.centroid)
+
+        self.calculate_fluorescence(seg_img, intensity_image, region)
+
+    def calculate_fluorescence(self,
+                               seg_img,
+                               intensity_image,
+                               region):
+
+        total_fluor = np.sum(intensity_image[seg_img == region.label])
+        self.total_fluorescence.append(total_fluor)
+        self.area_mean_fluorescence.append(total_fluor/self.areas[-1])
+        self.volume_mean_fluorescence.append(total_fluor/self.volumes[-1])
+        self.median_fluorescence.append(np.median(intensity_image[seg_img == region.label]))
+        self.sd_fluorescence.append(np.std(intensity_image[seg_img == region.label]))
+
+        # get the focus' displacement from center of cell
+        # find x and y position relative to the whole image (convert from small box)
+
+        # calculate distance of foci from middle of cell (scikit image)
+        orientation = region.orientation
+        if orientation < 0:
+            orientation = np.pi+orientation
+
+        cell_idx = self.cells[-1].times.index(self.times[-1]) # final time in self.times is current time
+        cell_centroid = self.cells[-1].centroids[cell_idx]
+        focus_centroid = region.centroid
+        disp_y = (focus_centroid[0]-cell_centroid[0])*np.sin(orientation) - (focus_centroid[1]-cell_centroid[1])*np.cos(orientation)
+        disp_x = (focus_centroid[0]-cell_centroid[0])*np.cos(orientation) + (focus_centroid[1]-cell_centroid[1])*np.sin(orientation)
+
+        # append foci information to the list
+        self.disp_l = np.append(self.disp_l, disp_y)
+        self.disp_w = np.append(self.disp_w, disp_x)
+
+    def disappears(self, region, t):
+        '''
+        Annotate focus as disappearing from current t to next t.
+        '''
+        self.disappear = t
+
+    def add_daughter(self, daughter, t):
+
+        if self.daughters is None:
+            self.daughters = [daughter]
+        else:
+            self.daughters.append(daughter)
+            # sort daughters by y position, with smaller y-value first.
+            # this will cause the daughter closer to the closed end of the trap to be listed first.
+            self.daughters.sort(key=lambda focus: focus.centroids[0][0])
+            self.divide(t)
+
+    def divide(self, t):
+        '''Divide the cell and update stats.
+        daughter1 is the daugther closer to the closed end.'''
+
+        # put the daugther ids into the cell
+        # self.daughters = [daughter1.id, daughter2.id]
+
+        # give this guy a division time
+        self.split_time = self.daughters[0].appear_time
+
+        # convert data to smaller floats. No need for float64
+        # see https://docs.scipy.org/doc/numpy-1.13.0/user/basics.types.html
+        convert_to = 'float16' # numpy datatype to convert to
+
+        self.lengths = [length.astype(convert_to) for length in self.lengths]
+        self.widths = [width.astype(convert_to) for width in self.widths]
+        self.volumes = [vol.astype(convert_to) for vol in self.volumes]
+        # note the float16 is hardcoded here
+        self.orientations = [np.float16(orientation) for orientation in self.orientations]
+        self.centroids = [(y.astype(convert_to), x.astype(convert_to)) for y, x in self.centroids]
+
+    def print_info(self):
+        '''prints information about the focus'''
+        print('id = %s' % self.id)
+        print('times = {}'.format(', '.join('{}'.format(t) for t in self.times)))
+        print('lengths = {}'.format(', '.join('{:.2f}'.format(l) for l in self.lengths)))
+        if self.daughters is not None:
+            print('daughters = {}'.format(', '.join('{}'.format(daughter.id) for daughter in self.daughters)))
+        if self.cells is not None:
+            print('cells = {}'.format([cell.id for cell in self.cells]))
+
+    def make_wide_df(self):
+
+        import pandas as pd
+
+        data = {}
+        data['id'] = self.id
+        data['cells'] = self.cells
+        data['parent'] = self.parent
+        data['child1'] = None
+        data['child2'] = None
+        # data['division_time'] = self.division_time
+        data['appear_label'] = self.appear_label
+        data['appear_time'] = self.appear_time
+        data['disappear'] = self.disappear
+
+        if self.daughters is not None:
+            data['child1'] = self.daughters[0]
+
+            if len(self.daughters) == 2:
+                data['child2'] = self.daughters[1]
+
+        df = pd.DataFrame(data, index=[self.id])
+        return(df)
+
+    def make_long_df(self):
+
+        import pandas as pd
+
+        data = {}
+        data['id'] = [self.id]*len(self.times)
+        data['time'] = self.times
+        # data['cell'] = self.cells
+        data['length'] = self.lengths
+        data['volume'] = self.volumes
+        data['area'] = self.areas
+        data['seconds'] = self.abs_times
+        data['area_mean_fluorescence'] = self.area_mean_fluorescence
+        data['volume_mean_fluorescence'] = self.volume_mean_fluorescence
+        data['total_fluorescence'] = self.total_fluorescence
+        data['median_fluorescence'] = self.median_fluorescence
+        data['sd_fluorescence'] = self.sd_fluorescence
+        data['disp_l'] = self.disp_l
+        data['disp_w'] = self.disp_w
+
+        # print(data['id'])
+
+        df = pd.DataFrame(data, index=data['id'])
+
+        return(df)
+
+def get_greatest_score_info(first_node, second_node, graph):
+    '''A function that is useful for track linking
+    '''
+    score_names = [k for k in graph.get_edge_data(first_node, second_node).keys()]
+    pred_scores = [val['score'] for k,val in graph.get_edge_data(first_node, second_node).items()]
+    max_score_index = np.argmax(pred_scores)
+    max_name = score_names[max_score_index]
+    max_score = pred_scores[max_score_index]
+    return(max_name, max_score)
+
+def get_score_by_type(first_node, second_node, graph, score_type='child'):
+    '''A function useful in track linking
+    '''
+    pred_score = graph.get_edge_data(first_node, second_node)[score_type]['score']
+    return(pred_score)
+
+def count_unvisited(G, experiment_name):
+    count = 0
+    for node_id in G.nodes:
+        if node_id.startswith(experiment_name):
+            if not G.nodes[node_id]['visited']:
+                count += 1
+    return(count)
+
+def create_lineages_from_graph(graph,
+                               graph_df,
+                               fov_id,
+                               peak_id,
+                               ):
+    '''
+    This function iterates through nodes in a graph of detections
+    to link the nodes as "CellFromGraph" objects, eventually
+    leading to the ultimate goal of returning
+    a CellTree object with each cell's information for the experiment.
+
+    For now it ignores the number of cells in a detection and simply
+    assumes a 1:1 relationship between detections and cell number.
+
+    The nodes are numbered once, and the best edge of every pair of nodes is
+    found before linking, so each step of a track only looks at the edges
+    out of one node and linking takes time in proportion to the size of the
+    graph.
+    '''
+
+    # number the nodes, and find the detections, in the order of the graph
+    node_ids = list(graph.nodes)
+    node_index = {node_id : i for i, node_id in enumerate(node_ids)}
+    is_detection = np.array([node_id.startswith(params['experiment_name']) and node_id not in ['A', 'B']
+                             for node_id in node_ids])
+    is_disappear = np.array([node_id.startswith('disappear') for node_id in node_ids])
+
+    # successors of each node with the type and score of the best edge to each, and
+    # the score of the child edge, as from get_greatest_score_info and get_score_by_type
+    successors = []
+    successor_types = []
+    successor_scores = []
+    child_scores = []
+    for node_id in node_ids:
+        nbrs = graph.adj[node_id]
+        edge_types = []
+        scores = []
+        children = []
+        for edges in nbrs.values():
+            names = list(edges.keys())
+            edge_scores = [edge['score'] for edge in edges.values()]
+            max_score_index = np.argmax(edge_scores)
+            edge_types.append(names[max_score_index])
+            scores.append(edge_scores[max_score_index])
+            children.append(edges['child']['score'] if 'child' in edges else -np.inf)
+        successors.append(np.array([node_index[nbr] for nbr in nbrs], dtype=np.int64))
+        successor_types.append(edge_types)
+        successor_scores.append(np.array(scores, dtype=np.float64))
+        child_scores.append(np.array(children, dtype=np.float64))
+
+    # detections are started in the order of graph_df
+    queue = [node_index[node_id] for node_id in graph_df.node_id if is_detection[node_index[node_id]]]
+    queue_position = 0
+
+    visited = np.zeros(len(node_ids), dtype=bool)
+    num_unvisited = int(np.sum(is_detection))
+
+    tracks = {}
+    store = CellStore() # holds the data of the cells in tracks
+
+    def node_cell_id(node):
+        return create_cell_id(graph.nodes[node_ids[node]]['region'],
+                              graph.nodes[node_ids[node]]['time'],
+                              peak_id,
+                              fov_id,
+                              experiment_name=params['experiment_name'])
+
+    def node_cell(node, parent=None):
+        cell = CellFromGraph(node_cell_id(node),
+                             graph.nodes[node_ids[node]]['region'],
+                             graph.nodes[node_ids[node]]['time'],
+                             parent=parent,
+                             store=store)
+        tracks[cell.id] = cell
+        return cell
+
+    while num_unvisited > 0:
+
+        # grab the first unvisited detection. Detections are never unvisited again,
+        #   so the ones before it do not need to be looked at again
+        while visited[queue[queue_position]]:
+            queue_position += 1
+        prior_node = queue[queue_position]
+
+        cell_id = node_cell_id(prior_node)
+        if not cell_id in tracks:
+            current_cell = node_cell(prior_node)
+        else:
+            current_cell = tracks[cell_id]
+
+        visited[prior_node] = True
+        num_unvisited -= 1
+
+        # follow the best edges until the track leaves the detections. After that it only
+        #   goes through the dies or disappear states to 'B', which changes no cells
+        while is_detection[prior_node]:
+
+            # keep only the potential successor detections that have not yet been visited,
+            #   born, appear, etc. are always kept
+            unvisited = ~(visited[successors[prior_node]] & is_detection[successors[prior_node]])
+            unvisited_nodes = successors[prior_node][unvisited]
+            unvisited_scores = successor_scores[prior_node][unvisited]
+
+            # find highest score
+            max_score = np.max(unvisited_scores)
+            max_index = np.argmax(unvisited_scores)
+            next_node = unvisited_nodes[max_index]
+            max_edge_type = successor_types[prior_node][np.flatnonzero(unvisited)[max_index]]
+
+            # if the max_score in successor_scores isn't greater than log(0.1), just make the cell disappear for now.
+            if max_score < np.log(0.1):
+                max_edge_type = 'disappear'
+                next_node = unvisited_nodes[is_disappear[unvisited_nodes]][0]
+
+            # if this is a division event, add child node as a new cell,
+            #   add the new cell as a daughter to current_cell,
+            #   add current_cell as a parent to new cell.
+            # Then, search for the second child cell, add it to current_cell, etc.
+            if max_edge_type == 'child':
+
+                new_cell = node_cell(next_node, parent=current_cell)
+                new_cell_time = graph.nodes[node_ids[next_node]]['time']
+                current_cell.add_daughter(new_cell, new_cell_time)
+
+                # the second daughter is the other unvisited detection with the best child score
+                detections = is_detection[unvisited_nodes]
+                daughter_nodes = unvisited_nodes[detections]
+                daughter_scores = child_scores[prior_node][unvisited][detections]
+                daughter_scores[daughter_nodes == next_node] = -np.inf
+
+                # sometimes a second daughter doesn't exist: perhaps parent is at mouth of a trap and one
+                #  daughter is lost to the central channel at division time. In this case, do the following:
+                if np.max(daughter_scores) >= np.log(0.5):
+                    # the second daughter is not visited, so its cell is continued when it is started
+                    other_daughter_cell = node_cell(daughter_nodes[np.argmax(daughter_scores)],
+                                                    parent=current_cell)
+                    current_cell.add_daughter(other_daughter_cell, new_cell_time)
+
+                # now we remove current_cell, since it's done, and move on to one of the daughters
+                current_cell = new_cell
+
+            # if this is a migration, grow the current_cell.
+            elif max_edge_type == 'migrate':
+
+                current_cell.grow(graph.nodes[node_ids[next_node]]['region'],
+                                  graph.nodes[node_ids[next_node]]['time'])
+
+            # if the event represents death, kill the cell
+            elif max_edge_type == 'die':
+
+                current_cell.die(graph.nodes[node_ids[prior_node]]['region'],
+                                 graph.nodes[node_ids[prior_node]]['time'])
+
+            # if the event represents disappearance, end the cell
+            elif max_edge_type == 'disappear':
+
+                current_cell.disappears(graph.nodes[node_ids[prior_node]]['region'],
+                                        graph.nodes[node_ids[prior_node]]['time'])
+
+            # set the next node to 'visited'
+            if is_detection[next_node]:
+                num_unvisited -= 1
+            visited[next_node] = True
+
+            prior_node = next_node
+
+        print("{} detections remain unvisited.".format(num_unvisited))
+
+    store.compute_stats()
+    store.pack()
+
+    return tracks
+
+def make_track_trellis(predictions_dict,
+                       regions_by_time,
+                       max_cell_number=6,
+                       born_threshold=0.75,
+                       appear_threshold=0.75):
+    '''
+    Puts the tracking model predictions of one peak into dense arrays of log
+    scores, the array version of the graph made by initialize_track_graph.
+    Slot i of a frame is the i-th region of that frame, in label order.
+
+    Probabilities are clipped away from zero, so every assignment of the
+    detections has a finite score. As in the graph, a new cell is reached from
+    the born or appear state through one step of weight born_threshold or
+    appear_threshold.
+
+    Returns
+    -------
+    trellis : dict
+        n_regions : (n_frames,) number of detections in each frame, at most max_cell_number
+        migrate, child : (n_frames-1, max_cell_number, max_cell_number) log scores of
+            detection i of frame t continuing as, or dividing into, detection j of frame t+1
+        die, disappear : (n_frames, max_cell_number) log scores of detection i of frame t
+            ending after frame t
+        new, born : (n_frames, max_cell_number) log score of detection i of frame t
+            starting a new cell, and whether being born scores higher than appearing
+    '''
+
+    n_frames = len(regions_by_time)
+    shape = (n_frames, max_cell_number)
+    tiny = np.finfo(np.float32).tiny
+
+    def log_scores(key, shape):
+        key = '{}_model_predictions'.format(key)
+        if key not in predictions_dict:
+            # a model that was not run never scores
+            return np.full(shape, np.log(tiny))
+        values = np.asarray(predictions_dict[key], dtype=np.float64).reshape((n_frames,) + shape[1:])
+        return np.log(np.clip(values, tiny, 1))
+
+    pair_shape = (n_frames, max_cell_number, max_cell_number)
+    born = log_scores('born', shape) + np.log(born_threshold)
+    appear = log_scores('appear', shape) + np.log(appear_threshold)
+
+    trellis = {'n_regions' : np.array([min(len(regions), max_cell_number)
+                                       for regions in regions_by_time], dtype=np.int64),
+               'migrate' : log_scores('migrate', pair_shape)[:-1],
+               'child' : log_scores('child', pair_shape)[:-1],
+               'die' : log_scores('die', shape),
+               'disappear' : log_scores('disappear', shape),
+               'new' : np.maximum(born, appear),
+               'born' : born >= appear}
+
+    return trellis
+
+# moves of the alignment of the detections of two frames
+TRACK_END = 0 # detection of frame t dies or disappears
+TRACK_NEW = 1 # detection of frame t+1 is born or appears
+TRACK_MIGRATE = 2 # detection of frame t continues as one of frame t+1
+TRACK_LOST_DAUGHTER = 3 # detection of frame t divides, one daughter is lost
+TRACK_DIVIDE = 4 # detection of frame t divides into two neighbouring ones
+
+def viterbi_decode_trellis(trellis, lost_daughter_score=np.log(0.5)):
+    '''
+    Finds the highest scoring assignment of the detections of every pair of
+    frames. Cells in a channel keep their order, so the links of a pair of
+    frames are an alignment of the detections of the two frames, found by
+    dynamic programming over the slots of both frames. Every detection of
+    frame t ends, continues, or divides into one or two neighbouring detections
+    of frame t+1, and every detection of frame t+1 that is not linked is a new
+    cell. Since every detection is in the lineage, the score of a peak is the
+    sum over the pairs of frames, and the pairs are decoded together as one
+    batch. Ties go to the earlier move in the list above.
+
+    The second daughter of a division is not needed, at a cost of
+    lost_daughter_score, as in create_lineages_from_graph.
+
+    Returns
+    -------
+    decoded : dict
+        move : (n_frames-1, max_cell_number) move of each detection of frame t,
+            -1 for slots with no detection
+        targets : (n_frames-1, max_cell_number, 2) detections of frame t+1 it continues
+            or divides into, -1 if none
+        new : (n_frames-1, max_cell_number) detections of frame t+1 that start new cells
+        scores : (n_frames-1,) score of each pair of frames
+    '''
+
+    migrate = trellis['migrate']
+    child = trellis['child']
+    end = np.maximum(trellis['die'], trellis['disappear'])[:-1]
+    new = trellis['new'][1:]
+    n_pairs, n_slots = end.shape
+    pairs = np.arange(n_pairs)
+
+    # best score of aligning the first i detections of frame t to the first j of frame t+1
+    best = np.full((n_pairs, n_slots+1, n_slots+1), -np.inf)
+    best[:, 0, 0] = 0
+    back = np.zeros((n_pairs, n_slots+1, n_slots+1), dtype=np.int8)
+
+    for i in range(n_slots+1):
+        for j in range(n_slots+1):
+            if i == 0 and j == 0:
+                continue
+            candidates = np.full((5, n_pairs), -np.inf)
+            if i > 0:
+                candidates[TRACK_END] = best[:, i-1, j] + end[:, i-1]
+            if j > 0:
+                candidates[TRACK_NEW] = best[:, i, j-1] + new[:, j-1]
+            if i > 0 and j > 0:
+                candidates[TRACK_MIGRATE] = best[:, i-1, j-1] + migrate[:, i-1, j-1]
+                candidates[TRACK_LOST_DAUGHTER] = (best[:, i-1, j-1] + child[:, i-1, j-1]
+                                                   + lost_daughter_score)
+            if i > 0 and j > 1:
+                candidates[TRACK_DIVIDE] = (best[:, i-1, j-2] + child[:, i-1, j-2]
+                                            + child[:, i-1, j-1])
+            back[:, i, j] = np.argmax(candidates, axis=0)
+            best[:, i, j] = candidates[back[:, i, j], pairs]
+
+    # trace the alignments back from the last detection of both frames
+    i = trellis['n_regions'][:-1].copy()
+    j = trellis['n_regions'][1:].copy()
+    scores = best[pairs, i, j]
+
+    move = np.full((n_pairs, n_slots), -1, dtype=np.int8)
+    targets = np.full((n_pairs, n_slots, 2), -1, dtype=np.int64)
+    new_cells = np.zeros((n_pairs, n_slots), dtype=bool)
+
+    # each step takes one or two detections off, so this is enough steps
+    for _ in range(2 * n_slots):
+        active = pairs[(i > 0) | (j > 0)]
+        if active.size == 0:
+            break
+        ia, ja = i[active], j[active]
+        steps = back[active, ia, ja]
+
+        ended = steps == TRACK_END
+        move[active[ended], ia[ended]-1] = TRACK_END
+
+        started = steps == TRACK_NEW
+        new_cells[active[started], ja[started]-1] = True
+
+        linked = (steps == TRACK_MIGRATE) | (steps == TRACK_LOST_DAUGHTER)
+        move[active[linked], ia[linked]-1] = steps[linked]
+        targets[active[linked], ia[linked]-1, 0] = ja[linked]-1
+
+        divided = steps == TRACK_DIVIDE
+        move[active[divided], ia[divided]-1] = TRACK_DIVIDE
+        targets[active[divided], ia[divided]-1, 0] = ja[divided]-2
+        targets[active[divided], ia[divided]-1, 1] = ja[divided]-1
+
+        i[active] = ia - (steps != TRACK_NEW)
+        j[active] = ja - np.select([started | linked, divided], [1, 2], 0)
+
+    decoded = {'move' : move,
+               'targets' : targets,
+               'new' : new_cells,
+               'scores' : scores}
+
+    return decoded
+
+def viterbi_create_lineages(trellis,
+                            regions_by_time,
+                            fov_id,
+                            peak_id):
+    '''
+    Links the detections of a peak into CellFromGraph objects with the highest
+    scoring assignment of the trellis from make_track_trellis. See
+    viterbi_decode_trellis.
+
+    Returns
+    -------
+    tracks : CellTree
+        The cells of the peak, with the score of each pair of frames in
+        tracks.scores and their sum in tracks.score. Empty if the peak has no
+        frames or no regions.
+    '''
+
+    # nothing to link, like the greedy linker
+    if not any(len(regions) for regions in regions_by_time):
+        tracks = CellTree()
+        tracks.scores = []
+        tracks.score = 0.0
+        return tracks
+
+    decoded = viterbi_decode_trellis(trellis)
+    n_regions = trellis['n_regions']
+
+    tracks = CellTree()
+    store = CellStore() # holds the data of the cells in tracks
+
+    def new_cell(frame_idx, slot, parent=None):
+        region = regions_by_time[frame_idx][slot]
+        t = frame_idx + 1
+        cell_id = create_cell_id(region, t, peak_id, fov_id,
+                                 experiment_name=params['experiment_name'])
+        cell = CellFromGraph(cell_id, region, t, parent=parent, store=store)
+        tracks.add_cell(cell)
+        return cell
+
+    # the cell each detection of the current frame belongs to
+    frame_cells = [new_cell(0, slot) for slot in range(n_regions[0])]
+
+    for frame_idx in range(len(regions_by_time)-1):
+        t = frame_idx + 1
+        next_cells = [None] * n_regions[frame_idx+1]
+
+        for slot, cell in enumerate(frame_cells):
+            move = decoded['move'][frame_idx, slot]
+            targets = decoded['targets'][frame_idx, slot]
+            region = regions_by_time[frame_idx][slot]
+
+            if move == TRACK_MIGRATE:
+                cell.grow(regions_by_time[frame_idx+1][targets[0]], t+1)
+                next_cells[targets[0]] = cell
+
+            elif move in (TRACK_LOST_DAUGHTER, TRACK_DIVIDE):
+                for target in targets[targets >= 0]:
+                    daughter = new_cell(frame_idx+1, target, parent=cell)
+                    cell.add_daughter(daughter, t+1)
+                    next_cells[target] = daughter
+
+            elif trellis['die'][frame_idx, slot] >= trellis['disappear'][frame_idx, slot]:
+                cell.die(region, t)
+
+            else:
+                cell.disappears(region, t)
+
+        for slot in np.flatnonzero(decoded['new'][frame_idx]):
+            next_cells[slot] = new_cell(frame_idx+1, slot)
+
+        frame_cells = next_cells
+
+    tracks.scores = list(decoded['scores'])
+    tracks.score = float(np.sum(decoded['scores']))
+
+    store.compute_stats()
+    store.pack()
+
+    return tracks
+
+def link_track_peak(track_job):
+    '''
+    Links the detections of one peak from its tracking model predictions, with
+    the linker chosen by params['track']['linker']. Used as the pool function of
+    mm3_Track.py, so only the region table and the predictions are sent to the
+    worker.
+
+    Parameters
+    ----------
+    track_job : tuple
+        (fov_id, peak_id, region_table, predictions_dict, born_threshold, appear_threshold)
+
+    Returns
+    -------
+    (fov_id, peak_id, tracks, seconds)
+        tracks is a dictionary of CellFromGraph objects, seconds the time it took.
+    '''
+
+    fov_id, peak_id, region_table, predictions_dict, born_threshold, appear_threshold = track_job
+
+    t0 = time.time()
+    frame_number = predictions_dict['migrate_model_predictions'].shape[0]
+    regions_by_time = regions_from_table(region_table, frame_number)
+
+    if params['track']['linker'] == 'viterbi':
+        # dense score arrays instead of the graph
+        trellis = make_track_trellis(predictions_dict,
+                                     regions_by_time,
+                                     born_threshold=born_threshold,
+                                     appear_threshold=appear_threshold)
+        tracks = viterbi_create_lineages(trellis, regions_by_time, fov_id, peak_id).cells
+
+    else:
+        G, graph_df = initialize_track_graph(peak_id=peak_id,
+                                             fov_id=fov_id,
+                                             experiment_name=params['experiment_name'],
+                                             predictions_dict=predictions_dict,
+                                             regions_by_time=regions_by_time,
+                                             born_threshold=born_threshold,
+                                             appear_threshold=appear_threshold)
+        tracks = create_lineages_from_graph(G, graph_df, fov_id, peak_id)
+
+    return fov_id, peak_id, tracks, time.time() - t0
+
+def create_lineages_from_graph_2(graph,
+                               graph_df,
+                               fov_id,
+                               peak_id,
+                               ):
+
+    '''
+    This function iterates through nodes in a graph of detections
+    to link the nodes as "CellFromGraph" objects, eventually
+    leading to the ultimate goal of returning
+    a CellTree object with each cell's information for the experiment.
+
+    For now it ignores the number of cells in a detection and simply
+    assumes a 1:1 relationship between detections and cell number.
+    '''
+
+    # iterate through all nodes in G
+    # graph_score = 0
+    # track_dict = {}
+    tracks = CellTree()
+    store = CellStore() # holds the data of the cells in tracks
+
+    for node_id in graph.nodes:
+        graph.nodes[node_id]['visited'] = False
+    graph_df['visited'] = False
+    num_unvisited = count_unvisited(graph, params['experiment_name'])
+
+    while num_unvisited > 0:
+
+        # which detection nodes are not yet visited
+        unvisited_detection_nodes = graph_df[(~(graph_df.visited) & graph_df.node_id.str.startswith(params['experiment_name']))]
+        # grab the first unvisited node_id from the dataframe
+        prior_node_id = unvisited_detection_nodes.iloc[0,1]
+        prior_node_time = graph.nodes[prior_node_id]['time']
+        prior_node_region = graph.nodes[prior_node_id]['region']
+
+        cell_id = create_cell_id(prior_node_region,
+                                    prior_node_time,
+                                    peak_id,
+                                    fov_id,
+                                    experiment_name=params['experiment_name'])
+
+        if not cell_id in tracks.cell_id_list:
+            current_cell = CellFromGraph(cell_id,
+                                            prior_node_region,
+                                            prior_node_time,
+                                            parent=None,
+                                            store=store)
+            tracks.add_cell(current_cell)
+        else:
+            current_cell = tracks.get_cell(cell_id)
+
+    #     track_dict_key = prior_node_id
+        # for use later in establishing predecessors
+        current_node_id = prior_node_id
+
+        # set this detection's "visited" status to True in the graph and in the dataframe
+        graph.nodes[prior_node_id]['visited'] = True
+        graph_df.iloc[np.where(graph_df.node_id==prior_node_id)[0][0],3] = True
+
+        # build current_track list to this detection's node
+        current_track = collections.deque()
+        current_track.append(current_node_id)
+        predecessors_list = [k for k in graph.predecessors(prior_node_id)]
+        unvisited_predecessors_list = [k for k in predecessors_list if not graph.nodes[k]['visited']]
+
+        while len(unvisited_predecessors_list) != 0:
+
+            # initialize a scores array to select highest score from the available options
+            predecessor_scores = np.zeros(len(unvisited_predecessors_list))
+
+            # populate array with scores
+            for i in range(len(unvisited_predecessors_list)):
+                predecessor_node_id = unvisited_predecessors_list[i]
+                edge_type, edge_score = get_greatest_score_info(predecessor_node_id, current_node_id, graph)
+                predecessor_scores[i] = edge_score
+
+            # find highest score
+            max_index = np.argmax(predecessor_scores)
+            # grab the node_id corresponding to traversing the highest-scoring edge from the prior node
+            current_node_id = unvisited_predecessors_list[max_index]
+            current_track.appendleft(current_node_id)
+
+            predecessors_list = [k for k in graph.predecessors(current_node_id)]
+            unvisited_predecessors_list = [k for k in predecessors_list if not graph.nodes[k]['visited']]
+
+        while prior_node_id is not 'B':
+
+            # which nodes succeed our current node?
+            successor_node_ids = [node_id for node_id in graph.successors(prior_node_id)]
+
+            # keep only the potential successor detections that have not yet been visited
+            unvisited_node_ids = []
+            for i,successor_node_id in enumerate(successor_node_ids):
+
+                # if it starts with params['experiment_name'], it is a detection node, and not born, appear, etc.
+                if successor_node_id.startswith(params['experiment_name']):
+
+                    # if it has been used in the cell track graph, i.e., if 'visited' is True,
+                    #   move on. Otherwise, append to our list
+                    if graph.nodes[successor_node_id]['visited']:
+                        continue
+                    else:
+                        unvisited_node_ids.append(successor_node_id)
+
+                # if it doesn't start with params['experiment_name'], it is a born, appear, etc., and should always be appended
+                else:
+                    unvisited_node_ids.append(successor_node_id)
+
+            # initialize a scores array to select highest score from the available options
+            successor_scores = np.zeros(len(unvisited_node_ids))
+            successor_edge_types = []
+
+            # populate array with scores
+            for i in range(len(unvisited_node_ids)):
+                successor_node_id = unvisited_node_ids[i]
+                edge_type, edge_score = get_greatest_score_info(prior_node_id, successor_node_id, graph)
+                successor_scores[i] = edge_score
+                successor_edge_types.append(edge_type)
+
+            # find highest score
+            max_index = np.argmax(successor_scores)
+            # grab the node_id corresponding to traversing the highest-scoring edge from the prior node
+            next_node_id = unvisited_node_ids[max_index]
+            max_edge_type = successor_edge_types[max_index]
+
+            # if this is a division event, add child node as a new cell,
+            #   add the new cell as a daughter to current_cell,
+            #   add current_cell as a parent to new cell.
+            # Then, search for the second child cell, add it to current_cell, etc.
+            if max_edge_type == 'child':
+
+                new_cell_time = graph.nodes[next_node_id]['time']
+                new_cell_region = graph.nodes[next_node_id]['region']
+                new_cell_id = create_cell_id(new_cell_region,
+                                                new_cell_time,
+                                                peak_id,
+                                                fov_id,
+                                                experiment_name=params['experiment_name'])
+
+                new_cell = CellFromGraph(new_cell_id,
+                                            new_cell_region,
+                                            new_cell_time,
+                                            parent=current_cell,
+                                            store=store)
+
+                tracks.add_cell(new_cell)
+
+                current_cell.add_daughter(new_cell, new_cell_time)
+    #             print("First daughter", current_cell.id, new_cell.id)
+
+                # initialize a scores array to select highest score from the available options
+                unvisited_detection_nodes = [unvisited_node_id for unvisited_node_id in unvisited_node_ids if unvisited_node_id.startswith(params['experiment_name'])]
+                child_scores = np.zeros(len(unvisited_detection_nodes))
+
+                # populate array with scores
+                for i in range(len(unvisited_detection_nodes)):
+                    successor_node_id = unvisited_detection_nodes[i]
+                    if successor_node_id == next_node_id:
+                        child_scores[i] = -np.inf
+                        continue
+                    child_score = get_score_by_type(prior_node_id, successor_node_id, graph, score_type='child')
+                    child_scores[i] = child_score
+    #             print(child_scores)
+
+                try:
+                    second_daughter_index = np.argmax(child_scores)
+                    # grab the node_id corresponding to traversing the highest-scoring edge from the prior node
+                    other_daughter_node_id = unvisited_detection_nodes[second_daughter_index]
+
+                    other_daughter_cell_time = graph.nodes[other_daughter_node_id]['time']
+                    other_daughter_cell_region = graph.nodes[other_daughter_node_id]['region']
+                    other_daughter_cell_id = create_cell_id(other_daughter_cell_region,
+                                                                other_daughter_cell_time,
+                                                                peak_id,
+                                                                fov_id,
+                                                                experiment_name=params['experiment_name'])
+
+                    other_daughter_cell = CellFromGraph(other_daughter_cell_id,
+                                                            other_daughter_cell_region,
+                                                            other_daughter_cell_time,
+                                                            parent=current_cell,
+                                                            store=store)
+
+                    tracks.add_cell(other_daughter_cell)
+
+                    current_cell.add_daughter(other_daughter_cell, new_cell_time)
+
+                    # now we remove current_cell, since it's done, and move on to one of the daughters
+                    current_cell = new_cell
+    #                 print("Second daughter", current_cell.parent.id, other_daughter_cell.id)
+
+                # sometimes a second daughter doesn't exist: perhaps parent is at mouth of a trap and one
+                #  daughter is lost to the central channel at division time. In this case, do the following:
+                except IndexError:
+                    current_cell = new_cell
+
+            # if this is a migration, grow the current_cell.
+            elif max_edge_type == 'migrate':
+
+                cell_time = graph.nodes[next_node_id]['time']
+                cell_region = graph.nodes[next_node_id]['region']
+                current_cell.grow(cell_region, cell_time)
+
+            # if the event represents death, kill the cell
+            elif max_edge_type == 'die':
+
+                if prior_node_id.startswith(params['experiment_name']):
+                    death_time = graph.nodes[prior_node_id]['time']
+                    death_region = graph.nodes[prior_node_id]['region']
+                    current_cell.die(death_region, death_time)
+
+            # if the event represents disappearance, end the cell
+            elif max_edge_type == 'disappear':
+
+                if prior_node_id.startswith(params['experiment_name']):
+                    disappear_time = graph.nodes[prior_node_id]['time']
+                    disappear_region = graph.nodes[prior_node_id]['region']
+                    current_cell.disappears(disappear_region, disappear_time)
+
+            # set the next node to 'visited'
+            graph.nodes[next_node_id]['visited'] = True
+            if next_node_id != 'B':
+                graph_df.iloc[np.where(graph_df.node_id==next_node_id)[0][0],3] = True
+
+            # reset prior_node_id to iterate to next frame and append node_id to current track
+    #         current_track.append(next_node_id)
+            prior_node_id = next_node_id
+    #         print(current_cell.id, current_cell.parent.id)
+
+    #     track_dict[track_dict_key][:] = current_track
+
+        if num_unvisited != count_unvisited(graph, params['experiment_name']):
+            same_iter_num = 0
+        else:
+            same_iter_num += 1
+
+        num_unvisited = count_unvisited(graph, params['experiment_name'])
+        print("{} detections remain unvisited.".format(num_unvisited))
+
+        if same_iter_num > 10:
+            break
+
+    store.compute_stats()
+    store.pack()
+
+    return(tracks)
+
+### region tables
+# a region of a segmented image, taken from a region table. It has the attributes
+# of skimage RegionProperties that the Cell, Detection and Focus classes use
+Region = collections.namedtuple('Region', ['label', 'centroid', 'bbox', 'area', 'orientation',
+                                           'major_axis_length', 'minor_axis_length',
+                                           'length', 'width'])
+
+def make_region_table(label_stack):
+    '''
+    Measures all regions of a segmented stack.
+
+    Parameters
+    ----------
+    label_stack : np.ndarray
+        Labeled images, shape (t, y, x).
+
+    Returns
+    -------
+    table : dict
+        Column name : np.ndarray, one row per region, sorted by frame and label.
+        Columns are frame (index in the stack), label, centroid_y, centroid_x,
+        min_row, min_col, max_row, max_col, area, orientation,
+        major_axis_length, minor_axis_length, length and width (Feret
+        diameters, see feretdiameter), and checksum, the array_checksum of the
+        stack.
+    '''
+
+    properties = ['label', 'centroid', 'bbox', 'area', 'orientation',
+                  'major_axis_length', 'minor_axis_length']
+    frame_tables = [regionprops_table(label_image, properties=properties)
+                    for label_image in label_stack]
+
+    table = {'frame' : np.concatenate([np.full(len(frame_table['label']), frame, dtype='int32')
+                                       for frame, frame_table in enumerate(frame_tables)])
+                       if frame_tables else np.zeros(0, dtype='int32')}
+    for name, key in [('label', 'label'), ('centroid_y', 'centroid-0'), ('centroid_x', 'centroid-1'),
+                      ('min_row', 'bbox-0'), ('min_col', 'bbox-1'), ('max_row', 'bbox-2'),
+                      ('max_col', 'bbox-3'), ('area', 'area'), ('orientation', 'orientation'),
+                      ('major_axis_length', 'major_axis_length'),
+                      ('minor_axis_length', 'minor_axis_length')]:
+        table[name] = np.concatenate([frame_table[key] for frame_table in frame_tables]) \
+                      if frame_tables else np.zeros(0)
+    # Feret diameters of all regions of the stack at once
+    table['length'], table['width'] = feret_diameters(label_stack, table)
+    table['checksum'] = np.array(array_checksum(label_stack).encode())
+
+    return table
+
+def get_region_table(fov_id, peak_id, color, label_stack=None):
+    '''
+    Returns the region table of a segmented stack. A saved table is used if it
+    was made from the same stack, otherwise the table is made and saved so the
+    later stages can use it.
+
+    Parameters
+    ----------
+    color : str
+        Color of the segmented stack, e.g. 'seg_unet' or 'foci_seg_unet'.
+    label_stack : np.ndarray
+        The segmented stack, if it is already loaded.
+    '''
+
+    if label_stack is None:
+        label_stack = load_stack(fov_id, peak_id, color=color)
+
+    table = load_current_region_table(fov_id, peak_id, color, label_stack)
+    if table is not None:
+        return table
+
+    table = make_region_table(label_stack)
+    try:
+        save_region_table(table, fov_id, peak_id, color)
+    except (IOError, OSError) as e:
+        warning('Could not save region table for FOV {}, peak {}: {}'.format(fov_id, peak_id, e))
+
+    return table
+
+def load_current_region_table(fov_id, peak_id, color, label_stack):
+    '''Returns the saved region table of a segmented stack if it was made from
+    label_stack, else None. Does not write anything, so it can be used by workers.'''
+
+    try:
+        table = load_region_table(fov_id, peak_id, color)
+    except (IOError, KeyError):
+        return None
+    if table.get('checksum') is None or table['checksum'][()] != array_checksum(label_stack).encode():
+        return None
+
+    return table
+
+def regions_from_table(region_table, n_frames):
+    '''Lists of Region records for each frame of a region table, in label order,
+    to use where a list of regionprops per frame was used.'''
+
+    # numpy scalars are kept, the Cell classes convert them with astype
+    columns = [region_table[column] for column in
+               ['frame', 'label', 'centroid_y', 'centroid_x', 'min_row', 'min_col', 'max_row',
+                'max_col', 'area', 'orientation', 'major_axis_length', 'minor_axis_length',
+                'length', 'width']]
+
+    regions_by_time = [[] for _ in range(n_frames)]
+    for (frame, label, y, x, min_row, min_col, max_row, max_col, area, orientation,
+         major_axis_length, minor_axis_length, length, width) in zip(*columns):
+        regions_by_time[frame].append(Region(label, (y, x), (min_row, min_col, max_row, max_col),
+                                             area, orientation, major_axis_length,
+                                             minor_axis_length, length, width))
+
+    return regions_by_time
+
+def region_table_from_regions(regions_by_time):
+    '''The region table columns of lists of Region records for each frame, the
+    reverse of regions_from_table. Also takes skimage RegionProperties, which
+    have no Feret length and width; these columns are NaN for them.'''
+
+    columns = ['frame', 'label', 'centroid_y', 'centroid_x', 'min_row', 'min_col', 'max_row',
+               'max_col', 'area', 'orientation', 'major_axis_length', 'minor_axis_length',
+               'length', 'width']
+    rows = [(frame, region.label) + tuple(region.centroid) + tuple(region.bbox)
+            + (region.area, region.orientation, region.major_axis_length,
+               region.minor_axis_length, getattr(region, 'length', np.nan),
+               getattr(region, 'width', np.nan))
+            for frame, regions in enumerate(regions_by_time) for region in regions]
+
+    if not rows:
+        return {column : np.zeros(0) for column in columns}
+    return {column : np.array(values) for column, values in zip(columns, zip(*rows))}
+
+def make_track_features(region_table, n_frames, max_cell_number=6, n_window_frames=5):
+    '''
+    Makes the input of the tracking models for every frame of a peak from its
+    region table. The features of a frame are those of the regions in a window
+    of frames around it, with zeros past the ends of the stack.
+
+    The first max_cell_number regions of each frame are used. The features of a
+    region are (min_x, max_x, x, min_y, max_y, y, orientation, area, length), with
+    the major axis length as the length, and they go in the row of its label.
+    Regions with a label above max_cell_number have no row and are left out;
+    the data generator this replaces raised an IndexError for them.
+
+    Parameters
+    ----------
+    region_table : dict
+        See make_region_table. Rows are sorted by frame and label.
+    n_frames : int
+        Number of frames in the stack.
+
+    Returns
+    -------
+    features : np.ndarray, float32
+        Shape (n_frames, max_cell_number, n_window_frames, 9, 1).
+    '''
+
+    frames = np.asarray(region_table['frame'], dtype=np.int64)
+    labels = np.asarray(region_table['label'], dtype=np.int64)
+
+    # position of each region in its frame
+    frame_starts = np.searchsorted(frames, np.arange(n_frames))
+    ranks = np.arange(len(frames)) - frame_starts[frames]
+    keep = (ranks < max_cell_number) & (labels <= max_cell_number)
+
+    region_features = np.stack([region_table[column] for column in
+                                ['min_col', 'max_col', 'centroid_x', 'min_row', 'max_row',
+                                 'centroid_y', 'orientation', 'area', 'major_axis_length']],
+                               axis=1).astype(np.float32)
+
+    # features of each frame, with empty frames before the first and after the last
+    before = n_window_frames // 2
+    frame_features = np.zeros((n_frames + n_window_frames - 1, max_cell_number, 9), dtype=np.float32)
+    frame_features[frames[keep] + before, labels[keep] - 1] = region_features[keep]
+
+    # window of each frame, (n_frames, n_window_frames, max_cell_number, 9)
+    window_frames = np.arange(n_frames)[:, np.newaxis] + np.arange(n_window_frames)
+    windows = frame_features[window_frames]
+    # to the order of the models
+    return windows.transpose(0, 2, 1, 3)[..., np.newaxis]
+
+def region_length_width(region):
+    '''Feret length and width of a region, from its region table if it has one.'''
+
+    if isinstance(region, Region):
+        return region.length, region.width
+
+    return feretdiameter(region)
+
+# obtains cell length and width of the cell using the feret diameter
+def feretdiameter(region):
+    '''
+    feretdiameter calculates the length and width of the binary region shape. The cell orientation
+    from the ellipsoid is used to find the major and minor axis of the cell.
+    See https://en.wikipedia.org/wiki/Feret_diameter.
+
+    This is the single region version of feret_diameters. To measure many
+    regions use feret_diameters, which does all of them at once.
+    '''
+
+    # boundary pixels of the region in image coordinates
+    rows, cols = np.nonzero(get_boundary(region.image[np.newaxis])[0])
+    lengths, widths = feret_from_boundary(rows + region.bbox[0], cols + region.bbox[1],
+                                          np.zeros(len(rows), dtype=int),
+                                          np.array([region.centroid[0]]), np.array([region.centroid[1]]),
+                                          np.array([region.bbox[0]]), np.array([region.bbox[1]]),
+                                          np.array([region.orientation]),
+                                          np.array([region.major_axis_length]),
+                                          np.array([region.minor_axis_length]))
+
+    if np.isnan(lengths[0]):
+        return None, None
+
+    return lengths[0], widths[0]
+
+def get_boundary(label_stack):
+    '''Boundary pixels of all regions of a labeled stack (t, y, x): pixels of a
+    region with a 4-connected neighbor outside the region. This is the region
+    XOR its erosion, and the pixels at distance 1 in its distance transform.'''
+
+    padded = np.pad(label_stack, ((0,0), (1,1), (1,1)), mode='constant')
+    center = padded[:, 1:-1, 1:-1]
+
+    return (center != 0) & ((padded[:, :-2, 1:-1] != center) | (padded[:, 2:, 1:-1] != center) |
+                            (padded[:, 1:-1, :-2] != center) | (padded[:, 1:-1, 2:] != center))
+
+def feret_diameters(label_stack, region_table):
+    '''
+    Feret length and width of all regions of a labeled stack at once. Gives the
+    same values as feretdiameter for each region.
+
+    Parameters
+    ----------
+    label_stack : np.ndarray
+        Labeled images, shape (t, y, x). A single image can be passed as
+        image[np.newaxis].
+    region_table : dict
+        Columns frame, label, centroid_y, centroid_x, min_row, min_col,
+        orientation, major_axis_length and minor_axis_length, one row per
+        region, sorted by frame and label. See make_region_table.
+
+    Returns
+    -------
+    lengths, widths : np.ndarray
+        One entry per row of region_table. NaN where the region is too small to
+        measure.
+    '''
+
+    label_stack = np.asarray(label_stack)
+    frames, rows, cols = np.nonzero(get_boundary(label_stack))
+    labels = label_stack[frames, rows, cols].astype('int64')
+
+    # row of the region table each boundary pixel belongs to
+    n_labels = int(label_stack.max()) + 1 if label_stack.size else 1
+    table_keys = region_table['frame'].astype('int64') * n_labels + region_table['label'].astype('int64')
+    pixel_rows = np.searchsorted(table_keys, frames * n_labels + labels)
+
+    return feret_from_boundary(rows, cols, pixel_rows,
+                               region_table['centroid_y'], region_table['centroid_x'],
+                               region_table['min_row'], region_table['min_col'],
+                               region_table['orientation'],
+                               region_table['major_axis_length'],
+                               region_table['minor_axis_length'])
+
+def segment_argmin(values, segments, n_segments):
+    '''Index of the first smallest value in each segment, -1 for empty segments.'''
+
+    order = np.lexsort((values, segments)) # stable, so ties keep the first index
+    sorted_segments = segments[order]
+    first = np.searchsorted(sorted_segments, np.arange(n_segments))
+
+    argmins = np.full(n_segments, -1, dtype='int64')
+    found = first < len(order)
+    found[found] = sorted_segments[first[found]] == np.arange(n_segments)[found]
+    argmins[found] = order[first[found]]
+
+    return argmins
+
+def feret_from_boundary(rows, cols, pixel_regions, centroid_y, centroid_x, min_row, min_col,
+                        orientation, major_axis_length, minor_axis_length):
+    '''
+    Feret length and width of many regions from their boundary pixels. The
+    calculation is the one of the original per region feretdiameter, done for
+    all boundary pixels together, with the operations in the same order so the
+    results are identical.
+
+    Parameters
+    ----------
+    rows, cols : np.ndarray
+        Image coordinates of the boundary pixels, in row major order within
+        each region.
+    pixel_regions : np.ndarray
+        Index of the region of each boundary pixel.
+    centroid_y, ..., minor_axis_length : np.ndarray
+        Region properties as from regionprops, one entry per region.
+
+    Returns
+    -------
+    lengths, widths : np.ndarray
+        NaN for regions with too few boundary pixels.
+    '''
+
+    n_regions = len(centroid_y)
+    amp_param = 1.2 #amplifying number to make sure the axis is longer than actual cell length
+
+    # sort pixels by region, keeping their order within each region
+    order = np.argsort(pixel_regions, kind='stable')
+    pixel_regions = pixel_regions[order]
+    # coordinates relative to the bounding box padded by one pixel
+    pixel_y = rows[order] - min_row[pixel_regions] + 1
+    pixel_x = cols[order] - min_col[pixel_regions] + 1
+
+    n_pixels = np.bincount(pixel_regions, minlength=n_regions)
+    rank = np.arange(len(pixel_regions)) - np.searchsorted(pixel_regions, pixel_regions)
+
+    # y: along vertical axis of the image; x: along horizontal axis of the image;
+    # relative centroid in the bounding box (non-rotated)
+    y0 = centroid_y - min_row.astype(np.int16) + 1
+    x0 = centroid_x - min_col.astype(np.int16) + 1
+    cosorient = np.cos(orientation)
+    sinorient = np.sin(orientation)
+    top_first = (orientation > 0)[pixel_regions]
+
+    #####################
+    # calculate cell length
+    # the quarter of boundary pixels closest to the top of the image is searched for
+    # the pole closest to the top (L1 if orientation > 0)
+    quarter = np.round(n_pixels / 4).astype(int)[pixel_regions]
+    in_L1 = np.where(top_first, rank < quarter, rank >= quarter)
+
+    # the two end points of the long axis line
+    L1_y = y0 - sinorient * 0.5 * major_axis_length*amp_param
+    L1_x = x0 + cosorient * 0.5 * major_axis_length*amp_param
+    L2_y = y0 + sinorient * 0.5 * major_axis_length*amp_param
+    L2_x = x0 - cosorient * 0.5 * major_axis_length*amp_param
+
+    # closest boundary pixel to each end point
+    target_y = np.where(in_L1, L1_y[pixel_regions], L2_y[pixel_regions])
+    target_x = np.where(in_L1, L1_x[pixel_regions], L2_x[pixel_regions])
+    dist = np.sqrt(np.power(pixel_y-target_y,2) + np.power(pixel_x-target_x,2))
+    poles = segment_argmin(dist, 2 * pixel_regions + ~in_L1, 2 * n_regions).reshape(n_regions, 2)
+
+    measured = (poles >= 0).all(axis=1)
+    pole_1 = poles[measured, 0]
+    pole_2 = poles[measured, 1]
+    lengths = np.full(n_regions, np.nan)
+    lengths[measured] = np.sqrt(np.power(pixel_y[pole_1]-pixel_y[pole_2],2) +
+                                np.power(pixel_x[pole_1]-pixel_x[pole_2],2))
+
+    #####################
+    # calculate cell width
+    # 2 parallel lines along the short axis spaced by 0.8*quarter of length = 0.4, to avoid midcell
+    # each line is searched in one half of the boundary pixels
+    half = np.round(n_pixels / 2).astype(int)[pixel_regions]
+    in_W1 = np.where(top_first, rank >= half, rank < half).astype(int) # 0 for the first line
+
+    # starting points
+    x1 = x0 + cosorient * 0.5 * lengths*0.4
+    y1 = y0 - sinorient * 0.5 * lengths*0.4
+    x2 = x0 - cosorient * 0.5 * lengths*0.4
+    y2 = y0 + sinorient * 0.5 * lengths*0.4
+
+    # ends of the lines, on one side (W1) and the other side (W2)
+    # first index is the line, second the region
+    W1_y = np.array([y1 - cosorient * 0.5 * minor_axis_length*amp_param,
+                     y2 - cosorient * 0.5 * minor_axis_length*amp_param])
+    W1_x = np.array([x1 - sinorient * 0.5 * minor_axis_length*amp_param,
+                     x2 - sinorient * 0.5 * minor_axis_length*amp_param])
+    W2_y = np.array([y1 + cosorient * 0.5 * minor_axis_length*amp_param,
+                     y2 + cosorient * 0.5 * minor_axis_length*amp_param])
+    W2_x = np.array([x1 + sinorient * 0.5 * minor_axis_length*amp_param,
+                     x2 + sinorient * 0.5 * minor_axis_length*amp_param])
+
+    line_segments = 2 * pixel_regions + in_W1
+    d_W = np.full((n_regions, 2), np.nan)
+    W1_dist = np.sqrt(np.power(pixel_y-W1_y[in_W1, pixel_regions],2) +
+                      np.power(pixel_x-W1_x[in_W1, pixel_regions],2))
+    W2_dist = np.sqrt(np.power(pixel_y-W2_y[in_W1, pixel_regions],2) +
+                      np.power(pixel_x-W2_x[in_W1, pixel_regions],2))
+    pt_W1 = segment_argmin(W1_dist, line_segments, 2 * n_regions)
+    pt_W2 = segment_argmin(W2_dist, line_segments, 2 * n_regions)
+
+    found = (pt_W1 >= 0) & (pt_W2 >= 0)
+    d_W.ravel()[found] = np.sqrt(np.power((pixel_y[pt_W1[found]]-pixel_y[pt_W2[found]]).astype(float),2) +
+                                 np.power((pixel_x[pt_W1[found]]-pixel_x[pt_W2[found]]).astype(float),2))
+
+    # take the average of the two at quarter positions
+    widths = (d_W[:, 0] + d_W[:, 1]) / 2
+    widths[~measured] = np.nan
+
+    return lengths, widths
+
+# take info and make string for cell id
+def create_focus_id(region, t, peak, fov, experiment_name=None):
+    '''Make a unique focus id string for a new focus'''
+    if experiment_name is None:
+        focus_id = 'f{:0=2}p{:0=4}t{:0=4}r{:0=2}'.format(fov, peak, t, region.label)
+    else:
+        focus_id = '{}f{:0=2}p{:0=4}t{:0=4}r{:0=2}'.format(experiment_name, fov, peak, t, region.label)
+    return focus_id
+
+# take info and make string for cell id
+def create_cell_id(region, t, peak, fov, experiment_name=None):
+    '''Make a unique cell id string for a new cell'''
+    # cell_id = ['f', str(fov), 'p', str(peak), 't', str(t), 'r', str(region.label)]
+    if experiment_name is None:
+        cell_id = ['f', '%02d' % fov, 'p', '%04d' % peak, 't', '%04d' % t, 'r', '%02d' % region.label]
+        cell_id = ''.join(cell_id)
+    else:
+        cell_id = '{}f{:0=2}p{:0=4}t{:0=4}r{:0=2}'.format(experiment_name, fov, peak, t, region.label)
+    return cell_id
+
+def create_detection_id(t, peak, fov, region_label, experiment_name=None, max_cell_number=6):
+    '''Make a unique cell id string for a new cell'''
+    # cell_id = ['f', str(fov), 'p', str(peak), 't', str(t), 'r', str(region.label)]
+    if experiment_name is None:
+        det_id = ['f', '%02d' % fov, 'p', '%04d' % peak, 't', '%04d' % t, 'r', '%02d' % region_label]
+        det_id = ''.join(det_id)
+    else:
+        det_id = '{}f{:0=2}p{:0=4}t{:0=4}r{:0=2}'.format(experiment_name, fov, peak, t, region_label)
+    return det_id
+
+def initialize_track_graph(peak_id,
+                        fov_id,
+                        experiment_name,
+                        predictions_dict,
+                        regions_by_time,
+                        max_cell_number=6,
+                        born_threshold=0.75,
+                        appear_threshold=0.75):
+
+    import networkx as nx
+    import pandas as pd
+
+    detection_dict = {}
+    frame_num = predictions_dict['migrate_model_predictions'].shape[0]
+
+    ebunch = []
+
+    G = nx.MultiDiGraph()
+    # create common start point
+    G.add_node('A')
+    # create common end point
+    G.add_node('B')
+
+    last_frame = False
+
+    node_id_list = []
+    timepoint_list = []
+    region_label_list = []
+
+    for frame_idx in range(frame_num):
+
+        timepoint = frame_idx + 1
+        paired_detection_time = timepoint+1
+
+        # get detections for this frame
+        frame_regions_list = regions_by_time[frame_idx]
+
+        # if we're at the end of the imaging, make all cells migrate to node 'B'
+        if timepoint == frame_num:
+            last_frame = True
+        else:
+            paired_frame_regions_list = regions_by_time[frame_idx+1]
+
+        # get state change probabilities (class predictions) for this frame
+        frame_prediction_dict = {key:val[frame_idx,...] for key,val in predictions_dict.items() if key != 'general_model_predictions'}
+        # for i in range(len(predictions_dict['general_model_predictions'])):
+            # frame_general_prediction = predictions_dict['general_model_predictions'][]
+
+        # create the "will be born" and "will appear" nodes for this frame
+        prior_born_state = 'born_{:0=4}'.format(timepoint-1)
+        born_state = 'born_{:0=4}'.format(timepoint)
+        G.add_node(born_state, visited=False, time=timepoint)
+
+        prior_appear_state = 'appear_{:0=4}'.format(timepoint-1)
+        appear_state = 'appear_{:0=4}'.format(timepoint)
+        G.add_node(appear_state, visited=False, time=timepoint)
+
+        if frame_idx == 0:
+            ebunch.append(('A', appear_state, 'start', {'weight':appear_threshold, 'score':1*np.log(appear_threshold)}))
+            ebunch.append(('A', born_state, 'start', {'weight':born_threshold, 'score':1*np.log(born_threshold)}))
+
+        # create the "Dies" and "Disappeared" nodes to link from prior frame
+        prior_dies_state = 'dies_{:0=4}'.format(timepoint-1)
+        dies_state = 'dies_{:0=4}'.format(timepoint)
+        next_dies_state = 'dies_{:0=4}'.format(timepoint+1)
+        G.add_node(dies_state, visited=False, time=timepoint)
+
+        prior_disappear_state = 'disappear_{:0=4}'.format(timepoint-1)
+        disappear_state = 'disappear_{:0=4}'.format(timepoint)
+        next_disappear_state = 'disappear_{:0=4}'.format(timepoint+1)
+        G.add_node(disappear_state, visited=False, time=timepoint)
+
+        node_id_list.extend([born_state, dies_state, appear_state, disappear_state])
+        timepoint_list.extend([timepoint, timepoint, timepoint, timepoint])
+        region_label_list.extend([0,0,0,0])
+
+        if frame_idx > 0:
+
+            ebunch.append((prior_dies_state, dies_state, 'die', {'weight':1.1, 'score':1*np.log(1.1)})) # impossible to move out of dies track
+            ebunch.append((prior_disappear_state, disappear_state, 'disappear', {'weight':1.1, 'score':1*np.log(1.1)})) # impossible to move out of disappear track
+            ebunch.append((prior_born_state, born_state, 'born', {'weight':born_threshold, 'score':1*np.log(born_threshold)}))
+            ebunch.append((prior_appear_state, appear_state, 'appear', {'weight':appear_threshold, 'score':1*np.log(appear_threshold)}))
+
+        if last_frame:
+            ebunch.append((appear_state, 'B', 'end', {'weight':1, 'score':1*np.log(1)}))
+            ebunch.append((disappear_state, 'B', 'end', {'weight':1, 'score':1*np.log(1)}))
+            ebunch.append((born_state, 'B', 'end', {'weight':1, 'score':1*np.log(1)}))
+            ebunch.append((dies_state, 'B', 'end', {'weight':1, 'score':1*np.log(1)}))
+
+        for region_idx in range(max_cell_number):
+
+            # the tracking models assume there are 6 detections in each frame, regardless of how many
+            #   are actually there. Therefore, this try/except logic will catch cases where there
+            #   were fewer than 6 detections in a frame.
+            try:
+                region = frame_regions_list[region_idx]
+                region_label = region.label
+            except IndexError:
+                region = None
+                region_label = region_idx + 1
+
+            # create the name for this detection
+            detection_id = create_detection_id(timepoint,
+                                                peak_id,
+                                                fov_id,
+                                                region_label,
+                                                experiment_name=experiment_name)
+
+            det = Detection(detection_id, region, timepoint)
+            detection_dict[det.id] = det
+
+            if det.area is not None:
+                # if the detection represents a segmentation from our imaging, add its ID,
+                #   which is also its key in detection_dict, as a node in G
+                G.add_node(det.id, visited=False, cell_count=1, region=region, time=timepoint)
+                timepoint_list.append(timepoint)
+                node_id_list.append(detection_id)
+                region_label_list.append(region.label)
+                # also set up all edges for this detection's node in our ebunch
+                #   loop through prediction types and add each to the ebunch
+
+                for key,val in frame_prediction_dict.items():
+
+                    if frame_idx == 0:
+
+                        ebunch.append(('A', detection_id, 'start', {'weight':1, 'score':1*np.log(1)}))
+
+                    if last_frame:
+
+                        ebunch.append((detection_id, 'B', 'end', {'weight':1, 'score':1*np.log(1)}))
+
+                        if val.shape[0] == max_cell_number ** 2:
+                            continue
+
+                        else:
+                            frame_predictions = val
+                            detection_prediction = frame_predictions[region_idx]
+
+                            if key == 'appear_model_predictions':
+                                if frame_idx == 0:
+                                    continue
+                                elem = (prior_appear_state, detection_id, 'appear', {'weight':detection_prediction, 'score':1*np.log(detection_prediction)})
+
+                            elif 'born' in key:
+                                if frame_idx == 0:
+                                    continue
+                                elem = (prior_born_state, detection_id, 'born', {'weight':detection_prediction, 'score':1*np.log(detection_prediction)})
+
+                            elif 'zero_cell' in key:
+                                G.nodes[det.id]['zero_cell_weight'] = detection_prediction
+                                G.nodes[det.id]['zero_cell_score'] = 1*np.log(detection_prediction)
+
+                            elif 'one_cell' in key:
+                                G.nodes[det.id]['one_cell_weight'] = detection_prediction
+                                G.nodes[det.id]['zero_cell_score'] = 1*np.log(detection_prediction)
+
+                            elif 'two_cell' in key:
+                                G.nodes[det.id]['two_cell_weight'] = detection_prediction
+                                G.nodes[det.id]['zero_cell_score'] = 1*np.log(detection_prediction)
+
+                            ebunch.append(elem)
+
+                    else:
+                        # if the array is cell_number^2, reshape it to cell_number x cell_number
+                        #  Then slice our detection's row and iterate over paired_cells
+                        if val.shape[0] == max_cell_number**2:
+
+                            frame_predictions = val.reshape((max_cell_number,max_cell_number))
+                            detection_predictions = frame_predictions[region_idx,:]
+
+                            # loop through paired detection predictions, test whether paired detection exists
+                            #  then append the edge to our ebunch
+                            for paired_cell_idx in range(detection_predictions.size):
+
+                                # attempt to grab the paired detection. If we get an IndexError, it doesn't exist.
+                                try:
+                                    paired_detection = paired_frame_regions_list[paired_cell_idx]
+                                except IndexError:
+                                    continue
+
+                                # create the paired detection's id for use in our ebunch
+                                paired_detection_id = create_detection_id(paired_detection_time,
+                                                                            peak_id,
+                                                                            fov_id,
+                                                                            paired_detection.label,
+                                                                            experiment_name=experiment_name)
+
+                                paired_prediction = detection_predictions[paired_cell_idx]
+                                if 'child_' in key:
+                                    child_weight = paired_prediction
+                                    elem = (detection_id, paired_detection_id, 'child', {'child_weight':child_weight, 'score':1*np.log(child_weight)})
+                                    ebunch.append(elem)
+
+                                if 'migrate_' in key:
+                                    migrate_weight = paired_prediction
+                                    elem = (detection_id, paired_detection_id, 'migrate', {'migrate_weight':migrate_weight, 'score':1*np.log(migrate_weight)})
+                                    ebunch.append(elem)
+
+                                # if 'interaction_' in key:
+                                #     interaction_weight = paired_prediction
+                                #     elem = (detection_id, paired_detection_id, 'interaction', {'weight':interaction_weight, 'score':1*np.log(interaction_weight)})
+                                #     ebunch.append(elem)
+
+                        # if the array is cell_number long, do similar stuff as above.
+                        elif val.shape[0] == max_cell_number:
+
+                            frame_predictions = val
+                            detection_prediction = frame_predictions[region_idx]
+
+                            if key == 'appear_model_predictions':
+                                if frame_idx == 0:
+                                    continue
+    #                             print("Linking {} to {}.".format(prior_appear_state, detection_id))
+                                elem = (prior_appear_state, detection_id, 'appear', {'weight':detection_prediction, 'score':1*np.log(detection_prediction)})
+
+                            elif 'disappear_' in key:
+                                if last_frame:
+                                    continue
+    #                             print("Linking {} to {}.".format(detection_id, next_disappear_state))
+                                elem = (detection_id, next_disappear_state, 'disappear', {'weight':detection_prediction, 'score':1*np.log(detection_prediction)})
+
+                            elif 'born_' in key:
+                                if frame_idx == 0:
+                                    continue
+    #                             print("Linking {} to {}.".format(prior_born_state, detection_id))
+                                elem = (prior_born_state, detection_id, 'born', {'weight':detection_prediction, 'score':1*np.log(detection_prediction)})
+
+                            elif 'die_model' in key:
+                                if last_frame:
+                                    continue
+    #                             print("Linking {} to {}.".format(detection_id, next_dies_state))
+                                elem = (detection_id, next_dies_state, 'die', {'weight':detection_prediction, 'score':1*np.log(detection_prediction)})
+
+                            # the following classes aren't yet implemented
+                            elif 'zero_cell' in key:
+                                G.nodes[det.id]['zero_cell_weight'] = detection_prediction
+                                G.nodes[det.id]['zero_cell_score'] = 1*np.log(detection_prediction)
+
+                            elif 'one_cell' in key:
+                                G.nodes[det.id]['one_cell_weight'] = detection_prediction
+                                G.nodes[det.id]['one_cell_score'] = 1*np.log(detection_prediction)
+
+                            elif 'two_cell' in key:
+                                G.nodes[det.id]['two_cell_weight'] = detection_prediction
+                                G.nodes[det.id]['two_cell_score'] = 1*np.log(detection_prediction)
+
+                            ebunch.append(elem)
+
+    G.add_edges_from(ebunch)
+    graph_df = pd.DataFrame(data={'timepoint':timepoint_list,
+                                  'node_id':node_id_list,
+                                  'region_label':region_label_list})
+    return(G, graph_df)
+
+# function for a growing cell, used to calculate growth rate
+def cell_growth_func(t, sb, elong_rate):
+    '''
+    Assumes you have taken log of the data.
+    It also allows the size at birth to be a free parameter, rather than fixed
+    at the actual size at birth (but still uses that as a guess)
+    Assumes natural log, not base 2 (though I think that makes less sense)
+
+    old form: sb*2**(alpha*t)
+    '''
+    return sb+elong_rate*t
+
+# functions for checking if a cell has divided or not
+# this function should also take the variable t to
+# weight the allowed changes by the difference in time as well
+def check_growth_by_region(cell, region):
+    '''Checks to see if it makes sense
+    to grow a cell by a particular region'''
+    # load parameters for checking
+    max_growth_length = params['track']['max_growth_length']
+    min_growth_length = params['track']['min_growth_length']
+    max_growth_area = params['track']['max_growth_area']
+    min_growth_area = params['track']['min_growth_area']
+
+    # check if length is not too much longer
+    if cell.lengths[-1]*max_growth_length < region.major_axis_length:
+        return False
+
+    # check if it is not too short (cell should not shrink really)
+    if cell.lengths[-1]*min_growth_length > region.major_axis_length:
+        return False
+
+    # check if area is not too great
+    if cell.areas[-1]*max_growth_area < region.area:
+        return False
+
+    # check if area is not too small
+    if cell.lengths[-1]*min_growth_area > region.area:
+        return False
+
+    # # check if y position of region is within
+    # # the quarter positions of the bounding box
+    # lower_quarter = cell.bboxes[-1][0] + (region.major_axis_length / 4)
+    # upper_quarter = cell.bboxes[-1][2] - (region.major_axis_length / 4)
+    # if lower_quarter > region.centroid[0] or upper_quarter < region.centroid[0]:
+    #     return False
+
+    # check if y position of region is within the bounding box of previous region
+    lower_bound = cell.bboxes[-1][0]
+    upper_bound = cell.bboxes[-1][2]
+    if lower_bound > region.centroid[0] or upper_bound < region.centroid[0]:
+        return False
+
+    # return true if you get this far
+    return True
+
+# see if a cell has reasonably divided
+def check_division(cell, region1, region2):
+    '''Checks to see if it makes sense to divide a
+    cell into two new cells based on two regions.
+
+    Return 0 if nothing should happend and regions ignored
+    Return 1 if cell should grow by region 1
+    Return 2 if cell should grow by region 2
+    Return 3 if cell should divide into the regions.'''
+
+    # load in parameters
+    max_growth_length = params['track']['max_growth_length']
+    min_growth_length = params['track']['min_growth_length']
+
+    # see if either region just could be continued growth,
+    # if that is the case then just return
+    # these shouldn't return true if the cells are divided
+    # as they would be too small
+    if check_growth_by_region(cell, region1):
+        return 1
+
+    if check_growth_by_region(cell, region2):
+        return 2
+
+    # make sure combined size of daughters is not too big
+    combined_size = region1.major_axis_length + region2.major_axis_length
+    # check if length is not too much longer
+    if cell.lengths[-1]*max_growth_length < combined_size:
+        return 0
+    # and not too small
+    if cell.lengths[-1]*min_growth_length > combined_size:
+        return 0
+
+    # centroids of regions should be in the upper and lower half of the
+    # of the mother's bounding box, respectively
+    # top region within top half of mother bounding box
+    if cell.bboxes[-1][0] > region1.centroid[0] or cell.centroids[-1][0] < region1.centroid[0]:
+        return 0
+    # bottom region with bottom half of mother bounding box
+    if cell.centroids[-1][0] > region2.centroid[0] or cell.bboxes[-1][2] < region2.centroid[0]:
+        return 0
+
+    # if you got this far then divide the mother
+    return 3
+
+def check_growth_arrays(leaves, regions):
+    '''Vectorized check_growth_by_region. leaves and regions are dictionaries of
+    arrays from get_leaf_arrays and get_region_arrays, aligned so that entry i
+    of both is one proposed link. Returns a boolean array.'''
+
+    max_growth_length = params['track']['max_growth_length']
+    min_growth_length = params['track']['min_growth_length']
+    max_growth_area = params['track']['max_growth_area']
+    min_growth_area = params['track']['min_growth_area']
+
+    # each term is True where the link passes and comparisons with NaN are False,
+    # so a leaf or region with a NaN length or area is never linked. This is
+    # stricter than check_growth_by_region, whose early returns let NaN through
+    return ((leaves['length'] * max_growth_length >= regions['length']) &
+            (leaves['length'] * min_growth_length <= regions['length']) &
+            (leaves['area'] * max_growth_area >= regions['area']) &
+            (leaves['length'] * min_growth_area <= regions['area']) &
+            (leaves['top'] <= regions['y']) &
+            (leaves['bottom'] >= regions['y']))
+
+def check_division_arrays(leaves, regions1, regions2):
+    '''Vectorized division test of check_division, without the growth checks
+    that come first there. True where the leaf should divide into the two
+    regions.'''
+
+    max_growth_length = params['track']['max_growth_length']
+    min_growth_length = params['track']['min_growth_length']
+
+    # combined size of daughters is not too big or too small
+    combined_size = regions1['length'] + regions2['length']
+
+    # top region within top half of mother bounding box and
+    # bottom region within bottom half
+    return ((leaves['length'] * max_growth_length >= combined_size) &
+            (leaves['length'] * min_growth_length <= combined_size) &
+            (leaves['top'] <= regions1['y']) & (leaves['y'] >= regions1['y']) &
+            (leaves['y'] <= regions2['y']) & (leaves['bottom'] >= regions2['y']))
@@ -0,0 +1,30 @@
+'''Vectorized growth check of the lineage tracker.'''
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mm3_io # noqa: E402
+import mm3_tracking # noqa: E402
+
+def set_track_params():
+    mm3_io.params['track'] = {'max_growth_length' : 1.3, 'min_growth_length' : 0.8,
+                              'max_growth_area' : 1.3, 'min_growth_area' : 0.8}
+
+def test_check_growth_arrays_rejects_nan():
+    set_track_params()
+
+    # link 0 passes, links 1 and 2 have a NaN leaf length and region length
+    leaves = {'length' : np.array([20.0, np.nan, 20.0]),
+              'area' : np.array([200.0, 200.0, 200.0]),
+              'top' : np.array([10.0, 10.0, 10.0]),
+              'bottom' : np.array([30.0, 30.0, 30.0])}
+    regions = {'length' : np.array([21.0, 21.0, np.nan]),
+               'area' : np.array([210.0, 210.0, 210.0]),
+               'y' : np.array([20.0, 20.0, 20.0])}
+
+    passes = mm3_tracking.check_growth_arrays(leaves, regions)
+
+    assert passes.tolist() == [True, False, False]
@@ -0,0 +1,49 @@
+'''Fused tracking models give the same predictions as running the models one by one.
+Skipped when TensorFlow is not installed.'''
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mm3_ml # noqa: E402
+
+def make_tiny_model(n_outputs, seed):
+    'A small model with the input shape of the tracking models.'
+
+    from tensorflow.keras import layers, models
+
+    model = models.Sequential([layers.Flatten(input_shape=(4, 5, 9, 1)),
+                               layers.Dense(n_outputs, activation='softmax',
+                                            kernel_initializer=tf.keras.initializers.RandomNormal(seed=seed))])
+    return model
+
+def test_fused_tracking_model_matches_separate_models():
+    model_dict = {'migrate' : make_tiny_model(1, seed=1),
+                  'child' : make_tiny_model(3, seed=2)}
+    cell_info = np.random.RandomState(0).rand(7, 4, 5, 9, 1).astype('float32')
+
+    fused_model = mm3_ml.make_fused_tracking_model(model_dict)
+    assert fused_model is not None
+
+    fused = mm3_ml.predict_tracking_models(model_dict, cell_info, batch_size=4, fused_model=fused_model)
+    separate = mm3_ml.predict_tracking_models(model_dict, cell_info, batch_size=4)
+
+    assert sorted(fused.keys()) == ['child_predictions', 'migrate_predictions']
+    for key in separate:
+        assert fused[key].shape == separate[key].shape
+        np.testing.assert_allclose(fused[key], separate[key], rtol=1e-5, atol=1e-6)
+
+def test_fused_tracking_model_with_one_model():
+    model_dict = {'die' : make_tiny_model(1, seed=3)}
+    cell_info = np.random.RandomState(1).rand(5, 4, 5, 9, 1).astype('float32')
+
+    fused_model = mm3_ml.make_fused_tracking_model(model_dict)
+    fused = mm3_ml.predict_tracking_models(model_dict, cell_info, fused_model=fused_model)
+
+    np.testing.assert_allclose(fused['die_predictions'], model_dict['die'].predict(cell_info),
+                               rtol=1e-5, atol=1e-6)